@@ -12,13 +12,32 @@ REQUEST_DELAY = 1  # Delay in seconds between requests
 
 # ---- Paths ----
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'local_data')
+# FUNGI_DATA_DIR points the whole pipeline at another data tree (e.g. synthetic benchmark data)
+DATA_DIR = os.environ.get("FUNGI_DATA_DIR", os.path.join(BASE_DIR, 'local_data'))
 # JSON_DIR = os.path.join(DATA_DIR, 'json_files')
 # PORTALS_DIR = os.path.join(DATA_DIR, "portal_phylogeny")
 PROTEOMES_DIR = os.path.join(DATA_DIR, "proteomes")
 RENAMED_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "renamed")
 FINAL_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "final")
 CLEAN_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "clean")
+NONREDUNDANT_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "nonredundant")
+NONREDUNDANT_MAP_PATH = os.path.join(PROTEOMES_DIR, "nonredundant_members.tsv")
+ORTHOFINDER_DIR = os.path.join(CLEAN_PROTEOMES_DIR, "OrthoFinder")
+# Path of the latest Results_* folder, rewritten after every successful orthofinder-update.py run
+ORTHOFINDER_DONE_PATH = os.path.join(ORTHOFINDER_DIR, "latest_results.txt")
+SPECIESTREE_DIR = os.path.join(DATA_DIR, "speciestree")
+SPECIESTREE_SEQS_DIR = os.path.join(SPECIESTREE_DIR, "seq_files")
+SPECIESTREE_ALIGN_DIR = os.path.join(SPECIESTREE_DIR, "seq_alignments")
+SPECIESTREE_TRIM_DIR = os.path.join(SPECIESTREE_DIR, "trimmed_alignments")
+GENE_TREES_DIR = os.path.join(SPECIESTREE_DIR, "gene_trees")
+ASTRAL_CLEAN_TREES_DIR = os.path.join(SPECIESTREE_DIR, "astral_clean_trees")
+LOGS_DIR = os.path.join(DATA_DIR, "logs")
+BENCHMARK_DIR = os.path.join(BASE_DIR, "benchmarks")
+METRICS_PATH = os.path.join(LOGS_DIR, "stage_metrics.jsonl")
+PROFILE_DIR = os.path.join(LOGS_DIR, "profiles")
+# NCBI taxdump (https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz) and the index built from it
+NCBI_TAXDUMP_PATH = os.path.join(DATA_DIR, "ncbi_taxonomy", "taxdump.tar.gz")
+TAXONOMY_INDEX_DIR = os.path.join(DATA_DIR, "ncbi_taxonomy", "index")
 
 
 # PORTALS_TABLE_PATH = os.path.join(DATA_DIR, 'mycocosm_fungi_data.csv')
@@ -29,5 +48,151 @@ CLEAN_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "clean")
 PROTEOME_FILES_METADATA_PATH = os.path.join(DATA_DIR, 'proteomes_all_list.csv')
 PROCESSED_PROTEOMES_PATH = os.path.join(PROTEOMES_DIR, 'processed_proteomes_list.csv')
 PROTEOME_FINAL_METADATA_PATH = os.path.join(DATA_DIR, 'proteomes_final_list.csv')
+# "bgzf": extracted/renamed/final proteomes are BGZF <portal>.fasta.gz with .fai/.gzi indexes
+# (final/ holds hardlinks); "none": plain .fasta. clean/ stays plain for OrthoFinder and InterProScan.
+PROTEOME_COMPRESSION = os.environ.get("FUNGI_PROTEOME_COMPRESSION", "bgzf")
+BGZF_LEVEL = 6
 # PROTEOME_LOG_PATH = os.path.join(PROTEOMES_DIR, "renaming_summary_log.csv")
-# PROTEOME_CUSTOMLOG_PATH = os.path.join(PROTEOMES_DIR, "renaming_custom_summary_log.csv")
\ No newline at end of file
+# PROTEOME_CUSTOMLOG_PATH = os.path.join(PROTEOMES_DIR, "renaming_custom_summary_log.csv")
+
+# ---- CDS ----
+# CDS of the selected portals (mycocosm-datadump.py: file_selection/cds_files_all.csv), downloaded to
+# cds/compressed/ like the proteomes; renamed/ holds indexed BGZF <portal>.fasta.gz with Portal-ID headers
+CDS_DIR = os.path.join(DATA_DIR, "cds")
+CDS_SELECTION_PATH = os.path.join(DATA_DIR, "mycocosm_data", "file_selection", "cds_files_all.csv")
+COMPRESSED_CDS_DIR = os.path.join(CDS_DIR, "compressed")
+RENAMED_CDS_DIR = os.path.join(CDS_DIR, "renamed")
+# Codon alignments back-translated from the trimmed protein alignments (src/codon-align.py)
+SPECIESTREE_CODON_DIR = os.path.join(SPECIESTREE_DIR, "codon_alignments")
+# Sequences whose CDS translates to a different residue at more than this share of positions are dropped
+CODON_MAX_MISMATCH = 0.02
+
+# ---- InterProScan ----
+INTERPROSCAN_RESULTS_DIR = os.path.join(DATA_DIR, "interproscan_results")
+IPRSCAN_LOG_DIR = os.path.join(DATA_DIR, "logs", "iprscan_logs")
+IPRSCAN_APPLICATIONS = "CDD,Pfam,PANTHER,SMART,SUPERFAMILY"
+ANNOTATION_CACHE_DIR = os.path.join(DATA_DIR, "annotation_cache")
+ANNOTATION_CACHE_PATH = os.path.join(ANNOTATION_CACHE_DIR, "annotations.sqlite")
+IPRSCAN_PARQUET_DIR = os.path.join(DATA_DIR, "interproscan_parquet")
+HMMSCAN_RESULTS_DIR = os.path.join(DATA_DIR, "hmmscan_results")
+
+# ---- Domain architecture index ----
+DOMAIN_INDEX_DIR = os.path.join(DATA_DIR, "domain_index")
+# Portal taxonomy written by mycocosm-datadump.py (build_phylogeny_data)
+PORTAL_PHYLOGENY_PATH = os.path.join(DATA_DIR, "mycocosm_data", "portal_phylogeny", "portals_single_phylogeny.csv")
+# InterProScan member database the architectures are built from ("" = all, overlaps resolved)
+DOMAIN_INDEX_ANALYSIS = "Pfam"
+DOMAIN_MAX_EVALUE = 1e-3
+# A hit overlapping a better one by more than this fraction of the shorter hit is dropped
+DOMAIN_MAX_OVERLAP = 0.5
+
+# ---- Functional enrichment ----
+# Protein / orthogroup x GO term (or pathway) matrices and enrichment tables (src/go-enrichment.py)
+ENRICHMENT_DIR = os.path.join(DATA_DIR, "enrichment")
+# GO ontology (go-basic.obo) used to propagate annotations to ancestor terms and to name them; optional
+GO_OBO_PATH = os.path.join(DATA_DIR, "go", "go-basic.obo")
+# An orthogroup carries a term when at least this share of its annotated members do
+ENRICH_OG_MIN_FRACTION = 0.5
+# Terms annotated to fewer background items are not tested
+ENRICH_MIN_TERM_SIZE = 5
+ENRICH_FDR = 0.05
+# Clades are the taxa at these ranks (ncbi_taxon_<rank>) with at least ENRICH_MIN_CLADE_PORTALS portals
+ENRICH_CLADE_RANKS = ("class", "order", "family", "genus")
+ENRICH_MIN_CLADE_PORTALS = 3
+# An orthogroup is expanded in a clade when its mean copy number there is at least ENRICH_EXPANSION_RATIO
+# times the mean of the other portals and at least ENRICH_MIN_CLADE_COPIES
+ENRICH_EXPANSION_RATIO = 2.0
+ENRICH_MIN_CLADE_COPIES = 1.5
+
+# ---- Executables ----
+MAFFT_BIN = "mafft"
+TRIMAL_BIN = "/scratch/project_2002833/VG/software/trimal-1.5.0/source/trimal"
+IQTREE_BIN = "/scratch/project_2002833/VG/software/iqtree-3.0.1-Linux/bin/iqtree3"
+SLURM_ACCOUNT = "project_2002833"
+SLURM_PARTITION = "small"
+
+# ---- MSA strategy ----
+# Size-adaptive MAFFT (src/mafft-adaptive.py): a family gets the first tier it fits,
+# by number of sequences and mean sequence length (None = no limit).
+# (strategy, max sequences, max mean length, MAFFT options, threads)
+MAFFT_TIERS = [
+    ("L-INS-i", 200, 2000, "--localpair --maxiterate 1000", 4),
+    ("FFT-NS-i", 2000, None, "--retree 2 --maxiterate 1000", 8),
+    ("FFT-NS-2", 20000, None, "--retree 2 --maxiterate 0", 8),
+    ("PartTree", None, None, "--parttree --retree 1", 16),
+]
+# Families this small are aligned single-threaded whatever their tier
+MAFFT_SINGLE_THREAD_MAX_SEQS = 50
+# The fixed strategy used before the adaptive mode (baseline for benchmark-msa.py)
+MAFFT_FIXED_OPTIONS = "--retree 2 --maxiterate 1000"
+
+# ---- Family stage stamps ----
+# Every MSA / trim / gene tree output gets an <output>.stamp: a hash of the family's sorted member
+# sequences chained with the options of each stage (src/family-plan.py). The batch-*.sh scripts only
+# rerun families whose stamp no longer matches, so changing the options below reruns that stage.
+TRIMAL_OPTIONS = "-gt 0.8 -cons 10"
+IQTREE_OPTIONS = "-B 1000 -alrt 1000"
+
+# ---- Family pruning ----
+# Pre-alignment filter of the orthogroup FASTAs (src/prune-families.py, run by filter-scog.py)
+# Sequences outside these multiples of the family median length are dropped (fragments, fusions)
+PRUNE_MIN_LENGTH_RATIO = 0.5
+PRUNE_MAX_LENGTH_RATIO = 2.0
+# k-mer length of the consensus similarity that picks one copy per portal
+PRUNE_KMER = 3
+# Families larger than this keep the sequences closest to the consensus (0 = no cap)
+PRUNE_MAX_SEQS = 0
+# Per-family logs of the removed sequences, and prune_summary.tsv
+PRUNE_LOG_DIR = os.path.join(SPECIESTREE_DIR, "prune_logs")
+
+# ---- IQ-TREE model cache ----
+# Best-fit models collected from finished gene trees (src/iqtree-models.py)
+MODEL_CACHE_PATH = os.path.join(SPECIESTREE_DIR, "model_cache.sqlite")
+# "mset": ModelFinder only tests the substitution matrices seen in the cache;
+# "reuse": families close to cached ones take their model without ModelFinder; "off": full ModelFinder
+MODEL_SELECTION_MODE = os.environ.get("FUNGI_MODEL_SELECTION", "mset")
+# Cached ModelFinder results needed before -mset is restricted
+MODEL_CACHE_MIN_FAMILIES = 50
+# -mset keeps the most frequent matrices covering this share of the cached families
+MODEL_MSET_COVERAGE = 0.95
+# Reuse: this many nearest families within both limits, and this share of them agreeing on the model
+MODEL_REUSE_NEIGHBOURS = 5
+MODEL_REUSE_MIN_AGREEMENT = 0.8
+MODEL_REUSE_MAX_COMPOSITION_DISTANCE = 0.03    # total variation distance of amino-acid frequencies
+MODEL_REUSE_MAX_LENGTH_RATIO = 1.5             # alignment sites, longer / shorter
+
+# ---- Work queue ----
+# Shared-filesystem queues drained by long-lived workers (src/workqueue.py), one folder per stage
+QUEUE_DIR = os.path.join(DATA_DIR, "queues")
+# A claim not renewed for this long (dead or killed worker) goes back to pending; workers renew every lease / 4
+QUEUE_LEASE_S = 15 * 60
+# Failed runs of an item before it is moved to failed/
+QUEUE_MAX_ATTEMPTS = 3
+# Default pool size and time limit of the SLURM workers
+QUEUE_WORKERS = 50
+QUEUE_WORKER_TIME = "3-00:00:00"
+
+# ---- SLURM right-sizing ----
+# Per-task resources for the array launchers (src/slurm-plan.py). x is the input size:
+# n_seqs * residues for unaligned FASTA (msa), taxa * sites for alignments (trim, iqtree).
+# time_s = a * x**b and mem_mb = c * x**d until fitted models from sacct are saved in
+# SLURM_RESOURCE_MODELS_PATH; cpus: first (max x, cpus) step that fits (msa: MAFFT tier threads).
+SLURM_RESOURCE_MODELS = {
+    "msa": {"time": (2.9e-5, 0.9), "mem": (0.09, 0.5), "cpus": None},
+    "trim": {"time": (2e-5, 1.0), "mem": (0.32, 0.5), "cpus": [(None, 1)]},
+    "iqtree": {"time": (2.5e-3, 1.2), "mem": (0.22, 0.7), "cpus": [(1e5, 4), (1e6, 8), (None, 16)]},
+}
+SLURM_RESOURCE_MODELS_PATH = os.path.join(LOGS_DIR, "slurm_resource_models.json")
+SLURM_PLAN_LOG_PATH = os.path.join(LOGS_DIR, "slurm_plans.jsonl")
+SLURM_USAGE_PATH = os.path.join(LOGS_DIR, "slurm_usage.tsv")
+# Headroom over the predicted time / memory (fitted models use their own 95th percentile residual)
+SLURM_TIME_MARGIN = 1.5
+SLURM_MEM_MARGIN = 1.3
+# A task killed at its limit needed more: refitted models request at least this much over the limit that killed it
+SLURM_KILLED_MARGIN = 1.25
+SLURM_MIN_TIME_S = 10 * 60
+SLURM_MIN_MEM_MB = 512
+SLURM_MAX_TIME_S = 3 * 24 * 3600
+SLURM_MAX_MEM_MB = 370 * 1024
+# Tasks are grouped into at most this many resource classes, one array each
+SLURM_RESOURCE_CLASSES = 3
@@ -0,0 +1,137 @@
+"""
+Single entry point for the pipeline scripts.
+
+  python -m src <command> [args...]
+  python -m src --list
+  python -m src startup-check [--budget-ms MS] [--repeat N]
+
+Only the standard library is imported here; each command runs its script with
+runpy, so pandas, Biopython, requests etc. are loaded only by the commands that
+use them, and the project root is put on sys.path once for all of them.
+
+startup-check times `<command> --help` for every command in a fresh interpreter
+(i.e. interpreter start + module-level imports) and fails when a command goes
+over its budget, printing its slowest imports from -X importtime.
+"""
+
+import os
+import sys
+import time
+import runpy
+import argparse
+import subprocess
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, "src")
+
+# Budgets for interpreter start + imports of `<command> --help`, in milliseconds
+LIGHT_MS = 300
+HEAVY_MS = 2500
+
+# command -> (script, startup budget in ms, help)
+COMMANDS = {
+    "datadump": ("mycocosm-datadump.py", HEAVY_MS, "Fetch the MycoCosm table and file metadata"),
+    "taxonomy-index": ("build-taxonomy-index.py", HEAVY_MS, "Build the offline NCBI taxonomy index"),
+    "process-seqs": ("process-seq-files.py", HEAVY_MS, "Extract and rename downloaded proteomes"),
+    "process-cds": ("process-cds-files.py", HEAVY_MS, "Stream-rename CDS files to indexed BGZF"),
+    "cleanup-seqs": ("cleanup-seq-files.py", HEAVY_MS, "Length-filter the final proteomes"),
+    "busco-summary": ("process_busco_results.py", HEAVY_MS, "Aggregate BUSCO summaries and full tables"),
+    "iprscan-scheduler": ("iprscan-scheduler.py", LIGHT_MS, "Schedule cluster InterProScan runs"),
+    "iprscan-summary": ("iprscan_log_summarize.py", LIGHT_MS, "Summarize InterProScan submit logs"),
+    "ingest-iprscan": ("ingest-iprscan-results.py", HEAVY_MS, "InterProScan TSVs -> Parquet and domain matrices"),
+    "domain-index": ("domain-index.py", LIGHT_MS, "Domain-architecture index: build and AND/OR/order queries"),
+    "go-enrichment": ("go-enrichment.py", LIGHT_MS, "GO / pathway enrichment of clade expansions and gene sets"),
+    "annotation-cache": ("annotation-cache.py", LIGHT_MS, "Sequence-hash annotation cache"),
+    "dedup": ("dedup-proteomes.py", HEAVY_MS, "Collapse identical sequences / expand results"),
+    "orthofinder-update": ("orthofinder-update.py", HEAVY_MS, "Incremental OrthoFinder runs"),
+    "filter-scog": ("filter-scog.py", LIGHT_MS, "Select single-copy orthogroups"),
+    "prune-families": ("prune-families.py", LIGHT_MS, "Drop length outliers / in-paralogs before alignment"),
+    "mafft-adaptive": ("mafft-adaptive.py", LIGHT_MS, "Align a family with a size-dependent MAFFT strategy"),
+    "family-plan": ("family-plan.py", LIGHT_MS, "Membership-hash stamps: plan which families to realign / retrim / retree"),
+    "benchmark-msa": ("benchmark-msa.py", HEAVY_MS, "Adaptive vs fixed MAFFT benchmark"),
+    "iqtree-models": ("iqtree-models.py", LIGHT_MS, "IQ-TREE best-fit model cache (-mset / model reuse)"),
+    "codon-align": ("codon-align.py", LIGHT_MS, "Back-translate trimmed alignments to codon alignments"),
+    "workqueue": ("workqueue.py", LIGHT_MS, "Shared-filesystem work queue: enqueue, workers, status"),
+    "slurm-plan": ("slurm-plan.py", LIGHT_MS, "Right-size SLURM arrays from input sizes; sacct report / fit"),
+    "clean-trees": ("cleanup-trees-par.py", HEAVY_MS, "Rename gene tree leaves for ASTRAL"),
+    "tree-summary": ("summarize-gene-trees.py", HEAVY_MS, "Gene tree vs species tree concordance"),
+    "pipeline": ("pipeline.py", LIGHT_MS, "Make-style pipeline runner"),
+    "benchmark": ("benchmark-hotpaths.py", HEAVY_MS, "Synthetic-data benchmarks"),
+}
+
+
+def run_command(name: str, argv: list):
+    script = os.path.join(SRC_DIR, COMMANDS[name][0])
+    sys.argv = [script, *argv]
+    runpy.run_path(script, run_name="__main__")
+
+
+def _slowest_imports(importtime_stderr: str, n: int = 5) -> list:
+    # Lines look like: "import time:  self [us] | cumulative | imported package"
+    rows = []
+    for line in importtime_stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) == 3 and not parts[2].startswith("  "):
+            # Top-level imports only (nested ones are indented)
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def startup_check(argv: list) -> int:
+    ap = argparse.ArgumentParser(prog="python -m src startup-check",
+                                 description="Check interpreter start + import time of every command")
+    ap.add_argument("commands", nargs="*", help="Commands to check (default: all)")
+    ap.add_argument("--budget-ms", type=float, default=None, help="Override every command's budget")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per command; the fastest counts (default: 3)")
+    args = ap.parse_args(argv)
+
+    over = []
+    for name in args.commands or COMMANDS:
+        if name not in COMMANDS:
+            ap.error(f"unknown command: {name}")
+        budget = args.budget_ms or COMMANDS[name][1]
+        best, stderr, rc = None, "", 0
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "src", name, "--help"],
+                                  cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            ms = (time.perf_counter() - t0) * 1000
+            if best is None or ms < best:
+                best, stderr, rc = ms, proc.stderr, proc.returncode
+        status = "✅" if rc == 0 and best <= budget else "❌"
+        print(f"{status} {name:<20} {best:7.0f} ms  (budget {budget:.0f} ms)")
+        if rc != 0:
+            print(f"   exited with {rc}: {stderr.strip().splitlines()[-1] if stderr.strip() else ''}")
+        if status == "❌":
+            over.append(name)
+            for us, module in _slowest_imports(stderr):
+                print(f"   {us / 1000:8.1f} ms  {module}")
+    if over:
+        print(f"❌ Over budget or failing: {', '.join(over)}")
+        return 1
+    print("✅ All commands within their startup budget.")
+    return 0
+
+
+def main():
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    argv = sys.argv[1:]
+    if not argv or argv[0] in ("-h", "--help", "--list"):
+        print(__doc__.strip() + "\n\nCommands:")
+        for name, (script, _, text) in COMMANDS.items():
+            print(f"  {name:<20} {text}  [{script}]")
+        print(f"  {'startup-check':<20} Check import-time budgets of all commands")
+        return
+    name, rest = argv[0], argv[1:]
+    if name == "startup-check":
+        sys.exit(startup_check(rest))
+    if name not in COMMANDS:
+        sys.exit(f"❌ Unknown command '{name}'. Use --list to see the available commands.")
+    run_command(name, rest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Sequence-hash annotation cache for InterProScan and hmmscan.
+
+Results are cached per (MD5 of the cleaned sequence, tool, database version), so
+a refreshed proteome, a rerun after a failure or a TF subset only sends proteins
+that were never scanned with that database to the cluster.
+
+Workflow:
+  1. split  : write <work>/<portal>.fasta with only the uncached proteins
+              (headers are MD5s) and <work>/<portal>.md5.tsv for every protein.
+  2. run cluster_interproscan / hmmscan on the <work>/*.fasta files as usual
+     (outputs <portal>.tsv[.gz] or <portal>.domtblout in --results-dir).
+  3. merge  : load those outputs into the cache and write the complete per-portal
+              result files (all proteins, original Portal-IDs) to --out-dir.
+
+Usage:
+  python src/annotation-cache.py split --tool interproscan --db-version 5.73-104.0
+  python src/annotation-cache.py merge --tool interproscan --db-version 5.73-104.0 \
+      --results-dir <dir> --out-dir local_data/interproscan_results
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CLEAN_PROTEOMES_DIR, ANNOTATION_CACHE_DIR, ANNOTATION_CACHE_PATH
+from src.utils.wrangleutils import validate_directories
+from src.utils.cacheutils import TOOLS, open_cache, split_cached, store_results, write_portal_results
+
+def default_work_dir(tool: str) -> str:
+    return os.path.join(ANNOTATION_CACHE_DIR, tool, "pending")
+
+def find_result(results_dir: str, portal: str, tool: str) -> str | None:
+    candidates = [".tsv.gz", ".tsv", ""] if tool == "interproscan" else [".domtblout", ".domtblout.gz"]
+    for suffix in candidates:
+        path = os.path.join(results_dir, portal + suffix)
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            return path
+    return None
+
+def cmd_split(args, con):
+    validate_directories([args.in_dir])
+    work_dir = args.work_dir or default_work_dir(args.tool)
+    fasta_files = sorted(glob.glob(os.path.join(args.in_dir, "*.fasta")))
+    if not fasta_files:
+        sys.exit(f"❌ No FASTA files found in {args.in_dir}")
+    total = cached = uncached = 0
+    for path in fasta_files:
+        s = split_cached(con, args.tool, args.db_version, path, work_dir)
+        total, cached, uncached = total + s["total"], cached + s["cached"], uncached + s["uncached_unique"]
+        print(f"{s['portal']}: {s['cached']}/{s['total']} cached, {s['uncached_unique']} to scan")
+    print(f"✅ {cached}/{total} proteins cached; {uncached} unique sequences to scan in {work_dir}")
+
+def cmd_merge(args, con):
+    work_dir = args.work_dir or default_work_dir(args.tool)
+    validate_directories([work_dir])
+    os.makedirs(args.out_dir, exist_ok=True)
+    md5_maps = sorted(glob.glob(os.path.join(work_dir, "*.md5.tsv")))
+    incomplete = []
+    for md5_map in md5_maps:
+        portal = os.path.basename(md5_map)[:-len(".md5.tsv")]
+        scanned_fasta = os.path.join(work_dir, f"{portal}.fasta")
+        if os.path.exists(scanned_fasta):
+            result = find_result(args.results_dir, portal, args.tool)
+            if result is None:
+                print(f"⚠️ {portal}: no {args.tool} output in {args.results_dir}; leaving it pending.")
+                incomplete.append(portal)
+                continue
+            n = store_results(con, args.tool, args.db_version, result, scanned_fasta)
+            print(f"📥 {portal}: cached {n} result lines")
+        out_path = os.path.join(args.out_dir, portal + TOOLS[args.tool]["suffix"])
+        s = write_portal_results(con, args.tool, args.db_version, md5_map, out_path)
+        if s["missing"]:
+            print(f"⚠️ {portal}: {s['missing']} proteins not in cache; no output written, keeping pending files.")
+            incomplete.append(portal)
+            continue
+        print(f"✅ {portal}: {s['lines']} lines for {s['proteins_with_hits']}/{s['proteins']} proteins -> {out_path}")
+        os.remove(md5_map)
+        if os.path.exists(scanned_fasta):
+            os.remove(scanned_fasta)
+    if incomplete:
+        print(f"⚠️ {len(incomplete)} portals still pending: {', '.join(incomplete)}")
+
+def cmd_stats(args, con):
+    for tool, version, n in con.execute("SELECT tool, version, COUNT(*) FROM scanned GROUP BY tool, version"):
+        hits = con.execute("SELECT COUNT(*) FROM hits WHERE tool=? AND version=?", (tool, version)).fetchone()[0]
+        print(f"{tool}\t{version}\t{n} sequences\t{hits} hit lines")
+
+def main():
+    ap = argparse.ArgumentParser(description="Sequence-hash annotation cache for InterProScan and hmmscan")
+    ap.add_argument("--cache", default=ANNOTATION_CACHE_PATH, help="SQLite cache file")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    def add_common(p):
+        p.add_argument("--tool", choices=sorted(TOOLS), required=True)
+        p.add_argument("--db-version", required=True,
+                       help="Tool + database version label, e.g. '5.73-104.0' or 'Pfam-A_37.0_TF'")
+        p.add_argument("--work-dir", default=None, help="Pending folder (default: annotation_cache/<tool>/pending)")
+
+    p = sub.add_parser("split", help="Write uncached proteins for scanning")
+    add_common(p)
+    p.add_argument("--in-dir", default=CLEAN_PROTEOMES_DIR)
+    p.set_defaults(func=cmd_split)
+
+    p = sub.add_parser("merge", help="Cache new results and write full per-portal outputs")
+    add_common(p)
+    p.add_argument("--results-dir", required=True, help="Tool outputs for the pending FASTAs")
+    p.add_argument("--out-dir", required=True, help="Folder for the complete per-portal result files")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("stats", help="Show cache contents")
+    p.set_defaults(func=cmd_stats)
+
+    args = ap.parse_args()
+    con = open_cache(args.cache)
+    try:
+        args.func(args, con)
+    finally:
+        con.close()
+
+if __name__ == "__main__":
+    main()
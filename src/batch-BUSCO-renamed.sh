@@ -53,6 +53,20 @@ if [[ ! -d "$SEQ_DIR" ]]; then
   echo "ERROR: Input directory not found: $SEQ_DIR" >&2
   exit 1
 fi
+
+# BUSCO cannot read gzip: stage BGZF proteomes (<portal>.fasta.gz) decompressed on
+# node-local scratch, next to links to the plain ones, and run on that folder
+shopt -s nullglob
+gz_files=("$SEQ_DIR"/*.fasta.gz)
+if (( ${#gz_files[@]} > 0 )); then
+  STAGE_DIR="${LOCAL_SCRATCH:-${TMPDIR:-/tmp}}/busco_input_${SLURM_JOB_ID:-$$}"
+  mkdir -p "$STAGE_DIR"
+  trap 'rm -rf "$STAGE_DIR"' EXIT
+  for f in "$SEQ_DIR"/*.fasta; do ln -s "$f" "$STAGE_DIR/"; done
+  for f in "${gz_files[@]}"; do zcat "$f" > "$STAGE_DIR/$(basename "$f" .gz)"; done
+  echo "Staged ${#gz_files[@]} compressed proteomes in $STAGE_DIR"
+  SEQ_DIR="$STAGE_DIR"
+fi
 if ! find "$SEQ_DIR" -type f \( -name '*.fa' -o -name '*.faa' -o -name '*.fasta' -o -name '*.fna' \) -print -quit | grep -q . ; then
   echo "WARNING: No FASTA-like files detected under $SEQ_DIR. BUSCO may do nothing." >&2
 fi
@@ -0,0 +1,88 @@
+#!/usr/bin/env bash
+set -euo pipefail
+shopt -s nullglob
+export LC_ALL=C
+
+# === Define paths to executables ===
+export PATH="/scratch/project_2015320/software/busco_env/bin:$PATH"
+
+# === Define directories ===
+DATA_DIR="local_data"
+SEQ_DIR="$DATA_DIR/proteomes/renamed"
+OUT_DIR="$DATA_DIR/BUSCO_results"
+RES_DIR="$OUT_DIR/busco_renamed"    # same layout as the single-job run: <portal>.fasta/short_summary*.json
+DB_DIR="$DATA_DIR/busco_downloads"
+LOGS_DIR="$DATA_DIR/logs/busco_array"
+
+mkdir -p "$RES_DIR" "$DB_DIR" "$LOGS_DIR"
+
+# Resolve to absolute paths (safer for SLURM nodes)
+SEQ_DIR="$(readlink -f "$SEQ_DIR")"
+OUT_DIR="$(readlink -f "$OUT_DIR")"
+RES_DIR="$(readlink -f "$RES_DIR")"
+DB_DIR="$(readlink -f "$DB_DIR")"
+LOGS_DIR="$(readlink -f "$LOGS_DIR")"
+
+SET_FILE="$OUT_DIR/unbusco_files.txt"
+
+LINEAGE="${LINEAGE:-fungi_odb12}"   # change if needed
+BATCH_SIZE="${BATCH_SIZE:-1}"      # proteomes per array task
+WAIT="${WAIT:-0}"                  # 1: block until the array ends and leave the summary to the caller (pipeline.py)
+
+# === Compute pending proteomes: no finished short_summary*.json yet ===
+: > "$SET_FILE"
+for fasta in "$SEQ_DIR"/*.fasta "$SEQ_DIR"/*.fasta.gz; do
+  base="$(basename "$fasta")"
+  summaries=("$RES_DIR/${base%.gz}"/short_summary*.json)
+  (( ${#summaries[@]} > 0 )) || echo "$base" >> "$SET_FILE"
+done
+
+if [[ ! -s "$SET_FILE" ]]; then
+  echo "All proteomes in $SEQ_DIR have BUSCO summaries in $RES_DIR."
+  exit 0
+fi
+
+npending=$(wc -l < "$SET_FILE")
+ntasks=$(( (npending + BATCH_SIZE - 1) / BATCH_SIZE ))
+
+# Respect the submit limit by putting more proteomes in each task rather than leaving the rest
+# unprocessed; the time limit of busco-par.sh (2 h) grows with the batch
+cap=${MAX_ARRAY_SIZE:-380}
+time_args=()
+if (( ntasks > cap )); then
+  old_batch=$BATCH_SIZE
+  BATCH_SIZE=$(( (npending + cap - 1) / cap ))
+  ntasks=$(( (npending + BATCH_SIZE - 1) / BATCH_SIZE ))
+  hours=$(( (2 * BATCH_SIZE + old_batch - 1) / old_batch ))
+  time_args=(--time="${hours}:00:00")
+  echo "Array size capped to $cap: raised BATCH_SIZE from $old_batch to $BATCH_SIZE (time limit ${hours} h)."
+fi
+echo "There are $npending proteomes without a BUSCO summary ($ntasks tasks of up to $BATCH_SIZE)."
+
+# === Fetch the lineage once so array tasks can run offline on a shared cache ===
+if [[ ! -d "$DB_DIR/lineages/$LINEAGE" ]]; then
+  echo "Downloading lineage $LINEAGE to $DB_DIR..."
+  busco --download_path "$DB_DIR" --download "$LINEAGE"
+fi
+
+echo "Submitting SLURM array for $ntasks BUSCO tasks…"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+# ${a[@]+...} keeps an empty array from tripping set -u on bash < 4.4
+wait_args=()
+if (( WAIT )); then wait_args=(--wait); fi
+jobid=$(sbatch --parsable --array=1-"$ntasks"%100 ${time_args[@]+"${time_args[@]}"} \
+  ${wait_args[@]+"${wait_args[@]}"} "$SCRIPT_DIR/busco-par.sh" \
+  "$SET_FILE" "$SEQ_DIR" "$RES_DIR" "$DB_DIR" "$LINEAGE" "$BATCH_SIZE")
+echo "Submitted job $jobid"
+if (( WAIT )); then
+  echo "BUSCO array $jobid finished."
+  exit 0
+fi
+
+# === Re-aggregate busco_summary.csv once the array is done ===
+aggid=$(sbatch --parsable --account=project_2015320 --partition=small --time=00:30:00 \
+  --cpus-per-task=4 --mem-per-cpu=1G --job-name=busco_aggregate \
+  --output="$LOGS_DIR/%x_%j.out" --error="$LOGS_DIR/%x_%j.stderr" \
+  --dependency=afterany:"$jobid" \
+  --wrap "module load biopythontools && python $SCRIPT_DIR/process_busco_results.py")
+echo "Submitted aggregation job $aggid (after $jobid)"
@@ -0,0 +1,20 @@
+#!/bin/bash
+
+#SBATCH --job-name=orthofinder_update             # Job name
+#SBATCH --output=logs/orthofinder_update_%j.out        # Output file for stdout
+#SBATCH --error=logs/orthofinder_update_%j.err         # Output file for stderr
+#SBATCH --ntasks=1                     # Number of tasks (cores)
+#SBATCH --cpus-per-task=20             # Number of cores per task
+#SBATCH --time=24:00:00              # Time limit hrs:min:sec
+#SBATCH --account=project_2002833      # Project number
+#SBATCH --mem-per-cpu=2G               # Memory to reserve
+#SBATCH --partition=small              # Job queue (partition)
+
+# Load the biopython module and biokit
+module load biopythontools
+module load biokit
+
+# Adds only new proteomes (-b) unless an existing one changed; extra args are passed through
+python src/orthofinder-update.py --threads "${SLURM_CPUS_PER_TASK:-20}" "$@"
+
+echo "OrthoFinder update finished."
@@ -25,30 +25,58 @@ echo "Cleaning up empty files in $OUT_DIR..."
 find "$OUT_DIR" -type f -empty -delete || true
 echo "Cleanup complete."
 
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 # === Compute pending files ===
-mapfile -t in_basenames  < <(find "$IN_DIR"  -maxdepth 1 -type f -name '*.fa'      -printf '%f\n' | sed -E 's/\.fa$//'      | sort -u)
-mapfile -t out_basenames < <(find "$OUT_DIR" -maxdepth 1 -type f -name '*_trim.fa' -printf '%f\n' | sed -E 's/_trim\.fa$//' | sort -u)
+# Families whose members or stage options changed since their output was made, from the
+# membership stamps (src/family-plan.py); if the planner fails, families without an output
+if ! python3 "$SCRIPT_DIR/family-plan.py" plan trim "$IN_DIR" "$OUT_DIR" --set-file "$SET_FILE"; then
+  echo "⚠️ Family planner failed; scheduling families without an output"
+  mapfile -t in_basenames  < <(find "$IN_DIR"  -maxdepth 1 -type f -name '*.fa'      -printf '%f\n' | sed -E 's/\.fa$//'      | sort -u)
+  mapfile -t out_basenames < <(find "$OUT_DIR" -maxdepth 1 -type f -name '*_trim.fa' -printf '%f\n' | sed -E 's/_trim\.fa$//' | sort -u)
 
-in_tmp=$(mktemp); out_tmp=$(mktemp)
-printf "%s\n" "${in_basenames[@]:-}"  > "$in_tmp"
-printf "%s\n" "${out_basenames[@]:-}" > "$out_tmp"
+  in_tmp=$(mktemp); out_tmp=$(mktemp)
+  printf "%s\n" "${in_basenames[@]:-}"  > "$in_tmp"
+  printf "%s\n" "${out_basenames[@]:-}" > "$out_tmp"
 
-# Write missing names (with .fa restored) to the list file
-comm -23 "$in_tmp" "$out_tmp" | sed 's/$/.fa/' > "$SET_FILE"
+  # Write missing names (with .fa restored) to the list file
+  comm -23 "$in_tmp" "$out_tmp" | sed 's/$/.fa/' > "$SET_FILE"
 
-rm -f "$in_tmp" "$out_tmp"
+  rm -f "$in_tmp" "$out_tmp"
+fi
 
 if [[ -s "$SET_FILE" ]]; then
   npending=$(wc -l < "$SET_FILE")
   echo "There are $npending unaligned files."
 
-  cap=${MAX_ARRAY_SIZE:-380}
-  (( npending > cap )) && { echo "Capping array size to $cap to respect submit limit."; npending=$cap; }
-  echo "Submitting SLURM array for $npending unaligned files…"
-  SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-  jobid=$(sbatch --parsable --array=1-"$npending"%100 "$SCRIPT_DIR/trim-par.sh" "$SET_FILE" "$IN_DIR" "$OUT_DIR")
-  echo "Submitted job $jobid"
+  if [[ -n "${QUEUE_WORKERS:-}" ]]; then
+    # Work queue (src/workqueue.py): QUEUE_WORKERS long-lived workers drain every pending file,
+    # largest first, with no array size cap; rerunning this script only adds the new ones
+    QUEUE_DIR="$DATA_DIR/queues/trim"
+    mkdir -p "$DATA_DIR/logs/queue_worker"
+    python3 "$SCRIPT_DIR/workqueue.py" enqueue "$QUEUE_DIR" "$SET_FILE" --script "$SCRIPT_DIR/trim-par.sh" \
+      --in-dir "$IN_DIR" --out-dir "$OUT_DIR"
+    python3 "$SCRIPT_DIR/workqueue.py" submit "$QUEUE_DIR" --workers "$QUEUE_WORKERS"
+  else
+    cap=${MAX_ARRAY_SIZE:-380}
+    (( npending > cap )) && { echo "Capping array size to $cap to respect submit limit."; npending=$cap; }
+    echo "Submitting SLURM array for $npending unaligned files…"
+    # RIGHTSIZE=1 (default): one array per resource class, sized from the inputs (slurm-plan.py);
+    # RIGHTSIZE=0 or a planner that submitted nothing: one array with the #SBATCH defaults of trim-par.sh
+    rc=1
+    if [[ "${RIGHTSIZE:-1}" == 1 ]]; then
+      python3 "$SCRIPT_DIR/slurm-plan.py" submit trim "$SET_FILE" "$IN_DIR" "$OUT_DIR" \
+        --script "$SCRIPT_DIR/trim-par.sh" --max-tasks "$npending" --concurrent 100 && rc=0 || rc=$?
+    fi
+    if (( rc == 3 )); then
+      # Some classes are queued already; a full array would run those families twice
+      echo "⚠️ Only part of the pending files were submitted; rerun this script after those jobs finish to submit the rest."
+    elif (( rc != 0 )); then
+      jobid=$(sbatch --parsable --array=1-"$npending"%100 "$SCRIPT_DIR/trim-par.sh" "$SET_FILE" "$IN_DIR" "$OUT_DIR")
+      echo "Submitted job $jobid"
+    fi
+  fi
 else
-  echo "All files in $IN_DIR have corresponding alignments in $OUT_DIR."
+  echo "All trimmed alignments in $OUT_DIR are up to date with $IN_DIR."
 fi
 
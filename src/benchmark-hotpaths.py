@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark the proteome and metadata hot paths on synthetic data.
+
+Generates MycoCosm JSON pages, JGI-style gzipped proteomes, BUSCO results,
+InterProScan submit logs and gene trees at the requested scale in a scratch
+folder, then times:
+
+  parse_portal_jsons, extract_files, rename_fasta_headers   (in-process)
+  cleanup-seq-files.py, process_busco_results.py,
+  iprscan_log_summarize.py, cleanup-trees-par.py             (as subprocesses,
+                                                              FUNGI_DATA_DIR -> scratch)
+
+Results (best and median wall time over --repeat runs, CPU, peak RSS) are
+written to benchmarks/results/<label>_<timestamp>.json. --save-baseline stores
+them as benchmarks/baselines/<label>.json, and --compare checks a run against
+that baseline and exits 1 on regressions beyond --tolerance.
+
+Usage:
+  python src/benchmark-hotpaths.py --portals 20 --proteins 5000 --save-baseline
+  python src/benchmark-hotpaths.py --portals 20 --proteins 5000 --compare
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BASE_DIR, BENCHMARK_DIR
+from src.utils.webutils import parse_portal_jsons
+from src.utils.wrangleutils import extract_files, rename_fasta_headers
+from src.utils.profileutils import stage_timer
+from src.utils.synthutils import (
+    synthetic_portals, write_mycocosm_jsons, write_jgi_proteomes, write_renamed_proteomes,
+    write_busco_results, write_iprscan_logs, write_gene_trees
+)
+
+SRC_DIR = os.path.join(BASE_DIR, "src")
+
+
+def generate(root: str, args) -> dict:
+    """
+    Build the synthetic data tree under root/local_data.
+
+    Returns:
+        dict: Paths and the generated portal list.
+    """
+    rng = random.Random(args.seed)
+    data = os.path.join(root, "local_data")
+    portals = synthetic_portals(args.portals)
+    paths = {
+        "data": data,
+        "portals": portals,
+        "json_dir": os.path.join(data, "mycocosm_data", "json_files"),
+        "compressed": os.path.join(data, "proteomes", "compressed"),
+        "extracted": os.path.join(data, "proteomes", "extracted"),
+        "renamed": os.path.join(data, "proteomes", "renamed"),
+        "iprscan_logs": os.path.join(data, "logs", "iprscan_logs"),
+    }
+    print(f"🧪 Generating {args.portals} portals x {args.proteins} proteins in {data}")
+    write_mycocosm_jsons(paths["json_dir"], portals, args.files_per_portal, rng)
+    proteome_list = write_jgi_proteomes(paths["compressed"], portals, args.proteins, rng)
+    proteome_list.to_csv(os.path.join(data, "proteomes_all_list.csv"), index=False)
+    paths["proteome_list"] = proteome_list
+    write_renamed_proteomes(os.path.join(data, "proteomes", "final"), portals, args.proteins, rng)
+    write_busco_results(os.path.join(data, "BUSCO_results", "busco_renamed"), portals, args.busco_markers, rng)
+    write_iprscan_logs(paths["iprscan_logs"], portals, args.iprscan_pieces, rng)
+    write_gene_trees(os.path.join(data, "speciestree", "gene_trees"), portals, args.trees, rng)
+    os.makedirs(paths["extracted"], exist_ok=True)
+    os.makedirs(paths["renamed"], exist_ok=True)
+    return paths
+
+
+def script_runner(root: str, data: str, workers: int, name: str, *script_args: str):
+    env = dict(os.environ, FUNGI_DATA_DIR=data, SLURM_CPUS_PER_TASK=str(workers))
+
+    def run():
+        cmd = [sys.executable, os.path.join(SRC_DIR, name), *script_args]
+        result = subprocess.run(cmd, cwd=root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{name} failed:\n{result.stderr[-2000:]}")
+    return run
+
+
+def benchmarks(paths: dict, root: str, args) -> list:
+    """
+    Benchmarks as (name, callable, items) tuples, in pipeline order.
+    """
+    data, portals = paths["data"], paths["portals"]
+    proteome_list = paths["proteome_list"]
+
+    def extract():
+        proteome_list["extracted_file"] = extract_files(proteome_list, paths["compressed"], paths["extracted"])
+
+    def rename():
+        if "extracted_file" not in proteome_list:
+            extract()
+        rename_fasta_headers(proteome_list, paths["renamed"])
+
+    n_proteins = args.portals * args.proteins
+    return [
+        ("parse_portal_jsons", lambda: parse_portal_jsons(portals, paths["json_dir"]),
+         args.portals * args.files_per_portal),
+        ("extract_files", extract, n_proteins),
+        ("rename_fasta_headers", rename, n_proteins),
+        ("cleanup-seq-files.py", script_runner(root, data, args.workers, "cleanup-seq-files.py"), n_proteins),
+        ("process_busco_results.py",
+         script_runner(root, data, args.workers, "process_busco_results.py", "-j", str(args.workers)), args.portals),
+        ("iprscan_log_summarize.py",
+         script_runner(root, data, args.workers, "iprscan_log_summarize.py", paths["iprscan_logs"],
+                       "-o", os.path.join(data, "logs", "iprscan_summary.csv"), "--state",
+                       os.path.join(root, "iprscan_state.json"), "-j", str(args.workers)), args.portals),
+        ("cleanup-trees-par.py", script_runner(root, data, args.workers, "cleanup-trees-par.py"), args.trees),
+    ]
+
+
+def run_benchmarks(paths: dict, root: str, args) -> dict:
+    metrics_path = os.path.join(root, "bench_metrics.jsonl")
+    results = {}
+    selected = set(args.only) if args.only else None
+    for name, func, items in benchmarks(paths, root, args):
+        if selected and name not in selected:
+            continue
+        for _ in range(args.repeat):
+            state_path = os.path.join(root, "iprscan_state.json")
+            if os.path.exists(state_path):
+                # Measure a cold summary, not an incremental no-op
+                os.remove(state_path)
+            with stage_timer(f"bench.{name}", metrics_path) as m, \
+                    open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                func()
+                m.add(items=items)
+        with open(metrics_path) as f:
+            runs = [r for r in map(json.loads, f) if r["stage"] == f"bench.{name}"]
+        walls = [r["wall_s"] for r in runs]
+        results[name] = {
+            "items": items,
+            "best_wall_s": min(walls),
+            "median_wall_s": round(statistics.median(walls), 3),
+            "cpu_s": min(r["cpu_s"] + r["child_cpu_s"] for r in runs),
+            "peak_rss_mb": max(r["process_peak_rss_mb"] for r in runs),
+            "items_per_s": round(items / min(walls), 1) if min(walls) > 0 else None,
+        }
+        print(f"⏱️ {name:<26} best {results[name]['best_wall_s']:>8.3f}s  "
+              f"median {results[name]['median_wall_s']:>8.3f}s  ({items} items)")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_seconds: float = 0.05) -> list:
+    """
+    Compare best wall times against a baseline.
+
+    Args:
+        results (dict): This run.
+        baseline (dict): Stored baseline.
+        tolerance (float): Allowed relative slowdown.
+        min_seconds (float): Absolute slowdowns below this are treated as timer noise.
+
+    Returns:
+        list: Names of benchmarks slower than baseline * (1 + tolerance).
+    """
+    if baseline.get("scale") != results.get("scale"):
+        print(f"⚠️ Baseline scale {baseline.get('scale')} differs from this run {results.get('scale')}")
+    regressions = []
+    for name, res in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if not base:
+            print(f"   {name:<26} (no baseline)")
+            continue
+        ratio = res["best_wall_s"] / base["best_wall_s"] if base["best_wall_s"] > 0 else float("inf")
+        slower = ratio > 1 + tolerance and res["best_wall_s"] - base["best_wall_s"] > min_seconds
+        flag = "❌ REGRESSION" if slower else ("✅ faster" if ratio < 1 - tolerance else "ok")
+        print(f"   {name:<26} {base['best_wall_s']:>8.3f}s -> {res['best_wall_s']:>8.3f}s  x{ratio:.2f}  {flag}")
+        if slower:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Synthetic-data benchmarks for the pipeline hot paths")
+    ap.add_argument("--portals", type=int, default=20)
+    ap.add_argument("--proteins", type=int, default=2000, help="Proteins per portal")
+    ap.add_argument("--files-per-portal", type=int, default=120, help="Files listed per portal in the JSON pages")
+    ap.add_argument("--busco-markers", type=int, default=758, help="Markers per BUSCO full table (fungi_odb10: 758)")
+    ap.add_argument("--iprscan-pieces", type=int, default=40, help="Subjobs per InterProScan submit log")
+    ap.add_argument("--trees", type=int, default=500, help="Number of gene trees")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per benchmark (best and median are reported)")
+    ap.add_argument("-j", "--workers", type=int, default=4, help="Workers passed to the parallel scripts")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    ap.add_argument("--label", default="default", help="Baseline name (default: default)")
+    ap.add_argument("--workdir", default=None, help="Scratch folder (default: a temporary folder, removed afterwards)")
+    ap.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline for --label")
+    ap.add_argument("--compare", action="store_true", help="Compare with the stored baseline for --label")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before flagging (default: 0.2)")
+    ap.add_argument("--min-seconds", type=float, default=0.05,
+                    help="Ignore slowdowns smaller than this many seconds (default: 0.05)")
+    args = ap.parse_args()
+
+    # parse_portal_jsons and friends log per file; keep the benchmark output readable
+    logging.basicConfig(level=logging.WARNING)
+
+    root = args.workdir or tempfile.mkdtemp(prefix="fungi_bench_")
+    os.makedirs(root, exist_ok=True)
+    try:
+        paths = generate(root, args)
+        results = {
+            "label": args.label,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "host": os.uname().nodename,
+            "python": sys.version.split()[0],
+            "scale": {k: getattr(args, k) for k in
+                      ("portals", "proteins", "files_per_portal", "busco_markers", "iprscan_pieces", "trees", "workers")},
+            "benchmarks": run_benchmarks(paths, root, args),
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    results_dir = os.path.join(BENCHMARK_DIR, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    out_path = os.path.join(results_dir, f"{args.label}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"📝 Results saved to: {out_path}")
+
+    baseline_path = os.path.join(BENCHMARK_DIR, "baselines", f"{args.label}.json")
+    if args.compare:
+        if not os.path.exists(baseline_path):
+            sys.exit(f"❌ No baseline at {baseline_path}; run with --save-baseline first")
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_seconds)
+        if regressions:
+            sys.exit(f"❌ Regressions: {', '.join(regressions)}")
+        print("✅ No regressions against the baseline.")
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"📝 Baseline saved to: {baseline_path}")
+
+
+if __name__ == "__main__":
+    main()
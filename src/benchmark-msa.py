@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Benchmark the size-adaptive MAFFT mode against the fixed strategy on our families.
+
+A sample of orthogroups (up to --per-tier for each adaptive tier) is aligned
+twice: with the fixed command used so far (config.MAFFT_FIXED_OPTIONS) and with
+the adaptive choice. The report gives wall time per family and tier and the
+sum-of-pairs agreement of the adaptive alignment with the fixed one. With
+--linsi-max-seqs, families up to that size are also aligned with L-INS-i as an
+accuracy reference, and both alignments are scored against it.
+
+Results are written to benchmarks/results/msa_<timestamp>.json, and the
+per-tier table also as Markdown (msa_<timestamp>.md) for the README.
+
+Usage:
+  python src/benchmark-msa.py --per-tier 5 --threads 8
+  python src/benchmark-msa.py --seq-dir <folder> --linsi-max-seqs 200
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SPECIESTREE_SEQS_DIR, BENCHMARK_DIR, MAFFT_BIN, MAFFT_TIERS, MAFFT_FIXED_OPTIONS
+from src.utils.msautils import fasta_stats, choose_strategy, run_mafft, sum_of_pairs_agreement, mafft_version
+
+LINSI_OPTIONS = next(t[3] for t in MAFFT_TIERS if t[0] == "L-INS-i")
+
+
+def sample_families(seq_dir: str, per_tier: int, threads: int, seed: int) -> list:
+    """
+    Up to per_tier families for every adaptive tier, with their size and choice.
+    """
+    by_tier = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(seq_dir, "*.fa"))):
+        stats = fasta_stats(path)
+        if stats["n_seqs"] < 2:
+            continue
+        choice = choose_strategy(stats["n_seqs"], stats["mean_len"], threads)
+        by_tier[choice["strategy"]].append({"path": path, **stats, **choice})
+    rng = random.Random(seed)
+    return [f for tier in by_tier.values() for f in rng.sample(tier, min(per_tier, len(tier)))]
+
+
+def benchmark_family(fam: dict, work: str, args) -> dict:
+    stem = os.path.splitext(os.path.basename(fam["path"]))[0]
+    fixed_path = os.path.join(work, f"{stem}_fixed.fa")
+    adaptive_path = os.path.join(work, f"{stem}_adaptive.fa")
+    row = {k: fam[k] for k in ("n_seqs", "mean_len", "max_len", "strategy", "threads")}
+    row["family"] = stem
+    row["fixed_s"] = round(run_mafft(fam["path"], fixed_path, MAFFT_FIXED_OPTIONS, args.threads, args.mafft), 3)
+    if fam["options"] == MAFFT_FIXED_OPTIONS and fam["threads"] == args.threads:
+        # Same command as the fixed mode
+        shutil.copyfile(fixed_path, adaptive_path)
+        row["adaptive_s"] = row["fixed_s"]
+    else:
+        row["adaptive_s"] = round(run_mafft(fam["path"], adaptive_path, fam["options"], fam["threads"], args.mafft), 3)
+    row["sp_adaptive_vs_fixed"] = round(sum_of_pairs_agreement(adaptive_path, fixed_path), 4)
+    if fam["n_seqs"] <= args.linsi_max_seqs:
+        ref_path = os.path.join(work, f"{stem}_linsi.fa")
+        if fam["strategy"] == "L-INS-i":
+            shutil.copyfile(adaptive_path, ref_path)
+        else:
+            run_mafft(fam["path"], ref_path, LINSI_OPTIONS, args.threads, args.mafft)
+        row["sp_fixed_vs_linsi"] = round(sum_of_pairs_agreement(fixed_path, ref_path), 4)
+        row["sp_adaptive_vs_linsi"] = round(sum_of_pairs_agreement(adaptive_path, ref_path), 4)
+    return row
+
+
+def summarize(rows: list) -> dict:
+    tiers = defaultdict(list)
+    for r in rows:
+        tiers[r["strategy"]].append(r)
+    tiers["all"] = rows
+    summary = {}
+    for name, tier_rows in tiers.items():
+        fixed = sum(r["fixed_s"] for r in tier_rows)
+        adaptive = sum(r["adaptive_s"] for r in tier_rows)
+        entry = {
+            "families": len(tier_rows),
+            "fixed_s": round(fixed, 3),
+            "adaptive_s": round(adaptive, 3),
+            "speedup": round(fixed / adaptive, 2) if adaptive > 0 else None,
+            "mean_sp_adaptive_vs_fixed": round(sum(r["sp_adaptive_vs_fixed"] for r in tier_rows) / len(tier_rows), 4),
+        }
+        scored = [r for r in tier_rows if "sp_adaptive_vs_linsi" in r]
+        if scored:
+            entry["mean_sp_fixed_vs_linsi"] = round(sum(r["sp_fixed_vs_linsi"] for r in scored) / len(scored), 4)
+            entry["mean_sp_adaptive_vs_linsi"] = round(sum(r["sp_adaptive_vs_linsi"] for r in scored) / len(scored), 4)
+        summary[name] = entry
+    return summary
+
+
+def tier_table(summary: dict, meta: dict) -> str:
+    """
+    Per-tier summary as a Markdown table.
+    """
+    linsi = any("mean_sp_adaptive_vs_linsi" in s for s in summary.values())
+    header = ["Tier", "Families", "Fixed (s)", "Adaptive (s)", "Speedup", "SP vs fixed"]
+    if linsi:
+        header += ["SP fixed vs L-INS-i", "SP adaptive vs L-INS-i"]
+    lines = [f"MSA benchmark, {meta['date']} on {meta['host']} ({meta['mafft']}, {meta['threads']} threads, "
+             f"{meta['seq_dir']})", "",
+             "| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    for name, s in summary.items():
+        cells = [name, s["families"], f"{s['fixed_s']:.2f}", f"{s['adaptive_s']:.2f}",
+                 f"x{s['speedup']}" if s["speedup"] else "-", f"{s['mean_sp_adaptive_vs_fixed']:.3f}"]
+        if linsi:
+            cells += [f"{s[k]:.3f}" if k in s else "-" for k in ("mean_sp_fixed_vs_linsi", "mean_sp_adaptive_vs_linsi")]
+        lines.append("| " + " | ".join(str(c) for c in cells) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Adaptive vs fixed MAFFT strategy benchmark")
+    ap.add_argument("--seq-dir", default=SPECIESTREE_SEQS_DIR, help="Unaligned families (*.fa)")
+    ap.add_argument("--per-tier", type=int, default=5, help="Families sampled per adaptive tier (default: 5)")
+    ap.add_argument("--threads", type=int, default=int(os.environ.get("SLURM_CPUS_PER_TASK", 4)),
+                    help="Threads for the fixed mode and cap for the adaptive one")
+    ap.add_argument("--linsi-max-seqs", type=int, default=0,
+                    help="Also score both modes against L-INS-i for families up to this size (default: off)")
+    ap.add_argument("--mafft", default=MAFFT_BIN, help=f"MAFFT executable (default: {MAFFT_BIN})")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--workdir", default=None, help="Keep alignments here (default: temporary folder)")
+    args = ap.parse_args()
+
+    families = sample_families(args.seq_dir, args.per_tier, args.threads, args.seed)
+    if not families:
+        sys.exit(f"❌ No families with 2+ sequences in {args.seq_dir}")
+    work = args.workdir or tempfile.mkdtemp(prefix="msa_bench_")
+    os.makedirs(work, exist_ok=True)
+    rows = []
+    try:
+        for fam in families:
+            row = benchmark_family(fam, work, args)
+            rows.append(row)
+            print(f"⏱️ {row['family']:<14} {row['strategy']:<9} {row['n_seqs']:>6} seqs  "
+                  f"fixed {row['fixed_s']:>8.2f}s  adaptive {row['adaptive_s']:>8.2f}s  "
+                  f"SP vs fixed {row['sp_adaptive_vs_fixed']:.3f}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(work, ignore_errors=True)
+
+    summary = summarize(rows)
+    print("\n📋 Per tier:")
+    for name, s in summary.items():
+        line = (f"   {name:<9} {s['families']:>4} families  fixed {s['fixed_s']:>9.2f}s  "
+                f"adaptive {s['adaptive_s']:>9.2f}s  x{s['speedup']}  SP vs fixed {s['mean_sp_adaptive_vs_fixed']:.3f}")
+        if "mean_sp_adaptive_vs_linsi" in s:
+            line += f"  SP vs L-INS-i: fixed {s['mean_sp_fixed_vs_linsi']:.3f} / adaptive {s['mean_sp_adaptive_vs_linsi']:.3f}"
+        print(line)
+
+    results = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "host": os.uname().nodename,
+        "mafft": mafft_version(args.mafft),
+        "seq_dir": os.path.abspath(args.seq_dir),
+        "threads": args.threads,
+        "fixed_options": MAFFT_FIXED_OPTIONS,
+        "tiers": [list(t) for t in MAFFT_TIERS],
+        "summary": summary,
+        "families": rows,
+    }
+    results_dir = os.path.join(BENCHMARK_DIR, "results")
+    os.makedirs(results_dir, exist_ok=True)
+    out_path = os.path.join(results_dir, f"msa_{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    table_path = os.path.splitext(out_path)[0] + ".md"
+    with open(table_path, "w") as f:
+        f.write(tier_table(summary, results))
+    print(f"📝 Results saved to: {out_path} (table: {table_path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Build the offline NCBI taxonomy index used to fill and check portal lineages.
+
+Download the taxdump once (no network access is needed afterwards):
+  wget -P local_data/ncbi_taxonomy https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz
+
+Usage:
+  python src/build-taxonomy-index.py
+  python src/build-taxonomy-index.py path/to/taxdump[.tar.gz] -o <index dir>
+  python src/build-taxonomy-index.py --lookup "Aspergillus niger" 5061
+"""
+
+import argparse
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import NCBI_TAXDUMP_PATH, TAXONOMY_INDEX_DIR
+from src.utils.profileutils import stage_timer
+from src.utils.taxonomyutils import LINEAGE_RANKS, TaxonomyIndex, build_taxonomy_index
+
+
+def print_lookup(index: TaxonomyIndex, queries: list):
+    taxids = [int(q) if q.isdigit() else 0 for q in queries]
+    by_name = index.lookup([q if not q.isdigit() else "" for q in queries])
+    taxids = index.canonical([t or max(int(n), 0) for t, n in zip(taxids, by_name)])
+    lineages = index.lineages(taxids)
+    for i, (query, taxid) in enumerate(zip(queries, taxids)):
+        if by_name[i] == -1:
+            print(f"⚠️ {query}: ambiguous name")
+            continue
+        lineage = " > ".join(f"{r}={lineages[r][i]}" for r in LINEAGE_RANKS if lineages[r][i])
+        print(f"{query}: {taxid} {lineage or '(not found)'}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build the offline NCBI taxonomy index from a taxdump")
+    ap.add_argument("taxdump", nargs="?", default=NCBI_TAXDUMP_PATH,
+                    help=f"Extracted taxdump folder or taxdump.tar.gz (default: {NCBI_TAXDUMP_PATH})")
+    ap.add_argument("-o", "--index-dir", default=TAXONOMY_INDEX_DIR,
+                    help=f"Output folder (default: {TAXONOMY_INDEX_DIR})")
+    ap.add_argument("--lookup", nargs="+", metavar="NAME_OR_TAXID",
+                    help="Only print the lineages of these names/taxids from an existing index")
+    args = ap.parse_args()
+
+    if args.lookup:
+        print_lookup(TaxonomyIndex(args.index_dir), args.lookup)
+        return
+    if not os.path.exists(args.taxdump):
+        sys.exit(f"❌ Taxdump not found: {args.taxdump}\n"
+                 "   Download https://ftp.ncbi.nlm.nih.gov/pub/taxonomy/taxdump.tar.gz")
+
+    with stage_timer("taxonomy.build_index") as m:
+        meta = build_taxonomy_index(args.taxdump, args.index_dir)
+        m.add(items=meta["nodes"])
+    print(f"✅ Indexed {meta['nodes']} taxa ({meta['merged']} merged ids) and {meta['names']} names "
+          f"({meta['ambiguous_names']} ambiguous)")
+    print(f"📁 Taxonomy index saved to: {args.index_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/bin/bash -l
+#SBATCH --account=project_2015320
+#SBATCH --job-name=busco_array
+#SBATCH --output=local_data/logs/busco_array/%x_%A_%a.out
+#SBATCH --error=local_data/logs/busco_array/%x_%A_%a.stderr
+#SBATCH --time=02:00:00
+#SBATCH --nodes=1
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task=4
+#SBATCH --mem-per-cpu=2G
+#SBATCH --partition=small
+
+set -euo pipefail
+
+echo "=== Job started at $(date) ==="
+echo "SLURM job ID: $SLURM_JOB_ID"
+echo "Working dir: $(pwd)"
+
+# Threads from Slurm:
+THREADS="${SLURM_CPUS_PER_TASK:-1}"
+
+# === Define paths to executables ===
+export PATH="/scratch/project_2015320/software/busco_env/bin:$PATH"
+
+echo "BUSCO version: $(busco --version || true)"
+
+# === Establish paths ===
+set_file="$1"
+in_dir="$2"
+out_dir="$3"
+db_dir="$4"
+lineage="$5"
+batch_size="${6:-1}"
+
+# Lines handled by this task (one proteome per line)
+first=$(( (SLURM_ARRAY_TASK_ID - 1) * batch_size + 1 ))
+last=$(( SLURM_ARRAY_TASK_ID * batch_size ))
+
+while read -r fname; do
+  [[ -z "$fname" ]] && continue
+  in_path="$in_dir/$fname"
+  out_name="${fname%.gz}"   # results stay in <portal>.fasta/ for BGZF inputs too
+
+  # skip if already finished (e.g. by an earlier, interrupted array)
+  if compgen -G "$out_dir/$out_name/short_summary*.json" > /dev/null; then
+    echo "Exists: $out_dir/$out_name — skipping."
+    continue
+  fi
+
+  # BUSCO cannot read gzip: decompress BGZF proteomes to node-local scratch for this run only
+  staged=""
+  if [[ "$in_path" == *.gz ]]; then
+    staged="${LOCAL_SCRATCH:-${TMPDIR:-/tmp}}/$out_name"
+    # remove the copy also if BUSCO fails and set -e ends the task
+    trap 'rm -f "$staged"' EXIT
+    zcat "$in_path" > "$staged"
+    in_path="$staged"
+  fi
+
+  # -f only clears this proteome's own partial run
+  echo "Running busco -c $THREADS -i $in_path -m prot -l $lineage -f --offline --out $out_name --out_path $out_dir --download_path $db_dir"
+  busco -c "$THREADS" -i "$in_path" -m prot -l "$lineage" -f --offline \
+    --out "$out_name" --out_path "$out_dir" --download_path "$db_dir" < /dev/null
+  if [[ -n "$staged" ]]; then rm -f "$staged"; trap - EXIT; fi
+done < <(sed -n "${first},${last}p" "$set_file")
+
+echo "Job completed!"
+echo "=== Job ended at $(date) ==="
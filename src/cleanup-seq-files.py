@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import csv
@@ -6,40 +7,44 @@ from Bio import SeqIO
 # Add project root to sys.path only here
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import PROTEOMES_DIR, FINAL_PROTEOMES_DIR, CLEAN_PROTEOMES_DIR
+from config import PROTEOMES_DIR, FINAL_PROTEOMES_DIR, CLEAN_PROTEOMES_DIR, PROFILE_DIR
 from src.utils.wrangleutils import validate_directories
+from src.utils.sequtils import open_text, fasta_stem
+from src.utils.storageutils import list_fasta
+from src.utils.profileutils import stage_timer, enable_profiling, add_profile_argument
 
 # Define length limits
 UPPER_LENGTH = 10000
 LOWER_LENGTH = 50
 
 def main():
+    ap = argparse.ArgumentParser(description="Filter proteome sequences by length")
+    add_profile_argument(ap, PROFILE_DIR)
+    enable_profiling(ap.parse_args().profile)
+
     # Validate input directories
     validate_directories([FINAL_PROTEOMES_DIR])
 
     # Create output directory if missing
     os.makedirs(CLEAN_PROTEOMES_DIR, exist_ok=True)
 
-    # List all FASTA files
-    proteome_files = [
-        os.path.join(FINAL_PROTEOMES_DIR, f)
-        for f in os.listdir(FINAL_PROTEOMES_DIR)
-        if f.endswith(".fasta")
-    ]
+    # List all FASTA files (plain or BGZF-compressed)
+    proteome_files = list_fasta(FINAL_PROTEOMES_DIR)
 
     if not proteome_files:
         raise FileNotFoundError(f"No FASTA files found in {FINAL_PROTEOMES_DIR}.")
     # Prepare CSV log
     log_path = os.path.join(PROTEOMES_DIR, "cleaned_proteomes_log.csv")
-    with open(log_path, "w", newline="") as log_f:
+    with stage_timer("cleanup_seqs.filter_length") as stage, open(log_path, "w", newline="") as log_f:
         writer = csv.writer(log_f)
         writer.writerow(["portal", "total_sequences", "kept_sequences", "dropped_sequences"])
         
         for file_name in proteome_files:
-            portal = os.path.basename(file_name).replace(".fasta", "")
+            portal = fasta_stem(file_name)
             print(f"Processing file: {os.path.basename(file_name)}")
             
-            sequences = list(SeqIO.parse(file_name, "fasta"))
+            with open_text(file_name) as f:
+                sequences = list(SeqIO.parse(f, "fasta"))
             if not sequences:
                 print(f"Warning: No sequences found in {os.path.basename(file_name)}. Skipping this file.")
                 # still log the portal with zeros
@@ -52,19 +57,21 @@ def main():
                 if LOWER_LENGTH <= len(seq) <= UPPER_LENGTH
             ]
 
-            # Save filtered sequences
-            output_file = os.path.join(CLEAN_PROTEOMES_DIR, os.path.basename(file_name))
+            # Save filtered sequences (clean/ stays plain FASTA for OrthoFinder and InterProScan)
+            output_file = os.path.join(CLEAN_PROTEOMES_DIR, f"{portal}.fasta")
             SeqIO.write(output_sequences, output_file, "fasta")
 
             total = len(sequences)
             kept = len(output_sequences)
             dropped = total - kept
             writer.writerow([portal, total, kept, dropped])
+            stage.add(items=total)
 
             print(
                 f"Successfully filtered {total} sequences from {portal} into {kept} sequences "
                 f"saved to {output_file}"
             )
+        stage.add(files=len(proteome_files))
 
     print("Filtering complete for all proteomes.")
 
@@ -1,27 +1,43 @@
 #!/usr/bin/env python3
 from pathlib import Path
 from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
 import os
-from Bio import Phylo
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROFILE_DIR
+from src.utils.treeutils import read_newick, write_newick, iter_postorder, leaf_taxon, collapse_low_support
+from src.utils.profileutils import stage_timer, enable_profiling, add_profile_argument
 
 BASE   = Path.cwd()
 IN_DIR = BASE / "local_data/speciestree/gene_trees"
 OUT_DIR= BASE / "local_data/speciestree/astral_clean_trees"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-def process_one(path: Path) -> str:
+def process_one(path: Path, min_support: float | None = None) -> str:
     try:
-        t = Phylo.read(str(path), "newick")        # one tree per file (IQ-TREE default)
-        for clade in t.get_terminals():
-            if clade.name:
-                clade.name = clade.name.split("-", 1)[0]  # keep species only
+        t = read_newick(path)                       # one tree per file (IQ-TREE default)
+        n_collapsed = collapse_low_support(t, min_support) if min_support is not None else 0
+        for node in iter_postorder(t):
+            if node.is_leaf() and node.name:
+                node.name = leaf_taxon(node.name)   # keep species only
         out_path = OUT_DIR / path.name
-        Phylo.write(t, str(out_path), "newick")
-        return f"OK  {path.name}"
+        out_path.write_text(write_newick(t) + "\n")
+        return f"OK  {path.name} ({n_collapsed} collapsed)"
     except Exception as e:
         return f"ERR {path.name}: {e}"
 
 def main():
+    ap = argparse.ArgumentParser(description="Rename gene tree leaves to species for ASTRAL")
+    ap.add_argument("--collapse-below", type=float, default=None,
+                    help="Collapse branches with UFBoot below this value (e.g. 10) before writing")
+    add_profile_argument(ap, PROFILE_DIR)
+    args = ap.parse_args()
+    enable_profiling(args.profile)
+
     files = sorted(IN_DIR.glob("*.treefile"))
     if not files:
         print(f"No .treefile files found in {IN_DIR}")
@@ -32,8 +48,8 @@ def main():
     print(f"Processing {len(files)} trees with {n_workers} workers")
     ok = err = 0
 
-    with ProcessPoolExecutor(max_workers=n_workers) as ex:
-        futs = {ex.submit(process_one, f): f for f in files}
+    with stage_timer("clean_trees.rename_leaves") as stage, ProcessPoolExecutor(max_workers=n_workers) as ex:
+        futs = {ex.submit(process_one, f, args.collapse_below): f for f in files}
         for i, fut in enumerate(as_completed(futs), 1):
             msg = fut.result()
             if msg.startswith("OK"):
@@ -43,9 +59,9 @@ def main():
             # lightweight progress ping every 100 files
             if i % 100 == 0 or i == len(files):
                 print(f"[{i}/{len(files)}] {ok} ok, {err} err")
+        stage.add(items=ok, failed=err, workers=n_workers)
 
     print(f"Done. {ok} succeeded, {err} failed. Output → {OUT_DIR}")
 
 if __name__ == "__main__":
     main()
-
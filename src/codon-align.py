@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Codon alignments from the trimmed protein alignments and the renamed CDS.
+
+Every residue of the untrimmed MAFFT alignment (<OG>_mafft.fa) takes its
+codon from the sequence's CDS (cds/renamed/<portal>.fasta.gz, written by
+process-cds-files.py); the codons are gathered with NumPy index arrays and
+translated back in one batch per family, and sequences whose CDS is missing,
+too short or translates to other residues are left out. The columns kept by
+trimAl (<OG>_mafft_trim.fa.cols from -colnumbering, or matched columns) select
+the same codon columns, so <OG>_mafft_trim_codon.fa matches the trimmed
+protein alignment used for the gene trees.
+
+Usage:
+  python src/codon-align.py [-j 8]                       # all trimmed alignments
+  python src/codon-align.py OG0000001_mafft_trim.fa OG0000001_mafft_trim_codon.fa
+"""
+
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    SPECIESTREE_ALIGN_DIR, SPECIESTREE_TRIM_DIR, SPECIESTREE_CODON_DIR, RENAMED_CDS_DIR, CODON_MAX_MISMATCH
+)
+from src.utils.profileutils import stage_timer
+from src.utils.codonutils import CODON_LOG_COLUMNS, codon_align_family
+
+
+def untrimmed_path(trim_path: str, align_dir: str) -> str:
+    # OG_mafft_trim.fa / OG_mafft_80trim.fa -> <align_dir>/OG_mafft.fa
+    name = re.sub(r"_(\d*trim)\.fa$", ".fa", os.path.basename(trim_path))
+    return os.path.join(align_dir, name)
+
+
+def codon_job(params: tuple) -> dict:
+    trim_path, out_path, align_dir, cds_dir, max_mismatch = params
+    return codon_align_family(trim_path, untrimmed_path(trim_path, align_dir), out_path, cds_dir, max_mismatch,
+                              column_map_path=trim_path + ".cols")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Back-translate trimmed protein alignments to codon alignments")
+    ap.add_argument("input", nargs="?", help="One trimmed alignment (default: every *trim.fa in --trim-dir)")
+    ap.add_argument("output", nargs="?", help="Codon alignment to write (with input)")
+    ap.add_argument("--trim-dir", default=SPECIESTREE_TRIM_DIR)
+    ap.add_argument("--align-dir", default=SPECIESTREE_ALIGN_DIR, help="Untrimmed alignments")
+    ap.add_argument("--cds-dir", default=RENAMED_CDS_DIR, help="Renamed, indexed CDS")
+    ap.add_argument("-o", "--out-dir", default=SPECIESTREE_CODON_DIR)
+    ap.add_argument("--max-mismatch", type=float, default=CODON_MAX_MISMATCH,
+                    help=f"Share of residues a CDS may translate differently (default: {CODON_MAX_MISMATCH})")
+    ap.add_argument("--force", action="store_true", help="Redo existing codon alignments")
+    ap.add_argument("-j", "--workers", type=int,
+                    default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    args = ap.parse_args()
+
+    if args.input:
+        if not args.output:
+            ap.error("output is required with input")
+        summary = codon_job((args.input, args.output, args.align_dir, args.cds_dir, args.max_mismatch))
+        print(f"✅ {summary['family']}: {summary['n_out']}/{summary['n_seqs']} sequences, "
+              f"{summary['codon_columns']} codon columns ({summary['column_map']}) -> {args.output}")
+        return
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    jobs = []
+    for trim_path in sorted(glob.glob(os.path.join(args.trim_dir, "*trim.fa"))):
+        out_path = os.path.join(args.out_dir, os.path.basename(trim_path)[:-len(".fa")] + "_codon.fa")
+        if args.force or not os.path.exists(out_path):
+            jobs.append((trim_path, out_path, args.align_dir, args.cds_dir, args.max_mismatch))
+    if not jobs:
+        print(f"✅ No trimmed alignments without a codon alignment in {args.trim_dir}")
+        return
+
+    summaries = []
+    with stage_timer("codon_align") as m:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = {ex.submit(codon_job, job): job[0] for job in jobs}
+            for i, fut in enumerate(as_completed(futs), 1):
+                try:
+                    summaries.append(fut.result())
+                except Exception as e:
+                    print(f"❌ {os.path.basename(futs[fut])}: {e}")
+                if i % 500 == 0 or i == len(futs):
+                    print(f"[{i}/{len(futs)}] families back-translated")
+        m.add(items=sum(s["n_seqs"] for s in summaries), files=len(summaries))
+
+    log_path = os.path.join(args.out_dir, "codon_alignment_log.tsv")
+    rows = {}
+    if os.path.exists(log_path):
+        with open(log_path, newline="") as f:
+            rows = {r["family"]: r for r in csv.DictReader(f, delimiter="\t")}
+    rows.update({s["family"]: s for s in summaries})
+    with open(log_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CODON_LOG_COLUMNS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(rows[k] for k in sorted(rows))
+
+    n_seqs = sum(s["n_seqs"] for s in summaries)
+    n_out = sum(s["n_out"] for s in summaries)
+    dropped = {k: sum(s[k] for s in summaries) for k in ("missing_cds", "short_cds", "mismatch")}
+    print(f"✅ {len(summaries)} codon alignments: {n_out}/{n_seqs} sequences kept "
+          f"({', '.join(f'{v} {k}' for k, v in dropped.items() if v) or 'all consistent'})")
+    print(f"📝 Per-family log: {log_path}")
+
+
+if __name__ == "__main__":
+    main()
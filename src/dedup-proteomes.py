@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Collapse identical protein sequences before OrthoFinder / InterProScan and
+expand the results back to every original Portal-ID afterwards.
+
+Subcommands:
+  collapse             proteomes/clean/*.fasta -> proteomes/nonredundant/*.fasta
+                       plus nonredundant_members.tsv (md5, representative, member)
+  expand-iprscan       InterProScan TSVs of the non-redundant run -> one TSV per portal
+  expand-orthogroups   OrthoFinder Orthogroups.tsv -> expanded Orthogroups.tsv and GeneCount
+
+Usage:
+  python src/dedup-proteomes.py collapse
+  python src/dedup-proteomes.py expand-iprscan --in-dir <nr results> --out-dir <results>
+  python src/dedup-proteomes.py expand-orthogroups --orthogroups <Orthogroups.tsv> --out-dir <dir>
+"""
+
+import argparse
+import glob
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CLEAN_PROTEOMES_DIR, NONREDUNDANT_PROTEOMES_DIR, NONREDUNDANT_MAP_PATH
+from src.utils.wrangleutils import validate_directories
+from src.utils.dedupeutils import collapse_identical_sequences, load_member_map, expand_iprscan_results, expand_orthogroups
+
+def check_separate_dirs(in_dir: str, out_dir: str):
+    """
+    Refuse to write results into the input folder, where they would overwrite
+    or delete the input files.
+    """
+    if os.path.realpath(in_dir) == os.path.realpath(out_dir):
+        sys.exit(f"❌ Input and output folders are the same ({os.path.realpath(in_dir)}); choose another --out-dir")
+
+def cmd_collapse(args):
+    validate_directories([args.in_dir])
+    check_separate_dirs(args.in_dir, args.out_dir)
+    fasta_files = sorted(glob.glob(os.path.join(args.in_dir, "*.fasta")))
+    if not fasta_files:
+        sys.exit(f"❌ No FASTA files found in {args.in_dir}")
+    stats = collapse_identical_sequences(fasta_files, args.out_dir, args.map)
+    log_path = os.path.join(os.path.dirname(os.path.abspath(args.map)), "nonredundant_proteomes_log.csv")
+    stats.to_csv(log_path, index=False)
+    total, kept = stats["total_sequences"].sum(), stats["kept_sequences"].sum()
+    print(f"✅ Kept {kept}/{total} sequences ({(total - kept) / max(total, 1):.1%} redundant) -> {args.out_dir}")
+    print(f"📝 Member map: {args.map}")
+    print(f"📝 Log saved to: {log_path}")
+
+def cmd_expand_iprscan(args):
+    validate_directories([args.in_dir])
+    check_separate_dirs(args.in_dir, args.out_dir)
+    tsv_files = sorted(glob.glob(os.path.join(args.in_dir, "*.tsv.gz")) + glob.glob(os.path.join(args.in_dir, "*.tsv")))
+    if not tsv_files:
+        sys.exit(f"❌ No InterProScan TSVs found in {args.in_dir}")
+    n = expand_iprscan_results(tsv_files, load_member_map(args.map), args.out_dir)
+    print(f"✅ Wrote {n} expanded InterProScan rows -> {args.out_dir}")
+
+def cmd_expand_orthogroups(args):
+    check_separate_dirs(os.path.dirname(os.path.abspath(args.orthogroups)), args.out_dir)
+    os.makedirs(args.out_dir, exist_ok=True)
+    out_path = os.path.join(args.out_dir, "Orthogroups.tsv")
+    count_path = os.path.join(args.out_dir, "Orthogroups.GeneCount.tsv")
+    counts = expand_orthogroups(args.orthogroups, load_member_map(args.map), out_path, count_path)
+    print(f"✅ Expanded {len(counts)} orthogroups -> {out_path}")
+    print(f"✅ Gene counts -> {count_path}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Identical-sequence collapsing and result expansion")
+    ap.add_argument("--map", default=NONREDUNDANT_MAP_PATH, help="Representative -> member map TSV")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("collapse", help="Write non-redundant proteomes")
+    p.add_argument("--in-dir", default=CLEAN_PROTEOMES_DIR)
+    p.add_argument("--out-dir", default=NONREDUNDANT_PROTEOMES_DIR)
+    p.set_defaults(func=cmd_collapse)
+
+    p = sub.add_parser("expand-iprscan", help="Expand InterProScan TSVs to all members")
+    p.add_argument("--in-dir", required=True, help="InterProScan results of the non-redundant proteomes")
+    p.add_argument("--out-dir", required=True, help="Folder for the expanded <portal>.tsv.gz files")
+    p.set_defaults(func=cmd_expand_iprscan)
+
+    p = sub.add_parser("expand-orthogroups", help="Expand OrthoFinder orthogroups to all members")
+    p.add_argument("--orthogroups", required=True, help="Orthogroups/Orthogroups.tsv of the non-redundant run")
+    p.add_argument("--out-dir", required=True)
+    p.set_defaults(func=cmd_expand_orthogroups)
+
+    args = ap.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Domain-architecture inverted index over all portals.
+
+build  derive the ordered domain architecture of every protein from the hit
+       coordinates (InterProScan Parquet dataset or hmmscan domtblout files),
+       intern the architectures and write domain -> protein postings lists,
+       joined to the portal taxonomy from the datadump.
+query  AND / OR / NOT / ordered domain queries, optionally restricted by
+       taxonomy or portal; answers come from the memory-mapped postings.
+
+Usage:
+  python src/domain-index.py build [--source iprscan|hmmscan] [-j 8]
+  python src/domain-index.py query --order Zn_clus Fungal_trans --taxon class=Agaricomycetes
+  python src/domain-index.py query --all PF00172 --any PF04082 PF11951 --by-portal
+  python src/domain-index.py query --order PF00172 PF04082 --list -o zn_fungal_trans.tsv
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    IPRSCAN_PARQUET_DIR, HMMSCAN_RESULTS_DIR, DOMAIN_INDEX_DIR, PORTAL_PHYLOGENY_PATH, DOMAIN_INDEX_ANALYSIS,
+    DOMAIN_MAX_EVALUE, DOMAIN_MAX_OVERLAP
+)
+from src.utils.profileutils import stage_timer
+from src.utils.architectureutils import (
+    ArchitectureIndex, build_architecture_index, iprscan_portal_architectures, hmmscan_portal_architectures
+)
+
+
+def cmd_build(args):
+    import pandas as pd
+    from src.utils.wrangleutils import build_phylogeny_data
+
+    if args.source == "iprscan":
+        portals = sorted(d[len("portal="):] for d in os.listdir(args.input)
+                         if d.startswith("portal=")) if os.path.isdir(args.input) else []
+        jobs = {p: (iprscan_portal_architectures, args.input, p, args.analysis) for p in portals}
+        source = f"{os.path.abspath(args.input)} ({args.analysis or 'all analyses'})"
+    else:
+        paths = {os.path.basename(p)[:-len(".domtblout")]: p
+                 for p in sorted(glob.glob(os.path.join(args.input, "*.domtblout")))}
+        jobs = {portal: (hmmscan_portal_architectures, path, portal) for portal, path in paths.items()}
+        source = os.path.abspath(args.input)
+    if not jobs:
+        sys.exit(f"❌ No {args.source} results found in {args.input}")
+
+    taxonomy = None
+    if os.path.exists(args.phylogeny):
+        taxonomy = build_phylogeny_data(pd.read_csv(args.phylogeny, dtype=str, keep_default_na=False))
+    else:
+        print(f"⚠️ No portal taxonomy at {args.phylogeny}; taxon filters will not be available")
+
+    with stage_timer("domain_index.build") as m:
+        results = []
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = {ex.submit(func, *params, max_evalue=args.max_evalue, max_overlap=args.max_overlap): portal
+                    for portal, (func, *params) in jobs.items()}
+            for i, fut in enumerate(as_completed(futs), 1):
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    print(f"❌ Failed to read {futs[fut]}: {e}")
+                    continue
+                result["portal"] = futs[fut]
+                results.append(result)
+                if i % 50 == 0 or i == len(futs):
+                    print(f"[{i}/{len(futs)}] portals read")
+        meta = build_architecture_index(results, args.index_dir, taxonomy, source)
+        m.add(items=meta["proteins"], portals=meta["portals"])
+    print(f"✅ {meta['proteins']} proteins, {meta['architectures']} architectures, {len(meta['domains'])} domains "
+          f"from {meta['portals']} portals")
+    print(f"📁 Domain index saved to: {args.index_dir}")
+
+
+def cmd_query(args):
+    start = time.perf_counter()
+    index = ArchitectureIndex(args.index_dir)
+    try:
+        proteins = index.query(args.all, args.any, args.none, args.order, args.adjacent, args.taxon, args.portal)
+    except KeyError as e:
+        sys.exit(f"❌ {e.args[0]}")
+    elapsed = (time.perf_counter() - start) * 1000
+    portal_codes = index.protein_portal(proteins)
+    print(f"📋 {len(proteins)} proteins in {len(set(portal_codes.tolist()))} portals ({elapsed:.1f} ms)")
+
+    if args.by_portal:
+        import numpy as np
+
+        codes, counts = np.unique(portal_codes, return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        header = ["portal", "proteins"] + [c for c in index.portals if c.startswith("ncbi")]
+        rows = [[index.portals["portal"][codes[i]], str(counts[i])]
+                + [index.portals[c][codes[i]] for c in header[2:]] for i in order]
+        if args.output:
+            with open(args.output, "w") as f:
+                f.writelines("\t".join(r) + "\n" for r in [header] + rows)
+            print(f"📝 Saved to: {args.output}")
+        else:
+            for r in [header] + rows[:args.limit]:
+                print("\t".join(r))
+        return
+    if args.list:
+        shown = proteins if args.output else proteins[:args.limit]
+        rows = zip(index.protein_ids(shown), index.portals["portal"][portal_codes[:len(shown)]],
+                   index.architectures(shown))
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write("protein_id\tportal\tarchitecture\n")
+                f.writelines(f"{p}\t{portal}\t{arch}\n" for p, portal, arch in rows)
+            print(f"📝 Saved to: {args.output}")
+        else:
+            for p, portal, arch in rows:
+                print(f"{p}\t{portal}\t{arch}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Domain-architecture inverted index")
+    ap.add_argument("--index-dir", default=DOMAIN_INDEX_DIR, help=f"Index folder (default: {DOMAIN_INDEX_DIR})")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="Build the index from InterProScan or hmmscan results")
+    p.add_argument("--source", choices=["iprscan", "hmmscan"], default="iprscan")
+    p.add_argument("--input", help=f"Parquet dataset (default: {IPRSCAN_PARQUET_DIR}) "
+                                   f"or domtblout folder (default: {HMMSCAN_RESULTS_DIR})")
+    p.add_argument("--analysis", default=DOMAIN_INDEX_ANALYSIS,
+                   help=f"InterProScan member database, '' for all (default: {DOMAIN_INDEX_ANALYSIS})")
+    p.add_argument("--phylogeny", default=PORTAL_PHYLOGENY_PATH, help="Portal taxonomy CSV from the datadump")
+    p.add_argument("--max-evalue", type=float, default=DOMAIN_MAX_EVALUE)
+    p.add_argument("--max-overlap", type=float, default=DOMAIN_MAX_OVERLAP)
+    p.add_argument("-j", "--workers", type=int,
+                   default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("query", help="Query the index")
+    p.add_argument("--all", nargs="+", default=[], metavar="DOMAIN", help="Proteins with all of these")
+    p.add_argument("--any", nargs="+", default=[], metavar="DOMAIN", help="... and at least one of these")
+    p.add_argument("--none", nargs="+", default=[], metavar="DOMAIN", help="... and none of these")
+    p.add_argument("--order", nargs="+", default=[], metavar="DOMAIN", help="... with these in this order")
+    p.add_argument("--adjacent", action="store_true", help="--order domains must be consecutive")
+    p.add_argument("--taxon", nargs="+", default=[], help="rank=name or name, e.g. class=Agaricomycetes")
+    p.add_argument("--portal", nargs="+", default=[])
+    p.add_argument("--by-portal", action="store_true", help="Count matches per portal with taxonomy")
+    p.add_argument("--list", action="store_true", help="List the proteins with their architecture")
+    p.add_argument("--limit", type=int, default=20, help="Rows printed without -o (default: 20)")
+    p.add_argument("-o", "--output", help="Write the --list / --by-portal table as TSV")
+    p.set_defaults(func=cmd_query)
+
+    args = ap.parse_args()
+    if args.command == "build":
+        args.input = args.input or (IPRSCAN_PARQUET_DIR if args.source == "iprscan" else HMMSCAN_RESULTS_DIR)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
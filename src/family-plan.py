@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Plan the per-family stages (MSA, trim, gene tree) from membership stamps.
+
+Every stage output carries <output>.stamp, a hash of the family's sorted
+member sequences chained with the options of each stage (trim and tree keys
+build on the key of their input), so a family is rerun only when its members
+or the options actually changed, not whenever its FASTA is rewritten. The
+batch-*.sh scripts list the families to run with `plan`, and the *-par.sh
+scripts skip current outputs with `check` and `stamp` what they produce.
+Outputs made before stamps existed are adopted when they match their input.
+
+plan    list the families of a stage to (re)run into a set file
+check   exit 0 if a family's output is current
+stamp   record that an output was made from its input
+params  print the options of a stage (for the *-par.sh scripts)
+
+Usage:
+  python src/family-plan.py plan msa local_data/speciestree/seq_files local_data/speciestree/seq_alignments \\
+      --set-file local_data/speciestree/unaligned_files.txt
+  python src/family-plan.py check trim OG0000001_mafft.fa OG0000001_mafft_trim.fa
+"""
+
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.stamputils import (
+    STAGE_OUTPUTS, STAMP_SUFFIX, RERUN_STATES, stage_options, family_status, write_stamp
+)
+
+STATES = ("current", "adopted", "new", "input changed", "options changed", "unstamped")
+
+
+def _status(params: tuple) -> str:
+    stage, in_path, out_path, adopt, rehash, write = params
+    return family_status(stage, in_path, out_path, adopt, rehash, write)
+
+
+def output_name(stage: str, in_name: str) -> str:
+    return STAGE_OUTPUTS[stage].format(base=in_name[:-len(".fa")])
+
+
+def cmd_plan(args):
+    from src.utils.profileutils import stage_timer
+
+    names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(args.in_dir, "*.fa")))
+    jobs = [(args.stage, os.path.join(args.in_dir, n), os.path.join(args.out_dir, output_name(args.stage, n)),
+             not args.no_adopt, args.rehash, not args.dry_run) for n in names]
+    with stage_timer(f"family_plan.{args.stage}") as m:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            states = list(ex.map(_status, jobs, chunksize=64))
+        m.add(items=len(jobs))
+    counts = {s: states.count(s) for s in STATES}
+    print(f"📋 {args.stage}: " + ", ".join(f"{n} {s}" for s, n in counts.items() if n or s in ("current", "new")))
+    changed = [n for n, s in zip(names, states) if s in ("input changed", "options changed")]
+    if changed:
+        print(f"   changed: {', '.join(changed[:10])}" + (" ..." if len(changed) > 10 else ""))
+
+    # Outputs whose family is gone (e.g. after an OrthoFinder rerun)
+    expected = {output_name(args.stage, n) for n in names}
+    pattern = STAGE_OUTPUTS[args.stage].format(base="*")
+    orphans = sorted(os.path.basename(p) for p in glob.glob(os.path.join(args.out_dir, pattern))
+                     if os.path.basename(p) not in expected)
+    if orphans:
+        if args.remove_orphans and not args.dry_run:
+            for name in orphans:
+                for path in (os.path.join(args.out_dir, name), os.path.join(args.out_dir, name + STAMP_SUFFIX)):
+                    if os.path.exists(path):
+                        os.remove(path)
+            print(f"🗑️ Removed {len(orphans)} outputs without an input family")
+        else:
+            print(f"⚠️ {len(orphans)} outputs without an input family (e.g. {orphans[0]}); "
+                  f"--remove-orphans deletes them")
+
+    pending = [n for n, s in zip(names, states) if s in RERUN_STATES]
+    if args.dry_run or not args.set_file:
+        print(f"📋 {len(pending)} families to run" + (" (dry run)" if args.dry_run else ""))
+        return
+    with open(args.set_file, "w") as f:
+        f.writelines(n + "\n" for n in pending)
+    report_path = os.path.splitext(args.set_file)[0] + "_plan.tsv"
+    with open(report_path, "w") as f:
+        f.write("family\tstatus\n")
+        f.writelines(f"{n}\t{s}\n" for n, s in zip(names, states))
+    print(f"📝 {len(pending)} families to run -> {args.set_file} (all states: {report_path})")
+
+
+def cmd_check(args):
+    status = family_status(args.stage, args.input, args.output, adopt=False, write=False)
+    sys.exit(0 if status == "current" else 1)
+
+
+def cmd_stamp(args):
+    write_stamp(args.stage, args.input, args.output)
+
+
+def cmd_params(args):
+    print(stage_options(args.stage))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Membership-stamp planner for the per-family stages")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("plan", help="List the families of a stage to (re)run")
+    p.add_argument("stage", choices=list(STAGE_OUTPUTS))
+    p.add_argument("in_dir", help="Stage inputs (*.fa)")
+    p.add_argument("out_dir", help="Stage outputs")
+    p.add_argument("--set-file", help="Write the input names to run here, one per line")
+    p.add_argument("--no-adopt", action="store_true", help="Rerun unstamped outputs instead of adopting them")
+    p.add_argument("--rehash", action="store_true", help="Hash inputs even if their size and mtime are unchanged")
+    p.add_argument("--remove-orphans", action="store_true", help="Delete outputs whose input family is gone")
+    p.add_argument("--dry-run", action="store_true", help="Only report; write no stamps or set file")
+    p.add_argument("-j", "--workers", type=int,
+                   default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    p.set_defaults(func=cmd_plan)
+
+    for name, text, func in (("check", "Exit 0 if the output is current", cmd_check),
+                             ("stamp", "Stamp an output made from its input", cmd_stamp)):
+        p = sub.add_parser(name, help=text)
+        p.add_argument("stage", choices=list(STAGE_OUTPUTS))
+        p.add_argument("input")
+        p.add_argument("output")
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("params", help="Print the options of a stage")
+    p.add_argument("stage", choices=list(STAGE_OUTPUTS))
+    p.set_defaults(func=cmd_params)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,14 +16,19 @@ done
 # Read the 'portal' column into the portals array
 mapfile -t portals < <(tail -n +2 "$input_file" | awk -F',' -v idx=$((portal_idx+1)) '{print $idx}')
 
-# Copy each portal.fasta file
+# Link each portal's proteome (plain .fasta or BGZF .fasta.gz with its .fai/.gzi)
+# into final/: a hardlink costs no space, a reflink is the fallback across
+# filesystems that support it, a plain copy the last resort
 src_dir="local_data/proteomes/renamed"
 dst_dir="local_data/proteomes/final"
 mkdir -p "$dst_dir"
 
 for portal in "${portals[@]}"; do
-    src_file="$src_dir/${portal}.fasta"
-    if [[ -f "$src_file" ]]; then
-        cp "$src_file" "$dst_dir/"
-    fi
-done
\ No newline at end of file
+    for src_file in "$src_dir/${portal}.fasta" "$src_dir/${portal}.fasta.gz"; do
+        [[ -f "$src_file" ]] || continue
+        for f in "$src_file" "$src_file.fai" "$src_file.gzi"; do
+            [[ -f "$f" ]] || continue
+            ln -f "$f" "$dst_dir/" 2>/dev/null || cp --reflink=auto "$f" "$dst_dir/"
+        done
+    done
+done
@@ -1,22 +1,44 @@
 import os
-import shutil
-import pandas as pd
+import sys
 import argparse
-from config import ORTHOFINDER_TBLS_DIR, ORTHOFINDER_SEQS_DIR, ORTHOGROUPS_GENECOUNT_PATH, SPECIESTREE_SEQS_DIR
-from utils.wrangle_utils import find_single_copy_orthogroups, copy_orthogroup_fastas
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ORTHOFINDER_DIR, SPECIESTREE_SEQS_DIR, PRUNE_LOG_DIR
+from src.utils.wrangleutils import find_single_copy_orthogroups, copy_orthogroup_fastas, find_latest_orthofinder_results
+from src.utils.familyutils import prune_families
 
 def main():
     """
     Parses command-line arguments, finds single-copy orthogroups,
-    and copies their FASTA files to the target directory.
+    and copies their FASTA files to the target directory, pruned of length
+    outliers and in-paralogs (see prune-families.py) unless --no-prune.
     """
     parser = argparse.ArgumentParser(description="Find single-copy orthogroups and copy their FASTA files.")
     parser.add_argument('--threshold', type=float, default=0.75, help='Fraction of genomes required to have a single gene (default: 0.75)')
+    parser.add_argument('--results-dir', default=None, help='OrthoFinder Results_* directory (default: latest under ORTHOFINDER_DIR)')
+    parser.add_argument('--no-prune', action='store_true', help='Copy the orthogroup FASTAs without pruning length outliers and in-paralogs')
     args = parser.parse_args()
 
-    output_path = os.path.join(ORTHOFINDER_TBLS_DIR, 'single_copy_orthogroups.tsv')
-    orthogroup_names = find_single_copy_orthogroups(ORTHOGROUPS_GENECOUNT_PATH, output_path, args.threshold)
-    copy_orthogroup_fastas(orthogroup_names, ORTHOFINDER_SEQS_DIR, SPECIESTREE_SEQS_DIR)
+    results_dir = args.results_dir or find_latest_orthofinder_results(ORTHOFINDER_DIR)
+    if not results_dir:
+        sys.exit(f"❌ No OrthoFinder results found in {ORTHOFINDER_DIR}")
+
+    orthogroups_dir = os.path.join(results_dir, 'Orthogroups')
+    output_path = os.path.join(orthogroups_dir, 'single_copy_orthogroups.tsv')
+    gene_count_path = os.path.join(orthogroups_dir, 'Orthogroups.GeneCount.tsv')
+    orthogroup_names = find_single_copy_orthogroups(gene_count_path, output_path, args.threshold)
+    missing = copy_orthogroup_fastas(orthogroup_names, os.path.join(results_dir, 'Orthogroup_Sequences'), SPECIESTREE_SEQS_DIR)
+    if not args.no_prune:
+        # Fresh copies, so every family is pruned again
+        missing = set(missing)
+        copied = [f"{og}.fa" for og in orthogroup_names if og not in missing]
+        summaries = prune_families(SPECIESTREE_SEQS_DIR, SPECIESTREE_SEQS_DIR, PRUNE_LOG_DIR, names=copied, force=True,
+                                   workers=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+        n_in = sum(s["n_in"] for s in summaries)
+        n_out = sum(s["n_out"] for s in summaries)
+        print(f"✅ Pruned {len(summaries)} families: {n_in} -> {n_out} sequences (removal logs in {PRUNE_LOG_DIR})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
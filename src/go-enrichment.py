@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+GO term and pathway enrichment over orthogroups and clades.
+
+build   read the GO terms (or pathways) of every protein from the InterProScan
+        results (Parquet dataset or TSVs, run with --goterms --pathways), build
+        the sparse protein x term matrix (GO annotations propagated to their
+        ancestors with go-basic.obo when available) and the orthogroup x term
+        counts over the latest OrthoFinder orthogroups
+clades  for every clade of the portal taxonomy, the orthogroups expanded in it
+        (Orthogroups.GeneCount.tsv) against all annotated orthogroups
+sets    any foreground sets of orthogroups or proteins from a TSV (set, member)
+
+All sets are tested at once: overlaps come from sparse matrix products,
+p-values from one vectorized hypergeometric test per chunk of sets, and
+q-values are Benjamini-Hochberg per set.
+
+Usage:
+  python src/go-enrichment.py build [--source tsv] [--terms pathways] [-j 8]
+  python src/go-enrichment.py clades [--ranks order family] [--namespace biological_process]
+  python src/go-enrichment.py sets candidates.tsv --level protein -o candidates_go.tsv
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    IPRSCAN_PARQUET_DIR, INTERPROSCAN_RESULTS_DIR, ORTHOFINDER_DIR, PORTAL_PHYLOGENY_PATH, ENRICHMENT_DIR,
+    GO_OBO_PATH, ENRICH_OG_MIN_FRACTION, ENRICH_MIN_TERM_SIZE, ENRICH_FDR, ENRICH_CLADE_RANKS,
+    ENRICH_MIN_CLADE_PORTALS, ENRICH_EXPANSION_RATIO, ENRICH_MIN_CLADE_COPIES
+)
+from src.utils.profileutils import stage_timer
+
+
+def latest_orthogroups_file(name: str) -> str | None:
+    from src.utils.wrangleutils import find_latest_orthofinder_results
+
+    results = find_latest_orthofinder_results(ORTHOFINDER_DIR) if os.path.isdir(ORTHOFINDER_DIR) else None
+    return os.path.join(results, "Orthogroups", name) if results else None
+
+
+def find_portal_sources(source: str, folder: str) -> dict:
+    """
+    Map portal -> Parquet partition or InterProScan TSV (.tsv.gz preferred over .tsv).
+    """
+    found = {}
+    if not os.path.isdir(folder):
+        return found
+    for name in sorted(os.listdir(folder)):
+        if source == "parquet":
+            if name.startswith("portal="):
+                found[name[len("portal="):]] = os.path.join(folder, name)
+            continue
+        for suffix in (".tsv", ".tsv.gz"):
+            if name.endswith(suffix) and not name.endswith(".rerun" + suffix):
+                found[name[:-len(suffix)]] = os.path.join(folder, name)
+    return found
+
+
+def cmd_build(args):
+    import numpy as np
+    import pandas as pd
+    from src.utils.enrichutils import (
+        read_portal_terms, read_obo, build_term_matrices, read_orthogroups, add_orthogroup_terms, save_term_matrices
+    )
+
+    sources = find_portal_sources(args.source, args.input)
+    if not sources:
+        sys.exit(f"❌ No InterProScan results found in {args.input}")
+    ontology = None
+    if args.terms == "go_terms":
+        if os.path.exists(args.obo):
+            ontology = read_obo(args.obo)
+        else:
+            print(f"⚠️ No GO ontology at {args.obo}; terms are not propagated to their ancestors")
+
+    with stage_timer("go_enrichment.build") as m:
+        results = []
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = {ex.submit(read_portal_terms, path, portal, args.terms): portal for portal, path in sources.items()}
+            for i, fut in enumerate(as_completed(futs), 1):
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    print(f"❌ Failed to read {futs[fut]}: {e}")
+                    continue
+                if i % 50 == 0 or i == len(futs):
+                    print(f"[{i}/{len(futs)}] portals read")
+        results.sort(key=lambda r: r["portal"])
+        matrices = build_term_matrices(results, ontology)
+
+        orthogroups_path = args.orthogroups or latest_orthogroups_file("Orthogroups.tsv")
+        if orthogroups_path and os.path.exists(orthogroups_path):
+            add_orthogroup_terms(matrices, read_orthogroups(orthogroups_path))
+            print(f"📋 {len(matrices['orthogroups'])} annotated orthogroups from {orthogroups_path}")
+        else:
+            print("⚠️ No Orthogroups.tsv found; only the protein matrix is built")
+        save_term_matrices(args.matrix_dir, matrices)
+        m.add(items=len(matrices["proteins"]), portals=len(results))
+
+    terms = matrices["terms"]
+    pd.DataFrame({
+        "term": terms,
+        "name": [ontology[t]["name"] if ontology and t in ontology else "" for t in terms],
+        "namespace": [ontology[t]["namespace"] if ontology and t in ontology else "" for t in terms],
+        "proteins": np.asarray(matrices["protein_term"].getnnz(axis=0)),
+    }).to_csv(os.path.join(args.matrix_dir, "terms.tsv"), sep="\t", index=False)
+    print(f"✅ {len(matrices['proteins'])} proteins x {len(terms)} terms "
+          f"({matrices['protein_term'].nnz} annotations) -> {args.matrix_dir}")
+
+
+def load_annotation(args, level: str) -> tuple:
+    """
+    Item x term incidence at the given level, its item labels and the term table.
+    """
+    import pandas as pd
+    from src.utils.enrichutils import load_term_matrices, orthogroup_annotation
+
+    if not os.path.exists(os.path.join(args.matrix_dir, "labels.npz")):
+        sys.exit(f"❌ No term matrices in {args.matrix_dir}; run the build command first")
+    matrices = load_term_matrices(args.matrix_dir)
+    if level == "orthogroup":
+        if "orthogroup_term" not in matrices:
+            sys.exit(f"❌ {args.matrix_dir} has no orthogroup matrix; build with --orthogroups")
+        annotation, items = orthogroup_annotation(matrices, args.min_fraction), matrices["orthogroups"]
+    else:
+        annotation, items = matrices["protein_term"], matrices["proteins"]
+    terms = pd.read_csv(os.path.join(args.matrix_dir, "terms.tsv"), sep="\t", dtype=str, keep_default_na=False)
+    if args.namespace:
+        mask = (terms["namespace"] == args.namespace).to_numpy()
+        if not mask.any():
+            sys.exit(f"❌ No terms in namespace {args.namespace} (terms are named only when built with an ontology)")
+        annotation = annotation.multiply(mask[None, :]).tocsr()
+    return annotation, items, terms
+
+
+def run_tests(args, foreground, annotation, set_labels, terms):
+    """
+    Test every set, write the significant terms and return the per-set counts of them.
+    """
+    from src.utils.enrichutils import enrichment_tests
+
+    with stage_timer("go_enrichment.test") as m:
+        results, meta = enrichment_tests(foreground, annotation, args.min_term_size, args.max_term_size,
+                                         args.min_count, args.alpha)
+        m.add(items=foreground.shape[0] * meta["terms"])
+    print(f"📋 {foreground.shape[0]} sets x {meta['terms']} terms tested against {meta['background']} "
+          f"annotated items")
+
+    table = set_labels.iloc[results["set"]].reset_index(drop=True)
+    table = table.join(terms[["term", "name", "namespace"]].iloc[results["term"]].reset_index(drop=True))
+    table = table.join(results.drop(columns=["set", "term"]))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    table.to_csv(args.output, sep="\t", index=False, float_format="%.4g")
+    print(f"✅ {len(table)} enriched set/term pairs (q <= {args.alpha}) in {results['set'].nunique()} sets")
+    print(f"📝 Saved to: {args.output}")
+    return results["set"].value_counts()
+
+
+def cmd_clades(args):
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+    from src.utils.wrangleutils import build_phylogeny_data
+    from src.utils.enrichutils import clade_membership, expanded_orthogroups
+
+    annotation, orthogroups, terms = load_annotation(args, "orthogroup")
+    gene_count_path = args.gene_count or latest_orthogroups_file("Orthogroups.GeneCount.tsv")
+    if not gene_count_path or not os.path.exists(gene_count_path):
+        sys.exit("❌ No Orthogroups.GeneCount.tsv found; pass --gene-count")
+    if not os.path.exists(args.phylogeny):
+        sys.exit(f"❌ No portal taxonomy at {args.phylogeny}")
+
+    counts = pd.read_csv(gene_count_path, sep="\t", index_col="Orthogroup").drop(columns="Total", errors="ignore")
+    portals = np.asarray(counts.columns, dtype=object)
+    # Gene counts in the row order of the annotation matrix
+    counts = sparse.csr_matrix(counts.reindex(orthogroups, fill_value=0).to_numpy(dtype=np.int32).T)
+    taxonomy = build_phylogeny_data(pd.read_csv(args.phylogeny, dtype=str, keep_default_na=False))
+    clades, info = clade_membership(taxonomy, portals, args.ranks, args.min_portals)
+    if not len(info):
+        sys.exit(f"❌ No clades with >= {args.min_portals} portals at ranks {', '.join(args.ranks)}")
+
+    with stage_timer("go_enrichment.expansions") as m:
+        expanded = expanded_orthogroups(counts, clades, args.ratio, args.min_copies)
+        m.add(items=len(info))
+    info["expanded_orthogroups"] = expanded.getnnz(axis=1)
+    print(f"📋 {len(info)} clades, {int((info['expanded_orthogroups'] > 0).sum())} with expanded orthogroups")
+
+    args.output = args.output or os.path.join(ENRICHMENT_DIR, f"clade_expansions_{args.terms}.tsv")
+    enriched = run_tests(args, expanded, annotation, info[["clade", "rank"]], terms)
+    info["enriched_terms"] = enriched.reindex(range(len(info)), fill_value=0).to_numpy()
+    summary_path = os.path.splitext(args.output)[0] + "_clades.tsv"
+    info.to_csv(summary_path, sep="\t", index=False)
+    print(f"📝 Clade summary: {summary_path}")
+
+
+def cmd_sets(args):
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    annotation, items, terms = load_annotation(args, args.level)
+    members = pd.read_csv(args.sets, sep="\t", header=None, names=["set", "member"], usecols=[0, 1], dtype=str,
+                          comment="#").dropna()
+    codes = pd.Index(items).get_indexer(members["member"])
+    if (codes < 0).any():
+        print(f"⚠️ {int((codes < 0).sum())} members without annotation are not tested")
+    set_codes, set_names = pd.factorize(members["set"])
+    known = codes >= 0
+    foreground = sparse.csr_matrix(
+        (np.ones(known.sum(), dtype=bool), (set_codes[known], codes[known])), shape=(len(set_names), len(items)))
+
+    args.output = args.output or os.path.join(
+        ENRICHMENT_DIR, f"{os.path.splitext(os.path.basename(args.sets))[0]}_{args.terms}.tsv")
+    run_tests(args, foreground, annotation, pd.DataFrame({"set": np.asarray(set_names, dtype=object)}), terms)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="GO term / pathway enrichment with sparse incidence matrices")
+    ap.add_argument("--terms", choices=["go_terms", "pathways"], default="go_terms",
+                    help="InterProScan column to use (default: go_terms)")
+    ap.add_argument("--matrix-dir", help=f"Term matrices (default: {ENRICHMENT_DIR}/<terms>)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="Build protein / orthogroup x term matrices")
+    p.add_argument("--source", choices=["parquet", "tsv"], default="parquet")
+    p.add_argument("--input", help=f"Parquet dataset (default: {IPRSCAN_PARQUET_DIR}) "
+                                   f"or TSV folder (default: {INTERPROSCAN_RESULTS_DIR})")
+    p.add_argument("--obo", default=GO_OBO_PATH, help=f"GO ontology for propagation and names (default: {GO_OBO_PATH})")
+    p.add_argument("--orthogroups", help="Orthogroups.tsv (default: latest OrthoFinder results)")
+    p.add_argument("-j", "--workers", type=int,
+                   default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("clades", help="Terms enriched in the orthogroups expanded in each clade")
+    p.add_argument("--gene-count", help="Orthogroups.GeneCount.tsv (default: latest OrthoFinder results)")
+    p.add_argument("--phylogeny", default=PORTAL_PHYLOGENY_PATH, help="Portal taxonomy CSV from the datadump")
+    p.add_argument("--ranks", nargs="+", default=list(ENRICH_CLADE_RANKS),
+                   help=f"Clade ranks (default: {' '.join(ENRICH_CLADE_RANKS)})")
+    p.add_argument("--min-portals", type=int, default=ENRICH_MIN_CLADE_PORTALS)
+    p.add_argument("--ratio", type=float, default=ENRICH_EXPANSION_RATIO,
+                   help=f"Clade / other portals mean copy number (default: {ENRICH_EXPANSION_RATIO})")
+    p.add_argument("--min-copies", type=float, default=ENRICH_MIN_CLADE_COPIES,
+                   help=f"Lowest mean copy number in the clade (default: {ENRICH_MIN_CLADE_COPIES})")
+    p.set_defaults(func=cmd_clades, level="orthogroup")
+
+    p = sub.add_parser("sets", help="Terms enriched in given sets of orthogroups or proteins")
+    p.add_argument("sets", help="TSV without header: set name, member (orthogroup or protein id)")
+    p.add_argument("--level", choices=["orthogroup", "protein"], default="orthogroup")
+    p.set_defaults(func=cmd_sets)
+
+    for name in ("clades", "sets"):
+        p = sub.choices[name]
+        p.add_argument("--namespace", choices=["biological_process", "molecular_function", "cellular_component"],
+                       help="Only test GO terms of this namespace")
+        p.add_argument("--min-fraction", type=float, default=ENRICH_OG_MIN_FRACTION,
+                       help=f"Share of annotated members an orthogroup term needs (default: {ENRICH_OG_MIN_FRACTION})")
+        p.add_argument("--min-term-size", type=int, default=ENRICH_MIN_TERM_SIZE)
+        p.add_argument("--max-term-size", type=int, default=None)
+        p.add_argument("--min-count", type=int, default=2, help="Smallest overlap reported (default: 2)")
+        p.add_argument("--alpha", type=float, default=ENRICH_FDR, help=f"Largest q-value reported (default: {ENRICH_FDR})")
+        p.add_argument("-o", "--output", help="Enrichment TSV")
+
+    args = ap.parse_args()
+    args.matrix_dir = args.matrix_dir or os.path.join(ENRICHMENT_DIR, args.terms)
+    if args.command == "build":
+        args.input = args.input or (IPRSCAN_PARQUET_DIR if args.source == "parquet" else INTERPROSCAN_RESULTS_DIR)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
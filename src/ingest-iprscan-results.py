@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Ingest InterProScan results into a Parquet dataset and sparse domain matrices.
+
+Each interproscan_results/<portal>.tsv(.gz) is streamed in chunks (one worker
+process per portal) into <dataset>/portal=<portal>/analysis=<app>/*.parquet.
+Then a protein x domain and a portal x domain sparse matrix are built over all
+portals. Portals whose TSV did not change since the last ingestion are read back
+from Parquet instead of re-parsing the text.
+
+Usage:
+  python src/ingest-iprscan-results.py [-j 8] [--domain-column signature_accession] [--force]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATA_DIR, INTERPROSCAN_RESULTS_DIR, IPRSCAN_PARQUET_DIR
+from src.utils.wrangleutils import validate_directories
+from src.utils.domainutils import ingest_iprscan_tsv, read_portal_pairs, build_domain_matrices, save_domain_matrices
+
+DATASET_DIR = IPRSCAN_PARQUET_DIR
+MATRIX_DIR = os.path.join(DATA_DIR, "domain_matrices")
+MANIFEST_PATH = os.path.join(DATASET_DIR, "_ingested_manifest.csv")  # leading "_" keeps it out of Parquet dataset scans
+
+def find_tsvs(folder: str) -> dict:
+    """
+    Map portal -> InterProScan TSV path, preferring .tsv.gz over .tsv.
+    """
+    found = {}
+    for name in sorted(os.listdir(folder)):
+        for suffix in (".tsv", ".tsv.gz"):
+            if name.endswith(suffix) and not name.endswith(".rerun" + suffix):
+                found[name[:-len(suffix)]] = os.path.join(folder, name)
+    return found
+
+def main():
+    ap = argparse.ArgumentParser(description="Ingest InterProScan TSVs into Parquet and domain matrices")
+    ap.add_argument("-j", "--workers", type=int,
+                    default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    ap.add_argument("--chunksize", type=int, default=1_000_000, help="Rows per streamed chunk")
+    ap.add_argument("--domain-column", default="signature_accession",
+                    choices=["signature_accession", "interpro_accession"],
+                    help="Identifier used as matrix columns (default: signature_accession)")
+    ap.add_argument("--force", action="store_true", help="Re-ingest portals even if their TSV is unchanged")
+    args = ap.parse_args()
+
+    validate_directories([INTERPROSCAN_RESULTS_DIR])
+    os.makedirs(DATASET_DIR, exist_ok=True)
+
+    tsvs = find_tsvs(INTERPROSCAN_RESULTS_DIR)
+    if not tsvs:
+        sys.exit(f"❌ No InterProScan TSVs found in {INTERPROSCAN_RESULTS_DIR}")
+
+    # Skip portals whose source file is unchanged since the last run
+    manifest = pd.read_csv(MANIFEST_PATH) if os.path.exists(MANIFEST_PATH) else pd.DataFrame(
+        columns=["portal", "source", "size", "mtime", "rows"])
+    previous = {r.portal: r for r in manifest.itertuples()}
+    to_ingest, unchanged = [], []
+    for portal, path in tsvs.items():
+        st = os.stat(path)
+        prev = previous.get(portal)
+        if (not args.force and prev is not None and prev.source == path and prev.size == st.st_size
+                and prev.mtime == st.st_mtime and os.path.isdir(os.path.join(DATASET_DIR, f"portal={portal}"))):
+            unchanged.append(portal)
+        else:
+            to_ingest.append(portal)
+    print(f"📦 {len(to_ingest)} portals to ingest, {len(unchanged)} unchanged")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        futs = {
+            ex.submit(ingest_iprscan_tsv, tsvs[p], p, DATASET_DIR, args.domain_column, args.chunksize): p
+            for p in to_ingest
+        }
+        futs.update({
+            ex.submit(read_portal_pairs, DATASET_DIR, p, args.domain_column): p
+            for p in unchanged
+        })
+        for i, fut in enumerate(as_completed(futs), 1):
+            portal = futs[fut]
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                print(f"❌ Failed to ingest {portal}: {e}")
+                continue
+            if i % 50 == 0 or i == len(futs):
+                print(f"[{i}/{len(futs)}] portals processed")
+
+    results.sort(key=lambda r: r["portal"])
+    manifest_rows = []
+    for r in results:
+        st = os.stat(tsvs[r["portal"]])
+        manifest_rows.append({"portal": r["portal"], "source": tsvs[r["portal"]],
+                              "size": st.st_size, "mtime": st.st_mtime, "rows": r["rows"]})
+    pd.DataFrame(manifest_rows).to_csv(MANIFEST_PATH, index=False)
+    print(f"✅ Parquet dataset: {DATASET_DIR}")
+
+    matrices = build_domain_matrices(results)
+    save_domain_matrices(MATRIX_DIR, matrices)
+    print(
+        f"✅ Domain matrices ({len(matrices['proteins'])} proteins, {len(matrices['domains'])} domains, "
+        f"{len(matrices['portals'])} portals) -> {MATRIX_DIR}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Windowed asyncio scheduler for cluster_interproscan.
+
+Each clean proteome is streamed into '*'-free chunks, and up to --window chunks
+are kept running through cluster_interproscan at once. Progress events in each
+submit log ("split into N pieces", "subjob X OK/FAILED") are followed while the
+run is active. Like iprscan-launcher-failed.sh, a chunk with failed pieces is
+retried piece by piece (up to --retries times): the outputs of the OK pieces
+are kept, and only the *_sequences inputs that cluster_interproscan leaves for
+the failed pieces are resubmitted. Only when the failed pieces cannot be told
+apart (no piece inputs left behind, missing subjobs, no output) is the input
+of that attempt rerun as a whole. Every attempt runs in its own folder and is
+appended to the chunk's submit log. The outputs of all attempts are merged
+into the chunk TSV, and when every chunk of a portal is done, the chunk TSVs
+are merged into <out-dir>/<portal>.tsv.gz (chunks live in <out-dir>/chunks).
+
+Usage:
+  python src/iprscan-scheduler.py [--window 4] [--chunk-size 20000] [--max-queued 200]
+
+For a local dry run, put fake 'cluster_interproscan' and 'squeue' executables
+first on PATH (or pass --iprscan-cmd / --squeue-cmd).
+"""
+
+import argparse
+import asyncio
+import getpass
+import logging
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CLEAN_PROTEOMES_DIR, INTERPROSCAN_RESULTS_DIR, IPRSCAN_LOG_DIR, IPRSCAN_APPLICATIONS
+from src.utils.iprscanutils import (
+    SUBMIT_HEADER, parse_progress_line, find_iprscan_output, find_failed_piece_inputs, concat_outputs,
+    write_clean_chunks
+)
+
+# === Logging setup ===
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
+
+
+async def follow_log(log_path: Path, state: dict, done: asyncio.Event, poll: float, offset: int = 0):
+    """
+    Read progress events appended to a submit log until the run finishes.
+
+    Args:
+        log_path (Path): Submit log being written by cluster_interproscan.
+        state (dict): Progress state updated in place ('total', 'ok', 'failed').
+        done (asyncio.Event): Set when the cluster_interproscan process has exited.
+        poll (float): Seconds between reads.
+        offset (int): Where this attempt starts in the log (earlier attempts are skipped).
+    """
+    buffer = ""
+    while True:
+        finished = done.is_set()
+        try:
+            with open(log_path, "r", errors="ignore") as f:
+                f.seek(offset)
+                data = f.read()
+                offset = f.tell()
+        except FileNotFoundError:
+            data = ""
+        buffer += data
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            event = parse_progress_line(line)
+            if event is None:
+                continue
+            kind, value = event
+            if kind == "total":
+                state["total"] = value
+            elif kind == "OK":
+                state["ok"].add(value)
+                state["failed"].discard(value)
+            else:
+                state["failed"].add(value)
+        if finished:
+            if buffer:
+                event = parse_progress_line(buffer)
+                if event and event[0] == "total":
+                    state["total"] = event[1]
+                elif event:
+                    state["ok" if event[0] == "OK" else "failed"].add(event[1])
+            return
+        try:
+            await asyncio.wait_for(done.wait(), timeout=poll)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def queued_jobs(squeue_cmd: str, user: str) -> int:
+    """
+    Count queued/running jobs of the user whose name starts with 'iprscan'.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        squeue_cmd, "-u", user, "-h", "-o", "%j",
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    out, _ = await proc.communicate()
+    return sum(1 for line in out.decode(errors="ignore").splitlines() if line.startswith("iprscan"))
+
+
+def concat_files(paths: list, out_path: str):
+    """
+    Concatenate files byte for byte (the piece inputs of a retry).
+    """
+    with open(out_path, "wb") as out:
+        for path in paths:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+async def run_chunk(chunk: str, args, window: asyncio.Semaphore, stats: dict) -> bool:
+    """
+    Run cluster_interproscan for one chunk, rerunning only the failed pieces.
+
+    Attempt n runs in <chunk>.runs/attempt<n>/. Its output (the OK pieces) is
+    kept, and the *_sequences inputs of its failed pieces form the input of
+    attempt n + 1. The chunk output is the concatenation of all kept outputs.
+
+    Args:
+        chunk (str): Path of the chunk FASTA.
+        args: Parsed command-line arguments.
+        window (asyncio.Semaphore): Concurrency window shared by all chunks.
+        stats (dict): Global counters updated in place.
+
+    Returns:
+        bool: True if the chunk produced a complete output.
+    """
+    stem = os.path.basename(chunk)[:-len(".fasta")]
+    out_basename = os.path.join(os.path.dirname(chunk), stem)
+    if find_iprscan_output(out_basename):
+        stats["skipped"] += 1
+        return True
+
+    log_path = Path(args.log_dir) / f"iprscan_{stem}.submit.log"
+    runs_dir = os.path.abspath(out_basename + ".runs")
+    # Outputs of an interrupted earlier scheduler run cannot be matched to their inputs
+    shutil.rmtree(runs_dir, ignore_errors=True)
+    kept_outputs = []
+    input_path = os.path.abspath(chunk)
+    for attempt in range(1, args.retries + 2):
+        run_dir = os.path.join(runs_dir, f"attempt{attempt}")
+        os.makedirs(run_dir)
+        run_basename = os.path.join(run_dir, stem)
+        async with window:
+            if args.max_queued:
+                while await queued_jobs(args.squeue_cmd, args.user) >= args.max_queued:
+                    logging.info(f"[WAIT] iprscan jobs at limit {args.max_queued}; sleeping {args.poll}s")
+                    await asyncio.sleep(args.poll)
+
+            state = {"total": None, "ok": set(), "failed": set()}
+            # Appended, so earlier attempts stay in the log and iprscan_log_summarize.py keeps its offsets
+            with open(log_path, "a") as log:
+                log.write(
+                    f"{SUBMIT_HEADER}\n"
+                    f"JobName:  iprscan_{stem}\nInput:    {input_path}\nOutput:   {run_basename}\n"
+                    f"Attempt:  {attempt}\nThreads:  {args.threads}\nApps:     {args.applications}\n"
+                )
+                log.flush()
+                start = log.tell()
+                logging.info(f"[SUBMIT] {stem} (attempt {attempt})")
+                # Run inside run_dir so the piece inputs of failed subjobs land there
+                proc = await asyncio.create_subprocess_exec(
+                    args.iprscan_cmd,
+                    "-i", input_path, "-f", "TSV", "--cpu", str(args.threads), "-o", run_basename,
+                    "-t", "p", "-appl", args.applications, "--goterms", "--pathways",
+                    stdout=log, stderr=asyncio.subprocess.STDOUT, cwd=run_dir,
+                )
+                done = asyncio.Event()
+                follower = asyncio.create_task(follow_log(log_path, state, done, args.poll, start))
+                returncode = await proc.wait()
+                done.set()
+                await follower
+            stats["submitted"] += 1
+
+        missing = None if state["total"] is None else state["total"] - len(state["ok"]) - len(state["failed"])
+        output = find_iprscan_output(run_basename)
+        if returncode == 0 and output and not state["failed"] and not missing:
+            logging.info(f"[OK] {stem}: {len(state['ok'])}/{state['total'] or '?'} subjobs (attempt {attempt})")
+            await asyncio.to_thread(concat_outputs, kept_outputs + [output], out_basename + ".tsv.gz")
+            shutil.rmtree(runs_dir, ignore_errors=True)
+            return True
+
+        pieces = find_failed_piece_inputs(run_dir)
+        # Only rerun single pieces when every failed subjob left its input, none is unaccounted
+        # for, and the OK pieces (if any) wrote their output
+        if pieces and len(pieces) == len(state["failed"]) and not missing and (output or not state["ok"]):
+            if output:
+                kept_outputs.append(output)
+            input_path = os.path.join(runs_dir, f"attempt{attempt}.failed.fasta")
+            await asyncio.to_thread(concat_files, pieces, input_path)
+            scope = f"{len(pieces)} failed pieces"
+        else:
+            scope = "whole input"
+        logging.warning(
+            f"[RETRY] {stem} ({scope}): exit={returncode}, failed={sorted(state['failed'])}, "
+            f"missing={missing}, output={'yes' if output else 'no'}"
+        )
+        stats["retried"] += 1
+
+    logging.error(f"[FAIL] {stem}: giving up after {args.retries + 1} attempts (see {log_path})")
+    stats["failed"] += 1
+    return False
+
+
+def merge_chunk_outputs(chunks: list, final_path: str):
+    """
+    Concatenate the TSV outputs of all chunks of a portal into one .tsv.gz.
+    """
+    concat_outputs([find_iprscan_output(chunk[:-len(".fasta")]) for chunk in chunks], final_path)
+
+
+async def run_portal(fasta: str, args, window: asyncio.Semaphore, stats: dict):
+    """
+    Chunk, scan and merge one proteome.
+    """
+    stem = os.path.basename(fasta).rsplit(".", 1)[0]
+    final_basename = os.path.join(args.out_dir, stem)
+    if find_iprscan_output(final_basename):
+        logging.info(f"[SKIP] {stem} -> output exists")
+        return
+
+    chunk_dir = os.path.join(args.out_dir, "chunks", stem)
+    chunks = await asyncio.to_thread(write_clean_chunks, fasta, chunk_dir, stem, args.chunk_size)
+    if not chunks:
+        logging.warning(f"[WARN] {stem}: no sequences, skipping.")
+        return
+
+    results = await asyncio.gather(*(run_chunk(c, args, window, stats) for c in chunks))
+    if all(results):
+        await asyncio.to_thread(merge_chunk_outputs, chunks, final_basename + ".tsv.gz")
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+        logging.info(f"[DONE] {stem} -> {final_basename}.tsv.gz")
+    else:
+        logging.error(f"[INCOMPLETE] {stem}: {results.count(False)}/{len(chunks)} chunks failed; rerun to retry")
+
+
+async def main_async(args):
+    fa_list = sorted(str(p) for p in Path(args.in_dir).glob("*.fasta"))
+    if not fa_list:
+        logging.error(f"No FASTA files found in {args.in_dir}")
+        sys.exit(1)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    os.makedirs(args.log_dir, exist_ok=True)
+    logging.info(f"Found {len(fa_list)} FASTA files; window={args.window}, chunk size={args.chunk_size}")
+
+    window = asyncio.Semaphore(args.window)
+    stats = {"submitted": 0, "skipped": 0, "retried": 0, "failed": 0}
+    await asyncio.gather(*(run_portal(f, args, window, stats) for f in fa_list))
+
+    logging.info("=== Summary ===")
+    for k, v in stats.items():
+        logging.info(f"{k.capitalize():<10}: {v}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Windowed async scheduler for cluster_interproscan")
+    ap.add_argument("--in-dir", default=CLEAN_PROTEOMES_DIR, help="Folder with *.fasta proteomes")
+    ap.add_argument("--out-dir", default=INTERPROSCAN_RESULTS_DIR, help="Folder for <portal>.tsv.gz results")
+    ap.add_argument("--log-dir", default=IPRSCAN_LOG_DIR, help="Folder for iprscan_*.submit.log files")
+    ap.add_argument("--window", type=int, default=4, help="Concurrent cluster_interproscan runs (default: 4)")
+    ap.add_argument("--chunk-size", type=int, default=20000, help="Sequences per submitted chunk (default: 20000)")
+    ap.add_argument("--retries", type=int, default=2, help="Resubmissions per failed chunk (default: 2)")
+    ap.add_argument("--max-queued", type=int, default=0,
+                    help="Also wait while squeue shows this many iprscan* jobs (0 disables)")
+    ap.add_argument("--poll", type=float, default=60, help="Seconds between log/squeue polls (default: 60)")
+    ap.add_argument("--threads", type=int, default=16, help="--cpu passed to cluster_interproscan")
+    ap.add_argument("--applications", default=IPRSCAN_APPLICATIONS)
+    ap.add_argument("--iprscan-cmd", default="cluster_interproscan")
+    ap.add_argument("--squeue-cmd", default="squeue")
+    ap.add_argument("--user", default=os.environ.get("USER") or getpass.getuser())
+    args = ap.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
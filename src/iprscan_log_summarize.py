@@ -10,76 +10,184 @@ the script extracts:
 - failed_subjobs (# of "subjob X FAILED")
 - missing_subjobs (if total is known: total - ok - failed; else empty)
 
+A log holding several attempts (iprscan-scheduler.py appends resubmissions)
+is summarized by its latest attempt, which after a piece retry covers only the
+pieces that failed before.
+
 Usage:
   python iprscan_summarize.py /path/to/folder [-o output.csv]
+  python iprscan_summarize.py /path/to/folder --watch 60 [--print]
 
 Notes:
 - If total_subjobs isn't present in a file, it's left blank in the CSV.
 - Script is robust to extra whitespace and repeated lines.
+- With --watch, the byte offset, inode and mtime of every log are remembered
+  (also across restarts, in --state) and only newly appended lines are parsed.
+  A log whose inode changes or that shrinks is parsed again from the start.
 """
 
 import argparse
 import csv
-import re
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional
 
-TOTAL_RE = re.compile(r"The job is split into\s+(\d+)\s+pieces", re.IGNORECASE)
-SUBJOB_RE = re.compile(r"subjob\s+(\d+)\s+(OK|FAILED)", re.IGNORECASE)
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def parse_log_file(p: Path) -> Dict[str, Optional[int]]:
-    portal = p.name
-    # Derive portal from filename patterns like: iprscan_<portal>.submit.log
-    # We'll remove a leading "iprscan_" and trailing ".submit.log" if present.
-    if portal.startswith("iprscan_"):
-        portal = portal[len("iprscan_"):]
-    if portal.endswith(".submit.log"):
-        portal = portal[:-len(".submit.log")]
+from src.utils.iprscanutils import SUBMIT_HEADER, parse_progress_line, portal_from_log_name
+
+FIELDNAMES = ["portal", "total_subjobs", "ok_subjobs", "failed_subjobs", "missing_subjobs", "path", "error"]
+
+def new_log_state() -> Dict:
+    return {"inode": None, "mtime": None, "offset": 0, "carry": "",
+            "total": None, "ok": 0, "failed": 0, "error": ""}
+
+def update_log_state(p: Path, state: Optional[Dict] = None) -> Dict:
+    """
+    Parse only the part of a log appended since the last call.
+
+    Args:
+        p (Path): Submit log.
+        state (dict | None): State returned by a previous call, or None to start over.
+
+    Returns:
+        dict: Updated state (running totals, offset, inode, mtime).
+    """
+    state = dict(state) if state else new_log_state()
+    try:
+        st = p.stat()
+    except OSError as e:
+        state["error"] = f"Could not read file: {e}"
+        return state
+
+    if state["inode"] != st.st_ino or st.st_size < state["offset"]:
+        # New or rewritten file: start from scratch
+        state = new_log_state()
+        state["inode"] = st.st_ino
+    elif state["mtime"] == st.st_mtime and state["offset"] == st.st_size:
+        return state
 
     try:
-        text = p.read_text(errors="ignore")
+        with p.open("rb") as f:
+            f.seek(state["offset"])
+            data = f.read()
     except Exception as e:
-        return {
-            "portal": portal,
-            "total_subjobs": None,
-            "ok_subjobs": None,
-            "failed_subjobs": None,
-            "missing_subjobs": None,
-            "error": f"Could not read file: {e}",
-            "path": str(p),
-        }
-
-    total_match = TOTAL_RE.search(text)
-    total = int(total_match.group(1)) if total_match else None
-
-    ok = 0
-    failed = 0
-
-    # Count OK / FAILED lines
-    for m in SUBJOB_RE.finditer(text):
-        status = m.group(2).upper()
-        if status == "OK":
+        state["error"] = f"Could not read file: {e}"
+        return state
+
+    state["offset"] += len(data)
+    state["mtime"] = st.st_mtime
+    state["error"] = ""
+    *lines, state["carry"] = (state["carry"] + data.decode(errors="ignore")).split("\n")
+    for line in lines:
+        if line.startswith(SUBMIT_HEADER):
+            # A resubmission appended to the log: count only the latest attempt
+            state["total"], state["ok"], state["failed"] = None, 0, 0
+            continue
+        event = parse_progress_line(line)
+        if event is None:
+            continue
+        kind, value = event
+        if kind == "total":
+            if state["total"] is None:
+                state["total"] = value
+        elif kind == "OK":
+            state["ok"] += 1
+        else:
+            state["failed"] += 1
+    return state
+
+def state_to_row(p: Path, state: Dict) -> Dict[str, Optional[int]]:
+    total, ok, failed = state["total"], state["ok"], state["failed"]
+    # The last line may be complete but not yet newline-terminated
+    event = parse_progress_line(state["carry"]) if state["carry"] else None
+    if event:
+        if event[0] == "total" and total is None:
+            total = event[1]
+        elif event[0] == "OK":
             ok += 1
-        elif status == "FAILED":
+        elif event[0] == "FAILED":
             failed += 1
-
+    if state["error"]:
+        total = ok = failed = None
     missing = None
     if total is not None:
         missing = max(total - ok - failed, 0)
 
     return {
-        "portal": portal,
+        "portal": portal_from_log_name(p.name),
         "total_subjobs": total,
         "ok_subjobs": ok,
         "failed_subjobs": failed,
         "missing_subjobs": missing,
-        "error": "",
+        "error": state["error"],
         "path": str(p),
     }
 
+def parse_log_file(p: Path) -> Dict[str, Optional[int]]:
+    return state_to_row(p, update_log_state(p))
+
 def find_logs(folder: Path) -> List[Path]:
     return sorted(folder.glob("iprscan_*.submit.log"))
 
+def write_csv(rows: List[Dict], output: Path) -> None:
+    # Write to a temp file first so readers never see a half-written CSV
+    tmp = output.with_name(output.name + ".tmp")
+    with tmp.open("w", newline="") as f:
+        w = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+    os.replace(tmp, output)
+
+def print_table(rows: List[Dict]) -> None:
+    # Minimal dependency pretty table
+    fieldnames = FIELDNAMES
+    widths = {k: len(k) for k in fieldnames}
+    for r in rows:
+        for k in fieldnames:
+            widths[k] = max(widths[k], len("" if r.get(k) is None else str(r.get(k))))
+
+    def line(char="-"):
+        print("+" + "+".join(char * (widths[k] + 2) for k in fieldnames) + "+")
+
+    def cell_row(values: List[str]):
+        print("| " + " | ".join(v.ljust(widths[fieldnames[i]]) for i, v in enumerate(values)) + " |")
+
+    line("=")
+    cell_row(fieldnames)
+    line("=")
+    for r in rows:
+        values = [str(r.get(k, "")) if r.get(k) is not None else "" for k in fieldnames]
+        cell_row(values)
+        line("-")
+
+def load_states(path: Optional[Path]) -> Dict[str, Dict]:
+    if path and path.exists():
+        try:
+            return json.loads(path.read_text())
+        except Exception:
+            print(f"Ignoring unreadable state file {path}")
+    return {}
+
+def save_states(path: Optional[Path], states: Dict[str, Dict]) -> None:
+    if not path:
+        return
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(states))
+    os.replace(tmp, path)
+
+def refresh(logs: List[Path], states: Dict[str, Dict], pool: ThreadPoolExecutor) -> List[Dict]:
+    new_states = list(pool.map(lambda p: update_log_state(p, states.get(str(p))), logs))
+    states.clear()
+    states.update({str(p): s for p, s in zip(logs, new_states)})
+    return [state_to_row(p, s) for p, s in zip(logs, new_states)]
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="Summarize InterProScan submit logs")
     ap.add_argument("folder", type=Path, default=Path("local_data/logs/iprscan_logs"),
@@ -88,45 +196,43 @@ def main() -> None:
                     help="Output CSV path (default: local_data/logs/iprscan_summary.csv)")
     ap.add_argument("--print", dest="do_print", action="store_true",
                     help="Print a pretty table to stdout")
+    ap.add_argument("--watch", type=float, default=None, metavar="SECONDS",
+                    help="Keep running and refresh the CSV (and table) every SECONDS")
+    ap.add_argument("--state", type=Path, default=None,
+                    help="JSON file with per-log offsets (default with --watch: <output>.state.json)")
+    ap.add_argument("-j", "--workers", type=int, default=8, help="Parallel log readers (default: 8)")
     args = ap.parse_args()
 
-    logs = find_logs(args.folder)
-    if not logs:
-        print(f"No files found in {args.folder} matching iprscan_*.submit.log")
-        return
-
-    rows: List[Dict[str, Optional[int]]] = [parse_log_file(p) for p in logs]
-
-    # Write CSV
-    fieldnames = ["portal", "total_subjobs", "ok_subjobs", "failed_subjobs", "missing_subjobs", "path", "error"]
-    with args.output.open("w", newline="") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
-
-    print(f"Wrote {args.output} with {len(rows)} rows.")
-
-    if args.do_print:
-        # Minimal dependency pretty table
-        widths = {k: len(k) for k in fieldnames}
-        for r in rows:
-            for k in fieldnames:
-                widths[k] = max(widths[k], len("" if r.get(k) is None else str(r.get(k))))
-
-        def line(char="-"):
-            print("+" + "+".join(char * (widths[k] + 2) for k in fieldnames) + "+")
-
-        def cell_row(values: List[str]):
-            print("| " + " | ".join(v.ljust(widths[fieldnames[i]]) for i, v in enumerate(values)) + " |")
-
-        line("=")
-        cell_row(fieldnames)
-        line("=")
-        for r in rows:
-            values = [str(r.get(k, "")) if r.get(k) is not None else "" for k in fieldnames]
-            cell_row(values)
-            line("-")
+    state_path = args.state
+    if state_path is None and args.watch:
+        state_path = args.output.with_name(args.output.name + ".state.json")
+    states = load_states(state_path)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        while True:
+            logs = find_logs(args.folder)
+            if not logs and not args.watch:
+                print(f"No files found in {args.folder} matching iprscan_*.submit.log")
+                return
+
+            rows = refresh(logs, states, pool)
+            write_csv(rows, args.output)
+            save_states(state_path, states)
+
+            if args.watch:
+                done = sum(1 for r in rows if r["missing_subjobs"] == 0 and r["total_subjobs"])
+                print(f"[{time.strftime('%H:%M:%S')}] {len(rows)} logs, {done} complete, "
+                      f"{sum(r['ok_subjobs'] or 0 for r in rows)} OK / "
+                      f"{sum(r['failed_subjobs'] or 0 for r in rows)} FAILED subjobs -> {args.output}")
+            else:
+                print(f"Wrote {args.output} with {len(rows)} rows.")
+
+            if args.do_print:
+                print_table(rows)
+
+            if not args.watch:
+                return
+            time.sleep(args.watch)
 
 if __name__ == "__main__":
     main()
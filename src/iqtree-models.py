@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Cache of IQ-TREE best-fit models to cut ModelFinder time on new gene families.
+
+Subcommands:
+  collect  add the models chosen in finished runs (<prefix>.iqtree / .log) to the cache
+  args     print the model options for one alignment (used by iqtree-par.sh):
+             mset   -m <default> -mset <matrices chosen for 95% of cached families>
+             reuse  -m <model> when the nearest families by length and amino-acid
+                    composition agree on it, otherwise as mset
+             off    -m <default>
+  query    summarize the cache, or list the families of a model / run SQL on it
+
+Usage:
+  python src/iqtree-models.py collect
+  python src/iqtree-models.py args OG0000001_mafft_trim.fa --mode reuse --default TEST
+  python src/iqtree-models.py query
+  python src/iqtree-models.py query --model LG+I+G4
+  python src/iqtree-models.py query --sql "SELECT model, AVG(n_sites) FROM families GROUP BY model"
+"""
+
+import argparse
+import os
+import shlex
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MODEL_CACHE_PATH, MODEL_SELECTION_MODE, GENE_TREES_DIR, SPECIESTREE_TRIM_DIR
+from src.utils.modelutils import open_model_cache, collect_models, model_args, learned_mset, base_matrix
+
+
+def cmd_collect(args):
+    con = open_model_cache(args.db)
+    stats = collect_models(con, args.tree_dir, args.aln_dir)
+    total = con.execute("SELECT COUNT(*) FROM families").fetchone()[0]
+    print(f"✅ {stats.get('added', 0)} runs added or updated, {stats.get('unchanged', 0)} unchanged, "
+          f"{stats.get('no_model', 0)} without a model; {total} families in {args.db}")
+
+
+def cmd_args(args):
+    con = open_model_cache(args.db, readonly=True) if os.path.isfile(args.db) else None
+    try:
+        options, note = model_args(con, args.alignment, args.mode, args.default)
+    except Exception as e:
+        # A broken cache must never stop the tree search
+        options, note = ["-m", args.default], f"full ModelFinder (cache unusable: {e})"
+    print(f"📋 {os.path.basename(args.alignment)}: {note}", file=sys.stderr)
+    print(shlex.join(options))
+
+
+def cmd_query(args):
+    con = open_model_cache(args.db, readonly=True)
+    if args.sql:
+        cur = con.execute(args.sql)
+        print("\t".join(d[0] for d in cur.description))
+        for row in cur:
+            print("\t".join("" if v is None else str(v) for v in row))
+        return
+    if args.model or args.family:
+        column, value = ("model", args.model) if args.model else ("family", args.family)
+        rows = con.execute(f"SELECT family, model, selection, n_seqs, n_sites, gap_frac FROM families "
+                           f"WHERE {column} = ? ORDER BY family", (value,)).fetchall()
+        print("family\tmodel\tselection\tn_seqs\tn_sites\tgap_frac")
+        for row in rows:
+            print("\t".join("" if v is None else str(v) for v in row))
+        return
+
+    rows = con.execute("SELECT selection, COUNT(*) FROM families GROUP BY selection").fetchall()
+    print(f"📋 {sum(n for _, n in rows)} families: " + ", ".join(f"{n} {s}" for s, n in rows))
+    matrices = {}
+    for model, n in con.execute("SELECT model, COUNT(*) FROM families GROUP BY model"):
+        matrices[base_matrix(model)] = matrices.get(base_matrix(model), 0) + n
+    print("   Matrix      families")
+    for matrix, n in sorted(matrices.items(), key=lambda kv: -kv[1]):
+        print(f"   {matrix:<11} {n:>8}")
+    mset = learned_mset(con)
+    print(f"   -mset: {','.join(mset) if mset else '(not enough ModelFinder runs yet)'}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="IQ-TREE model cache")
+    ap.add_argument("--db", default=MODEL_CACHE_PATH, help=f"Cache database (default: {MODEL_CACHE_PATH})")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("collect", help="Add finished runs to the cache")
+    p.add_argument("--tree-dir", nargs="+", default=[GENE_TREES_DIR], help="Folders with IQ-TREE outputs")
+    p.add_argument("--aln-dir", nargs="+", default=[SPECIESTREE_TRIM_DIR],
+                   help="Folders to find alignments in if the reported path moved")
+    p.set_defaults(func=cmd_collect)
+
+    p = sub.add_parser("args", help="Print the IQ-TREE model options for an alignment")
+    p.add_argument("alignment")
+    p.add_argument("--mode", choices=["off", "mset", "reuse"], default=MODEL_SELECTION_MODE,
+                   help=f"Model selection mode (default: {MODEL_SELECTION_MODE})")
+    p.add_argument("--default", default="MFP", help="ModelFinder mode for -m (default: MFP)")
+    p.set_defaults(func=cmd_args)
+
+    p = sub.add_parser("query", help="Summarize or query the cache")
+    group = p.add_mutually_exclusive_group()
+    group.add_argument("--model", help="List the families with this model")
+    group.add_argument("--family", help="Show one family")
+    group.add_argument("--sql", help="Run a read-only SQL query on the families table")
+    p.set_defaults(func=cmd_query)
+
+    args = ap.parse_args()
+    if args.command == "query" and not os.path.isfile(args.db):
+        sys.exit(f"❌ No model cache at {args.db}; run 'collect' first")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -30,17 +30,34 @@ set_file="$1"
 in_dir="$2"
 out_dir="$3"
 
-# Get the line that matches this task ID (basename with .fa)
-fname=$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")
+# Get the line that matches this task ID (basename with .fa), or the family claimed by a
+# src/workqueue.py worker (QUEUE_ITEM; set_file is then the queue folder)
+fname="${QUEUE_ITEM:-$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")}"
 in_path="$in_dir/$fname"
 base="${fname%.fa}"
 out_path="$out_dir/${base}.treefile"
 
-# skip if already aligned
-[[ -s "$out_path" ]] && { echo "Exists: $out_path — skipping."; exit 0; }
+SCRIPT_DIR="${SLURM_SUBMIT_DIR:-.}/src"
 
-echo "Running $IQTREE_BIN -s $in_path -m TEST -T $THREADS -B 1000 -alrt 1000 -pre $out_dir/$base"
-"$IQTREE_BIN" -s "$in_path" -m TEST -T $THREADS -B 1000 -alrt 1000 -pre "$out_dir/$base"
+# skip if built from the same trimmed alignment with the same options (membership stamp, src/family-plan.py)
+redo=""
+if [[ -s "$out_path" ]]; then
+  if python3 "$SCRIPT_DIR/family-plan.py" check iqtree "$in_path" "$out_path"; then
+    echo "Current: $out_path — skipping."; exit 0
+  fi
+  # Stale tree: IQ-TREE refuses to overwrite a finished run without -redo
+  redo="-redo"
+fi
+
+# Model options from the model cache (FUNGI_MODEL_SELECTION: mset, reuse or off; see src/iqtree-models.py)
+model_args=$(python3 "$SCRIPT_DIR/iqtree-models.py" args "$in_path" --default TEST) || model_args="-m TEST"
+# Options from config.IQTREE_OPTIONS, so they match the stamp
+IQTREE_OPTS=$(python3 "$SCRIPT_DIR/family-plan.py" params iqtree) || IQTREE_OPTS="-B 1000 -alrt 1000"
+
+echo "Running $IQTREE_BIN -s $in_path $model_args -T $THREADS $IQTREE_OPTS $redo -pre $out_dir/$base"
+# shellcheck disable=SC2086
+"$IQTREE_BIN" -s "$in_path" $model_args -T $THREADS $IQTREE_OPTS $redo -pre "$out_dir/$base"
+python3 "$SCRIPT_DIR/family-plan.py" stamp iqtree "$in_path" "$out_path"
 
 
 echo "Job completed!"
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Align one orthogroup with a MAFFT strategy chosen from its size.
+
+The tiers (L-INS-i, FFT-NS-i, FFT-NS-2, PartTree) and their thread counts come
+from config.MAFFT_TIERS; the choice is written next to the alignment as
+<OG>_mafft.meta.json.
+
+Usage:
+  python src/mafft-adaptive.py OG0000001.fa OG0000001_mafft.fa [--max-threads 8]
+  python src/mafft-adaptive.py --plan [local_data/speciestree/seq_files]
+"""
+
+import argparse
+import glob
+import os
+import sys
+from collections import Counter
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SPECIESTREE_SEQS_DIR, MAFFT_BIN, MAFFT_TIERS
+from src.utils.msautils import fasta_stats, choose_strategy, align_adaptive
+
+
+def plan(seq_dir: str, max_threads: int | None):
+    """
+    Print the strategy every family in seq_dir would get, without aligning.
+    """
+    files = sorted(glob.glob(os.path.join(seq_dir, "*.fa")))
+    if not files:
+        sys.exit(f"❌ No *.fa files found in {seq_dir}")
+    counts, seqs = Counter(), Counter()
+    for path in files:
+        stats = fasta_stats(path)
+        choice = choose_strategy(stats["n_seqs"], stats["mean_len"], max_threads)
+        counts[choice["strategy"]] += 1
+        seqs[choice["strategy"]] = max(seqs[choice["strategy"]], stats["n_seqs"])
+    print(f"📋 {len(files)} families in {seq_dir}")
+    for name, *_ in MAFFT_TIERS:
+        if counts[name]:
+            print(f"   {name:<9} {counts[name]:>6} families (largest: {seqs[name]} sequences)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Size-adaptive MAFFT alignment")
+    ap.add_argument("input", nargs="?", help="Unaligned FASTA (with --plan: folder, default seq_files)")
+    ap.add_argument("output", nargs="?", help="Alignment to write")
+    ap.add_argument("--max-threads", type=int, default=int(os.environ.get("SLURM_CPUS_PER_TASK", 0)) or None,
+                    help="Threads available (default: SLURM_CPUS_PER_TASK)")
+    ap.add_argument("--strategy", choices=[t[0] for t in MAFFT_TIERS], help="Force a strategy")
+    ap.add_argument("--mafft", default=MAFFT_BIN, help=f"MAFFT executable (default: {MAFFT_BIN})")
+    ap.add_argument("--plan", action="store_true", help="Only report the strategy per family")
+    args = ap.parse_args()
+
+    if args.plan:
+        plan(args.input or SPECIESTREE_SEQS_DIR, args.max_threads)
+        return
+    if not args.input or not args.output:
+        ap.error("input and output are required")
+
+    meta = align_adaptive(args.input, args.output, args.max_threads, args.strategy, args.mafft)
+    print(f"✅ {meta['input']}: {meta['strategy']} ({meta['n_seqs']} seqs, mean length {meta['mean_len']}, "
+          f"{meta['threads']} threads) in {meta['wall_s']}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
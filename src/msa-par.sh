@@ -30,17 +30,30 @@ set_file="$1"
 in_dir="$2"
 out_dir="$3"
 
-# Get the line that matches this task ID (basename with .fa)
-fname=$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")
+# Get the line that matches this task ID (basename with .fa), or the family claimed by a
+# src/workqueue.py worker (QUEUE_ITEM; set_file is then the queue folder)
+fname="${QUEUE_ITEM:-$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")}"
 in_path="$in_dir/$fname"
 base="${fname%.fa}"
 out_path="$out_dir/${base}_mafft.fa"
 
-# skip if already aligned
-[[ -s "$out_path" ]] && { echo "Exists: $out_path — skipping."; exit 0; }
-
-echo "Running: mafft --thread $THREADS --retree 2 --maxiterate 1000 $in_path > $out_path"
-mafft --thread "$THREADS" --retree 2 --maxiterate 1000 "$in_path" > "$out_path"
+SCRIPT_DIR="${SLURM_SUBMIT_DIR:-.}/src"
+
+# skip if aligned from the same members with the same options (membership stamp, src/family-plan.py)
+if [[ -s "$out_path" ]] && python3 "$SCRIPT_DIR/family-plan.py" check msa "$in_path" "$out_path"; then
+  echo "Current: $out_path — skipping."; exit 0
+fi
+
+# MSA_MODE=adaptive picks the MAFFT strategy and threads from the family size
+# (config.MAFFT_TIERS, recorded in ${base}_mafft.meta.json); MSA_MODE=fixed keeps the old command
+if [[ "${MSA_MODE:-adaptive}" == "adaptive" ]]; then
+  echo "Running: python3 $SCRIPT_DIR/mafft-adaptive.py $in_path $out_path --max-threads $THREADS"
+  python3 "$SCRIPT_DIR/mafft-adaptive.py" "$in_path" "$out_path" --max-threads "$THREADS"
+else
+  echo "Running: mafft --thread $THREADS --retree 2 --maxiterate 1000 $in_path > $out_path"
+  mafft --thread "$THREADS" --retree 2 --maxiterate 1000 "$in_path" > "$out_path"
+fi
+python3 "$SCRIPT_DIR/family-plan.py" stamp msa "$in_path" "$out_path"
 
 echo "Job completed!"
 echo "=== Job ended at $(date) ==="
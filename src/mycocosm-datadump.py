@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import logging
@@ -5,10 +6,11 @@ import logging
 # Add project root to sys.path only here
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import MYCOCOSM_FUNGI_URL, DATA_DIR
-from src.credentials import JGI_API_TOKEN
+from config import MYCOCOSM_FUNGI_URL, DATA_DIR, PROFILE_DIR, TAXONOMY_INDEX_DIR
 from src.utils.webutils import download_mycocosm_fungi_table, batch_fetch_json, parse_portal_jsons
 from src.utils.wrangleutils import find_new_proteomes,build_phylogeny_data, split_phylogeny_data, find_duplicates, check_organism_counts
+from src.utils.profileutils import stage_timer, enable_profiling, add_profile_argument
+from src.utils.taxonomyutils import load_taxonomy_index, resolve_incomplete_phylogeny
 
 # === Logging setup ===
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s: %(message)s')
@@ -20,20 +22,35 @@ PORTALS_DIR = os.path.join(MYCOCOSM_DATA_DIR, "portal_phylogeny")
 SELECTED_DIR = os.path.join(MYCOCOSM_DATA_DIR, "file_selection")
 
 NEW_PORTALS_TABLE_PATH = os.path.join(MYCOCOSM_DATA_DIR, 'mycocosm_fungi_data_new.xlsx')
+TABLE_CACHE_DIR = os.path.join(MYCOCOSM_DATA_DIR, 'table_cache')
 PORTALS_TABLE_PATH = os.path.join(MYCOCOSM_DATA_DIR, 'mycocosm_fungi_data.csv')
 MYCOCOSM_FILES_METADATA_PATH = os.path.join(MYCOCOSM_DATA_DIR, 'mycocosm_files_metadata.csv')
 
 
-# Authentication headers
-headers = {
-    "accept": "application/json",
-    "Authorization": JGI_API_TOKEN
-} 
+def api_headers() -> dict:
+    """
+    Authentication headers for the JGI API (credentials are only loaded when needed).
+    """
+    from src.credentials import JGI_API_TOKEN
+    return {
+        "accept": "application/json",
+        "Authorization": JGI_API_TOKEN
+    }
 
 if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fetch MycoCosm tables and file metadata")
+    ap.add_argument("--taxonomy-index", default=TAXONOMY_INDEX_DIR,
+                    help="Offline NCBI taxonomy index used to fill and check lineages "
+                         "(see build-taxonomy-index.py; skipped if not built)")
+    add_profile_argument(ap, PROFILE_DIR)
+    args = ap.parse_args()
+    enable_profiling(args.profile)
+
     # Fetch the table from the website wrangle it for our use
     os.makedirs(MYCOCOSM_DATA_DIR, exist_ok=True)
-    df = download_mycocosm_fungi_table(MYCOCOSM_FUNGI_URL, NEW_PORTALS_TABLE_PATH)
+    with stage_timer("datadump.download_table") as m:
+        df = download_mycocosm_fungi_table(MYCOCOSM_FUNGI_URL, NEW_PORTALS_TABLE_PATH, TABLE_CACHE_DIR)
+        m.add(items=0 if df is None else len(df))
     os.makedirs(JSON_DIR, exist_ok=True)
 
     if df is not None:
@@ -57,7 +74,9 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Fetch and parse JSON files for all published organism IDs
-    batch_fetch_json(new_organism_ids, headers, JSON_DIR)
+    with stage_timer("datadump.batch_fetch_json") as m:
+        batch_fetch_json(new_organism_ids, api_headers(), JSON_DIR)
+        m.add(items=len(new_organism_ids))
 
     metadata_df = parse_portal_jsons(organism_ids, JSON_DIR)
     # Map new_proteome from df to metadata_df using the correct column
@@ -77,7 +96,14 @@ if __name__ == "__main__":
     phylogeny_data_missing, phylogeny_data_complete, phylogeny_data_incomplete = split_phylogeny_data(
         phylogeny_data, missing_organisms
     )
-    double_phylogeny, single_phylogeny = find_duplicates(phylogeny_data_complete)
+    taxonomy = load_taxonomy_index(args.taxonomy_index)
+    if taxonomy is not None:
+        with stage_timer("datadump.resolve_lineages") as m:
+            phylogeny_data_complete, phylogeny_data_incomplete = resolve_incomplete_phylogeny(
+                phylogeny_data_complete, phylogeny_data_incomplete, taxonomy
+            )
+            m.add(items=len(phylogeny_data_complete) + len(phylogeny_data_incomplete))
+    double_phylogeny, single_phylogeny = find_duplicates(phylogeny_data_complete, taxonomy)
 
     check_organism_counts(single_phylogeny, double_phylogeny, phylogeny_data_missing, phylogeny_data_incomplete, all_organisms)
     
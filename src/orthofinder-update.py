@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Incremental OrthoFinder runs for newly added proteomes.
+
+The species set (portal + MD5 of the clean proteome) of every run is saved as
+species_manifest.csv in its Results_* directory. On the next call the clean
+proteomes are compared with the latest manifest:
+
+- nothing new            -> nothing to run
+- only new proteomes     -> add them to the previous run with -b (reusing its
+                            all-vs-all searches), or --assign them (--mode assign)
+- changed/removed ones   -> full rerun with -f
+
+Afterwards the single-copy orthogroup list and species-tree FASTAs are
+regenerated from the new results (same as filter-scog.py).
+
+Usage:
+  python src/orthofinder-update.py [--threads 20] [--mode add|assign] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import pandas as pd
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CLEAN_PROTEOMES_DIR, PROTEOMES_DIR, ORTHOFINDER_DIR, ORTHOFINDER_DONE_PATH, SPECIESTREE_SEQS_DIR
+from src.utils.wrangleutils import (
+    validate_directories, find_latest_orthofinder_results, find_single_copy_orthogroups, copy_orthogroup_fastas
+)
+
+ORTHOFINDER_CMD = "/scratch/project_2002833/VG/software/OrthoFinder/bin/orthofinder"
+NEW_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "clean_new")
+MANIFEST_NAME = "species_manifest.csv"
+
+def file_md5(path: str) -> str:
+    h = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def current_species(proteome_dir: str) -> pd.DataFrame:
+    """
+    List the clean proteomes with their MD5.
+    """
+    rows = [
+        {"species": f, "md5": file_md5(os.path.join(proteome_dir, f))}
+        for f in sorted(os.listdir(proteome_dir)) if f.endswith(".fasta")
+    ]
+    return pd.DataFrame(rows, columns=["species", "md5"])
+
+def previous_species(results_dir: str) -> pd.DataFrame | None:
+    """
+    Species of a previous run: its manifest, or SpeciesIDs.txt (without MD5s)
+    for runs made before manifests existed.
+    """
+    manifest = os.path.join(results_dir, MANIFEST_NAME)
+    if os.path.exists(manifest):
+        return pd.read_csv(manifest)
+    ids_path = os.path.join(results_dir, "WorkingDirectory", "SpeciesIDs.txt")
+    if os.path.exists(ids_path):
+        with open(ids_path) as f:
+            names = [line.split(":", 1)[1].strip() for line in f if ":" in line and not line.startswith("#")]
+        print(f"⚠️ No {MANIFEST_NAME} in {results_dir}; assuming its {len(names)} proteomes are unchanged.")
+        return pd.DataFrame({"species": names, "md5": None})
+    return None
+
+def plan_update(current: pd.DataFrame, previous: pd.DataFrame | None) -> dict:
+    """
+    Compare the current and previous species sets.
+
+    Returns:
+        dict: 'new', 'changed' and 'removed' species lists.
+    """
+    if previous is None:
+        return {"new": current["species"].tolist(), "changed": [], "removed": []}
+    prev = dict(zip(previous["species"], previous["md5"]))
+    cur = dict(zip(current["species"], current["md5"]))
+    return {
+        "new": [s for s in cur if s not in prev],
+        "changed": [s for s in cur if s in prev and pd.notna(prev[s]) and prev[s] != cur[s]],
+        "removed": [s for s in prev if s not in cur],
+    }
+
+def stage_new_proteomes(species: list, proteome_dir: str, stage_dir: str):
+    """
+    Link only the new proteomes into a separate folder for -b / --assign.
+    """
+    shutil.rmtree(stage_dir, ignore_errors=True)
+    os.makedirs(stage_dir)
+    for s in species:
+        os.symlink(os.path.abspath(os.path.join(proteome_dir, s)), os.path.join(stage_dir, s))
+
+def mark_done(results_dir: str):
+    """
+    Record the current results, so the pipeline sees the OrthoFinder stage as up to date.
+    """
+    with open(ORTHOFINDER_DONE_PATH, "w") as f:
+        f.write(results_dir + "\n")
+
+def run(cmd: list, dry_run: bool):
+    print("Running: " + " ".join(cmd))
+    if not dry_run:
+        subprocess.run(cmd, check=True)
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental OrthoFinder update")
+    ap.add_argument("--threads", type=int, default=int(os.environ.get("SLURM_CPUS_PER_TASK", 20)))
+    ap.add_argument("--mode", choices=["add", "assign"], default="add",
+                    help="add: -b (new species get full orthogroup inference); assign: --assign to existing orthogroups")
+    ap.add_argument("--orthofinder", default=ORTHOFINDER_CMD, help="OrthoFinder executable")
+    ap.add_argument("--threshold", type=float, default=0.75, help="Single-copy threshold for the species-tree set")
+    ap.add_argument("--force-full", action="store_true", help="Always rerun from scratch")
+    ap.add_argument("--dry-run", action="store_true", help="Only print the plan and commands")
+    args = ap.parse_args()
+
+    validate_directories([CLEAN_PROTEOMES_DIR])
+    current = current_species(CLEAN_PROTEOMES_DIR)
+    if current.empty:
+        sys.exit(f"❌ No FASTA files found in {CLEAN_PROTEOMES_DIR}")
+
+    latest = find_latest_orthofinder_results(ORTHOFINDER_DIR) if os.path.isdir(ORTHOFINDER_DIR) else None
+    previous = previous_species(latest) if latest else None
+    plan = plan_update(current, previous)
+    print(f"📋 Previous results: {latest or 'none'}")
+    print(f"📋 New: {len(plan['new'])}, changed: {len(plan['changed'])}, removed: {len(plan['removed'])}")
+    for key in ("changed", "removed"):
+        if plan[key]:
+            print(f"   {key}: {', '.join(plan[key])}")
+
+    common = ["-t", str(args.threads), "-a", "5"]
+    if latest is None or plan["changed"] or plan["removed"] or args.force_full:
+        print("🔁 Full OrthoFinder run.")
+        run([args.orthofinder, "-f", CLEAN_PROTEOMES_DIR, *common, "-M", "msa", "-os"], args.dry_run)
+    elif not plan["new"]:
+        print("✅ OrthoFinder results are up to date.")
+        if not args.dry_run:
+            mark_done(latest)
+        return
+    else:
+        stage_new_proteomes(plan["new"], CLEAN_PROTEOMES_DIR, NEW_PROTEOMES_DIR)
+        if args.mode == "add":
+            print(f"➕ Adding {len(plan['new'])} species to {latest}")
+            run([args.orthofinder, "-b", os.path.join(latest, "WorkingDirectory"), "-f", NEW_PROTEOMES_DIR,
+                 *common, "-M", "msa", "-os"], args.dry_run)
+        else:
+            print(f"➕ Assigning {len(plan['new'])} species to the orthogroups of {latest}")
+            run([args.orthofinder, "--assign", NEW_PROTEOMES_DIR, "--core", latest, *common], args.dry_run)
+
+    if args.dry_run:
+        return
+
+    results = find_latest_orthofinder_results(ORTHOFINDER_DIR)
+    if not results or results == latest:
+        sys.exit("❌ OrthoFinder finished but no new Results_* directory was found.")
+    current.to_csv(os.path.join(results, MANIFEST_NAME), index=False)
+    print(f"📝 Species manifest saved to {results}")
+
+    # Regenerate the single-copy list used downstream
+    orthogroups_dir = os.path.join(results, "Orthogroups")
+    names = find_single_copy_orthogroups(
+        os.path.join(orthogroups_dir, "Orthogroups.GeneCount.tsv"),
+        os.path.join(orthogroups_dir, "single_copy_orthogroups.tsv"),
+        args.threshold,
+    )
+    copy_orthogroup_fastas(names, os.path.join(results, "Orthogroup_Sequences"), SPECIESTREE_SEQS_DIR)
+    mark_done(results)
+
+if __name__ == "__main__":
+    main()
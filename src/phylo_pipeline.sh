@@ -40,6 +40,10 @@ LOGS_DIR="local_data/logs"
 # === Create output directories ===
 mkdir -p "$ALIGN_DIR" "$TRIM_DIR" "$TREE_DIR" "$LOGS_DIR"
 
+# === Step 0: Prune length outliers and in-paralogs (src/prune-families.py; families pruned before are skipped) ===
+echo "Pruning families..."
+python3 src/prune-families.py "$SEQ_DIR" --log-dir "local_data/phylogeny_analysis/prune_logs" -j "$THREADS" || echo "Families not pruned"
+
 # === Step 1: Align with MAFFT ===
 echo "Running MAFFT alignments..."
 for file in "$SEQ_DIR"/*; do
@@ -51,8 +55,9 @@ for file in "$SEQ_DIR"/*; do
     fi
     # echo "Running mafft --thread $THREADS --retree 2 --maxiterate 1000 --op 1.53 --ep 0.123  $file > $out"
     # mafft --thread $THREADS --retree 2 --maxiterate 1000 --op 1.53 --ep 0.123 "$file" > "$out"
-    echo "Running mafft --thread $THREADS --retree 2 --maxiterate 1000 $file > $out"
-    mafft --thread $THREADS --retree 2 --maxiterate 1000 "$file" > "$out"
+    # Strategy and threads follow the family size (config.MAFFT_TIERS)
+    echo "Running python3 src/mafft-adaptive.py $file $out --max-threads $THREADS"
+    python3 src/mafft-adaptive.py "$file" "$out" --max-threads "$THREADS"
 done
 
 # === Step 2: Trim alignments with trimAl ===
@@ -64,12 +69,15 @@ for file in "$ALIGN_DIR"/*; do
         echo "Skipping trimAl for $file (output exists)"
         continue
     fi
-    echo "Running $TRIMAL_BIN -in $file -gt 0.8 -cons 10 -out $out"
-    "$TRIMAL_BIN" -in "$file" -gt 0.8 -cons 10 -out "$out"
+    # -colnumbering: the kept columns, for codon alignments (src/codon-align.py)
+    echo "Running $TRIMAL_BIN -in $file -gt 0.8 -cons 10 -out $out -colnumbering > $out.cols"
+    "$TRIMAL_BIN" -in "$file" -gt 0.8 -cons 10 -out "$out" -colnumbering > "$out.cols"
 done
 
 # === Step 3: Build trees with IQ-TREE ===
 echo "Building trees from trimmed alignments..."
+# Models of earlier trees restrict ModelFinder (FUNGI_MODEL_SELECTION: mset, reuse or off; see src/iqtree-models.py)
+python3 src/iqtree-models.py collect --tree-dir "$TREE_DIR" --aln-dir "$TRIM_DIR" "$ALIGN_DIR" || echo "Model cache not updated"
 for file in "$TRIM_DIR"/*; do
     base=$(basename "$file" .fa)
     out="$TREE_DIR/$base.treefile"
@@ -77,8 +85,10 @@ for file in "$TRIM_DIR"/*; do
         echo "Skipping IQ-TREE for $file (output exists)"
         continue
     fi
-    echo "Running $IQTREE_BIN -s $file -m MFP -T $THREADS -B 1000 -alrt 1000 -pre $TREE_DIR/$base"
-    "$IQTREE_BIN" -s "$file" -m MFP -T $THREADS -B 1000 -alrt 1000 -pre "$TREE_DIR/$base"
+    model_args=$(python3 src/iqtree-models.py args "$file" --default MFP) || model_args="-m MFP"
+    echo "Running $IQTREE_BIN -s $file $model_args -T $THREADS -B 1000 -alrt 1000 -pre $TREE_DIR/$base"
+    # shellcheck disable=SC2086
+    "$IQTREE_BIN" -s "$file" $model_args -T $THREADS -B 1000 -alrt 1000 -pre "$TREE_DIR/$base"
 done
 
 # === Step 4: Build trees for septin alignments ===
@@ -90,8 +100,10 @@ for file in "$ALIGN_DIR"/*septin*; do
         echo "Skipping septin IQ-TREE for $file (output exists)"
        continue
     fi
-    echo "Running $IQTREE_BIN -s $file -m MFP -T $THREADS -B 1000 -alrt 1000 -pre $TREE_DIR/${base}_septin"
-    "$IQTREE_BIN" -s "$file" -m MFP -T $THREADS -B 1000 -alrt 1000 -pre "$TREE_DIR/${base}_septin"
+    model_args=$(python3 src/iqtree-models.py args "$file" --default MFP) || model_args="-m MFP"
+    echo "Running $IQTREE_BIN -s $file $model_args -T $THREADS -B 1000 -alrt 1000 -pre $TREE_DIR/${base}_septin"
+    # shellcheck disable=SC2086
+    "$IQTREE_BIN" -s "$file" $model_args -T $THREADS -B 1000 -alrt 1000 -pre "$TREE_DIR/${base}_septin"
 done
 
 echo "Pipeline complete!"
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Run the whole pipeline as a make-style DAG.
+
+Every stage declares its inputs and outputs; a stage runs only when an output
+is missing or older than its inputs (or an upstream stage ran). Per-orthogroup
+stages (MSA, trimming, IQ-TREE) expand to one task per file, so only new or
+changed orthogroups are recomputed.
+
+Executors:
+  local  run tasks on this machine, independent tasks concurrently (-j)
+  slurm  submit one job / job array per stage chained with --dependency=afterok
+
+Usage:
+  python src/pipeline.py --dry-run
+  python src/pipeline.py --executor local -j 8 iqtree
+  python src/pipeline.py --executor slurm --start msa
+"""
+
+import argparse
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    BASE_DIR, DATA_DIR, LOGS_DIR, PROTEOME_FILES_METADATA_PATH, PROCESSED_PROTEOMES_PATH,
+    PROTEOME_FINAL_METADATA_PATH, RENAMED_PROTEOMES_DIR, FINAL_PROTEOMES_DIR, CLEAN_PROTEOMES_DIR,
+    ORTHOFINDER_DONE_PATH, SPECIESTREE_SEQS_DIR, SPECIESTREE_ALIGN_DIR, SPECIESTREE_TRIM_DIR, GENE_TREES_DIR,
+    ASTRAL_CLEAN_TREES_DIR, CDS_SELECTION_PATH, COMPRESSED_CDS_DIR, RENAMED_CDS_DIR, SPECIESTREE_CODON_DIR,
+    TRIMAL_BIN, TRIMAL_OPTIONS, IQTREE_BIN, IQTREE_OPTIONS, SLURM_ACCOUNT, SLURM_PARTITION
+)
+from src.utils.dagutils import Rule, select_rules, plan, print_plan, run_local, run_slurm
+
+SRC_DIR = os.path.join(BASE_DIR, "src")
+PIPELINE_LOG_DIR = os.path.join(LOGS_DIR, "pipeline")
+BUSCO_SUMMARY_PATH = os.path.join(DATA_DIR, "BUSCO_results", "busco_summary.csv")
+MYCOCOSM_FILES_METADATA_PATH = os.path.join(DATA_DIR, "mycocosm_data", "mycocosm_files_metadata.csv")
+PY = sys.executable
+
+
+def script(name: str, *args: str) -> str:
+    return " ".join([PY, os.path.join(SRC_DIR, name), *args])
+
+
+def family_stale(stage: str):
+    """
+    Staleness of a family stage from its membership stamps (src/family-plan.py)
+    rather than mtimes: filter_scog rewrites every family FASTA, so an mtime
+    check would realign and retree unchanged families on every run.
+    """
+    def stale(path, output):
+        from src.utils.stamputils import RERUN_STATES, family_status
+        return family_status(stage, path, output) in RERUN_STATES
+    return stale
+
+
+RULES = [
+    Rule("datadump", script("mycocosm-datadump.py"),
+         outputs=[MYCOCOSM_FILES_METADATA_PATH], time="04:00:00"),
+    Rule("process_seqs", script("process-seq-files.py"),
+         inputs=[PROTEOME_FILES_METADATA_PATH], outputs=[PROCESSED_PROTEOMES_PATH],
+         deps=["datadump"], time="04:00:00"),
+    Rule("filter_final", f"bash {os.path.join(SRC_DIR, 'filter-final-proteomes.sh')}",
+         inputs=[PROTEOME_FINAL_METADATA_PATH, PROCESSED_PROTEOMES_PATH], outputs=[FINAL_PROTEOMES_DIR],
+         deps=["process_seqs"]),
+    Rule("cleanup_seqs", script("cleanup-seq-files.py"),
+         inputs=[FINAL_PROTEOMES_DIR], outputs=[CLEAN_PROTEOMES_DIR], deps=["filter_final"]),
+    # Per-proteome array that skips finished proteomes; WAIT=1 blocks until it ends
+    Rule("busco", f"WAIT=1 bash {os.path.join(SRC_DIR, 'batch-BUSCO-sharded.sh')} && "
+                  + script("process_busco_results.py", "-j", "{threads}"),
+         inputs=[RENAMED_PROTEOMES_DIR], outputs=[BUSCO_SUMMARY_PATH],
+         deps=["process_seqs"], threads=8, mem="16G", time="24:00:00"),
+    Rule("orthofinder", script("orthofinder-update.py", "--threads", "{threads}"),
+         inputs=[CLEAN_PROTEOMES_DIR], outputs=[ORTHOFINDER_DONE_PATH],
+         deps=["cleanup_seqs"], threads=20, mem="64G", time="72:00:00"),
+    Rule("filter_scog", script("filter-scog.py"),
+         inputs=[ORTHOFINDER_DONE_PATH], outputs=[SPECIESTREE_SEQS_DIR], deps=["orthofinder"]),
+    # Family stages stamp their outputs and rerun only families whose stamp no longer matches
+    Rule("msa", script("mafft-adaptive.py", "{input}", "{output}", "--max-threads", "{threads}")
+                + " && " + script("family-plan.py", "stamp", "msa", "{input}", "{output}"),
+         foreach=os.path.join(SPECIESTREE_SEQS_DIR, "*.fa"),
+         out=os.path.join(SPECIESTREE_ALIGN_DIR, "{stem}_mafft.fa"),
+         deps=["filter_scog"], threads=8, mem="64G", stale=family_stale("msa")),
+    Rule("trim", f"{TRIMAL_BIN} -in {{input}} {TRIMAL_OPTIONS} -out {{output}} -colnumbering > {{output}}.cols && "
+                 + script("family-plan.py", "stamp", "trim", "{input}", "{output}"),
+         foreach=os.path.join(SPECIESTREE_ALIGN_DIR, "*_mafft.fa"),
+         out=os.path.join(SPECIESTREE_TRIM_DIR, "{stem}_trim.fa"),
+         deps=["msa"], time="00:15:00", stale=family_stale("trim")),
+    Rule("iqtree", f"{IQTREE_BIN} -s {{input}} $({script('iqtree-models.py', 'args', '{input}', '--default', 'TEST')}) "
+                   f"-T {{threads}} {IQTREE_OPTIONS} "
+                   f"-pre {os.path.join(GENE_TREES_DIR, '{stem}')} -redo && "
+                   + script("family-plan.py", "stamp", "iqtree", "{input}", "{output}"),
+         foreach=os.path.join(SPECIESTREE_TRIM_DIR, "*_trim.fa"),
+         out=os.path.join(GENE_TREES_DIR, "{stem}.treefile"),
+         deps=["trim"], threads=4, mem="8G", time="04:00:00", stale=family_stale("iqtree")),
+    Rule("process_cds", script("process-cds-files.py", "-j", "{threads}"),
+         inputs=[CDS_SELECTION_PATH, COMPRESSED_CDS_DIR], outputs=[RENAMED_CDS_DIR],
+         deps=["datadump"], threads=8, time="04:00:00"),
+    Rule("codon_align", script("codon-align.py", "{input}", "{output}"),
+         foreach=os.path.join(SPECIESTREE_TRIM_DIR, "*_trim.fa"),
+         out=os.path.join(SPECIESTREE_CODON_DIR, "{stem}_codon.fa"),
+         deps=["trim", "process_cds"], time="00:15:00"),
+    Rule("clean_trees", script("iqtree-models.py", "collect") + " && " + script("cleanup-trees-par.py"),
+         inputs=[GENE_TREES_DIR], outputs=[ASTRAL_CLEAN_TREES_DIR], deps=["iqtree"]),
+]
+
+
+def main():
+    names = [r.name for r in RULES]
+    ap = argparse.ArgumentParser(description="Make-style pipeline runner")
+    ap.add_argument("targets", nargs="*", help=f"Stages to bring up to date (default: all): {', '.join(names)}")
+    ap.add_argument("--executor", choices=["local", "slurm"], default="local")
+    ap.add_argument("-j", "--jobs", type=int, default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)),
+                    help="Concurrent tasks for the local executor")
+    ap.add_argument("--start", nargs="+", choices=names,
+                    help="Only run these stages and everything downstream of them")
+    ap.add_argument("--force", nargs="+", default=[], choices=names, help="Rerun these stages even if up to date")
+    ap.add_argument("--max-array", type=int, default=int(os.environ.get("MAX_ARRAY_SIZE", 380)),
+                    help="Largest SLURM array; bigger stages run several tasks per element")
+    ap.add_argument("--dry-run", action="store_true", help="Only show what would run")
+    args = ap.parse_args()
+    unknown = [t for t in args.targets if t not in names]
+    if unknown:
+        ap.error(f"unknown stage(s): {', '.join(unknown)}")
+
+    rules = select_rules(RULES, targets=args.targets, start=args.start)
+    print("📋 Pipeline plan:")
+    print_plan(plan(rules, force=args.force))
+
+    if args.executor == "slurm":
+        # run_slurm appends '--start <deferred rules>'; those lie downstream of args.start, so the
+        # continuation keeps its restriction, and --force still covers forced rules that were deferred
+        continuation = script("pipeline.py", "--executor", "slurm", "--max-array", str(args.max_array),
+                              *args.targets, *(["--force", *args.force] if args.force else []))
+        job_ids = run_slurm(rules, PIPELINE_LOG_DIR, SLURM_ACCOUNT, SLURM_PARTITION, continuation,
+                            max_array=args.max_array, dry_run=args.dry_run, force=args.force)
+        # Rules left to the continuation job share its id
+        submitted = {v for v in job_ids.values() if v}
+        print(f"✅ Submitted {len(submitted)} job(s)" + (" (dry run)" if args.dry_run else ""))
+        return
+    if args.dry_run:
+        return
+
+    status = run_local(rules, args.jobs, PIPELINE_LOG_DIR, force=args.force)
+    failed = [n for n, s in status.items() if s in ("failed", "skipped")]
+    if failed:
+        sys.exit(f"❌ Not completed: {', '.join(failed)} (logs in {PIPELINE_LOG_DIR})")
+    print("✅ Pipeline up to date.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Rename the CDS files of the selected portals for codon alignments.
+
+The CDS selected by mycocosm-datadump.py (file_selection/cds_files_all.csv,
+Filtered Models "best") are expected in cds/compressed/ under their JGI file
+names, downloaded like the proteomes; the ones still missing are listed in
+cds/missing_cds_files.csv with their file ids. Each present file is streamed
+straight into cds/renamed/<portal>.fasta.gz with the same jgi|Portal|ID|model
+-> Portal-ID headers as the proteomes, as indexed BGZF (.fai/.gzi) so that
+codon-align.py can fetch single CDS. Portals renamed before are skipped.
+
+Usage:
+  python src/process-cds-files.py [--selection cds_files_all.csv] [-j 8] [--force]
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import PROFILE_DIR, CDS_DIR, CDS_SELECTION_PATH, COMPRESSED_CDS_DIR, RENAMED_CDS_DIR
+from src.utils.wrangleutils import stream_rename_fasta
+from src.utils.profileutils import stage_timer, enable_profiling, add_profile_argument
+
+CDS_LOG_PATH = os.path.join(CDS_DIR, "processed_cds_log.csv")
+MISSING_CDS_PATH = os.path.join(CDS_DIR, "missing_cds_files.csv")
+
+
+def main():
+    import pandas as pd
+
+    ap = argparse.ArgumentParser(description="Stream-rename MycoCosm CDS files to indexed BGZF")
+    ap.add_argument("--selection", default=CDS_SELECTION_PATH,
+                    help=f"CDS file selection from the datadump (default: {CDS_SELECTION_PATH})")
+    ap.add_argument("--force", action="store_true", help="Rename again portals renamed before")
+    ap.add_argument("-j", "--workers", type=int,
+                    default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    add_profile_argument(ap, PROFILE_DIR)
+    args = ap.parse_args()
+    enable_profiling(args.profile)
+
+    if not os.path.exists(args.selection):
+        sys.exit(f"❌ No CDS selection at {args.selection}; run mycocosm-datadump.py first")
+    selection = pd.read_csv(args.selection, dtype=str).dropna(subset=["organism", "file_name"])
+    selection = selection.drop_duplicates("organism")
+    os.makedirs(COMPRESSED_CDS_DIR, exist_ok=True)
+    os.makedirs(RENAMED_CDS_DIR, exist_ok=True)
+
+    present = selection["file_name"].map(lambda name: os.path.isfile(os.path.join(COMPRESSED_CDS_DIR, name)))
+    missing = selection[~present]
+    missing[["organism", "file_name", "file_id", "md5sum"]].to_csv(MISSING_CDS_PATH, index=False)
+    if len(missing):
+        print(f"⚠️ {len(missing)} of {len(selection)} CDS files not in {COMPRESSED_CDS_DIR}; listed in {MISSING_CDS_PATH}")
+    else:
+        print("✅ All expected CDS files are present.")
+
+    jobs = {}
+    for portal, name in selection.loc[present, ["organism", "file_name"]].itertuples(index=False):
+        out_path = os.path.join(RENAMED_CDS_DIR, f"{portal}.fasta.gz")
+        if args.force or not os.path.exists(out_path + ".fai"):
+            jobs[portal] = (os.path.join(COMPRESSED_CDS_DIR, name), out_path)
+    if not jobs:
+        print(f"✅ Nothing to rename in {RENAMED_CDS_DIR} (use --force to rename again)")
+        return
+
+    log_data = []
+    with stage_timer("process_cds.rename") as m:
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            futs = {ex.submit(stream_rename_fasta, *paths): portal for portal, paths in jobs.items()}
+            for fut in as_completed(futs):
+                portal = futs[fut]
+                try:
+                    entry = fut.result()
+                except Exception as e:
+                    print(f"❌ Failed to rename {jobs[portal][0]}: {e}")
+                    continue
+                print(f"✅ Renamed {entry['renamed_sequences']}/{entry['total_sequences']} headers in: "
+                      f"{jobs[portal][1]}")
+                log_data.append({"portal": portal, **entry})
+        m.add(items=sum(entry["total_sequences"] for entry in log_data), files=len(log_data))
+    if not log_data:
+        sys.exit(f"❌ All {len(jobs)} CDS files failed to rename; {CDS_LOG_PATH} left unchanged")
+
+    log_df = pd.DataFrame(log_data)
+    if os.path.exists(CDS_LOG_PATH):
+        previous = pd.read_csv(CDS_LOG_PATH, dtype={"portal": str})
+        log_df = pd.concat([previous[~previous["portal"].isin(log_df["portal"])], log_df], ignore_index=True)
+    log_df.to_csv(CDS_LOG_PATH, index=False)
+    print(f"📝 Log saved to: {CDS_LOG_PATH}")
+
+
+if __name__ == "__main__":
+    main()
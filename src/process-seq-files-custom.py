@@ -8,6 +8,8 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import PROTEOMES_DIR, PROCESSED_PROTEOMES_PATH, RENAMED_PROTEOMES_DIR
+from src.utils.sequtils import open_text
+from src.utils.storageutils import proteome_suffix, write_seqrecords
 
 # -----------------------------
 # Configuration
@@ -35,14 +37,15 @@ for _, row in df.iterrows():
         print(f"❌ File not found: {input_path}")
         continue
 
-    output_path = os.path.join(RENAMED_PROTEOMES_DIR, f"{portal}.fasta")
+    output_path = os.path.join(RENAMED_PROTEOMES_DIR, f"{portal}{proteome_suffix()}")
     renamed_count = 0
     total = 0
     first_before = ""
     first_after = ""
 
     try:
-        records = list(SeqIO.parse(input_path, "fasta"))
+        with open_text(input_path) as f:
+            records = list(SeqIO.parse(f, "fasta"))
         total = len(records)
 
         for i, record in enumerate(records):
@@ -69,7 +72,7 @@ for _, row in df.iterrows():
             if i == 0:
                 first_after = record.id
 
-        SeqIO.write(records, output_path, "fasta")
+        write_seqrecords(output_path, records)
         print(f"✅ {portal}: Renamed {renamed_count}/{total} → {output_path}")
 
         log_data.append({
@@ -1,3 +1,4 @@
+import argparse
 import os
 import pandas as pd
 import sys
@@ -5,8 +6,9 @@ import sys
 # Add project root to sys.path only here
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import PROTEOMES_DIR, PROTEOME_FILES_METADATA_PATH, PROCESSED_PROTEOMES_PATH, RENAMED_PROTEOMES_DIR
+from config import PROFILE_DIR, PROTEOMES_DIR, PROTEOME_FILES_METADATA_PATH, PROCESSED_PROTEOMES_PATH, RENAMED_PROTEOMES_DIR
 from src.utils.wrangleutils import validate_directories, find_missing_files, rename_fasta_headers, extract_files
+from src.utils.profileutils import stage_timer, enable_profiling, add_profile_argument
 
 COMPRESSED_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "compressed")
 EXTRACTED_PROTEOMES_DIR = os.path.join(PROTEOMES_DIR, "extracted")
@@ -16,6 +18,10 @@ PROTEOME_LOG_PATH = os.path.join(PROTEOMES_DIR, "processed_proteomes_log.csv")
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Extract and rename MycoCosm proteomes")
+    add_profile_argument(ap, PROFILE_DIR)
+    enable_profiling(ap.parse_args().profile)
+
     validate_directories([PROTEOMES_DIR, COMPRESSED_PROTEOMES_DIR])
     os.makedirs(EXTRACTED_PROTEOMES_DIR, exist_ok=True)
     os.makedirs(RENAMED_PROTEOMES_DIR, exist_ok=True)
@@ -29,8 +35,12 @@ def main():
         sys.exit(f"❌ Missing files: {missing_str}")
     else:
         print("✅ All expected files are present.")
-    proteome_data["extracted_file"] = extract_files(proteome_data, COMPRESSED_PROTEOMES_DIR, EXTRACTED_PROTEOMES_DIR)
-    renamed_file_column, log_data = rename_fasta_headers(proteome_data, RENAMED_PROTEOMES_DIR)
+    with stage_timer("process_seqs.extract_files") as m:
+        proteome_data["extracted_file"] = extract_files(proteome_data, COMPRESSED_PROTEOMES_DIR, EXTRACTED_PROTEOMES_DIR)
+        m.add(items=len(proteome_data), files=len(proteome_data))
+    with stage_timer("process_seqs.rename_fasta_headers") as m:
+        renamed_file_column, log_data = rename_fasta_headers(proteome_data, RENAMED_PROTEOMES_DIR)
+        m.add(items=sum(entry["total_sequences"] for entry in log_data), files=len(log_data))
     proteome_data["renamed_file"] = renamed_file_column
     proteome_data.to_csv(PROCESSED_PROTEOMES_PATH, index=False)
     print(f"📁 Updated CSV: {PROCESSED_PROTEOMES_PATH}")
@@ -1,109 +1,79 @@
 import os
 import sys
-import re
-import json
-import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 
 # Add project root to sys.path only here
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config import DATA_DIR, PROTEOME_FILES_METADATA_PATH
-from src.utils.wrangleutils import validate_directories, find_missing_files, case_get
+from src.utils.wrangleutils import validate_directories, find_missing_files
+from src.utils.buscoutils import (
+    find_summary_json, find_full_table, parse_busco_json, parse_full_table,
+    build_marker_matrix, save_marker_matrix, marker_occupancy
+)
 
 BUSCO_DIR = os.path.join(DATA_DIR, "BUSCO_results")
 BUSCO_RES_DIR = os.path.join(BUSCO_DIR, "busco_renamed")
 OUT_CSV = os.path.join(BUSCO_DIR, "busco_summary.csv")
+MATRIX_PATH = os.path.join(BUSCO_DIR, "busco_marker_matrix.npz")
+OCCUPANCY_CSV = os.path.join(BUSCO_DIR, "busco_marker_occupancy.csv")
 
-def find_summary_json(folder: str) -> str | None:
+def process_portal(portal: str) -> tuple:
     """
-    Find the most recently modified BUSCO summary JSON file in a folder.
+    Parse the short summary and full table of one portal's BUSCO folder.
 
     Args:
-        folder (str): Path to the BUSCO result folder.
+        portal (str): Portal name.
 
     Returns:
-        str | None: Path to the freshest short_summary*.json file, or None if not found.
+        tuple:
+            dict | None: Summary record, or None if no summary JSON was found.
+            dict: Marker id -> status code (empty if no full table was found).
     """
-    candidates = glob.glob(os.path.join(folder, "short_summary*.json"))
-    if not candidates:
-        return None
-    candidates.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-    return candidates[0]
+    results_path = os.path.join(BUSCO_RES_DIR, portal + ".fasta")
+    json_path = find_summary_json(results_path)
 
-def parse_busco_json(json_path: str) -> dict:
-    """
-    Parse a BUSCO summary JSON file and extract relevant metrics.
-
-    Args:
-        json_path (str): Path to the BUSCO summary JSON file.
+    record = None
+    if json_path:
+        try:
+            record = parse_busco_json(json_path)
+        except Exception as e:
+            record = {
+                "portal": portal,
+                "portal_fasta": f"{portal}.fasta",
+                "error": f"Failed to parse JSON: {e}",
+                "_source": "json",
+                "summary_path": str(json_path),
+            }
 
-    Returns:
-        dict: Dictionary of parsed BUSCO metrics and metadata.
-    """
-    with open(json_path, "r") as f:
-        data = json.load(f)
-
-    results  = data.get("results", {})
-    lineage  = data.get("lineage_dataset", {})
-    params   = data.get("parameters", {})
-    versions = data.get("versions", {})
-
-    # portal name from file like: short_summary.<stuff>.<portal>.fasta.json
-    base = os.path.basename(json_path)
-    m = re.search(r"short_summary\..*?\.\..*?\.(?P<portal>.+?)\.fasta\.json$", base)
-    portal = m.group("portal") if m else None
-    if not portal:
-        # fallback: derive from parent folder name ending with ".fasta"
-        parent = os.path.basename(os.path.dirname(json_path))
-        portal = parent[:-6] if parent.endswith(".fasta") else parent
-
-    rec = {
-        "portal": portal,
-        "portal_fasta": f"{portal}.fasta" if portal else None,
-        "one_line_summary": case_get(results, "one_line_summary"),
-
-        # Percentages
-        "complete_pct":     case_get(results, "Complete percentage", "C"),
-        "single_copy_pct":  case_get(results, "Single copy percentage", "S"),
-        "duplicated_pct":   case_get(results, "Multi copy percentage", "D", "Duplicated percentage"),
-        "fragmented_pct":   case_get(results, "Fragmented percentage", "F"),
-        "missing_pct":      case_get(results, "Missing percentage", "M"),
-
-        # Counts
-        "complete_n":       case_get(results, "Complete BUSCOs"),
-        "single_copy_n":    case_get(results, "Single copy BUSCOs"),
-        "duplicated_n":     case_get(results, "Multi copy BUSCOs", "Duplicated BUSCOs"),
-        "fragmented_n":     case_get(results, "Fragmented BUSCOs"),
-        "missing_n":        case_get(results, "Missing BUSCOs"),
-        "n_markers":        case_get(results, "n_markers", "n"),
-        "domain":           case_get(results, "domain"),
-
-        # Useful metadata (optional but nice to have)
-        "lineage":               case_get(lineage, "name"),
-        "lineage_n_markers":     case_get(lineage, "number_of_buscos"),
-        "lineage_species":       case_get(lineage, "number_of_species"),
-        "lineage_creation_date": case_get(lineage, "creation_date"),
-        "busco_version":         case_get(versions, "busco"),
-        "python_version":        ".".join(map(str, case_get(versions, "python", default=[]))) if case_get(versions, "python", default=[]) else None,
-        "input_path":            case_get(params, "in"),
-        "main_out":              case_get(params, "main_out"),
-        "summary_path":          str(json_path),
-        "_source":               "json",
-    }
-    return rec
+    statuses = {}
+    table_path = find_full_table(results_path)
+    if table_path:
+        try:
+            statuses = parse_full_table(table_path)
+        except Exception as e:
+            print(f"⚠️ Failed to parse {table_path}: {e}")
+    return record, statuses
 
 def main():
+    ap = argparse.ArgumentParser(description="Aggregate BUSCO summaries and full tables")
+    ap.add_argument("-j", "--workers", type=int,
+                    default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)),
+                    help="Number of parallel workers (default: SLURM_CPUS_PER_TASK or all cores)")
+    args = ap.parse_args()
+
     validate_directories([BUSCO_DIR, BUSCO_RES_DIR])
 
     proteome_data = pd.read_csv(PROTEOME_FILES_METADATA_PATH)
     portal_ids = proteome_data["portal"].dropna().astype(str).tolist()
 
     expected_folders = [pid + ".fasta" for pid in portal_ids]
-    busco_folder_list = [
-        f for f in os.listdir(BUSCO_RES_DIR)
-        if f.endswith(".fasta") and os.path.isdir(os.path.join(BUSCO_RES_DIR, f))
-    ]
+    busco_folder_list = {
+        e.name for e in os.scandir(BUSCO_RES_DIR)
+        if e.name.endswith(".fasta") and e.is_dir()
+    }
 
     missing_folders = find_missing_files(expected_folders, busco_folder_list)
     if missing_folders:
@@ -112,26 +82,16 @@ def main():
     else:
         print("✅ All expected folders are present.")
 
-    records, missing_json = [], []
-
-    for portal in portal_ids:
-        results_path = os.path.join(BUSCO_RES_DIR, portal + ".fasta")
-        json_path = find_summary_json(results_path)
+    records, missing_json, portal_statuses = [], [], {}
 
-        if not json_path or not os.path.exists(json_path):
-            missing_json.append(portal)
-            continue
-
-        try:
-            records.append(parse_busco_json(json_path))
-        except Exception as e:
-            records.append({
-                "portal": portal,
-                "portal_fasta": f"{portal}.fasta",
-                "error": f"Failed to parse JSON: {e}",
-                "_source": "json",
-                "summary_path": str(json_path),
-            })
+    with ProcessPoolExecutor(max_workers=args.workers) as ex:
+        for portal, (record, statuses) in zip(portal_ids, ex.map(process_portal, portal_ids, chunksize=16)):
+            if record is None:
+                missing_json.append(portal)
+            else:
+                records.append(record)
+            if statuses:
+                portal_statuses[portal] = statuses
 
     df = pd.DataFrame.from_records(records)
     if not df.empty:
@@ -142,6 +102,15 @@ def main():
     else:
         print("⚠️ No BUSCO summaries parsed.")
 
+    if portal_statuses:
+        matrix, portals, markers = build_marker_matrix(portal_statuses)
+        save_marker_matrix(MATRIX_PATH, matrix, portals, markers)
+        marker_occupancy(matrix, markers).to_csv(OCCUPANCY_CSV, index=False)
+        print(f"✅ Marker matrix {matrix.shape[0]} portals x {matrix.shape[1]} markers -> {MATRIX_PATH}")
+        print(f"✅ Marker occupancy -> {OCCUPANCY_CSV}")
+    else:
+        print("⚠️ No BUSCO full tables parsed.")
+
     if missing_json:
         print(f"⚠️ No summary JSON found for {len(missing_json)} portals:")
         print(", ".join(missing_json))
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Prune orthogroup FASTAs before alignment.
+
+Drops sequences whose length is far from the family median (fragments,
+fusions) and keeps one copy per portal in multi-copy families, the one
+closest to the family k-mer consensus; optionally caps the family size.
+The removed sequences of each family are listed in <log dir>/<OG>.removed.tsv
+and the counts in <log dir>/prune_summary.tsv. filter-scog.py runs this on
+the families it copies; use this script for other folders or other settings.
+
+Usage:
+  python src/prune-families.py [local_data/speciestree/seq_files] [-o pruned_dir] [-j 8]
+  python src/prune-families.py seq_files --max-ratio 1.5 --max-seqs 500 --force
+"""
+
+import argparse
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    SPECIESTREE_SEQS_DIR, PRUNE_LOG_DIR, PRUNE_MIN_LENGTH_RATIO, PRUNE_MAX_LENGTH_RATIO, PRUNE_KMER, PRUNE_MAX_SEQS
+)
+from src.utils.profileutils import stage_timer
+from src.utils.familyutils import prune_families
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-alignment pruning of orthogroup FASTAs")
+    ap.add_argument("input", nargs="?", default=SPECIESTREE_SEQS_DIR,
+                    help=f"Folder of *.fa families (default: {SPECIESTREE_SEQS_DIR})")
+    ap.add_argument("-o", "--output", help="Folder of the pruned families (default: prune in place)")
+    ap.add_argument("--log-dir", default=PRUNE_LOG_DIR, help=f"Removal logs (default: {PRUNE_LOG_DIR})")
+    ap.add_argument("--min-ratio", type=float, default=PRUNE_MIN_LENGTH_RATIO,
+                    help=f"Minimum length / family median (default: {PRUNE_MIN_LENGTH_RATIO})")
+    ap.add_argument("--max-ratio", type=float, default=PRUNE_MAX_LENGTH_RATIO,
+                    help=f"Maximum length / family median (default: {PRUNE_MAX_LENGTH_RATIO})")
+    ap.add_argument("--keep-paralogs", action="store_true", help="Keep every copy per portal (e.g. for ASTRAL-Pro)")
+    ap.add_argument("--max-seqs", type=int, default=PRUNE_MAX_SEQS,
+                    help=f"Cap on the family size, 0 = none (default: {PRUNE_MAX_SEQS})")
+    ap.add_argument("-k", type=int, default=PRUNE_KMER, help=f"k-mer length (default: {PRUNE_KMER})")
+    ap.add_argument("--force", action="store_true", help="Prune again families pruned before")
+    ap.add_argument("-j", "--workers", type=int,
+                    default=int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1)))
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.input):
+        sys.exit(f"❌ No such folder: {args.input}")
+    with stage_timer("prune_families") as m:
+        summaries = prune_families(args.input, args.output or args.input, args.log_dir, force=args.force,
+                                   workers=args.workers, min_ratio=args.min_ratio, max_ratio=args.max_ratio,
+                                   one_per_portal=not args.keep_paralogs, max_seqs=args.max_seqs, k=args.k)
+        m.add(items=len(summaries))
+    if not summaries:
+        print(f"✅ Nothing to prune in {args.input} (use --force to prune again)")
+        return
+    n_in = sum(s["n_in"] for s in summaries)
+    n_out = sum(s["n_out"] for s in summaries)
+    removed = {r: sum(s[r] for s in summaries) for r in ("short", "long", "paralog", "capped")}
+    print(f"✅ {len(summaries)} families: {n_in} -> {n_out} sequences "
+          f"({', '.join(f'{v} {r}' for r, v in removed.items() if v) or 'none removed'})")
+    small = [s["family"] for s in summaries if s["n_out"] < 4]
+    if small:
+        print(f"⚠️ {len(small)} families have fewer than 4 sequences left, e.g. {', '.join(small[:5])}")
+    print(f"📝 Removed sequences per family in: {args.log_dir}")
+
+
+if __name__ == "__main__":
+    main()
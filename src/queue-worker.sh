@@ -0,0 +1,26 @@
+#!/bin/bash -l
+#SBATCH --account=project_2002833
+#SBATCH --job-name=queue_worker
+#SBATCH --output=local_data/logs/queue_worker/%x_%A_%a.out
+#SBATCH --error=local_data/logs/queue_worker/%x_%A_%a.stderr
+#SBATCH --time=3-00:00:00
+#SBATCH --nodes=1
+#SBATCH --ntasks=1
+#SBATCH --cpus-per-task=1
+#SBATCH --mem-per-cpu=1G
+#SBATCH --partition=small
+
+# One worker of a pool submitted by `src/workqueue.py submit`: claims families from the
+# queue until it is drained; each family runs the stage's *-par.sh (see the queue's queue.json)
+
+set -euo pipefail
+
+echo "=== Worker started at $(date) ==="
+echo "SLURM job ID: $SLURM_JOB_ID (worker ${SLURM_ARRAY_TASK_ID:-1})"
+echo "Working dir: $(pwd)"
+
+queue_dir="$1"
+
+python3 "${SLURM_SUBMIT_DIR:-.}/src/workqueue.py" work "$queue_dir"
+
+echo "=== Worker ended at $(date) ==="
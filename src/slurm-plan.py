@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Right-size SLURM array tasks from their input size, and check the sizing against sacct.
+
+submit  size every pending input of a launcher's set file (sequences x residues
+        for FASTA, taxa x sites for alignments), predict cpus / memory / time
+        with the stage's cost model, group the tasks into a few resource classes
+        and submit one array per class (used by batch-msa.sh, batch-trim.sh and
+        batch-iqtree.sh). Every task is logged to logs/slurm_plans.jsonl. Exits 1
+        if nothing was submitted and 3 if an sbatch failed after some classes
+        were submitted (the launchers then must not submit the full array).
+report  join the logged requests with sacct usage and summarize per stage and
+        class (time / memory / CPU efficiency, timeouts and OOM kills).
+fit     refit the cost models from the report (log-log regression per stage).
+
+Usage:
+  python src/slurm-plan.py submit msa <set file> <in dir> <out dir> --script src/msa-par.sh [--dry-run]
+  python src/slurm-plan.py report [--stage iqtree] [--days 30]
+  python src/slurm-plan.py fit
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import (
+    SLURM_PLAN_LOG_PATH, SLURM_USAGE_PATH, SLURM_RESOURCE_MODELS_PATH, SLURM_RESOURCE_CLASSES
+)
+from src.utils.slurmutils import (
+    STAGE_INPUTS, USAGE_COLUMNS, input_size, load_models, task_resources, resource_classes, slurm_time,
+    sacct_usage, fit_models
+)
+
+# Exit status of `submit` when some classes were submitted before an sbatch failed
+PARTIAL_EXIT = 3
+
+
+def cmd_submit(args):
+    with open(args.set_file) as f:
+        names = [line.strip() for line in f if line.strip()][:args.max_tasks or None]
+    if not names:
+        sys.exit(f"❌ No pending inputs in {args.set_file}")
+    models = load_models()
+    tasks = []
+    for name in names:
+        size = input_size(os.path.join(args.in_dir, name), STAGE_INPUTS[args.stage])
+        tasks.append({"input": name, "size": size, **task_resources(args.stage, size, models)})
+    classes = resource_classes(tasks, args.classes)
+
+    stem = os.path.splitext(args.set_file)[0]
+    submitted_classes = 0
+    for k, cls in enumerate(classes, 1):
+        class_file = f"{stem}.class{k}.txt"
+        with open(class_file, "w") as f:
+            f.write("".join(t["input"] + "\n" for t in cls["tasks"]))
+        cmd = ["sbatch", "--parsable", f"--array=1-{len(cls['tasks'])}%{args.concurrent}",
+               f"--cpus-per-task={cls['cpus']}", f"--mem-per-cpu={cls['mem_per_cpu_mb']}M",
+               f"--time={slurm_time(cls['time_s'])}", args.script, class_file, args.in_dir, args.out_dir]
+        print(f"📋 class {k}: {len(cls['tasks'])} tasks, {cls['cpus']} cpus, "
+              f"{cls['cpus'] * cls['mem_per_cpu_mb'] / 1024:.1f}G, {slurm_time(cls['time_s'])}")
+        if args.dry_run:
+            print("      " + " ".join(cmd))
+            continue
+        try:
+            job_id = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip().split(";")[0]
+        except (OSError, subprocess.CalledProcessError) as e:
+            detail = e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) and e.stderr else e
+            print(f"❌ sbatch failed for class {k}: {detail}")
+            if not submitted_classes:
+                sys.exit(1)
+            # The launcher must not fall back to one full array: these classes are queued already
+            print(f"⚠️ {submitted_classes}/{len(classes)} classes submitted; rerun the launcher for the rest")
+            sys.exit(PARTIAL_EXIT)
+        submitted_classes += 1
+        print(f"✅ Submitted job {job_id}")
+        # Logged per class, so the classes that went through are in the log even if a later one fails
+        submitted = datetime.now().isoformat(timespec="seconds")
+        os.makedirs(os.path.dirname(SLURM_PLAN_LOG_PATH), exist_ok=True)
+        with open(SLURM_PLAN_LOG_PATH, "a") as f:
+            f.writelines(json.dumps({"stage": args.stage, "job_id": job_id, "task": i, "class": k,
+                                     "input": t["input"], "size": t["size"], "x": t["x"], "cpus": cls["cpus"],
+                                     "mem_mb": cls["cpus"] * cls["mem_per_cpu_mb"], "time_s": cls["time_s"],
+                                     "submitted": submitted}) + "\n"
+                         for i, t in enumerate(cls["tasks"], 1))
+        time.sleep(1)
+
+
+def read_plans(stage: str | None, days: int | None) -> list:
+    if not os.path.exists(SLURM_PLAN_LOG_PATH):
+        sys.exit(f"❌ No submissions logged in {SLURM_PLAN_LOG_PATH}")
+    since = (datetime.now() - timedelta(days=days)).isoformat() if days else ""
+    with open(SLURM_PLAN_LOG_PATH) as f:
+        plans = [json.loads(line) for line in f if line.strip()]
+    return [p for p in plans if (not stage or p["stage"] == stage) and p["submitted"] >= since]
+
+
+def _median(values: list):
+    values = sorted(v for v in values if v is not None)
+    return values[len(values) // 2] if values else None
+
+
+def _ratio(used, requested):
+    return used / requested if used is not None and requested else None
+
+
+def cmd_report(args):
+    plans = read_plans(args.stage, args.days)
+    usage = sacct_usage(sorted({p["job_id"] for p in plans}))
+    rows = []
+    for p in plans:
+        u = usage.get(f"{p['job_id']}_{p['task']}", {"state": "UNKNOWN", "elapsed_s": None,
+                                                     "cpu_s": None, "max_rss_mb": None})
+        rows.append({**{k: p[k] for k in USAGE_COLUMNS if k in p}, **u})
+    os.makedirs(os.path.dirname(SLURM_USAGE_PATH), exist_ok=True)
+    with open(SLURM_USAGE_PATH, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=USAGE_COLUMNS, delimiter="\t", extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"{'stage':<8} {'class':>5} {'tasks':>6} {'done':>6} {'timeout':>7} {'oom':>5} "
+          f"{'time used':>9} {'mem used':>9} {'cpu eff':>8} {'core-h req':>10} {'core-h used':>11}")
+    for key in sorted({(r["stage"], r["class"]) for r in rows}):
+        group = [r for r in rows if (r["stage"], r["class"]) == key]
+        finished = [r for r in group if r["elapsed_s"] is not None and r["state"] not in ("PENDING", "RUNNING")]
+        time_used = _median([_ratio(r["elapsed_s"], r["time_s"]) for r in finished])
+        mem_used = _median([_ratio(r["max_rss_mb"], r["mem_mb"]) for r in finished])
+        cpu_eff = _median([_ratio(r["cpu_s"], r["elapsed_s"] * r["cpus"]) for r in finished if r["elapsed_s"]])
+        requested = sum(r["time_s"] * r["cpus"] for r in finished) / 3600
+        used = sum(r["elapsed_s"] * r["cpus"] for r in finished) / 3600
+
+        def pct(v):
+            return f"{v:.0%}" if v is not None else "-"
+
+        print(f"{key[0]:<8} {key[1]:>5} {len(group):>6} {sum(r['state'] == 'COMPLETED' for r in group):>6} "
+              f"{sum(r['state'] == 'TIMEOUT' for r in group):>7} {sum(r['state'] == 'OUT_OF_MEMORY' for r in group):>5} "
+              f"{pct(time_used):>9} {pct(mem_used):>9} {pct(cpu_eff):>8} {requested:>10.1f} {used:>11.1f}")
+    print("(time / mem used: median share of the request; core-h: time limit vs elapsed, times cpus)")
+    print(f"📝 Per-task usage saved to: {SLURM_USAGE_PATH}")
+
+
+def cmd_fit(args):
+    if not os.path.exists(SLURM_USAGE_PATH):
+        sys.exit(f"❌ No usage table at {SLURM_USAGE_PATH}; run 'report' first")
+    with open(SLURM_USAGE_PATH, newline="") as f:
+        rows = list(csv.DictReader(f, delimiter="\t"))
+    fitted = fit_models(rows, args.min_tasks)
+    if not fitted:
+        sys.exit(f"❌ No stage has {args.min_tasks} completed or killed tasks to fit")
+    current = {}
+    if os.path.exists(SLURM_RESOURCE_MODELS_PATH):
+        with open(SLURM_RESOURCE_MODELS_PATH) as f:
+            current = json.load(f)
+    current.update(fitted)
+    with open(SLURM_RESOURCE_MODELS_PATH, "w") as f:
+        json.dump(current, f, indent=2)
+    for stage, m in fitted.items():
+        print(f"✅ {stage}: time = {m['time'][0]:.3g} * x^{m['time'][1]:.2f} (x{m['time_margin']}), "
+              f"mem = {m['mem'][0]:.3g} * x^{m['mem'][1]:.2f} MB (x{m['mem_margin']}) from {m['tasks']} tasks "
+              f"({m['killed']} killed at a limit)")
+    print(f"📝 Models saved to: {SLURM_RESOURCE_MODELS_PATH}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SLURM resource right-sizing")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("submit", help="Size pending tasks and submit one array per resource class")
+    p.add_argument("stage", choices=sorted(STAGE_INPUTS))
+    p.add_argument("set_file", help="Pending input names, one per line")
+    p.add_argument("in_dir")
+    p.add_argument("out_dir")
+    p.add_argument("--script", required=True, help="Array script taking <set file> <in dir> <out dir>")
+    p.add_argument("--classes", type=int, default=SLURM_RESOURCE_CLASSES,
+                   help=f"Maximum number of resource classes (default: {SLURM_RESOURCE_CLASSES})")
+    p.add_argument("--max-tasks", type=int, default=0, help="Only the first N inputs (submit limit)")
+    p.add_argument("--concurrent", type=int, default=100, help="Array elements running at once (default: 100)")
+    p.add_argument("--dry-run", action="store_true", help="Print the sbatch commands only")
+    p.set_defaults(func=cmd_submit)
+
+    p = sub.add_parser("report", help="Requested vs used resources from sacct")
+    p.add_argument("--stage", choices=sorted(STAGE_INPUTS))
+    p.add_argument("--days", type=int, default=None, help="Only submissions of the last N days")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("fit", help="Refit the cost models from the last report")
+    p.add_argument("--min-tasks", type=int, default=10, help="Completed or killed tasks needed per stage (default: 10)")
+    p.set_defaults(func=cmd_fit)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Summarize IQ-TREE gene trees against the ASTRAL species tree.
+
+Per gene tree: mean SH-aLRT / UFBoot, taxa occupancy and Robinson-Foulds
+distance to the species tree. Per species-tree branch: how many gene trees are
+decisive for it and how many of those contain it (concordance).
+
+Usage:
+  python src/summarize-gene-trees.py [--species-tree path] [-o out_prefix]
+"""
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.treeutils import read_newick, summarize_gene_trees
+
+BASE      = Path.cwd()
+SET_DIR   = BASE / "local_data/speciestree"
+IN_DIR    = SET_DIR / "gene_trees"
+SP_TREE   = SET_DIR / "astral_results/species_tree.treefile"
+OUT_PREFIX= SET_DIR / "gene_tree_summary"
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize gene tree support, occupancy and RF distance")
+    ap.add_argument("--in-dir", type=Path, default=IN_DIR, help=f"Folder with *.treefile (default: {IN_DIR})")
+    ap.add_argument("--species-tree", type=Path, default=SP_TREE, help=f"Species tree (default: {SP_TREE})")
+    ap.add_argument("-o", "--out-prefix", type=Path, default=OUT_PREFIX,
+                    help="Writes <prefix>_trees.csv and <prefix>_branches.csv")
+    args = ap.parse_args()
+
+    files = sorted(args.in_dir.glob("*.treefile"))
+    if not files:
+        print(f"No .treefile files found in {args.in_dir}")
+        return
+
+    # Parsing dominates; the bitset comparison itself is vectorized
+    n_workers = int(os.environ.get("SLURM_CPUS_PER_TASK", os.cpu_count() or 1))
+    print(f"Parsing {len(files)} trees with {n_workers} workers")
+    with ProcessPoolExecutor(max_workers=n_workers) as ex:
+        roots = list(ex.map(read_newick, files, chunksize=64))
+    gene_trees = {f.name[:-len(".treefile")]: r for f, r in zip(files, roots)}
+
+    species_tree = None
+    if args.species_tree.exists():
+        species_tree = read_newick(args.species_tree)
+    else:
+        print(f"⚠️ Species tree not found at {args.species_tree}; skipping RF and concordance.")
+
+    trees_df, branches_df = summarize_gene_trees(gene_trees, species_tree)
+
+    args.out_prefix.parent.mkdir(parents=True, exist_ok=True)
+    trees_csv = args.out_prefix.with_name(args.out_prefix.name + "_trees.csv")
+    trees_df.to_csv(trees_csv, index=False)
+    print(f"✅ Wrote {len(trees_df)} gene tree summaries -> {trees_csv}")
+    if not branches_df.empty:
+        branches_csv = args.out_prefix.with_name(args.out_prefix.name + "_branches.csv")
+        branches_df.to_csv(branches_csv, index=False)
+        print(f"✅ Wrote {len(branches_df)} species tree branches -> {branches_csv}")
+
+if __name__ == "__main__":
+    main()
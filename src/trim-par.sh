@@ -30,17 +30,28 @@ set_file="$1"
 in_dir="$2"
 out_dir="$3"
 
-# Get the line that matches this task ID (basename with .fa)
-fname=$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")
+# Get the line that matches this task ID (basename with .fa), or the family claimed by a
+# src/workqueue.py worker (QUEUE_ITEM; set_file is then the queue folder)
+fname="${QUEUE_ITEM:-$(sed -n "${SLURM_ARRAY_TASK_ID}p" "$set_file")}"
 in_path="$in_dir/$fname"
 base="${fname%.fa}"
 out_path="$out_dir/${base}_trim.fa"
 
-# skip if already aligned
-[[ -s "$out_path" ]] && { echo "Exists: $out_path — skipping."; exit 0; }
+SCRIPT_DIR="${SLURM_SUBMIT_DIR:-.}/src"
 
-echo "Running $TRIMAL_BIN -in $in_path -gt 0.8 -cons 10 -out $out_path"
-"$TRIMAL_BIN" -in "$in_path" -gt 0.8 -cons 10 -out "$out_path"
+# skip if trimmed from the same alignment with the same options (membership stamp, src/family-plan.py)
+if [[ -s "$out_path" ]] && python3 "$SCRIPT_DIR/family-plan.py" check trim "$in_path" "$out_path"; then
+  echo "Current: $out_path — skipping."; exit 0
+fi
+
+# Options from config.TRIMAL_OPTIONS, so they match the stamp
+TRIM_OPTS=$(python3 "$SCRIPT_DIR/family-plan.py" params trim) || TRIM_OPTS="-gt 0.8 -cons 10"
+
+# -colnumbering: the kept columns, for codon alignments (src/codon-align.py)
+echo "Running $TRIMAL_BIN -in $in_path $TRIM_OPTS -out $out_path -colnumbering > $out_path.cols"
+# shellcheck disable=SC2086
+"$TRIMAL_BIN" -in "$in_path" $TRIM_OPTS -out "$out_path" -colnumbering > "$out_path.cols"
+python3 "$SCRIPT_DIR/family-plan.py" stamp trim "$in_path" "$out_path"
 
 echo "Job completed!"
 echo "=== Job ended at $(date) ==="
@@ -0,0 +1,406 @@
+import os
+import csv
+import json
+from datetime import datetime
+
+from config import DOMAIN_MAX_EVALUE, DOMAIN_MAX_OVERLAP
+
+ARCHITECTURE_INDEX_VERSION = 1
+# Separator of domains in architecture strings (Zn_clus~Fungal_trans)
+ARCH_SEPARATOR = "~"
+
+
+def resolve_architecture(domains, starts, stops, evalues, max_overlap: float = DOMAIN_MAX_OVERLAP) -> tuple:
+    """
+    Ordered domains of one protein from its hits.
+
+    Hits are accepted best E-value first; a hit overlapping an accepted one by
+    more than max_overlap of the shorter of the two is dropped, so alternative
+    matches to the same region (e.g. from related families) leave one domain.
+
+    Returns:
+        tuple: Domain identifiers ordered by start coordinate.
+    """
+    # Missing E-values (NaN) sort last
+    order = sorted(range(len(domains)),
+                   key=lambda i: (evalues[i] if evalues[i] == evalues[i] else float("inf"), starts[i]))
+    kept = []
+    for i in order:
+        length = stops[i] - starts[i] + 1
+        for j in kept:
+            overlap = min(stops[i], stops[j]) - max(starts[i], starts[j]) + 1
+            if overlap > max_overlap * min(length, stops[j] - starts[j] + 1):
+                break
+        else:
+            kept.append(i)
+    kept.sort(key=lambda i: (starts[i], stops[i]))
+    return tuple(domains[i] for i in kept)
+
+
+def _architectures(df, max_evalue: float, max_overlap: float) -> dict:
+    # df: protein_id, domain, start, stop, evalue -> {protein_id: architecture tuple}
+    import numpy as np
+
+    df = df[~(df["evalue"] > max_evalue)].sort_values(["protein_id", "start"], kind="stable")
+    proteins = df["protein_id"].to_numpy()
+    if not len(proteins):
+        return {}
+    columns = [df[c].to_numpy() for c in ("domain", "start", "stop", "evalue")]
+    bounds = np.flatnonzero(np.r_[True, proteins[1:] != proteins[:-1], True])
+    return {
+        proteins[a]: resolve_architecture(*(c[a:b] for c in columns), max_overlap=max_overlap)
+        for a, b in zip(bounds[:-1], bounds[1:])
+    }
+
+
+def iprscan_portal_architectures(dataset_dir: str, portal: str, analysis: str = "Pfam",
+                                 max_evalue: float = DOMAIN_MAX_EVALUE,
+                                 max_overlap: float = DOMAIN_MAX_OVERLAP) -> dict:
+    """
+    Architectures of a portal's proteins from the InterProScan Parquet dataset.
+
+    Args:
+        dataset_dir (str): Dataset written by ingest-iprscan-results.py.
+        portal (str): Portal name.
+        analysis (str): Member database to use ("" for all of them).
+        max_evalue (float): Hits with a larger E-value (the score column) are ignored.
+        max_overlap (float): See resolve_architecture.
+
+    Returns:
+        dict: 'portal', 'architectures' ({protein_id: tuple of accessions}) and
+            'names' ({accession: description}).
+    """
+    import pyarrow.parquet as pq
+
+    path = os.path.join(dataset_dir, f"portal={portal}")
+    if analysis:
+        path = os.path.join(path, f"analysis={analysis}")
+    if not os.path.isdir(path):
+        return {"portal": portal, "architectures": {}, "names": {}}
+    df = pq.read_table(path, columns=["protein_id", "signature_accession", "signature_description",
+                                      "start", "stop", "score"]).to_pandas()
+    df = df.rename(columns={"signature_accession": "domain", "score": "evalue"})
+    df = df.dropna(subset=["protein_id", "domain"])
+    df["protein_id"] = df["protein_id"].astype(object)
+    df["domain"] = df["domain"].astype(object)
+    names = df.dropna(subset=["signature_description"]).drop_duplicates("domain")
+    return {
+        "portal": portal,
+        "architectures": _architectures(df, max_evalue, max_overlap),
+        "names": dict(zip(names["domain"], names["signature_description"].astype(object))),
+    }
+
+
+def hmmscan_portal_architectures(domtblout_path: str, portal: str, max_evalue: float = DOMAIN_MAX_EVALUE,
+                                 max_overlap: float = DOMAIN_MAX_OVERLAP) -> dict:
+    """
+    Architectures of a portal's proteins from an hmmscan --domtblout file.
+
+    Domains are named by the HMM name (Zn_clus); its accession without the
+    version (PF00172) is kept as the alias. Envelope coordinates and the
+    independent E-value are used.
+
+    Returns:
+        dict: 'portal', 'architectures' ({protein_id: tuple of names}) and 'names' ({name: accession}).
+    """
+    import pandas as pd
+    from src.utils.sequtils import open_text
+
+    rows, names = [], {}
+    with open_text(domtblout_path) as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.split(None, 22)
+            if len(fields) < 21:
+                continue
+            rows.append((fields[3], fields[0], int(fields[19]), int(fields[20]), float(fields[12])))
+            if fields[1] != "-":
+                names.setdefault(fields[0], fields[1].split(".", 1)[0])
+    df = pd.DataFrame(rows, columns=["protein_id", "domain", "start", "stop", "evalue"])
+    return {"portal": portal, "architectures": _architectures(df, max_evalue, max_overlap), "names": names}
+
+
+def build_architecture_index(portal_results: list, index_dir: str, portal_taxonomy=None, source: str = "") -> dict:
+    """
+    Intern the architectures of all portals and write the inverted index.
+
+    Proteins are numbered portal by portal (portals and protein IDs sorted), so
+    every portal is a contiguous range of protein numbers and every postings
+    list is a sorted int32 array.
+
+    Files in index_dir:
+        protein_offsets.npy + proteins.bin   protein IDs
+        portal_offsets.npy                   first protein number of each portal (+ total)
+        protein_arch.npy                     architecture of each protein
+        arch_offsets.npy + arch_domains.npy  domain codes of each architecture, in order
+        postings_offsets.npy + postings.npy  sorted protein numbers of each domain
+        portals.csv                          portals with their taxonomy columns
+        meta.json                            domains (identifier, alias), portals and counts
+
+    Args:
+        portal_results (list): Dicts from iprscan_portal_architectures / hmmscan_portal_architectures.
+        index_dir (str): Output folder.
+        portal_taxonomy (pd.DataFrame | None): build_phylogeny_data output ('organism' is the portal).
+        source (str): Description of the input, stored in meta.json.
+
+    Returns:
+        dict: The index metadata (also written to meta.json).
+    """
+    import numpy as np
+    import pandas as pd
+
+    portal_results = sorted(portal_results, key=lambda r: r["portal"])
+    domain_codes, domain_names = {}, {}
+    arch_codes = {}
+    arch_domains, arch_lengths = [], []
+    protein_ids, protein_arch, portal_sizes = [], [], []
+    for result in portal_results:
+        domain_names.update(result["names"])
+        proteins = sorted(result["architectures"])
+        portal_sizes.append(len(proteins))
+        for protein in proteins:
+            codes = tuple(domain_codes.setdefault(d, len(domain_codes)) for d in result["architectures"][protein])
+            arch = arch_codes.get(codes)
+            if arch is None:
+                arch = arch_codes[codes] = len(arch_codes)
+                arch_domains.extend(codes)
+                arch_lengths.append(len(codes))
+            protein_ids.append(protein.encode())
+            protein_arch.append(arch)
+
+    protein_arch = np.array(protein_arch, dtype=np.int32)
+    arch_domains = np.array(arch_domains, dtype=np.int32)
+    arch_offsets = np.zeros(len(arch_lengths) + 1, dtype=np.int64)
+    arch_offsets[1:] = np.cumsum(arch_lengths)
+
+    # Postings: each protein once per distinct domain of its architecture
+    unique_domains = [np.unique(arch_domains[a:b]) for a, b in zip(arch_offsets[:-1], arch_offsets[1:])]
+    unique_offsets = np.zeros(len(unique_domains) + 1, dtype=np.int64)
+    unique_offsets[1:] = np.cumsum([len(u) for u in unique_domains])
+    unique_values = np.concatenate(unique_domains) if unique_domains else np.zeros(0, dtype=np.int32)
+    lengths = np.diff(unique_offsets)[protein_arch]
+    total = int(lengths.sum())
+    starts = np.repeat(unique_offsets[protein_arch], lengths)
+    within = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    pair_domains = unique_values[starts + within]
+    pair_proteins = np.repeat(np.arange(len(protein_arch), dtype=np.int32), lengths)
+    order = np.argsort(pair_domains, kind="stable")
+    postings = pair_proteins[order]
+    postings_offsets = np.zeros(len(domain_codes) + 1, dtype=np.int64)
+    postings_offsets[1:] = np.cumsum(np.bincount(pair_domains, minlength=len(domain_codes)))
+
+    protein_offsets = np.zeros(len(protein_ids) + 1, dtype=np.int64)
+    protein_offsets[1:] = np.cumsum([len(p) for p in protein_ids])
+    portal_offsets = np.zeros(len(portal_sizes) + 1, dtype=np.int64)
+    portal_offsets[1:] = np.cumsum(portal_sizes)
+
+    os.makedirs(index_dir, exist_ok=True)
+    for name, array in [("protein_offsets", protein_offsets), ("portal_offsets", portal_offsets),
+                        ("protein_arch", protein_arch), ("arch_offsets", arch_offsets),
+                        ("arch_domains", arch_domains), ("postings_offsets", postings_offsets),
+                        ("postings", postings)]:
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+    with open(os.path.join(index_dir, "proteins.bin"), "wb") as f:
+        f.write(b"".join(protein_ids))
+
+    portals = pd.DataFrame({"portal": [r["portal"] for r in portal_results]})
+    if portal_taxonomy is not None and "organism" in portal_taxonomy:
+        taxonomy = portal_taxonomy.drop_duplicates("organism").rename(columns={"organism": "portal"})
+        columns = ["portal"] + [c for c in taxonomy.columns if c.startswith("ncbi")]
+        portals = portals.merge(taxonomy[columns], on="portal", how="left")
+    portals.to_csv(os.path.join(index_dir, "portals.csv"), index=False)
+
+    by_code = sorted(domain_codes, key=domain_codes.get)
+    meta = {
+        "version": ARCHITECTURE_INDEX_VERSION,
+        "source": source,
+        "built": datetime.now().isoformat(timespec="seconds"),
+        "portals": len(portal_results),
+        "proteins": len(protein_arch),
+        "architectures": len(arch_lengths),
+        "domains": [[d, domain_names.get(d, "")] for d in by_code],
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def _is_subsequence(pattern: tuple, codes, adjacent: bool) -> bool:
+    if adjacent:
+        n = len(pattern)
+        return any(tuple(codes[i:i + n]) == pattern for i in range(len(codes) - n + 1))
+    it = iter(codes)
+    return all(any(c == p for c in it) for p in pattern)
+
+
+class ArchitectureIndex:
+    """
+    Memory-mapped domain architecture index built by build_architecture_index.
+
+    Queries intersect / merge sorted postings arrays, so they touch only the
+    proteins that carry the queried domains; order is checked once per distinct
+    architecture rather than once per protein.
+    """
+
+    def __init__(self, index_dir: str):
+        import numpy as np
+
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != ARCHITECTURE_INDEX_VERSION:
+            raise ValueError(f"Architecture index {index_dir} is version {self.meta.get('version')}, "
+                             f"expected {ARCHITECTURE_INDEX_VERSION}; rebuild it")
+
+        def load(name):
+            return np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r")
+
+        self.protein_offsets = load("protein_offsets")
+        self.portal_offsets = load("portal_offsets")
+        self.protein_arch = load("protein_arch")
+        self.arch_offsets = load("arch_offsets")
+        self.arch_domains = load("arch_domains")
+        self.postings_offsets = load("postings_offsets")
+        self.postings = load("postings")
+        proteins_path = os.path.join(index_dir, "proteins.bin")
+        self.proteins_blob = (np.memmap(proteins_path, dtype=np.uint8, mode="r")
+                              if os.path.getsize(proteins_path) else np.zeros(0, dtype=np.uint8))
+        self.portals_path = os.path.join(index_dir, "portals.csv")
+        self.domains = [d for d, _ in self.meta["domains"]]
+        self.aliases = [a for _, a in self.meta["domains"]]
+        self._codes = {d.lower(): i for i, d in enumerate(self.domains)}
+        for i, alias in enumerate(self.aliases):
+            if alias:
+                self._codes.setdefault(alias.lower(), i)
+        self._portals = None
+
+    @property
+    def portals(self) -> dict:
+        """
+        Portal table as column -> np.ndarray of str (item i = portal code i); read
+        with csv rather than pandas to keep single queries in milliseconds.
+        """
+        import numpy as np
+
+        if self._portals is None:
+            with open(self.portals_path, newline="") as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                rows = list(reader)
+            self._portals = {c: np.array([r[i] for r in rows], dtype=object) for i, c in enumerate(header)}
+        return self._portals
+
+    def domain_code(self, token: str) -> int:
+        """
+        Code of a domain given its identifier or alias (case-insensitive).
+        """
+        code = self._codes.get(token.lower())
+        if code is None:
+            similar = [d for d, a in zip(self.domains, self.aliases)
+                       if token.lower() in d.lower() or token.lower() in a.lower()][:10]
+            hint = f"; similar: {', '.join(similar)}" if similar else ""
+            raise KeyError(f"Unknown domain '{token}'{hint}")
+        return code
+
+    def domain_proteins(self, token: str):
+        """
+        Sorted protein numbers with the domain.
+        """
+        code = self.domain_code(token)
+        return self.postings[self.postings_offsets[code]:self.postings_offsets[code + 1]]
+
+    def portal_codes(self, taxa=(), portals=()):
+        """
+        Codes of the portals matching every taxon filter and, if given, one of the portals.
+
+        A filter is "rank=name" (rank as in ncbi_taxon_<rank>) or a bare name
+        matched against every taxonomy column; matching is case-insensitive.
+        """
+        import numpy as np
+
+        table = self.portals
+        keep = np.ones(len(table["portal"]), dtype=bool)
+        for taxon in taxa:
+            rank, _, name = taxon.rpartition("=")
+            columns = [f"ncbi_taxon_{rank}"] if rank else [c for c in table if c.startswith("ncbi_taxon_")]
+            missing = [c for c in columns if c not in table]
+            if missing:
+                raise KeyError(f"No taxonomy column {missing[0]} in {self.portals_path}")
+            match = np.zeros(len(keep), dtype=bool)
+            for column in columns:
+                match |= np.array([v.lower() == name.lower() for v in table[column]], dtype=bool)
+            keep &= match
+        if portals:
+            keep &= np.isin(table["portal"], list(portals))
+        return np.flatnonzero(keep)
+
+    def query(self, all_of=(), any_of=(), none_of=(), order=(), adjacent: bool = False,
+              taxa=(), portals=()):
+        """
+        Protein numbers matching a domain query.
+
+        Args:
+            all_of: Domains that must all be present.
+            any_of: At least one of these must be present.
+            none_of: None of these may be present.
+            order: Domains that must appear in this order (implies all_of).
+            adjacent (bool): The ordered domains must be consecutive.
+            taxa, portals: Restrict to portals (see portal_codes).
+
+        Returns:
+            np.ndarray: Sorted protein numbers.
+        """
+        import numpy as np
+
+        required = list(dict.fromkeys([*all_of, *order]))
+        result = None
+        for token in sorted(required, key=lambda t: len(self.domain_proteins(t))):
+            postings = self.domain_proteins(token)
+            result = np.asarray(postings) if result is None else np.intersect1d(result, postings, assume_unique=True)
+        if any_of:
+            union = np.unique(np.concatenate([self.domain_proteins(t) for t in any_of]))
+            result = union if result is None else np.intersect1d(result, union, assume_unique=True)
+        if taxa or portals:
+            codes = self.portal_codes(taxa, portals)
+            if result is None:
+                ranges = [np.arange(self.portal_offsets[c], self.portal_offsets[c + 1], dtype=np.int32) for c in codes]
+                result = np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int32)
+            else:
+                keep = np.zeros(len(self.portal_offsets) - 1, dtype=bool)
+                keep[codes] = True
+                result = result[keep[self.protein_portal(result)]]
+        if result is None:
+            result = np.arange(len(self.protein_arch), dtype=np.int32)
+        for token in none_of:
+            result = np.setdiff1d(result, self.domain_proteins(token), assume_unique=True)
+        if len(order) > 1 and len(result):
+            pattern = tuple(self.domain_code(t) for t in order)
+            archs, inverse = np.unique(self.protein_arch[result], return_inverse=True)
+            ok = np.array([_is_subsequence(pattern, self.arch_domains[self.arch_offsets[a]:self.arch_offsets[a + 1]],
+                                           adjacent) for a in archs], dtype=bool)
+            result = result[ok[inverse.ravel()]]
+        return result
+
+    def protein_portal(self, proteins):
+        """
+        Portal code of each protein number.
+        """
+        import numpy as np
+
+        return np.searchsorted(self.portal_offsets, proteins, side="right") - 1
+
+    def protein_ids(self, proteins) -> list:
+        return [self.proteins_blob[self.protein_offsets[p]:self.protein_offsets[p + 1]].tobytes().decode()
+                for p in proteins]
+
+    def architectures(self, proteins) -> list:
+        """
+        Architecture string of each protein number (Zn_clus~Fungal_trans).
+        """
+        import numpy as np
+
+        archs, inverse = np.unique(self.protein_arch[np.asarray(proteins, dtype=np.int64)], return_inverse=True)
+        strings = [ARCH_SEPARATOR.join(self.domains[c] for c in self.arch_domains[self.arch_offsets[a]:
+                                                                                  self.arch_offsets[a + 1]])
+                   for a in archs]
+        return [strings[i] for i in inverse.ravel()]
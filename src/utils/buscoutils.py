@@ -0,0 +1,236 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+# Marker status codes used in the portal x marker matrix
+STATUS_MISSING = 0
+STATUS_COMPLETE = 1      # complete, single copy
+STATUS_DUPLICATED = 2    # complete, multi copy
+STATUS_FRAGMENTED = 3
+STATUS_CODES = {
+    "missing": STATUS_MISSING,
+    "complete": STATUS_COMPLETE,
+    "duplicated": STATUS_DUPLICATED,
+    "fragmented": STATUS_FRAGMENTED,
+}
+
+SUMMARY_JSON_RE = re.compile(r"short_summary\..*?\.\..*?\.(?P<portal>.+?)\.fasta\.json$")
+
+
+def find_summary_json(folder: str) -> str | None:
+    """
+    Find the most recently modified BUSCO summary JSON file in a folder.
+
+    Args:
+        folder (str): Path to the BUSCO result folder.
+
+    Returns:
+        str | None: Path to the freshest short_summary*.json file, or None if not found.
+    """
+    try:
+        # scandir caches the stat result, so a single pass is enough
+        candidates = [
+            (e.stat().st_mtime, e.path) for e in os.scandir(folder)
+            if e.name.startswith("short_summary") and e.name.endswith(".json") and e.is_file()
+        ]
+    except FileNotFoundError:
+        return None
+    if not candidates:
+        return None
+    return max(candidates)[1]
+
+
+def find_full_table(folder: str) -> str | None:
+    """
+    Find the full_table.tsv of a BUSCO result folder (inside run_<lineage>/).
+
+    Args:
+        folder (str): Path to the BUSCO result folder.
+
+    Returns:
+        str | None: Path to full_table.tsv, or None if not found.
+    """
+    try:
+        for e in os.scandir(folder):
+            if e.name.startswith("run_") and e.is_dir():
+                path = os.path.join(e.path, "full_table.tsv")
+                if os.path.isfile(path):
+                    return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _lower_keys(d: dict) -> dict:
+    """
+    Lower-case the keys of a dict once, so lookups are O(1) instead of a key scan.
+    """
+    return {str(k).lower(): v for k, v in d.items()} if isinstance(d, dict) else {}
+
+
+def _get(d_lower: dict, *keys, default=None):
+    """
+    Get the first of several keys from a dict built by _lower_keys.
+    """
+    for k in keys:
+        v = d_lower.get(k.lower())
+        if v is not None:
+            return v
+    return default
+
+
+def parse_busco_json(json_path: str) -> dict:
+    """
+    Parse a BUSCO summary JSON file and extract relevant metrics.
+
+    Args:
+        json_path (str): Path to the BUSCO summary JSON file.
+
+    Returns:
+        dict: Dictionary of parsed BUSCO metrics and metadata.
+    """
+    with open(json_path, "r") as f:
+        data = json.load(f)
+
+    results  = _lower_keys(data.get("results", {}))
+    lineage  = _lower_keys(data.get("lineage_dataset", {}))
+    params   = _lower_keys(data.get("parameters", {}))
+    versions = _lower_keys(data.get("versions", {}))
+
+    # portal name from file like: short_summary.<stuff>.<portal>.fasta.json
+    base = os.path.basename(json_path)
+    m = SUMMARY_JSON_RE.search(base)
+    portal = m.group("portal") if m else None
+    if not portal:
+        # fallback: derive from parent folder name ending with ".fasta"
+        parent = os.path.basename(os.path.dirname(json_path))
+        portal = parent[:-6] if parent.endswith(".fasta") else parent
+
+    python_version = _get(versions, "python", default=[])
+    rec = {
+        "portal": portal,
+        "portal_fasta": f"{portal}.fasta" if portal else None,
+        "one_line_summary": _get(results, "one_line_summary"),
+
+        # Percentages
+        "complete_pct":     _get(results, "Complete percentage", "C"),
+        "single_copy_pct":  _get(results, "Single copy percentage", "S"),
+        "duplicated_pct":   _get(results, "Multi copy percentage", "D", "Duplicated percentage"),
+        "fragmented_pct":   _get(results, "Fragmented percentage", "F"),
+        "missing_pct":      _get(results, "Missing percentage", "M"),
+
+        # Counts
+        "complete_n":       _get(results, "Complete BUSCOs"),
+        "single_copy_n":    _get(results, "Single copy BUSCOs"),
+        "duplicated_n":     _get(results, "Multi copy BUSCOs", "Duplicated BUSCOs"),
+        "fragmented_n":     _get(results, "Fragmented BUSCOs"),
+        "missing_n":        _get(results, "Missing BUSCOs"),
+        "n_markers":        _get(results, "n_markers", "n"),
+        "domain":           _get(results, "domain"),
+
+        # Useful metadata (optional but nice to have)
+        "lineage":               _get(lineage, "name"),
+        "lineage_n_markers":     _get(lineage, "number_of_buscos"),
+        "lineage_species":       _get(lineage, "number_of_species"),
+        "lineage_creation_date": _get(lineage, "creation_date"),
+        "busco_version":         _get(versions, "busco"),
+        "python_version":        ".".join(map(str, python_version)) if python_version else None,
+        "input_path":            _get(params, "in"),
+        "main_out":              _get(params, "main_out"),
+        "summary_path":          str(json_path),
+        "_source":               "json",
+    }
+    return rec
+
+
+def parse_full_table(table_path: str) -> dict:
+    """
+    Parse a BUSCO full_table.tsv into one status per marker.
+
+    Duplicated markers appear on several rows; they all carry the same status,
+    so the last row seen for a marker wins.
+
+    Args:
+        table_path (str): Path to full_table.tsv.
+
+    Returns:
+        dict: Mapping BUSCO marker id -> status code (see STATUS_CODES).
+    """
+    statuses = {}
+    with open(table_path, "r") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            parts = line.split("\t", 2)
+            if len(parts) < 2:
+                continue
+            statuses[parts[0]] = STATUS_CODES.get(parts[1].strip().lower(), STATUS_MISSING)
+    return statuses
+
+
+def build_marker_matrix(portal_statuses: dict) -> tuple:
+    """
+    Build a compact portal x marker status matrix.
+
+    Args:
+        portal_statuses (dict): Mapping portal -> {marker id: status code}.
+
+    Returns:
+        tuple:
+            np.ndarray: int8 matrix (portals x markers); absent markers are STATUS_MISSING.
+            np.ndarray: Portal names (row labels).
+            np.ndarray: Marker ids (column labels).
+    """
+    portals = np.array(sorted(portal_statuses), dtype=object)
+    markers = np.array(sorted({m for s in portal_statuses.values() for m in s}), dtype=object)
+    marker_idx = {m: i for i, m in enumerate(markers)}
+    matrix = np.full((len(portals), len(markers)), STATUS_MISSING, dtype=np.int8)
+    for row, portal in enumerate(portals):
+        s = portal_statuses[portal]
+        if not s:
+            continue
+        cols = np.fromiter((marker_idx[m] for m in s), dtype=np.int64, count=len(s))
+        matrix[row, cols] = np.fromiter(s.values(), dtype=np.int8, count=len(s))
+    return matrix, portals, markers
+
+
+def save_marker_matrix(path: str, matrix: np.ndarray, portals: np.ndarray, markers: np.ndarray):
+    """
+    Save a marker matrix with its labels as a compressed .npz file.
+    """
+    np.savez_compressed(path, matrix=matrix, portals=portals.astype(str), markers=markers.astype(str))
+
+
+def load_marker_matrix(path: str) -> tuple:
+    """
+    Load a marker matrix saved by save_marker_matrix.
+
+    Returns:
+        tuple: (matrix, portals, markers) as in build_marker_matrix.
+    """
+    with np.load(path) as data:
+        return data["matrix"], data["portals"], data["markers"]
+
+
+def marker_occupancy(matrix: np.ndarray, markers: np.ndarray) -> pd.DataFrame:
+    """
+    Count, per marker, how many portals have each status.
+
+    Args:
+        matrix (np.ndarray): int8 portal x marker matrix.
+        markers (np.ndarray): Marker ids.
+
+    Returns:
+        pd.DataFrame: One row per marker with counts per status and the fraction of
+                      portals where the marker is complete (single or duplicated).
+    """
+    counts = {
+        f"n_{name}": (matrix == code).sum(axis=0)
+        for name, code in STATUS_CODES.items()
+    }
+    df = pd.DataFrame({"marker": markers, **counts})
+    n_portals = matrix.shape[0]
+    df["complete_occupancy"] = (df["n_complete"] + df["n_duplicated"]) / n_portals if n_portals else np.nan
+    return df
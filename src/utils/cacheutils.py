@@ -0,0 +1,224 @@
+import os
+import gzip
+import sqlite3
+from collections import defaultdict
+
+from src.utils.sequtils import iter_fasta, write_fasta_record, sequence_md5, open_text, fasta_stem
+
+# SQLite limits the number of bound parameters per statement
+BATCH = 900
+
+
+def _split_iprscan(line: str):
+    fields = line.rstrip("\n").split("\t")
+    return fields[0], "\t".join(fields[1:])
+
+
+def _join_iprscan(protein_id: str, payload: str) -> str:
+    return f"{protein_id}\t{payload}\n"
+
+
+def _split_domtblout(line: str):
+    # Columns are whitespace separated; the last one (description) may contain spaces
+    fields = line.rstrip("\n").split(None, 22)
+    query = fields.pop(3)
+    return query, "\t".join(fields)
+
+
+def _join_domtblout(protein_id: str, payload: str) -> str:
+    fields = payload.split("\t")
+    fields.insert(3, protein_id)
+    return " ".join(fields) + "\n"
+
+
+# How each tool's per-protein result lines are split into (protein id, payload)
+TOOLS = {
+    "interproscan": {"split": _split_iprscan, "join": _join_iprscan, "suffix": ".tsv.gz"},
+    "hmmscan": {"split": _split_domtblout, "join": _join_domtblout, "suffix": ".domtblout"},
+}
+
+
+def open_cache(db_path: str) -> sqlite3.Connection:
+    """
+    Open (and create if needed) the annotation cache database.
+
+    The cache lives on the shared cluster filesystem, so it keeps SQLite's
+    default rollback journal: WAL's shared-memory index is not safe across nodes.
+
+    Args:
+        db_path (str): Path to the SQLite file.
+
+    Returns:
+        sqlite3.Connection: Open connection.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    con = sqlite3.connect(db_path)
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS scanned (
+            tool TEXT NOT NULL, version TEXT NOT NULL, md5 TEXT NOT NULL,
+            PRIMARY KEY (tool, version, md5)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS hits (
+            tool TEXT NOT NULL, version TEXT NOT NULL, md5 TEXT NOT NULL, payload TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS hits_key ON hits (tool, version, md5);
+    """)
+    return con
+
+
+def _batched(items, size=BATCH):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def cached_md5s(con: sqlite3.Connection, tool: str, version: str, md5s) -> set:
+    """
+    Return the subset of md5s already scanned with this tool and database version.
+    """
+    found = set()
+    for batch in _batched(set(md5s)):
+        q = f"SELECT md5 FROM scanned WHERE tool=? AND version=? AND md5 IN ({','.join('?' * len(batch))})"
+        found.update(r[0] for r in con.execute(q, [tool, version, *batch]))
+    return found
+
+
+def split_cached(con, tool: str, version: str, fasta_path: str, work_dir: str) -> dict:
+    """
+    Split a proteome into cached and uncached proteins.
+
+    Writes <work_dir>/<portal>.md5.tsv (protein id -> md5, all proteins) and
+    <work_dir>/<portal>.fasta with one sequence per uncached md5, named by md5 so
+    that tool output can be keyed straight back to the cache.
+
+    Args:
+        con (sqlite3.Connection): Cache connection.
+        tool (str): 'interproscan' or 'hmmscan'.
+        version (str): Tool and database version label.
+        fasta_path (str): Proteome to split.
+        work_dir (str): Output folder.
+
+    Returns:
+        dict: portal, total, cached and uncached (unique md5s) counts.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    portal = fasta_stem(fasta_path)
+    records = [(h.split(None, 1)[0], sequence_md5(s), s) for h, s in iter_fasta(fasta_path)]
+    cached = cached_md5s(con, tool, version, (m for _, m, _ in records))
+
+    with open(os.path.join(work_dir, f"{portal}.md5.tsv"), "w") as f:
+        for seq_id, md5, _ in records:
+            f.write(f"{seq_id}\t{md5}\n")
+
+    uncached_path = os.path.join(work_dir, f"{portal}.fasta")
+    written = set()
+    with open(uncached_path, "w") as out:
+        for _, md5, seq in records:
+            if md5 not in cached and md5 not in written:
+                write_fasta_record(out, md5, seq.replace("*", ""))
+                written.add(md5)
+    if not written:
+        os.remove(uncached_path)
+
+    return {
+        "portal": portal,
+        "total": len(records),
+        "cached": sum(1 for _, m, _ in records if m in cached),
+        "uncached_unique": len(written),
+    }
+
+
+def store_results(con, tool: str, version: str, result_path: str, scanned_fasta: str) -> int:
+    """
+    Add the tool output of an uncached run to the cache.
+
+    Every md5 of the scanned FASTA is marked as scanned, so proteins without hits
+    are not rescanned either.
+
+    Args:
+        con (sqlite3.Connection): Cache connection.
+        tool (str): 'interproscan' or 'hmmscan'.
+        version (str): Tool and database version label.
+        result_path (str): Tool output for scanned_fasta (TSV / domtblout, optionally .gz).
+        scanned_fasta (str): FASTA written by split_cached (headers are md5s).
+
+    Returns:
+        int: Number of hit lines stored.
+    """
+    split = TOOLS[tool]["split"]
+    md5s = [h.split(None, 1)[0] for h, _ in iter_fasta(scanned_fasta)]
+    n = 0
+    with con:
+        # Drop any partial earlier import of the same proteins
+        for batch in _batched(md5s):
+            marks = ",".join("?" * len(batch))
+            con.execute(f"DELETE FROM hits WHERE tool=? AND version=? AND md5 IN ({marks})", [tool, version, *batch])
+        rows = []
+        if result_path and os.path.exists(result_path):
+            with open_text(result_path) as f:
+                for line in f:
+                    if not line.strip() or line.startswith("#"):
+                        continue
+                    md5, payload = split(line)
+                    rows.append((tool, version, md5, payload))
+                    if len(rows) >= 100_000:
+                        con.executemany("INSERT INTO hits VALUES (?, ?, ?, ?)", rows)
+                        n += len(rows)
+                        rows = []
+        con.executemany("INSERT INTO hits VALUES (?, ?, ?, ?)", rows)
+        n += len(rows)
+        con.executemany("INSERT OR IGNORE INTO scanned VALUES (?, ?, ?)", [(tool, version, m) for m in md5s])
+    return n
+
+
+def write_portal_results(con, tool: str, version: str, md5_map_path: str, out_path: str) -> dict:
+    """
+    Write a portal's full result file from the cache, in the tool's native format.
+
+    Nothing is written while some of the portal's proteins are not in the cache.
+
+    Args:
+        con (sqlite3.Connection): Cache connection.
+        tool (str): 'interproscan' or 'hmmscan'.
+        version (str): Tool and database version label.
+        md5_map_path (str): <portal>.md5.tsv written by split_cached.
+        out_path (str): Output file (.gz is compressed), replaced only when complete.
+
+    Returns:
+        dict: proteins, proteins_with_hits, lines and missing (proteins not in cache).
+    """
+    join = TOOLS[tool]["join"]
+    proteins = []
+    with open(md5_map_path, "r") as f:
+        for line in f:
+            seq_id, md5 = line.rstrip("\n").split("\t")
+            proteins.append((seq_id, md5))
+
+    unique = {m for _, m in proteins}
+    scanned = cached_md5s(con, tool, version, unique)
+    payloads = defaultdict(list)
+    for batch in _batched(unique):
+        q = f"SELECT md5, payload FROM hits WHERE tool=? AND version=? AND md5 IN ({','.join('?' * len(batch))})"
+        for md5, payload in con.execute(q, [tool, version, *batch]):
+            payloads[md5].append(payload)
+
+    lines = 0
+    tmp_path = out_path + ".tmp"
+    opener = gzip.open(tmp_path, "wt") if out_path.endswith(".gz") else open(tmp_path, "w")
+    with opener as out:
+        for seq_id, md5 in proteins:
+            for payload in payloads.get(md5, ()):
+                out.write(join(seq_id, payload))
+                lines += 1
+    missing = sum(1 for _, m in proteins if m not in scanned)
+    # An incomplete file would look finished to everything that skips existing outputs
+    if missing:
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, out_path)
+    return {
+        "proteins": len(proteins),
+        "proteins_with_hits": sum(1 for _, m in proteins if m in payloads),
+        "lines": lines,
+        "missing": missing,
+    }
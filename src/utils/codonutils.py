@@ -0,0 +1,210 @@
+import os
+import re
+
+from config import CODON_MAX_MISMATCH
+from src.utils.sequtils import iter_fasta, write_fasta_record, portal_of
+
+# Standard genetic code, codons in TCAG order (NCBI table 1)
+GENETIC_CODE = "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+CODON_LOG_COLUMNS = ["family", "n_seqs", "n_out", "missing_cds", "short_cds", "mismatch", "protein_columns",
+                     "codon_columns", "column_map"]
+
+
+def _nucleotide_codes():
+    import numpy as np
+
+    codes = np.full(256, 4, dtype=np.int64)
+    for i, base in enumerate("TCAG"):
+        codes[ord(base)] = codes[ord(base.lower())] = i
+    codes[ord("U")] = codes[ord("u")] = 0
+    return codes
+
+
+def read_alignment(path: str):
+    """
+    Alignment as (ids, n x L uint8 matrix of upper-case residues).
+    """
+    import numpy as np
+
+    ids, rows = [], []
+    for header, seq in iter_fasta(path):
+        ids.append(header.split(None, 1)[0])
+        rows.append(seq.upper().encode())
+    if not rows:
+        return ids, np.zeros((0, 0), dtype=np.uint8)
+    if len({len(r) for r in rows}) != 1:
+        raise ValueError(f"{path}: sequences of different lengths, not an alignment")
+    return ids, np.frombuffer(b"".join(rows), dtype=np.uint8).reshape(len(rows), -1)
+
+
+def read_column_map(path: str) -> list:
+    """
+    Kept column numbers from trimAl -colnumbering output ('#ColumnsMap\t0, 1, 5, ...').
+    """
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#ColumnsMap"):
+                return [int(c) for c in re.findall(r"\d+", line[len("#ColumnsMap"):])]
+    return []
+
+
+def kept_columns(full, trimmed, column_map: list | None = None):
+    """
+    Columns of the untrimmed alignment kept in the trimmed one.
+
+    The trimAl column map is used when it reproduces the trimmed alignment
+    (0- or 1-based); otherwise every trimmed column is matched to the next
+    identical untrimmed column, which is exact unless identical columns
+    follow each other.
+
+    Args:
+        full (np.ndarray): Untrimmed alignment (n x L), rows in the order of `trimmed`.
+        trimmed (np.ndarray): Trimmed alignment (n x T).
+        column_map (list | None): Kept column numbers from trimAl.
+
+    Returns:
+        tuple: (np.ndarray of T column indices, source: "colnumbering" or "matched").
+    """
+    import numpy as np
+
+    if column_map and len(column_map) == trimmed.shape[1]:
+        cols = np.asarray(column_map)
+        for shift in (0, 1):
+            c = cols - shift
+            if c.min() >= 0 and c.max() < full.shape[1] and np.array_equal(full[:, c], trimmed):
+                return c, "colnumbering"
+    # Columns as hashable byte strings, matched in order
+    full_cols = [full[:, i].tobytes() for i in range(full.shape[1])]
+    cols, i = [], 0
+    for j in range(trimmed.shape[1]):
+        col = trimmed[:, j].tobytes()
+        while i < len(full_cols) and full_cols[i] != col:
+            i += 1
+        if i == len(full_cols):
+            raise ValueError("trimmed alignment is not a column subset of the untrimmed one")
+        cols.append(i)
+        i += 1
+    return np.asarray(cols, dtype=np.int64), "matched"
+
+
+def back_translate(protein, cds: list, max_mismatch: float = CODON_MAX_MISMATCH):
+    """
+    Codon alignment of a protein alignment from the sequences' CDS.
+
+    Residue k of a sequence takes codon k of its CDS: the codons are gathered
+    for all sequences at once with index arrays (CDS concatenated into one
+    buffer, offset + 3 * residue index), translated with the genetic code and
+    compared with the aligned residues in one pass. Gaps become '---'.
+
+    Args:
+        protein (np.ndarray): Protein alignment (n x L uint8).
+        cds (list): CDS per row (None when missing).
+        max_mismatch (float): Highest share of residues whose codon may translate differently
+            (X in the protein and ambiguous codons are not counted).
+
+    Returns:
+        tuple: (codon alignment n x 3L uint8, status per row: "ok", "missing_cds", "short_cds" or "mismatch",
+                mismatch share per row).
+    """
+    import numpy as np
+
+    n, length = protein.shape
+    is_residue = protein != ord("-")
+    n_residues = is_residue.sum(axis=1)
+    cds = [(c or "").upper() for c in cds]
+    cds_len = np.array([len(c) for c in cds], dtype=np.int64)
+    status = np.full(n, "ok", dtype=object)
+    status[cds_len == 0] = "missing_cds"
+    # The CDS needs a codon per residue (a trailing stop codon or a missing one are both fine)
+    status[(cds_len > 0) & (cds_len < 3 * n_residues)] = "short_cds"
+    usable = status == "ok"
+
+    buffer = np.frombuffer("".join(cds).encode("ascii", "replace") + b"NNN", dtype=np.uint8)
+    offsets = np.concatenate([[0], np.cumsum(cds_len)[:-1]])
+    residue_index = np.cumsum(is_residue, axis=1) - 1
+    gather = is_residue & usable[:, None]
+    # Start of the codon of every aligned residue; gaps and unusable rows point at the padding
+    starts = np.where(gather, offsets[:, None] + 3 * residue_index, len(buffer) - 3)
+    codons = np.stack([buffer[starts], buffer[starts + 1], buffer[starts + 2]], axis=-1)
+
+    codes = _nucleotide_codes()[codons]
+    ambiguous = (codes == 4).any(axis=-1)
+    table = np.frombuffer(GENETIC_CODE.encode(), dtype=np.uint8)
+    translated = table[np.where(ambiguous, 0, codes[..., 0] * 16 + codes[..., 1] * 4 + codes[..., 2])]
+    checked = gather & ~ambiguous & (protein != ord("X"))
+    mismatches = (checked & (translated != protein)).sum(axis=1)
+    share = np.divide(mismatches, checked.sum(axis=1), out=np.zeros(n), where=checked.sum(axis=1) > 0)
+    status[usable & (share > max_mismatch)] = "mismatch"
+
+    codons[~is_residue] = ord("-")
+    return codons.reshape(n, 3 * length), status, share
+
+
+def fetch_cds(ids: list, cds_dir: str) -> dict:
+    """
+    CDS of Portal-ID sequence ids from <cds_dir>/<portal>.fasta.gz (indexed BGZF).
+    """
+    from src.utils.storageutils import IndexedFasta
+
+    by_portal = {}
+    for seq_id in ids:
+        by_portal.setdefault(portal_of(seq_id), []).append(seq_id)
+    found = {}
+    for portal, names in by_portal.items():
+        path = os.path.join(cds_dir, f"{portal}.fasta.gz")
+        if os.path.exists(path + ".fai"):
+            found.update(IndexedFasta(path, names).fetch(names))
+    return found
+
+
+def codon_align_family(trim_path: str, align_path: str, out_path: str, cds_dir: str,
+                       max_mismatch: float = CODON_MAX_MISMATCH, column_map_path: str | None = None) -> dict:
+    """
+    Codon alignment matching a trimmed protein alignment.
+
+    The untrimmed alignment gives every residue's position in its protein
+    (hence its codon); the trimAl column map (or column matching) gives the
+    columns the trimmed alignment kept, and the codon alignment keeps the
+    same columns. Rows without a consistent CDS are left out.
+
+    Args:
+        trim_path (str): Trimmed protein alignment.
+        align_path (str): Untrimmed protein alignment it was trimmed from.
+        out_path (str): Codon alignment FASTA to write.
+        cds_dir (str): Renamed CDS folder (<portal>.fasta.gz with .fai/.gzi).
+        max_mismatch (float): See back_translate.
+        column_map_path (str | None): trimAl -colnumbering output.
+
+    Returns:
+        dict: Summary (see CODON_LOG_COLUMNS).
+    """
+    import numpy as np
+
+    trim_ids, trimmed = read_alignment(trim_path)
+    full_ids, full = read_alignment(align_path)
+    position = {seq_id: i for i, seq_id in enumerate(full_ids)}
+    if any(seq_id not in position for seq_id in trim_ids):
+        raise ValueError(f"{trim_path} has sequences missing from {align_path}")
+    full = full[[position[seq_id] for seq_id in trim_ids]]
+    column_map = read_column_map(column_map_path) if column_map_path and os.path.exists(column_map_path) else None
+    cols, source = kept_columns(full, trimmed, column_map)
+
+    cds = fetch_cds(trim_ids, cds_dir)
+    codons, status, _ = back_translate(full, [cds.get(seq_id) for seq_id in trim_ids], max_mismatch)
+    codon_cols = (3 * cols[:, None] + np.arange(3)).ravel()
+    kept = codons[:, codon_cols]
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for i in np.flatnonzero(status == "ok"):
+            write_fasta_record(f, trim_ids[i], kept[i].tobytes().decode())
+    os.replace(tmp_path, out_path)
+    return {
+        "family": os.path.basename(out_path).rsplit(".", 1)[0],
+        "n_seqs": len(trim_ids),
+        "n_out": int((status == "ok").sum()),
+        **{s: int((status == s).sum()) for s in ("missing_cds", "short_cds", "mismatch")},
+        "protein_columns": int(trimmed.shape[1]),
+        "codon_columns": int(len(codon_cols)),
+        "column_map": source,
+    }
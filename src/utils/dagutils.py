@@ -0,0 +1,340 @@
+import os
+import glob
+import shlex
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Rule:
+    """
+    One pipeline stage.
+
+    A plain rule runs a single command that turns `inputs` into `outputs`. A
+    per-file rule (`foreach` set) runs `cmd` once per file matching the `foreach`
+    glob, with `{input}`, `{output}`, `{stem}` and `{threads}` filled in and the
+    output path built from the `out` template. Its `stale(input, output)`
+    callable, if given, replaces the mtime check of each file.
+    """
+
+    def __init__(self, name, cmd, inputs=(), outputs=(), deps=(), foreach=None, out=None,
+                 threads=1, mem="2G", time="01:00:00", stale=None):
+        self.name = name
+        self.cmd = cmd
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.deps = list(deps)
+        self.foreach = foreach
+        self.out = out
+        self.threads = threads
+        self.mem = mem
+        self.time = time
+        self.stale = stale
+
+
+def path_mtime(path):
+    """
+    Modification time of a file, or of the newest file directly inside a folder.
+
+    Returns:
+        float | None: mtime, or None if the path is missing, empty or an empty folder.
+    """
+    if os.path.isdir(path):
+        mtimes = [e.stat().st_mtime for e in os.scandir(path) if e.is_file() and e.stat().st_size > 0]
+        return max(mtimes) if mtimes else None
+    if os.path.isfile(path) and os.path.getsize(path) > 0:
+        return os.path.getmtime(path)
+    return None
+
+
+def is_stale(inputs, outputs):
+    """
+    Make-style check: an output is missing/empty or older than the newest input.
+    """
+    out_mtimes = [path_mtime(p) for p in outputs]
+    if not outputs or any(m is None for m in out_mtimes):
+        return True
+    in_mtimes = [m for m in (path_mtime(p) for p in inputs) if m is not None]
+    return bool(in_mtimes) and max(in_mtimes) > min(out_mtimes)
+
+
+def topological_order(rules):
+    """
+    Order rules so that every rule comes after its dependencies.
+
+    Raises:
+        ValueError: On unknown dependencies or cycles.
+    """
+    by_name = {r.name: r for r in rules}
+    order, state = [], {}
+
+    def visit(name, chain):
+        if name not in by_name:
+            raise ValueError(f"Unknown dependency '{name}' (from {' -> '.join(chain)})")
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Dependency cycle: {' -> '.join(chain + [name])}")
+        state[name] = "visiting"
+        for dep in by_name[name].deps:
+            visit(dep, chain + [name])
+        state[name] = "done"
+        order.append(by_name[name])
+
+    for r in rules:
+        visit(r.name, [])
+    return order
+
+
+def expand_tasks(rule, force=False):
+    """
+    Expand a rule into its out-of-date tasks.
+
+    Returns:
+        list: Dicts with 'cmd', 'inputs' and 'outputs' of each task to run.
+    """
+    if rule.foreach is None:
+        if force or is_stale(rule.inputs, rule.outputs):
+            return [{"cmd": rule.cmd.format(threads=rule.threads), "inputs": rule.inputs, "outputs": rule.outputs}]
+        return []
+    stale = rule.stale or (lambda path, output: is_stale([path], [output]))
+    tasks = []
+    for path in sorted(glob.glob(rule.foreach)):
+        name = os.path.basename(path)
+        stem = name.rsplit(".", 1)[0]
+        output = rule.out.format(stem=stem, name=name)
+        if force or stale(path, output):
+            tasks.append({
+                "cmd": rule.cmd.format(input=shlex.quote(path), output=shlex.quote(output),
+                                       stem=stem, threads=rule.threads),
+                "inputs": [path],
+                "outputs": [output],
+            })
+    return tasks
+
+
+def select_rules(rules, targets=None, start=None):
+    """
+    Restrict the pipeline to targets (and what they need) and/or to `start`
+    (a rule name or a list of them) and everything downstream of it.
+    """
+    order = topological_order(rules)
+    keep = {r.name for r in order}
+    if targets:
+        by_name = {r.name: r for r in order}
+        needed, stack = set(), list(targets)
+        while stack:
+            n = stack.pop()
+            if n not in needed:
+                needed.add(n)
+                stack.extend(by_name[n].deps)
+        keep &= needed
+    if start:
+        downstream = {start} if isinstance(start, str) else set(start)
+        for r in order:
+            if any(d in downstream for d in r.deps):
+                downstream.add(r.name)
+        keep &= downstream
+    return [r for r in order if r.name in keep]
+
+
+def plan(rules, force=()):
+    """
+    Compute which rules have work to do.
+
+    A per-file rule downstream of a rule with pending work cannot be expanded
+    yet (its input files do not exist), so it is marked as deferred.
+
+    Returns:
+        list: (rule, tasks, deferred) tuples in execution order.
+    """
+    # Deps outside the selection are treated as done and up to date
+    dirty = set()
+    result = []
+    for rule in rules:
+        upstream_dirty = any(d in dirty for d in rule.deps)
+        if rule.foreach is not None and upstream_dirty:
+            result.append((rule, [], True))
+            dirty.add(rule.name)
+            continue
+        tasks = expand_tasks(rule, force=rule.name in force or (upstream_dirty and rule.foreach is None))
+        if tasks:
+            dirty.add(rule.name)
+        result.append((rule, tasks, False))
+    return result
+
+
+def print_plan(planned):
+    for rule, tasks, deferred in planned:
+        if deferred:
+            status = "deferred (expands after upstream rules finish)"
+        elif tasks:
+            status = f"{len(tasks)} task(s) to run"
+        else:
+            status = "up to date"
+        print(f"  {rule.name:<16} {status}")
+        for t in tasks[:3]:
+            print(f"      $ {t['cmd']}")
+        if len(tasks) > 3:
+            print(f"      ... and {len(tasks) - 3} more")
+
+
+def _run_task(task, log_path):
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    for out in task["outputs"]:
+        parent = os.path.dirname(out)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+    before = {out: path_mtime(out) for out in task["outputs"]}
+    with open(log_path, "a") as log:
+        log.write(f"$ {task['cmd']}\n")
+        log.flush()
+        rc = subprocess.run(task["cmd"], shell=True, stdout=log, stderr=subprocess.STDOUT).returncode
+    if rc != 0:
+        # Never leave a partial output file that would look up to date next time
+        for out in task["outputs"]:
+            if os.path.isfile(out) and path_mtime(out) != before[out]:
+                os.remove(out)
+    return rc
+
+
+def run_local(rules, jobs, log_dir, force=()):
+    """
+    Run the pipeline on this machine with a pool of `jobs` concurrent tasks.
+
+    Rules start as soon as their dependencies finish; per-file tasks of a rule
+    and tasks of independent rules share the pool.
+
+    Returns:
+        dict: Rule name -> 'done', 'failed' or 'skipped'.
+    """
+    status = {}
+    remaining = {r.name: r for r in rules}
+    running = {}           # future -> rule name
+    open_tasks = {}        # rule name -> number of unfinished tasks
+    failed_rules = set()
+    dirty = set()
+    selected = set(remaining)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while remaining or running:
+            for name, rule in list(remaining.items()):
+                deps = [d for d in rule.deps if d in selected]
+                if any(d in failed_rules or status.get(d) == "skipped" for d in deps):
+                    status[name] = "skipped"
+                    del remaining[name]
+                    continue
+                if not all(status.get(d) in ("done", "up to date") for d in deps):
+                    continue
+                upstream_dirty = any(d in dirty for d in deps)
+                tasks = expand_tasks(rule, force=name in force or (upstream_dirty and rule.foreach is None))
+                del remaining[name]
+                if not tasks:
+                    status[name] = "up to date"
+                    continue
+                dirty.add(name)
+                print(f"▶ {name}: {len(tasks)} task(s)")
+                open_tasks[name] = len(tasks)
+                for task in tasks:
+                    fut = pool.submit(_run_task, task, os.path.join(log_dir, f"{name}.log"))
+                    running[fut] = name
+
+            if not running:
+                continue
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = running.pop(fut)
+                if fut.result() != 0:
+                    failed_rules.add(name)
+                open_tasks[name] -= 1
+                if open_tasks[name] == 0:
+                    status[name] = "failed" if name in failed_rules else "done"
+                    mark = "❌" if name in failed_rules else "✅"
+                    print(f"{mark} {name} {status[name]} (log: {os.path.join(log_dir, name + '.log')})")
+    return status
+
+
+def _sbatch(args, dry_run, label):
+    cmd = ["sbatch", "--parsable", *args]
+    if dry_run:
+        print("      " + " ".join(shlex.quote(c) for c in cmd))
+        return f"<{label}>"
+    out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+    return out.split(";")[0]
+
+
+def run_slurm(rules, log_dir, account, partition, continuation_cmd, max_array=380, dry_run=False, force=()):
+    """
+    Submit the pipeline to SLURM, one job (or job array) per rule, chained with
+    --dependency=afterok. Deferred per-file rules and everything downstream of
+    them are handled by one small continuation job that re-plans from those
+    rules once the jobs they need succeed; independent rules are submitted now.
+
+    Args:
+        rules (list): Selected rules in topological order.
+        log_dir (str): Folder for task lists and SLURM logs.
+        account (str): SLURM account.
+        partition (str): SLURM partition.
+        continuation_cmd (str): Command prefix re-invoking the runner, '--start <rule> ...' is appended.
+        max_array (int): Maximum array size; larger task lists run several tasks per element.
+        dry_run (bool): Print sbatch commands instead of submitting.
+
+    Returns:
+        dict: Rule name -> job id (None when up to date).
+    """
+    if not dry_run:
+        os.makedirs(log_dir, exist_ok=True)
+    job_ids = {}
+    selected = {r.name for r in rules}
+    common = [f"--account={account}", f"--partition={partition}",
+              f"--output={os.path.join(log_dir, '%x_%A_%a.out')}"]
+    # Deferred rules whose upstream is not deferred (the continuation starts there),
+    # and all rules left to the continuation job
+    starts, later = [], {}
+    for rule, tasks, deferred in plan(rules, force):
+        if any(d in later for d in rule.deps):
+            later[rule.name] = rule
+            continue
+        if deferred:
+            starts.append(rule.name)
+            later[rule.name] = rule
+            continue
+        if not tasks:
+            job_ids[rule.name] = None
+            continue
+
+        deps = [job_ids[d] for d in rule.deps if d in selected and job_ids.get(d)]
+        dependency = ["--dependency=afterok:" + ":".join(deps)] if deps else []
+        if len(tasks) == 1:
+            wrap = tasks[0]["cmd"]
+            array = []
+        else:
+            task_file = os.path.join(log_dir, f"{rule.name}.tasks")
+            if not dry_run:
+                with open(task_file, "w") as f:
+                    f.write("\n".join(t["cmd"] for t in tasks) + "\n")
+            n = min(len(tasks), max_array)
+            # Element i runs lines i, i+n, i+2n, ... so no array-size cap applies
+            wrap = (f"awk -v n={n} -v i=$SLURM_ARRAY_TASK_ID '(NR-i)%n==0' {shlex.quote(task_file)} "
+                    f"| while IFS= read -r c; do bash -c \"$c\" || exit 1; done")
+            array = [f"--array=1-{n}%100"]
+        print(f"  {rule.name}: {len(tasks)} task(s)")
+        resources = [f"--cpus-per-task={rule.threads}", f"--mem={rule.mem}", f"--time={rule.time}"]
+        job_ids[rule.name] = _sbatch(common + [f"--job-name=pipe_{rule.name}"] + dependency + resources + array
+                                     + ["--wrap", wrap], dry_run, rule.name)
+        if not dry_run:
+            time.sleep(1)
+
+    if starts:
+        # The continuation waits for every submitted job a deferred rule (or a rule after it) needs
+        deps = sorted({job_ids[d] for r in later.values() for d in r.deps
+                       if d in selected and d not in later and job_ids.get(d)})
+        dependency = ["--dependency=afterok:" + ":".join(deps)] if deps else []
+        print(f"  {', '.join(later)}: continuation job" + (f" after {', '.join(deps)}" if deps else ""))
+        job_id = _sbatch(common + [f"--job-name=pipe_{starts[0]}"] + dependency
+                         + ["--cpus-per-task=1", "--mem=1G", "--time=00:30:00",
+                            "--wrap", f"{continuation_cmd} --start {' '.join(starts)}"],
+                         dry_run, starts[0])
+        for name in later:
+            job_ids[name] = job_id
+    return job_ids
@@ -0,0 +1,167 @@
+import os
+import csv
+import gzip
+import hashlib
+from collections import defaultdict
+import pandas as pd
+
+from src.utils.sequtils import iter_fasta, write_fasta_record, normalize_protein, portal_of, fasta_stem
+
+MAP_COLUMNS = ["md5", "representative", "member"]
+
+
+def collapse_identical_sequences(fasta_paths: list, out_dir: str, map_path: str) -> pd.DataFrame:
+    """
+    Write non-redundant copies of the proteomes, keeping the first occurrence of
+    every distinct sequence (within and across portals).
+
+    Proteomes are processed in the given order, so a sequence is represented by
+    the protein of the first portal that contains it. Portals whose proteins are
+    all represented elsewhere get no output file.
+
+    Args:
+        fasta_paths (list): Input proteomes (<portal>.fasta), in priority order.
+        out_dir (str): Folder for the non-redundant proteomes.
+        map_path (str): TSV written with md5, representative and member ids
+                        (one row per original protein, representatives included).
+
+    Returns:
+        pd.DataFrame: Per-portal counts (portal, total_sequences, kept_sequences, collapsed_sequences).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # 16-byte digests keep the index small for millions of proteins
+    representatives = {}
+    stats = []
+    with open(map_path, "w", newline="") as map_f:
+        writer = csv.writer(map_f, delimiter="\t")
+        writer.writerow(MAP_COLUMNS)
+        for path in fasta_paths:
+            portal = fasta_stem(path)
+            out_path = os.path.join(out_dir, f"{portal}.fasta")
+            tmp_path = out_path + ".tmp"
+            total = kept = 0
+            with open(tmp_path, "w") as out:
+                for header, seq in iter_fasta(path):
+                    seq_id = header.split(None, 1)[0]
+                    digest = hashlib.md5(normalize_protein(seq).encode()).digest()
+                    total += 1
+                    rep = representatives.get(digest)
+                    if rep is None:
+                        representatives[digest] = rep = seq_id
+                        write_fasta_record(out, seq_id, seq)
+                        kept += 1
+                    writer.writerow([digest.hex().upper(), rep, seq_id])
+            if kept:
+                os.replace(tmp_path, out_path)
+            else:
+                os.remove(tmp_path)
+                if os.path.exists(out_path):
+                    os.remove(out_path)
+            stats.append({
+                "portal": portal,
+                "total_sequences": total,
+                "kept_sequences": kept,
+                "collapsed_sequences": total - kept,
+            })
+    return pd.DataFrame(stats)
+
+
+def load_member_map(map_path: str) -> pd.DataFrame:
+    """
+    Load a representative -> member map written by collapse_identical_sequences.
+
+    Returns:
+        pd.DataFrame: Columns md5, representative, member, member_portal.
+    """
+    df = pd.read_csv(map_path, sep="\t", dtype=str)
+    df["member_portal"] = df["member"].str.split("-", n=1).str[0]
+    return df
+
+
+def expand_iprscan_results(tsv_paths: list, member_map: pd.DataFrame, out_dir: str,
+                           chunksize: int = 1_000_000) -> int:
+    """
+    Expand InterProScan TSV rows of representatives to every original protein.
+
+    Rows are routed to <out_dir>/<member_portal>.tsv.gz, so each portal again gets
+    the annotations of all its proteins, whichever portal's run produced them.
+
+    Args:
+        tsv_paths (list): InterProScan outputs of the non-redundant proteomes.
+        member_map (pd.DataFrame): Output of load_member_map.
+        out_dir (str): Folder for the expanded per-portal TSVs (replaced).
+        chunksize (int): Rows per streamed chunk.
+
+    Returns:
+        int: Number of rows written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for portal in member_map["member_portal"].unique():
+        path = os.path.join(out_dir, f"{portal}.tsv.gz")
+        if os.path.exists(path):
+            os.remove(path)
+
+    members = member_map.set_index("representative")[["member", "member_portal"]]
+    written = 0
+    for tsv_path in tsv_paths:
+        reader = pd.read_csv(tsv_path, sep="\t", header=None, dtype=str, keep_default_na=False,
+                             chunksize=chunksize)
+        for chunk in reader:
+            expanded = chunk.merge(members, left_on=0, right_index=True, how="inner")
+            expanded[0] = expanded.pop("member")
+            for portal, rows in expanded.groupby("member_portal", sort=False):
+                rows = rows.drop(columns="member_portal")
+                # Appending gzip members yields a valid multi-member .gz file
+                with gzip.open(os.path.join(out_dir, f"{portal}.tsv.gz"), "at") as out:
+                    rows.to_csv(out, sep="\t", header=False, index=False)
+                written += len(rows)
+    return written
+
+
+def expand_orthogroups(orthogroups_path: str, member_map: pd.DataFrame, out_path: str,
+                       gene_count_path: str | None = None) -> pd.DataFrame:
+    """
+    Expand an OrthoFinder Orthogroups.tsv computed on non-redundant proteomes.
+
+    Every representative gene is replaced by all of its members, each placed in
+    its own portal's column, so portals that lost all proteins to deduplication
+    reappear as columns.
+
+    Args:
+        orthogroups_path (str): OrthoFinder Orthogroups.tsv.
+        member_map (pd.DataFrame): Output of load_member_map.
+        out_path (str): Expanded Orthogroups.tsv to write.
+        gene_count_path (str | None): Optionally also write Orthogroups.GeneCount.tsv.
+
+    Returns:
+        pd.DataFrame: Gene counts per orthogroup and portal.
+    """
+    members = defaultdict(list)
+    for rep, member in zip(member_map["representative"], member_map["member"]):
+        members[rep].append(member)
+    portals = sorted(member_map["member_portal"].unique())
+
+    rows = []
+    with open(orthogroups_path, "r") as f:
+        header = f.readline().rstrip("\n").split("\t")
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            by_portal = defaultdict(list)
+            for cell in fields[1:]:
+                for gene in filter(None, (g.strip() for g in cell.split(","))):
+                    for member in members.get(gene, [gene]):
+                        by_portal[portal_of(member)].append(member)
+            rows.append((fields[0], by_portal))
+
+    counts = []
+    with open(out_path, "w") as out:
+        out.write("\t".join([header[0]] + portals) + "\n")
+        for og, by_portal in rows:
+            out.write("\t".join([og] + [", ".join(by_portal.get(p, [])) for p in portals]) + "\n")
+            counts.append([og] + [len(by_portal.get(p, [])) for p in portals])
+
+    count_df = pd.DataFrame(counts, columns=["Orthogroup"] + portals)
+    count_df["Total"] = count_df[portals].sum(axis=1)
+    if gene_count_path:
+        count_df.to_csv(gene_count_path, sep="\t", index=False)
+    return count_df
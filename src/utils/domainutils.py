@@ -0,0 +1,224 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from scipy import sparse
+
+from src.utils.sequtils import open_text
+
+# Columns of the InterProScan TSV output (with --goterms --pathways)
+IPRSCAN_COLUMNS = [
+    "protein_id", "md5", "length", "analysis", "signature_accession",
+    "signature_description", "start", "stop", "score", "status", "date",
+    "interpro_accession", "interpro_description", "go_terms", "pathways",
+]
+IPRSCAN_DTYPES = {
+    "protein_id": "string",
+    "md5": "string",
+    "length": "int32",
+    "analysis": "category",
+    "signature_accession": "string",
+    "signature_description": "string",
+    "start": "int32",
+    "stop": "int32",
+    "score": "float64",
+    "status": "category",
+    "date": "string",
+    "interpro_accession": "string",
+    "interpro_description": "string",
+    "go_terms": "string",
+    "pathways": "string",
+}
+
+
+def read_iprscan_chunks(tsv_path: str, chunksize: int = 1_000_000):
+    """
+    Stream an InterProScan TSV (.tsv or .tsv.gz) as typed DataFrame chunks.
+
+    Args:
+        tsv_path (str): Path to the TSV file.
+        chunksize (int): Rows per chunk.
+
+    Yields:
+        pd.DataFrame: Chunk with IPRSCAN_COLUMNS; '-' placeholders and absent
+        optional columns (rows with only the 11 base columns, written when a
+        match has no InterPro/GO/pathway annotation) become missing values.
+    """
+    with open_text(tsv_path) as f:
+        n_fields = len(f.readline().split("\t"))
+    # Shorter rows are padded by the parser; usecols only drops extra trailing columns,
+    # and would reject a file whose first row has just the base columns
+    usecols = range(len(IPRSCAN_COLUMNS)) if n_fields > len(IPRSCAN_COLUMNS) else None
+    optional = ["", "-"]
+    reader = pd.read_csv(
+        tsv_path, sep="\t", header=None, names=IPRSCAN_COLUMNS,
+        dtype={k: v for k, v in IPRSCAN_DTYPES.items() if v not in ("int32", "float64")},
+        na_values={"score": ["-"], "interpro_accession": optional, "interpro_description": optional,
+                   "go_terms": optional, "pathways": optional, "signature_description": ["-"]},
+        keep_default_na=False, chunksize=chunksize, usecols=usecols,
+    )
+    for chunk in reader:
+        chunk["length"] = chunk["length"].astype("int32")
+        chunk["start"] = chunk["start"].astype("int32")
+        chunk["stop"] = chunk["stop"].astype("int32")
+        chunk["score"] = pd.to_numeric(chunk["score"], errors="coerce")
+        yield chunk
+
+
+def ingest_iprscan_tsv(tsv_path: str, portal: str, dataset_dir: str,
+                       domain_column: str = "signature_accession", chunksize: int = 1_000_000) -> dict:
+    """
+    Convert one portal's InterProScan TSV into Parquet partitions portal=<p>/analysis=<app>.
+
+    Existing partitions of the portal are replaced, so re-ingesting is idempotent.
+
+    Args:
+        tsv_path (str): Path to <portal>.tsv(.gz).
+        portal (str): Portal name.
+        dataset_dir (str): Root folder of the Parquet dataset.
+        domain_column (str): Column used as the domain identifier for the matrices.
+        chunksize (int): Rows per streamed chunk.
+
+    Returns:
+        dict: 'portal', 'rows', and the unique 'proteins' / 'domains' pairs (np.ndarray).
+    """
+    portal_dir = os.path.join(dataset_dir, f"portal={portal}")
+    shutil.rmtree(portal_dir, ignore_errors=True)
+
+    rows = 0
+    pairs = []
+    for i, chunk in enumerate(read_iprscan_chunks(tsv_path, chunksize)):
+        rows += len(chunk)
+        chunk["portal"] = portal
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        pq.write_to_dataset(
+            table, dataset_dir, partition_cols=["portal", "analysis"],
+            basename_template=f"part-{i:05d}-{{i}}.parquet",
+        )
+        sub = chunk[["protein_id", domain_column]].dropna().drop_duplicates()
+        pairs.append(sub)
+
+    pairs = pd.concat(pairs).drop_duplicates() if pairs else pd.DataFrame(columns=["protein_id", domain_column])
+    return {
+        "portal": portal,
+        "rows": rows,
+        "proteins": pairs["protein_id"].to_numpy(dtype=object),
+        "domains": pairs[domain_column].to_numpy(dtype=object),
+    }
+
+
+def read_portal_pairs(dataset_dir: str, portal: str, domain_column: str = "signature_accession") -> dict:
+    """
+    Read the unique protein/domain pairs of an already ingested portal from Parquet.
+    """
+    table = pq.read_table(
+        os.path.join(dataset_dir, f"portal={portal}"),
+        columns=["protein_id", domain_column],
+    )
+    pairs = table.to_pandas().dropna().drop_duplicates()
+    return {
+        "portal": portal,
+        "rows": table.num_rows,
+        "proteins": pairs["protein_id"].to_numpy(dtype=object),
+        "domains": pairs[domain_column].to_numpy(dtype=object),
+    }
+
+
+def build_domain_matrices(portal_pairs: list) -> dict:
+    """
+    Build sparse protein x domain and portal x domain matrices.
+
+    Args:
+        portal_pairs (list): Dicts with 'portal', 'proteins' and 'domains' as returned
+                             by ingest_iprscan_tsv / read_portal_pairs.
+
+    Returns:
+        dict:
+            'protein_domain' (csr, bool): protein has domain.
+            'portal_domain' (csr, int32): number of proteins per portal with the domain.
+            'proteins', 'domains', 'portals' (np.ndarray): row/column labels.
+            'protein_portal' (np.ndarray): row index into 'portals' for each protein.
+    """
+    portals = np.array([p["portal"] for p in portal_pairs], dtype=object)
+    all_proteins = np.concatenate([p["proteins"] for p in portal_pairs]) if portal_pairs else np.array([], dtype=object)
+    all_domains = np.concatenate([p["domains"] for p in portal_pairs]) if portal_pairs else np.array([], dtype=object)
+    pair_portal = np.repeat(np.arange(len(portal_pairs)), [len(p["proteins"]) for p in portal_pairs])
+
+    protein_codes, proteins = pd.factorize(all_proteins, sort=True)
+    domain_codes, domains = pd.factorize(all_domains, sort=True)
+
+    protein_domain = sparse.csr_matrix(
+        (np.ones(len(protein_codes), dtype=bool), (protein_codes, domain_codes)),
+        shape=(len(proteins), len(domains)),
+    )
+    protein_portal = np.zeros(len(proteins), dtype=np.int32)
+    protein_portal[protein_codes] = pair_portal
+
+    # Portal x domain counts: sum protein rows per portal via an indicator matrix
+    indicator = sparse.csr_matrix(
+        (np.ones(len(proteins), dtype=np.int32), (protein_portal, np.arange(len(proteins)))),
+        shape=(len(portals), len(proteins)),
+    )
+    portal_domain = (indicator @ protein_domain.astype(np.int32)).tocsr()
+
+    return {
+        "protein_domain": protein_domain,
+        "portal_domain": portal_domain,
+        "proteins": np.asarray(proteins, dtype=object),
+        "domains": np.asarray(domains, dtype=object),
+        "portals": portals,
+        "protein_portal": protein_portal,
+    }
+
+
+def save_domain_matrices(out_dir: str, matrices: dict):
+    """
+    Save the matrices from build_domain_matrices as .npz files plus label arrays.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sparse.save_npz(os.path.join(out_dir, "protein_domain.npz"), matrices["protein_domain"])
+    sparse.save_npz(os.path.join(out_dir, "portal_domain.npz"), matrices["portal_domain"])
+    np.savez_compressed(
+        os.path.join(out_dir, "labels.npz"),
+        proteins=matrices["proteins"].astype(str),
+        domains=matrices["domains"].astype(str),
+        portals=matrices["portals"].astype(str),
+        protein_portal=matrices["protein_portal"],
+    )
+
+
+def load_domain_matrices(out_dir: str) -> dict:
+    """
+    Load matrices saved by save_domain_matrices.
+    """
+    with np.load(os.path.join(out_dir, "labels.npz")) as labels:
+        result = {k: labels[k] for k in labels.files}
+    result["protein_domain"] = sparse.load_npz(os.path.join(out_dir, "protein_domain.npz")).tocsr()
+    result["portal_domain"] = sparse.load_npz(os.path.join(out_dir, "portal_domain.npz")).tocsr()
+    return result
+
+
+def orthogroup_domain_matrix(matrices: dict, orthogroups: pd.Series) -> tuple:
+    """
+    Collapse a protein x domain matrix to orthogroup x domain protein counts.
+
+    Args:
+        matrices (dict): Output of build_domain_matrices / load_domain_matrices.
+        orthogroups (pd.Series): Orthogroup id indexed by protein id (Portal-ID).
+
+    Returns:
+        tuple:
+            csr_matrix: Orthogroup x domain counts of member proteins with the domain.
+            np.ndarray: Orthogroup labels.
+    """
+    og = pd.Series(matrices["proteins"]).map(orthogroups)
+    keep = og.notna().to_numpy()
+    og_codes, og_labels = pd.factorize(og[keep], sort=True)
+    rows = np.flatnonzero(keep)
+    indicator = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (og_codes, rows)),
+        shape=(len(og_labels), len(matrices["proteins"])),
+    )
+    return (indicator @ matrices["protein_domain"].astype(np.int32)).tocsr(), np.asarray(og_labels, dtype=object)
@@ -0,0 +1,475 @@
+import os
+import re
+
+from config import ENRICH_MIN_TERM_SIZE, ENRICH_FDR, ENRICH_EXPANSION_RATIO, ENRICH_MIN_CLADE_COPIES
+
+# InterProScan >= 5.64 appends the source to GO terms: "GO:0003677(InterPro)"
+_TERM_SOURCE = re.compile(r"\([^)]*\)$")
+
+
+def read_portal_terms(path: str, portal: str, column: str = "go_terms") -> dict:
+    """
+    Unique protein/term pairs of one portal's InterProScan results.
+
+    Args:
+        path (str): The portal's partition of the Parquet dataset (portal=<p>) or its TSV(.gz).
+        portal (str): Portal name.
+        column (str): "go_terms" or "pathways" ('|'-separated lists, e.g. "Reactome: R-HSA-1234").
+
+    Returns:
+        dict: 'portal', 'rows', and the unique 'proteins' / 'terms' pairs (np.ndarray).
+    """
+    import pandas as pd
+
+    if os.path.isdir(path):
+        import pyarrow.parquet as pq
+
+        df = pq.read_table(path, columns=["protein_id", column]).to_pandas()
+    else:
+        from src.utils.domainutils import read_iprscan_chunks
+
+        df = pd.concat([chunk[["protein_id", column]] for chunk in read_iprscan_chunks(path)], ignore_index=True)
+    rows = len(df)
+    df = df.dropna().drop_duplicates()
+    exploded = df.assign(term=df[column].str.split("|")).explode("term")
+    terms = exploded["term"].str.replace(_TERM_SOURCE, "", regex=True).str.replace(" ", "", regex=False)
+    pairs = pd.DataFrame({"protein_id": exploded["protein_id"].to_numpy(), "term": terms.to_numpy()})
+    pairs = pairs[pairs["term"] != ""].drop_duplicates()
+    return {
+        "portal": portal,
+        "rows": rows,
+        "proteins": pairs["protein_id"].to_numpy(dtype=object),
+        "terms": pairs["term"].to_numpy(dtype=object),
+    }
+
+
+def _obo_terms(path: str):
+    # Yields the (key, value) lines of every [Term] stanza
+    kind, fields = None, []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                if kind == "Term":
+                    yield fields
+                kind, fields = line[1:-1], []
+            elif kind and ": " in line:
+                fields.append(line.split(": ", 1))
+    if kind == "Term":
+        yield fields
+
+
+def read_obo(path: str) -> dict:
+    """
+    Terms of an OBO ontology such as go-basic.obo.
+
+    Returns:
+        dict: Term id (alternative ids included) -> {'id' (primary id), 'name', 'namespace',
+              'parents' (is_a and part_of targets), 'obsolete'}.
+    """
+    ontology = {}
+    for fields in _obo_terms(path):
+        entry = {"id": "", "name": "", "namespace": "", "parents": [], "obsolete": False}
+        alt_ids = []
+        for key, value in fields:
+            if key in ("id", "name", "namespace"):
+                entry[key] = value
+            elif key == "alt_id":
+                alt_ids.append(value)
+            elif key == "is_a":
+                entry["parents"].append(value.split()[0])
+            elif key == "relationship" and value.startswith("part_of "):
+                entry["parents"].append(value.split()[1])
+            elif key == "is_obsolete":
+                entry["obsolete"] = value == "true"
+        if entry["id"]:
+            for term_id in [entry["id"]] + alt_ids:
+                ontology[term_id] = entry
+    return ontology
+
+
+def propagate_terms(protein_term, terms, ontology: dict) -> tuple:
+    """
+    Add the ancestors (is_a / part_of) of every annotated term.
+
+    The ancestor closure of the annotated terms is grown one level per sparse
+    product with the parent matrix, then applied to all proteins at once.
+    Alternative ids become their primary term; terms missing from the
+    ontology are kept as they are.
+
+    Args:
+        protein_term (csr_matrix): Protein x term incidence.
+        terms (np.ndarray): Term labels of its columns.
+        ontology (dict): Output of read_obo.
+
+    Returns:
+        tuple: (csr_matrix protein x term incidence with ancestors, np.ndarray term labels).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    primary = [ontology[t]["id"] if t in ontology else t for t in terms]
+    labels = sorted({entry["id"] for entry in ontology.values()} | set(primary))
+    code = {t: i for i, t in enumerate(labels)}
+    rows, cols = [], []
+    for t in labels:
+        for parent in ontology[t]["parents"] if t in ontology else ():
+            if parent in code:
+                rows.append(code[t])
+                cols.append(code[parent])
+    parents = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(len(labels),) * 2)
+
+    closure = sparse.csr_matrix(
+        (np.ones(len(terms), dtype=np.int32), (np.arange(len(terms)), [code[t] for t in primary])),
+        shape=(len(terms), len(labels)),
+    )
+    while True:
+        grown = ((closure + closure @ parents) > 0).astype(np.int32).tocsr()
+        if grown.nnz == closure.nnz:
+            break
+        closure = grown
+    propagated = ((protein_term.astype(np.int32) @ closure) > 0).tocsr()
+    keep = np.flatnonzero(propagated.getnnz(axis=0))
+    return propagated[:, keep].tocsr(), np.asarray(labels, dtype=object)[keep]
+
+
+def build_term_matrices(portal_terms: list, ontology: dict | None = None) -> dict:
+    """
+    Build the sparse protein x term matrix (see domainutils.build_domain_matrices).
+
+    Args:
+        portal_terms (list): Dicts from read_portal_terms.
+        ontology (dict | None): read_obo output; annotations are propagated to ancestor terms.
+
+    Returns:
+        dict: 'protein_term' (csr, bool), 'proteins', 'terms', 'portals', 'protein_portal' (np.ndarray).
+    """
+    from src.utils.domainutils import build_domain_matrices
+
+    matrices = build_domain_matrices(
+        [{"portal": r["portal"], "proteins": r["proteins"], "domains": r["terms"]} for r in portal_terms])
+    protein_term, terms = matrices["protein_domain"], matrices["domains"]
+    if ontology:
+        protein_term, terms = propagate_terms(protein_term, terms, ontology)
+    return {
+        "protein_term": protein_term,
+        "proteins": matrices["proteins"],
+        "terms": terms,
+        "portals": matrices["portals"],
+        "protein_portal": matrices["protein_portal"],
+    }
+
+
+def add_orthogroup_terms(matrices: dict, orthogroups) -> dict:
+    """
+    Add orthogroup x term counts of member proteins ('orthogroup_term', int32), the
+    'orthogroups' labels and the number of annotated members of each ('orthogroup_annotated').
+
+    Args:
+        matrices (dict): Output of build_term_matrices.
+        orthogroups (pd.Series): Orthogroup id indexed by protein id (read_orthogroups).
+    """
+    import numpy as np
+    import pandas as pd
+    from src.utils.domainutils import orthogroup_domain_matrix
+
+    counts, labels = orthogroup_domain_matrix(
+        {"proteins": matrices["proteins"], "protein_domain": matrices["protein_term"]}, orthogroups)
+    # Every protein of the matrix has at least one term
+    annotated = pd.Series(matrices["proteins"]).map(orthogroups).value_counts()
+    matrices.update(orthogroup_term=counts, orthogroups=labels,
+                    orthogroup_annotated=annotated.reindex(labels).to_numpy(dtype=np.int32))
+    return matrices
+
+
+def save_term_matrices(out_dir: str, matrices: dict):
+    """
+    Save the matrices from build_term_matrices / add_orthogroup_terms as .npz files plus label arrays.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    os.makedirs(out_dir, exist_ok=True)
+    sparse.save_npz(os.path.join(out_dir, "protein_term.npz"), matrices["protein_term"])
+    labels = {k: matrices[k].astype(str) for k in ("proteins", "terms", "portals")}
+    labels["protein_portal"] = matrices["protein_portal"]
+    if "orthogroup_term" in matrices:
+        sparse.save_npz(os.path.join(out_dir, "orthogroup_term.npz"), matrices["orthogroup_term"])
+        labels.update(orthogroups=matrices["orthogroups"].astype(str),
+                      orthogroup_annotated=matrices["orthogroup_annotated"])
+    np.savez_compressed(os.path.join(out_dir, "labels.npz"), **labels)
+
+
+def load_term_matrices(out_dir: str) -> dict:
+    """
+    Load matrices saved by save_term_matrices.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    with np.load(os.path.join(out_dir, "labels.npz")) as labels:
+        result = {k: labels[k] for k in labels.files}
+    result["protein_term"] = sparse.load_npz(os.path.join(out_dir, "protein_term.npz")).tocsr()
+    og_path = os.path.join(out_dir, "orthogroup_term.npz")
+    if os.path.exists(og_path):
+        result["orthogroup_term"] = sparse.load_npz(og_path).tocsr()
+    return result
+
+
+def orthogroup_annotation(matrices: dict, min_fraction: float):
+    """
+    Orthogroup x term incidence: terms carried by at least min_fraction of the annotated members.
+    """
+    import numpy as np
+
+    counts = matrices["orthogroup_term"].tocsr()
+    rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+    incidence = counts.copy()
+    incidence.data = counts.data >= min_fraction * matrices["orthogroup_annotated"][rows]
+    incidence.eliminate_zeros()
+    return incidence.astype(bool)
+
+
+def read_orthogroups(path: str):
+    """
+    Orthogroup of every gene in an OrthoFinder Orthogroups.tsv.
+
+    Returns:
+        pd.Series: Orthogroup id indexed by protein id.
+    """
+    import pandas as pd
+
+    genes, groups = [], []
+    with open(path) as f:
+        f.readline()
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            for cell in fields[1:]:
+                members = [g.strip() for g in cell.split(",") if g.strip()]
+                genes.extend(members)
+                groups.extend([fields[0]] * len(members))
+    return pd.Series(groups, index=genes, dtype=object)
+
+
+def clade_membership(taxonomy, portals, ranks, min_portals: int) -> tuple:
+    """
+    Clades of the portal taxonomy as a clade x portal indicator matrix.
+
+    A clade is a taxon at one of the ranks (ncbi_taxon_<rank>) with at least
+    min_portals portals; taxa holding every portal have no background and are left out.
+
+    Args:
+        taxonomy (pd.DataFrame): build_phylogeny_data output ('organism' is the portal).
+        portals (np.ndarray): Portal labels (matrix columns).
+        ranks (Iterable[str]): Ranks, e.g. ("class", "order").
+        min_portals (int): Smallest clade.
+
+    Returns:
+        tuple: (csr_matrix clades x portals, pd.DataFrame with clade, rank and portals per row).
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    taxonomy = taxonomy.drop_duplicates("organism").set_index("organism").reindex(portals)
+    rows, cols, info = [], [], []
+    offset = 0
+    for rank in ranks:
+        column = f"ncbi_taxon_{rank}"
+        if column not in taxonomy:
+            continue
+        values = taxonomy[column].fillna("").astype(str).str.strip().to_numpy(dtype=object)
+        codes, names = pd.factorize(values, sort=True)
+        names = np.asarray(names, dtype=object)
+        sizes = np.bincount(codes, minlength=len(names))
+        valid = (names != "") & (sizes >= min_portals) & (sizes < len(portals))
+        clade_of = np.full(len(names), -1)
+        clade_of[valid] = offset + np.arange(valid.sum())
+        member = clade_of[codes] >= 0
+        rows.append(clade_of[codes][member])
+        cols.append(np.flatnonzero(member))
+        info.append(pd.DataFrame({"clade": names[valid], "rank": rank, "portals": sizes[valid]}))
+        offset += int(valid.sum())
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    membership = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(offset, len(portals)))
+    info = pd.concat(info, ignore_index=True) if info else pd.DataFrame(columns=["clade", "rank", "portals"])
+    return membership, info
+
+
+def expanded_orthogroups(counts, clades, ratio: float = ENRICH_EXPANSION_RATIO,
+                         min_copies: float = ENRICH_MIN_CLADE_COPIES, chunk: int = 256):
+    """
+    Orthogroups expanded in each clade.
+
+    An orthogroup is expanded when its mean copy number over the clade's
+    portals is at least min_copies and at least ratio times the mean over the
+    other portals. Clade sums come from sparse products (clades x portals @
+    portals x orthogroups), and only non-zero sums can qualify.
+
+    Args:
+        counts (csr_matrix): Portal x orthogroup gene counts.
+        clades (csr_matrix): Clade x portal indicator (clade_membership).
+        ratio (float): Fold over the mean of the other portals.
+        min_copies (float): Lowest mean copy number in the clade.
+        chunk (int): Clades per product.
+
+    Returns:
+        csr_matrix: Clade x orthogroup (bool).
+    """
+    import numpy as np
+    from scipy import sparse
+
+    counts = counts.tocsr().astype(np.float64)
+    total = np.asarray(counts.sum(axis=0)).ravel()
+    n_portals = counts.shape[0]
+    sizes = clades.getnnz(axis=1)
+    blocks = []
+    for start in range(0, clades.shape[0], chunk):
+        inside = (clades[start:start + chunk].astype(np.float64) @ counts).tocoo()
+        size = sizes[start + inside.row]
+        mean_in = inside.data / size
+        mean_out = (total[inside.col] - inside.data) / (n_portals - size)
+        keep = (mean_in >= min_copies) & (mean_in >= ratio * mean_out)
+        blocks.append(sparse.csr_matrix((np.ones(keep.sum(), dtype=bool), (inside.row[keep], inside.col[keep])),
+                                        shape=inside.shape))
+    if not blocks:
+        return sparse.csr_matrix((0, counts.shape[1]), dtype=bool)
+    return sparse.vstack(blocks).tocsr()
+
+
+def hypergeom_sf(k, N: int, K, n, tol: float = 1e-12):
+    """
+    P(X >= k) for X ~ Hypergeometric(N items, K with the term, n drawn), for arrays of k, K and n.
+
+    scipy.stats.hypergeom.sf takes about a millisecond per value, too slow for
+    millions of tests. Here the pmf where the tail starts comes from gammaln,
+    and the tail is summed with the pmf ratio recurrence for all values at once:
+    the upper tail when k is above the mode, otherwise the lower tail below k,
+    whose complement is the answer (p >= ~0.5 there, so nothing is lost). Both
+    tails shrink from their start, and a value stops once its next term is
+    below tol of its sum.
+
+    Returns:
+        np.ndarray: Upper tail probabilities.
+    """
+    import numpy as np
+    from scipy.special import gammaln
+
+    k, K, n = (np.asarray(a, dtype=np.float64) for a in np.broadcast_arrays(k, K, n))
+
+    def log_choose(a, b):
+        return gammaln(a + 1) - gammaln(b + 1) - gammaln(a - b + 1)
+
+    lo, hi = np.maximum(0, n + K - N), np.minimum(K, n)
+    upper = k > np.floor((n + 1) * (K + 1) / (N + 2))
+    start = np.where(upper, k, k - 1)
+    valid = (start >= lo) & (start <= hi)
+    i = np.clip(start, lo, hi)
+    term = np.where(valid, np.exp(log_choose(K, i) + log_choose(N - K, n - i) - log_choose(N, n)), 0.0)
+    total = term.copy()
+    active = np.flatnonzero(valid & (term > 0))
+    while active.size:
+        a, kk, nn, up = i[active], K[active], n[active], upper[active]
+        # pmf(i + 1) / pmf(i) upwards, pmf(i - 1) / pmf(i) downwards; both reach 0 at the support bounds
+        ratio = np.where(up, (kk - a) * (nn - a) / ((a + 1) * (N - kk - nn + a + 1)),
+                         a * (N - kk - nn + a) / ((kk - a + 1) * (nn - a + 1)))
+        term[active] *= ratio
+        total[active] += term[active]
+        i[active] = a + np.where(up, 1, -1)
+        active = active[term[active] > tol * total[active]]
+    return np.clip(np.where(upper, total, 1.0 - total), 0.0, 1.0)
+
+
+def benjamini_hochberg(p, groups, m: int):
+    """
+    Benjamini-Hochberg q-values within each group of m tests.
+
+    Only the given p-values need to be passed: the group's other tests have
+    p = 1 and rank after them, so they do not change the q-values.
+
+    Args:
+        p (np.ndarray): p-values.
+        groups (np.ndarray): Non-negative integer group of every p-value.
+        m (int): Tests per group.
+
+    Returns:
+        np.ndarray: q-values in the order of p.
+    """
+    import numpy as np
+    import pandas as pd
+
+    order = np.lexsort((p, groups))
+    p_sorted, g_sorted = p[order], groups[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(g_sorted)) + 1] if len(p) else np.zeros(0, dtype=np.int64)
+    rank = np.arange(len(p)) - np.repeat(starts, np.diff(np.r_[starts, len(p)])) + 1
+    q = np.minimum(p_sorted * m / rank, 1.0)
+    # Running minimum from the largest p down within every group
+    q = pd.Series(q[::-1]).groupby(g_sorted[::-1], sort=False).cummin().to_numpy()[::-1]
+    result = np.empty_like(q)
+    result[order] = q
+    return result
+
+
+def enrichment_tests(foreground, annotation, min_term_size: int = ENRICH_MIN_TERM_SIZE,
+                     max_term_size: int | None = None, min_count: int = 2, alpha: float = ENRICH_FDR,
+                     chunk: int = 1024):
+    """
+    Over-representation of every term in every foreground set (one-sided
+    hypergeometric test, i.e. Fisher's exact test for enrichment).
+
+    The background is every item with at least one tested term, and the
+    foreground sets are restricted to it. The overlaps of all sets with all
+    terms come from one sparse product (sets x items @ items x terms) per chunk
+    of sets; only non-zero overlaps are tested (k = 0 has p = 1), all at once
+    with hypergeom_sf, and q-values are Benjamini-Hochberg per set
+    over all tested terms.
+
+    Args:
+        foreground (csr_matrix): Sets x items membership.
+        annotation (csr_matrix): Items x terms incidence.
+        min_term_size (int): Terms with fewer background items are not tested.
+        max_term_size (int | None): Terms with more background items are not tested.
+        min_count (int): Smallest overlap reported.
+        alpha (float): Largest q-value reported (1 reports every non-zero overlap).
+        chunk (int): Sets per product.
+
+    Returns:
+        tuple: (pd.DataFrame with set and term (row / column indices), k (overlap), n (set size),
+                K (term size), N (background), fold, p and q, sorted by set and p;
+                dict with the number of tested terms and the background size).
+    """
+    import numpy as np
+    import pandas as pd
+
+    annotation = annotation.tocsc().astype(bool)
+    term_size = annotation.getnnz(axis=0)
+    tested = term_size >= min_term_size
+    if max_term_size:
+        tested &= term_size <= max_term_size
+    term_index = np.flatnonzero(tested)
+    annotation = annotation[:, term_index].tocsr()
+    universe = np.flatnonzero(annotation.getnnz(axis=1))
+    annotation = annotation[universe].astype(np.int32)
+    foreground = foreground.tocsr()[:, universe].astype(np.int32)
+    N = len(universe)
+    K = annotation.getnnz(axis=0)
+    set_size = foreground.getnnz(axis=1)
+
+    frames = []
+    for start in range(0, foreground.shape[0], chunk):
+        overlap = (foreground[start:start + chunk] @ annotation).tocoo()
+        k, term = overlap.data, overlap.col
+        n = set_size[start + overlap.row]
+        p = hypergeom_sf(k, N, K[term], n)
+        q = benjamini_hochberg(p, overlap.row, len(term_index))
+        keep = (k >= min_count) & (q <= alpha)
+        frames.append(pd.DataFrame({
+            "set": start + overlap.row[keep], "term": term_index[term[keep]], "k": k[keep], "n": n[keep],
+            "K": K[term[keep]], "N": N, "fold": (k[keep] / n[keep]) / (K[term[keep]] / N),
+            "p": p[keep], "q": q[keep],
+        }))
+    columns = ["set", "term", "k", "n", "K", "N", "fold", "p", "q"]
+    results = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    results = results.sort_values(["set", "p"], kind="stable", ignore_index=True)
+    return results, {"terms": len(term_index), "background": N}
@@ -0,0 +1,211 @@
+import os
+import csv
+
+from config import PRUNE_MIN_LENGTH_RATIO, PRUNE_MAX_LENGTH_RATIO, PRUNE_KMER, PRUNE_MAX_SEQS
+from src.utils.sequtils import iter_fasta, write_fasta_record, portal_of, fasta_stem
+
+AMINO_ACIDS = b"ACDEFGHIKLMNPQRSTVWY"
+PRUNE_LOG_COLUMNS = ["seq_id", "portal", "length", "score", "reason"]
+PRUNE_SUMMARY_COLUMNS = ["family", "n_in", "n_out", "short", "long", "paralog", "capped", "median_length",
+                         "portals"]
+
+
+def kmer_consensus_scores(seqs: list, k: int = PRUNE_KMER, reference=None):
+    """
+    Similarity of every sequence to the family consensus, from shared k-mers.
+
+    The consensus is the family's k-mer frequency profile: the score of a
+    sequence is the mean, over its distinct k-mers, of the share of the other
+    reference sequences containing that k-mer (1 = every k-mer is found in
+    every other member). No alignment is needed.
+
+    Args:
+        seqs (list): Protein sequences.
+        k (int): k-mer length (21**k codes; residues outside the 20 amino acids count as one letter).
+        reference (np.ndarray | None): Boolean mask of the sequences forming the consensus (default: all).
+
+    Returns:
+        np.ndarray: Score per sequence in [0, 1] (0 for sequences shorter than k).
+    """
+    import numpy as np
+
+    n = len(seqs)
+    scores = np.zeros(n)
+    lengths = np.array([len(s) for s in seqs], dtype=np.int64)
+    if n == 0 or lengths.max() < k:
+        return scores
+    reference = np.ones(n, dtype=bool) if reference is None else np.asarray(reference, dtype=bool)
+
+    lut = np.full(256, 20, dtype=np.int64)
+    lut[np.frombuffer(AMINO_ACIDS, dtype=np.uint8)] = np.arange(20)
+    lut[np.frombuffer(AMINO_ACIDS.lower(), dtype=np.uint8)] = np.arange(20)
+    codes = lut[np.frombuffer("".join(seqs).encode("ascii", "replace"), dtype=np.uint8)]
+
+    # k-mer starting at every position, kept where it lies within one sequence
+    n_windows = len(codes) - k + 1
+    kmers = np.zeros(n_windows, dtype=np.int64)
+    for j in range(k):
+        kmers = kmers * 21 + codes[j:j + n_windows]
+    owner = np.repeat(np.arange(n), lengths)[:n_windows]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    valid = np.arange(n_windows) - offsets[owner] <= lengths[owner] - k
+    # Distinct (sequence, k-mer) pairs
+    pairs = np.unique(owner[valid] * 21 ** k + kmers[valid])
+    seq_of, kmer_of = pairs // 21 ** k, pairs % 21 ** k
+
+    in_reference = reference[seq_of]
+    counts = np.bincount(kmer_of[in_reference], minlength=21 ** k)
+    # Leave each reference sequence out of its own consensus; the others are all
+    # n_ref - 1 other reference sequences, or all n_ref for a sequence outside the reference
+    others = counts[kmer_of] - in_reference
+    n_ref = int(reference.sum())
+    n_others = np.maximum(n_ref - in_reference, 1)
+    totals = np.bincount(seq_of, weights=others / n_others, minlength=n)
+    n_kmers = np.bincount(seq_of, minlength=n)
+    np.divide(totals, n_kmers, out=scores, where=n_kmers > 0)
+    return scores
+
+
+def prune_family(in_path: str, out_path: str, log_path: str | None = None,
+                 min_ratio: float = PRUNE_MIN_LENGTH_RATIO, max_ratio: float = PRUNE_MAX_LENGTH_RATIO,
+                 one_per_portal: bool = True, max_seqs: int = PRUNE_MAX_SEQS, k: int = PRUNE_KMER) -> dict:
+    """
+    Drop length outliers and in-paralogs from an orthogroup FASTA before alignment.
+
+    1. Sequences shorter than min_ratio or longer than max_ratio times the
+       family median length (fragments, fusions) are removed.
+    2. Portals with several copies keep the one closest to the family k-mer
+       consensus (kmer_consensus_scores of the length-filtered members).
+    3. With max_seqs, larger families keep the max_seqs highest-scoring sequences.
+
+    Args:
+        in_path (str): Orthogroup FASTA with Portal-ID headers.
+        out_path (str): Pruned FASTA (may be in_path; written via a temporary file).
+        log_path (str | None): TSV of the removed sequences (seq_id, portal, length, score, reason).
+        min_ratio (float): Minimum length as a share of the median.
+        max_ratio (float): Maximum length as a multiple of the median.
+        one_per_portal (bool): Keep a single sequence per portal.
+        max_seqs (int): Cap on the family size (0 = none).
+        k (int): k-mer length of the consensus score.
+
+    Returns:
+        dict: Summary (see PRUNE_SUMMARY_COLUMNS).
+    """
+    import numpy as np
+
+    records = list(iter_fasta(in_path))
+    ids = [h.split()[0] for h, _ in records]
+    seqs = [s.replace("-", "").replace("*", "") for _, s in records]
+    lengths = np.array([len(s) for s in seqs])
+    portals = np.array([portal_of(i) for i in ids])
+    n = len(records)
+    reason = np.full(n, "", dtype=object)
+    median = float(np.median(lengths)) if n else 0.0
+
+    if median > 0:
+        reason[lengths < min_ratio * median] = "short"
+        reason[lengths > max_ratio * median] = "long"
+    kept = reason == ""
+    scores = kmer_consensus_scores(seqs, k, reference=kept)
+
+    if one_per_portal and kept.any():
+        # Best copy per portal: highest score, then length closest to the median
+        candidates = np.flatnonzero(kept)
+        order = candidates[np.lexsort((np.abs(lengths[candidates] - median), -scores[candidates],
+                                       portals[candidates]))]
+        _, first = np.unique(portals[order], return_index=True)
+        best = np.zeros(n, dtype=bool)
+        best[order[first]] = True
+        reason[kept & ~best] = "paralog"
+        kept &= best
+    if max_seqs and kept.sum() > max_seqs:
+        candidates = np.flatnonzero(kept)
+        dropped = candidates[np.argsort(-scores[candidates], kind="stable")[max_seqs:]]
+        reason[dropped] = "capped"
+        kept[dropped] = False
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        for i in np.flatnonzero(kept):
+            write_fasta_record(f, records[i][0], records[i][1])
+    os.replace(tmp_path, out_path)
+    if log_path:
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with open(log_path, "w", newline="") as f:
+            writer = csv.writer(f, delimiter="\t")
+            writer.writerow(PRUNE_LOG_COLUMNS)
+            for i in np.flatnonzero(~kept):
+                writer.writerow([ids[i], portals[i], int(lengths[i]), round(float(scores[i]), 4), reason[i]])
+
+    return {
+        "family": fasta_stem(in_path),
+        "n_in": n,
+        "n_out": int(kept.sum()),
+        **{r: int((reason == r).sum()) for r in ("short", "long", "paralog", "capped")},
+        "median_length": median,
+        "portals": len(set(portals[kept].tolist())),
+    }
+
+
+def _prune_job(params: tuple) -> dict:
+    in_path, out_path, log_path, kwargs = params
+    return prune_family(in_path, out_path, log_path, **kwargs)
+
+
+def prune_families(in_dir: str, out_dir: str, log_dir: str, names: list | None = None, force: bool = False,
+                   workers: int = 1, **kwargs) -> list:
+    """
+    Prune every *.fa family of in_dir into out_dir (in place when they are the same folder).
+
+    Families pruned before are skipped unless force: in place, those with a
+    log in log_dir (a second pass would filter against the already-pruned
+    median); otherwise those whose output is newer than the input.
+    prune_summary.tsv in log_dir is updated with the families pruned now.
+
+    Args:
+        in_dir (str): Folder of orthogroup FASTAs.
+        out_dir (str): Folder of the pruned FASTAs.
+        log_dir (str): Folder of the per-family logs (<family>.removed.tsv) and the summary.
+        names (list | None): Family file names to prune (default: all *.fa).
+        force (bool): Prune again families pruned before.
+        workers (int): Parallel processes.
+        **kwargs: Passed to prune_family (min_ratio, max_ratio, one_per_portal, max_seqs, k).
+
+    Returns:
+        list: Summaries of the families pruned now.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    os.makedirs(out_dir, exist_ok=True)
+    os.makedirs(log_dir, exist_ok=True)
+    in_place = os.path.abspath(in_dir) == os.path.abspath(out_dir)
+    if names is None:
+        names = sorted(f for f in os.listdir(in_dir) if f.endswith(".fa"))
+    jobs = []
+    for name in names:
+        in_path, out_path = os.path.join(in_dir, name), os.path.join(out_dir, name)
+        log_path = os.path.join(log_dir, f"{fasta_stem(name)}.removed.tsv")
+        if not force:
+            if in_place and os.path.exists(log_path):
+                continue
+            if not in_place and os.path.exists(out_path) and os.path.getmtime(out_path) >= os.path.getmtime(in_path):
+                continue
+        jobs.append((in_path, out_path, log_path, kwargs))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            summaries = list(ex.map(_prune_job, jobs, chunksize=16))
+    else:
+        summaries = [_prune_job(job) for job in jobs]
+
+    summary_path = os.path.join(log_dir, "prune_summary.tsv")
+    rows = {}
+    if os.path.exists(summary_path):
+        with open(summary_path, newline="") as f:
+            rows = {r["family"]: r for r in csv.DictReader(f, delimiter="\t")}
+    rows.update({s["family"]: s for s in summaries})
+    with open(summary_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=PRUNE_SUMMARY_COLUMNS, delimiter="\t")
+        writer.writeheader()
+        writer.writerows(rows[k] for k in sorted(rows))
+    return summaries
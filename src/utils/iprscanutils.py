@@ -0,0 +1,141 @@
+import os
+import re
+
+from src.utils.sequtils import open_text
+
+# Progress lines written by cluster_interproscan to its submit log
+TOTAL_RE = re.compile(r"The job is split into\s+(\d+)\s+pieces", re.IGNORECASE)
+SUBJOB_RE = re.compile(r"subjob\s+(\d+)\s+(OK|FAILED)", re.IGNORECASE)
+# First line of every submission in a submit log (a log can hold several attempts)
+SUBMIT_HEADER = "===== cluster_interproscan submit ====="
+
+# Outputs that count as "done" for a cluster_interproscan -o <basename> run
+OUTPUT_SUFFIXES = (".tsv.gz", ".tsv", "")
+# Inputs of failed pieces, left behind by cluster_interproscan (rerun by iprscan-launcher-failed.sh)
+PIECE_INPUT_GLOB = "*_sequences"
+
+
+def portal_from_log_name(name: str) -> str:
+    """
+    Derive the portal from a log filename like iprscan_<portal>.submit.log.
+
+    Args:
+        name (str): Log file name.
+
+    Returns:
+        str: Portal name.
+    """
+    if name.startswith("iprscan_"):
+        name = name[len("iprscan_"):]
+    if name.endswith(".submit.log"):
+        name = name[:-len(".submit.log")]
+    return name
+
+
+def parse_progress_line(line: str) -> tuple | None:
+    """
+    Parse one line of a cluster_interproscan submit log into a progress event.
+
+    Args:
+        line (str): Log line.
+
+    Returns:
+        tuple | None: ("total", n), ("OK", subjob), ("FAILED", subjob) or None.
+    """
+    m = TOTAL_RE.search(line)
+    if m:
+        return "total", int(m.group(1))
+    m = SUBJOB_RE.search(line)
+    if m:
+        return m.group(2).upper(), int(m.group(1))
+    return None
+
+
+def find_iprscan_output(out_basename: str) -> str | None:
+    """
+    Return the first non-empty InterProScan output for an -o basename, if any.
+
+    Args:
+        out_basename (str): Output basename passed to cluster_interproscan.
+
+    Returns:
+        str | None: Path to the output file, or None.
+    """
+    for suffix in OUTPUT_SUFFIXES:
+        path = out_basename + suffix
+        if os.path.isfile(path) and os.path.getsize(path) > 0:
+            return path
+    return None
+
+
+def find_failed_piece_inputs(run_dir: str) -> list:
+    """
+    List the *_sequences inputs that cluster_interproscan left for failed pieces.
+
+    Args:
+        run_dir (str): Working and output folder of one cluster_interproscan run.
+
+    Returns:
+        list: Paths of the leftover piece inputs, sorted.
+    """
+    from pathlib import Path
+    return sorted(str(p) for p in Path(run_dir).rglob(PIECE_INPUT_GLOB) if p.is_file())
+
+
+def concat_outputs(paths: list, final_path: str):
+    """
+    Concatenate InterProScan TSV outputs (plain or gzipped) into one .tsv.gz.
+
+    Args:
+        paths (list): Output files, in order.
+        final_path (str): Merged .tsv.gz (written via a temporary file).
+    """
+    import gzip
+    import shutil
+
+    tmp_path = final_path + ".tmp"
+    with gzip.open(tmp_path, "wb") as out:
+        for path in paths:
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, "rb") as f:
+                shutil.copyfileobj(f, out)
+    os.replace(tmp_path, final_path)
+
+
+def write_clean_chunks(fasta_path: str, out_dir: str, stem: str, chunk_size: int) -> list:
+    """
+    Stream a FASTA file into chunks of at most chunk_size sequences, removing
+    '*' stop characters from sequence lines (InterProScan rejects them).
+
+    Args:
+        fasta_path (str): Input FASTA.
+        out_dir (str): Directory for the chunk files.
+        stem (str): Prefix of the chunk names (<stem>.partNNNN.fasta).
+        chunk_size (int): Maximum sequences per chunk.
+
+    Returns:
+        list: Paths of the written chunks, in order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    chunks = []
+    out = None
+    n_in_chunk = chunk_size
+    try:
+        with open_text(fasta_path) as f:
+            for line in f:
+                if line.startswith(">"):
+                    if n_in_chunk >= chunk_size:
+                        if out:
+                            out.close()
+                        path = os.path.join(out_dir, f"{stem}.part{len(chunks):04d}.fasta")
+                        out = open(path, "w")
+                        chunks.append(path)
+                        n_in_chunk = 0
+                    n_in_chunk += 1
+                    out.write(line)
+                elif out is not None:
+                    out.write(line.replace("*", ""))
+    finally:
+        if out:
+            out.close()
+    return chunks
@@ -0,0 +1,305 @@
+import os
+import re
+import json
+import shlex
+import sqlite3
+from collections import Counter
+
+from config import (
+    MODEL_CACHE_MIN_FAMILIES, MODEL_MSET_COVERAGE, MODEL_REUSE_NEIGHBOURS, MODEL_REUSE_MIN_AGREEMENT,
+    MODEL_REUSE_MAX_COMPOSITION_DISTANCE, MODEL_REUSE_MAX_LENGTH_RATIO
+)
+from src.utils.sequtils import iter_fasta
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+GAP_CHARS = "-.?"
+
+_IQTREE_PATTERNS = {
+    "alignment": re.compile(r"^Input file name: (.+)$"),
+    "size": re.compile(r"^Input data: (\d+) sequences with (\d+) \S+ sites"),
+    "best": re.compile(r"^Best-fit model according to (\w+): (\S+)"),
+    "model": re.compile(r"^Model of substitution: (\S+)"),
+}
+_LOG_BEST = re.compile(r"^Best-fit model: (\S+) chosen according to (\w+)")
+
+
+def open_model_cache(db_path: str, readonly: bool = False) -> sqlite3.Connection:
+    """
+    Open (and create if needed) the IQ-TREE model cache database.
+
+    Array tasks only read it, so it keeps SQLite's default journal (no WAL
+    shared memory on the cluster filesystem) and readers open it read-only.
+
+    Args:
+        db_path (str): Path to the SQLite file.
+        readonly (bool): Open read-only (the file must exist).
+
+    Returns:
+        sqlite3.Connection: Open connection.
+    """
+    if readonly:
+        return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    con = sqlite3.connect(db_path, timeout=60)
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS families (
+            family TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            criterion TEXT,
+            selection TEXT NOT NULL,
+            mset TEXT,
+            n_seqs INTEGER,
+            n_sites INTEGER,
+            gap_frac REAL,
+            composition TEXT,
+            alignment TEXT,
+            report TEXT NOT NULL,
+            report_mtime REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS families_model ON families (model);
+        CREATE INDEX IF NOT EXISTS families_sites ON families (n_sites);
+    """)
+    return con
+
+
+def alignment_features(path: str) -> dict:
+    """
+    Size, gap fraction and amino-acid composition of an alignment.
+
+    Returns:
+        dict: n_seqs, n_sites, gap_frac and composition (frequencies in AMINO_ACIDS order).
+    """
+    seqs = [seq.upper() for _, seq in iter_fasta(path)]
+    data = "".join(seqs).encode()
+    counts = [data.count(aa.encode()) for aa in AMINO_ACIDS]
+    residues = sum(counts)
+    gaps = sum(data.count(c.encode()) for c in GAP_CHARS)
+    return {
+        "n_seqs": len(seqs),
+        "n_sites": max((len(s) for s in seqs), default=0),
+        "gap_frac": round(gaps / len(data), 4) if data else 0.0,
+        "composition": [round(c / residues, 5) for c in counts] if residues else None,
+    }
+
+
+def _command_args(log_path: str) -> list:
+    # IQ-TREE logs its command line near the top of <prefix>.log
+    if not os.path.isfile(log_path):
+        return []
+    with open(log_path, errors="replace") as f:
+        for i, line in enumerate(f):
+            if line.startswith("Command:"):
+                return shlex.split(line[len("Command:"):])
+            if i > 200:
+                break
+    return []
+
+
+def _option(args: list, name: str) -> str | None:
+    return args[args.index(name) + 1] if name in args and args.index(name) + 1 < len(args) else None
+
+
+def parse_iqtree_run(prefix: str) -> dict | None:
+    """
+    Model chosen by an IQ-TREE run, from <prefix>.iqtree (or <prefix>.log).
+
+    Args:
+        prefix (str): Run prefix (-pre), e.g. gene_trees/OG0000001_mafft_trim.
+
+    Returns:
+        dict | None: model, criterion, selection ("modelfinder", "modelfinder-mset" or
+            "fixed"), mset, alignment, n_seqs, n_sites and report; None if no model is found.
+    """
+    args = _command_args(prefix + ".log")
+    info = {"model": None, "criterion": None, "alignment": _option(args, "-s"),
+            "n_seqs": None, "n_sites": None, "report": None}
+    report = prefix + ".iqtree"
+    if os.path.isfile(report):
+        info["report"] = report
+        with open(report, errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                for key, pattern in _IQTREE_PATTERNS.items():
+                    m = pattern.match(line)
+                    if not m:
+                        continue
+                    if key == "alignment":
+                        info["alignment"] = info["alignment"] or m.group(1).strip()
+                    elif key == "size":
+                        info["n_seqs"], info["n_sites"] = int(m.group(1)), int(m.group(2))
+                    elif key == "best":
+                        info["criterion"], info["model"] = m.group(1), m.group(2)
+                    elif info["model"] is None:
+                        info["model"] = m.group(1)
+    elif os.path.isfile(prefix + ".log"):
+        info["report"] = prefix + ".log"
+        with open(prefix + ".log", errors="replace") as f:
+            for line in f:
+                m = _LOG_BEST.match(line.strip())
+                if m:
+                    info["model"], info["criterion"] = m.group(1), m.group(2)
+        if info["model"] is None:
+            # A fixed model (-m GTR...) runs without ModelFinder
+            model = _option(args, "-m")
+            if model and model not in ("TEST", "MFP", "TESTONLY", "MF", "TESTNEW", "TESTMERGE", "MFP+MERGE"):
+                info["model"] = model
+    if not info["model"]:
+        return None
+    info["mset"] = _option(args, "-mset")
+    if info["criterion"] is None:
+        info["selection"] = "fixed"
+    else:
+        info["selection"] = "modelfinder-mset" if info["mset"] else "modelfinder"
+    return info
+
+
+def _find_alignment(reported: str | None, family: str, aln_dirs: list) -> str | None:
+    if reported and os.path.isfile(reported):
+        return reported
+    names = [os.path.basename(reported)] if reported else []
+    for folder in aln_dirs:
+        for name in names + [family + ".fa"]:
+            path = os.path.join(folder, name)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def collect_models(con: sqlite3.Connection, tree_dirs: list, aln_dirs: list) -> dict:
+    """
+    Add the models of finished IQ-TREE runs to the cache (unchanged reports are skipped).
+
+    Args:
+        con (sqlite3.Connection): Cache connection.
+        tree_dirs (list): Folders with <prefix>.iqtree / <prefix>.log files.
+        aln_dirs (list): Where to look for the alignments if the reported path moved.
+
+    Returns:
+        dict: Counts of runs seen, added/updated, unchanged and without a model.
+    """
+    known = dict(con.execute("SELECT report, report_mtime FROM families"))
+    stats = Counter()
+    for folder in tree_dirs:
+        if not os.path.isdir(folder):
+            continue
+        prefixes = sorted({os.path.join(folder, f.rsplit(".", 1)[0]) for f in os.listdir(folder)
+                           if f.endswith((".iqtree", ".log"))})
+        for prefix in prefixes:
+            stats["runs"] += 1
+            report = prefix + ".iqtree" if os.path.isfile(prefix + ".iqtree") else prefix + ".log"
+            mtime = os.path.getmtime(report)
+            if known.get(report) == mtime:
+                stats["unchanged"] += 1
+                continue
+            info = parse_iqtree_run(prefix)
+            if info is None:
+                stats["no_model"] += 1
+                continue
+            alignment = _find_alignment(info["alignment"], os.path.basename(prefix), aln_dirs)
+            features = alignment_features(alignment) if alignment else {}
+            con.execute(
+                "INSERT OR REPLACE INTO families VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.basename(prefix), info["model"], info["criterion"], info["selection"], info["mset"],
+                 features.get("n_seqs", info["n_seqs"]), features.get("n_sites", info["n_sites"]),
+                 features.get("gap_frac"),
+                 json.dumps(features["composition"]) if features.get("composition") else None,
+                 alignment, report, mtime))
+            stats["added"] += 1
+    con.commit()
+    return dict(stats)
+
+
+def base_matrix(model: str) -> str:
+    """
+    Substitution matrix of a model name: LG+F+I+G4 -> LG.
+    """
+    return model.split("+", 1)[0]
+
+
+def learned_mset(con: sqlite3.Connection, coverage: float = MODEL_MSET_COVERAGE,
+                 min_families: int = MODEL_CACHE_MIN_FAMILIES) -> list | None:
+    """
+    Smallest set of matrices, most frequent first, chosen for at least `coverage`
+    of the families where ModelFinder tested every matrix.
+
+    Only unrestricted runs count, so the set cannot shrink by feeding on its own
+    restricted choices.
+
+    Returns:
+        list | None: Matrix names for -mset, or None while the cache has fewer than min_families runs.
+    """
+    models = [m for (m,) in con.execute("SELECT model FROM families WHERE selection = 'modelfinder'")]
+    if len(models) < min_families:
+        return None
+    counts = Counter(base_matrix(m) for m in models)
+    chosen, covered = [], 0
+    for matrix, n in counts.most_common():
+        chosen.append(matrix)
+        covered += n
+        if covered >= coverage * len(models):
+            break
+    return chosen
+
+
+def nearest_model(con: sqlite3.Connection, features: dict, k: int = MODEL_REUSE_NEIGHBOURS,
+                  min_agreement: float = MODEL_REUSE_MIN_AGREEMENT,
+                  max_distance: float = MODEL_REUSE_MAX_COMPOSITION_DISTANCE,
+                  max_length_ratio: float = MODEL_REUSE_MAX_LENGTH_RATIO) -> dict | None:
+    """
+    Model of the cached families most similar to an alignment, if they agree.
+
+    Candidates are ModelFinder results whose alignment length is within
+    max_length_ratio; the k nearest by total variation distance of amino-acid
+    composition must all lie within max_distance and at least min_agreement of
+    them must share the model.
+
+    Returns:
+        dict | None: model, agreement, distance (of the k-th neighbour) and neighbours; None if no reuse.
+    """
+    import numpy as np
+
+    if not features.get("composition") or not features.get("n_sites"):
+        return None
+    rows = con.execute(
+        "SELECT family, model, composition FROM families "
+        "WHERE selection != 'fixed' AND composition IS NOT NULL AND n_sites BETWEEN ? AND ?",
+        (features["n_sites"] / max_length_ratio, features["n_sites"] * max_length_ratio)).fetchall()
+    if len(rows) < k:
+        return None
+    comps = np.array([json.loads(c) for _, _, c in rows])
+    distances = 0.5 * np.abs(comps - np.asarray(features["composition"])).sum(axis=1)
+    nearest = np.argsort(distances, kind="stable")[:k]
+    if distances[nearest[-1]] > max_distance:
+        return None
+    model, n = Counter(rows[i][1] for i in nearest).most_common(1)[0]
+    if n / k < min_agreement:
+        return None
+    return {"model": model, "agreement": n / k, "distance": round(float(distances[nearest[-1]]), 4),
+            "neighbours": [rows[i][0] for i in nearest]}
+
+
+def model_args(con: sqlite3.Connection | None, aln_path: str, mode: str, default: str = "MFP") -> tuple:
+    """
+    IQ-TREE model options for an alignment under a model selection mode.
+
+    Args:
+        con (sqlite3.Connection | None): Cache connection (None: no cache yet).
+        aln_path (str): Alignment to build a tree for.
+        mode (str): "off", "mset" or "reuse" (reuse falls back to mset).
+        default (str): ModelFinder mode otherwise passed to -m (TEST or MFP).
+
+    Returns:
+        tuple: (list of IQ-TREE arguments, short description of the decision).
+    """
+    if con is None or mode == "off":
+        return ["-m", default], "full ModelFinder"
+    if mode == "reuse":
+        hit = nearest_model(con, alignment_features(aln_path))
+        if hit:
+            return (["-m", hit["model"]],
+                    f"reused {hit['model']} ({hit['agreement']:.0%} of {len(hit['neighbours'])} similar families, "
+                    f"composition distance <= {hit['distance']})")
+    mset = learned_mset(con)
+    if mset:
+        return ["-m", default, "-mset", ",".join(mset)], f"ModelFinder over {len(mset)} cached matrices"
+    return ["-m", default], "full ModelFinder (cache too small)"
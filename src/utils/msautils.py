@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import shlex
+import subprocess
+
+from config import MAFFT_BIN, MAFFT_TIERS, MAFFT_SINGLE_THREAD_MAX_SEQS
+from src.utils.sequtils import iter_fasta
+
+
+def fasta_stats(path: str) -> dict:
+    """
+    Number of sequences and their mean / max length (gaps and stops excluded).
+    """
+    lengths = [len(seq.replace("-", "").replace("*", "")) for _, seq in iter_fasta(path)]
+    return {
+        "n_seqs": len(lengths),
+        "mean_len": round(sum(lengths) / len(lengths), 1) if lengths else 0,
+        "max_len": max(lengths, default=0),
+    }
+
+
+def choose_strategy(n_seqs: int, mean_len: float, max_threads: int | None = None, tiers=MAFFT_TIERS) -> dict:
+    """
+    Pick the MAFFT strategy and thread count for a family from its size.
+
+    Args:
+        n_seqs (int): Number of sequences.
+        mean_len (float): Mean sequence length.
+        max_threads (int | None): Threads available (e.g. SLURM_CPUS_PER_TASK); caps the tier's count.
+        tiers (list): (strategy, max sequences, max mean length, options, threads), first match wins.
+
+    Returns:
+        dict: strategy, options and threads.
+    """
+    for name, max_seqs, max_len, options, threads in tiers:
+        if (max_seqs is None or n_seqs <= max_seqs) and (max_len is None or mean_len <= max_len):
+            break
+    if n_seqs <= MAFFT_SINGLE_THREAD_MAX_SEQS:
+        threads = 1
+    if max_threads:
+        threads = min(threads, max_threads)
+    return {"strategy": name, "options": options, "threads": threads}
+
+
+def mafft_version(mafft_bin: str = MAFFT_BIN) -> str:
+    # mafft prints its version on stderr
+    try:
+        result = subprocess.run([mafft_bin, "--version"], capture_output=True, text=True)
+    except OSError:
+        return ""
+    return (result.stderr or result.stdout).strip()
+
+
+def run_mafft(in_path: str, out_path: str, options: str, threads: int, mafft_bin: str = MAFFT_BIN) -> float:
+    """
+    Align in_path into out_path (written via a temporary file).
+
+    Returns:
+        float: Wall time in seconds.
+    """
+    cmd = [mafft_bin, "--thread", str(threads), *shlex.split(options), in_path]
+    tmp_path = out_path + ".tmp"
+    start = time.perf_counter()
+    with open(tmp_path, "w") as out:
+        result = subprocess.run(cmd, stdout=out, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0 or os.path.getsize(tmp_path) == 0:
+        os.remove(tmp_path)
+        raise RuntimeError(f"{' '.join(cmd)} failed ({result.returncode}): {result.stderr.strip()[-1000:]}")
+    os.replace(tmp_path, out_path)
+    return wall
+
+
+def metadata_path(out_path: str) -> str:
+    """
+    Sidecar metadata of an alignment: <OG>_mafft.fa -> <OG>_mafft.meta.json.
+    """
+    return os.path.splitext(out_path)[0] + ".meta.json"
+
+
+def align_adaptive(in_path: str, out_path: str, max_threads: int | None = None, strategy: str | None = None,
+                   mafft_bin: str = MAFFT_BIN) -> dict:
+    """
+    Align a family with the strategy its size calls for and record the choice
+    next to the alignment (see metadata_path).
+
+    Args:
+        in_path (str): Unaligned FASTA.
+        out_path (str): Alignment to write.
+        max_threads (int | None): Threads available.
+        strategy (str | None): Force a tier by name instead of choosing by size.
+        mafft_bin (str): MAFFT executable.
+
+    Returns:
+        dict: The metadata written (strategy, options, threads, family size, wall time).
+    """
+    stats = fasta_stats(in_path)
+    tiers = MAFFT_TIERS
+    if strategy:
+        tier = next((t for t in MAFFT_TIERS if t[0] == strategy), None)
+        if tier is None:
+            raise ValueError(f"Unknown MAFFT strategy {strategy}; choose from {[t[0] for t in MAFFT_TIERS]}")
+        # Same options and threads, without the size limits
+        tiers = [(tier[0], None, None, tier[3], tier[4])]
+    choice = choose_strategy(stats["n_seqs"], stats["mean_len"], max_threads, tiers)
+    wall = run_mafft(in_path, out_path, choice["options"], choice["threads"], mafft_bin)
+    meta = {
+        "input": os.path.basename(in_path),
+        **stats,
+        **choice,
+        "wall_s": round(wall, 3),
+        "mafft": mafft_version(mafft_bin),
+    }
+    with open(metadata_path(out_path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def _residue_columns(aligned: str):
+    import numpy as np
+
+    # Residue index at every column, -1 for gaps
+    residues = np.frombuffer(aligned.encode(), dtype=np.uint8) != ord("-")
+    return np.where(residues, np.cumsum(residues) - 1, -1)
+
+
+def sum_of_pairs_agreement(test_path: str, ref_path: str, max_pairs: int = 2000, seed: int = 1) -> float:
+    """
+    Fraction of the residue pairs aligned in the reference alignment that the
+    test alignment aligns too (the SP score of qscore / BAliBASE), over a random
+    sample of sequence pairs for large families.
+
+    Returns:
+        float: Agreement in [0, 1] (1.0 for identical alignments).
+    """
+    import random
+    import numpy as np
+
+    test = {h.split(None, 1)[0]: _residue_columns(s) for h, s in iter_fasta(test_path)}
+    ref = {h.split(None, 1)[0]: _residue_columns(s) for h, s in iter_fasta(ref_path)}
+    names = sorted(set(test) & set(ref))
+    if len(names) < 2:
+        return 1.0
+    if len(names) * (len(names) - 1) // 2 <= max_pairs:
+        pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+    else:
+        rng = random.Random(seed)
+        pairs = [tuple(rng.sample(names, 2)) for _ in range(max_pairs)]
+    shared = total = 0
+    for a, b in pairs:
+        keys = []
+        for aln in (ref, test):
+            both = (aln[a] >= 0) & (aln[b] >= 0)
+            keys.append(aln[a][both].astype(np.int64) * (1 << 20) + aln[b][both])
+        total += len(keys[0])
+        shared += len(np.intersect1d(keys[0], keys[1], assume_unique=True))
+    return shared / total if total else 1.0
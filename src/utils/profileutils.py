@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import socket
+import resource
+import functools
+import contextlib
+from datetime import datetime
+
+# Set by enable_profiling(); None means stage timers only record metrics
+_PROFILE_DIR = None
+
+
+def enable_profiling(profile_dir: str | None):
+    """
+    Turn cProfile and tracemalloc dumps on (or off with None) for all later stages.
+
+    Args:
+        profile_dir (str | None): Folder for <stage>_<timestamp>.prof / .mem.txt files.
+    """
+    global _PROFILE_DIR
+    _PROFILE_DIR = profile_dir
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def add_profile_argument(parser, default_dir: str):
+    """
+    Add the opt-in --profile [DIR] switch to a script's argument parser.
+    """
+    parser.add_argument("--profile", nargs="?", const=default_dir, default=None, metavar="DIR",
+                        help=f"Dump cProfile and tracemalloc data per stage (default dir: {default_dir})")
+
+
+def _io_counters():
+    # Bytes passed through read()/write() syscalls, cache hits included
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(":") for line in f)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS; children covers finished worker processes.
+    # Both are high-water marks over the whole process lifetime, not per stage.
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(own * scale, 1), round(children * scale, 1)
+
+
+def _cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return (own.ru_utime + own.ru_stime), (children.ru_utime + children.ru_stime)
+
+
+class StageMetrics:
+    """
+    Counters a stage fills in while it runs (items processed, bytes read and
+    written). Byte counts default to the process I/O counters when not given.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes_read = None
+        self.bytes_written = None
+        self.extra = {}
+
+    def add(self, items: int = 0, bytes_read: int = 0, bytes_written: int = 0, **extra):
+        self.items += items
+        if bytes_read:
+            self.bytes_read = (self.bytes_read or 0) + bytes_read
+        if bytes_written:
+            self.bytes_written = (self.bytes_written or 0) + bytes_written
+        self.extra.update(extra)
+
+
+def write_metrics(record: dict, metrics_path: str):
+    """
+    Append one JSON record to a JSON-lines metrics file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(metrics_path)), exist_ok=True)
+    with open(metrics_path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextlib.contextmanager
+def stage_timer(name: str, metrics_path: str | None = None):
+    """
+    Time a pipeline stage and append its metrics as one JSON line.
+
+    Records wall and CPU time (own and of finished child processes), items
+    processed and bytes read/written. Memory is recorded twice: process_peak_rss_mb
+    is the cumulative high-water mark of the process so far (the same for every
+    stage after the heaviest one), and peak_rss_growth_mb is how far this stage
+    raised it (0 when an earlier stage already used more).
+    With profiling enabled the stage is also run under cProfile and tracemalloc
+    (main process only; worker processes show up in the child CPU and RSS figures).
+
+    Args:
+        name (str): Stage name, e.g. 'cleanup_seqs.filter'.
+        metrics_path (str | None): JSON-lines file; defaults to config.METRICS_PATH.
+
+    Yields:
+        StageMetrics: Call .add(items=..., bytes_read=..., bytes_written=...) on it.
+    """
+    if metrics_path is None:
+        from config import METRICS_PATH
+        metrics_path = METRICS_PATH
+
+    metrics = StageMetrics(name)
+    profiler = None
+    if _PROFILE_DIR:
+        import cProfile
+        import tracemalloc
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+
+    rchar0, wchar0 = _io_counters()
+    cpu0, child_cpu0 = _cpu_seconds()
+    rss0, child_rss0 = _peak_rss_mb()
+    wall0 = time.perf_counter()
+    started = datetime.now().isoformat(timespec="seconds")
+    status = "ok"
+    if profiler:
+        profiler.enable()
+    try:
+        yield metrics
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        wall = time.perf_counter() - wall0
+        cpu1, child_cpu1 = _cpu_seconds()
+        rchar1, wchar1 = _io_counters()
+        rss, child_rss = _peak_rss_mb()
+        record = {
+            "stage": name,
+            "script": os.path.basename(sys.argv[0]),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "slurm_job_id": os.environ.get("SLURM_JOB_ID"),
+            "started": started,
+            "status": status,
+            "wall_s": round(wall, 3),
+            "cpu_s": round(cpu1 - cpu0, 3),
+            "child_cpu_s": round(child_cpu1 - child_cpu0, 3),
+            "process_peak_rss_mb": rss,
+            "child_process_peak_rss_mb": child_rss,
+            "peak_rss_growth_mb": round(rss - rss0, 1),
+            "child_peak_rss_growth_mb": round(child_rss - child_rss0, 1),
+            "items": metrics.items,
+            "items_per_s": round(metrics.items / wall, 2) if wall > 0 and metrics.items else None,
+            "bytes_read": metrics.bytes_read if metrics.bytes_read is not None
+                          else (rchar1 - rchar0 if rchar0 is not None else None),
+            "bytes_written": metrics.bytes_written if metrics.bytes_written is not None
+                             else (wchar1 - wchar0 if wchar0 is not None else None),
+            **metrics.extra,
+        }
+        if profiler:
+            record.update(_dump_profile(name, profiler))
+        try:
+            write_metrics(record, metrics_path)
+        except OSError as e:
+            print(f"⚠️ Could not write stage metrics to {metrics_path}: {e}")
+
+
+def _dump_profile(name: str, profiler) -> dict:
+    import tracemalloc
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(_PROFILE_DIR, f"{name}_{stamp}_{os.getpid()}")
+    profiler.dump_stats(base + ".prof")
+
+    snapshot = tracemalloc.take_snapshot()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    with open(base + ".mem.txt", "w") as f:
+        f.write(f"# tracemalloc peak: {traced_peak / 1024 / 1024:.1f} MiB\n")
+        for stat in snapshot.statistics("lineno")[:30]:
+            f.write(f"{stat}\n")
+    return {"profile": base + ".prof", "traced_peak_mb": round(traced_peak / 1024 / 1024, 1)}
+
+
+def timed(name: str | None = None, metrics_path: str | None = None):
+    """
+    Decorator form of stage_timer. If the function returns a sized object
+    (list, DataFrame, ...) its length is recorded as the item count.
+    """
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage_name, metrics_path) as m:
+                result = func(*args, **kwargs)
+                if not m.items:
+                    try:
+                        m.add(items=len(result))
+                    except TypeError:
+                        pass
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import shlex
+import signal
+import socket
+import subprocess
+from datetime import datetime
+
+from config import BASE_DIR, QUEUE_LEASE_S, QUEUE_MAX_ATTEMPTS
+
+QUEUE_STATES = ("pending", "claimed", "done", "failed")
+
+
+class WorkQueue:
+    """
+    Work queue on a shared filesystem, one file per item, moved between state
+    folders with os.rename (atomic on POSIX filesystems, Lustre and NFS
+    included, so exactly one worker wins each claim):
+
+        pending/  ->  claimed/  ->  done/ | failed/ (after max_attempts failures)
+
+    Item files are named <key>__<name>, the key sorting the largest inputs first.
+    A claim is a lease: its worker touches the file while it works, and a claim
+    whose mtime is older than lease_s is renamed back to pending by any worker.
+    Delivery is at-least-once, so the item command must skip finished outputs
+    (the *-par.sh scripts do). queue.json holds the command (script, in_dir, out_dir).
+
+    Renames rather than an SQLite table: SQLite's WAL index is not safe across nodes, and
+    without WAL every claim would lock the whole database (the cacheutils / modelutils
+    caches keep the rollback journal for the same reason).
+    """
+
+    def __init__(self, root: str, lease_s: int = QUEUE_LEASE_S, max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.root = root
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        for state in QUEUE_STATES + ("logs",):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+        self._candidates = []
+
+    def path(self, state: str, entry: str = "") -> str:
+        return os.path.join(self.root, state, entry)
+
+    @property
+    def config(self) -> dict:
+        path = os.path.join(self.root, "queue.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def entries(self, state: str) -> list:
+        # Dot files are claims a worker is finishing (see finish)
+        return sorted(e for e in os.listdir(self.path(state)) if "__" in e and not e.startswith("."))
+
+    def enqueue(self, items: list, **config) -> dict:
+        """
+        Add items, largest first.
+
+        Items already pending or claimed are left alone; done or failed ones are
+        put back to pending (the caller lists them as still to do).
+
+        Args:
+            items (list): (name, weight) pairs, e.g. input file name and size in bytes.
+            **config: Stored in queue.json (script, in_dir, out_dir).
+
+        Returns:
+            dict: Counts of added, requeued and skipped items.
+        """
+        if config:
+            with open(os.path.join(self.root, "queue.json.tmp"), "w") as f:
+                json.dump({**self.config, **config}, f, indent=2)
+            os.replace(os.path.join(self.root, "queue.json.tmp"), os.path.join(self.root, "queue.json"))
+        known = {e.split("__", 1)[1]: (state, e) for state in QUEUE_STATES for e in self.entries(state)}
+        counts = {"added": 0, "requeued": 0, "skipped": 0}
+        for name, weight in items:
+            if name in known:
+                state, entry = known[name]
+                if state in ("pending", "claimed"):
+                    counts["skipped"] += 1
+                    continue
+                self._write(self.path(state, entry), {"attempts": 0})
+                os.rename(self.path(state, entry), self.path("pending", entry))
+                counts["requeued"] += 1
+                continue
+            # Larger weight -> smaller key -> claimed earlier
+            key = f"{10 ** 12 - min(int(weight), 10 ** 12 - 1):012d}"
+            self._write(self.path("pending", f"{key}__{name}"), {"attempts": 0})
+            counts["added"] += 1
+        return counts
+
+    @staticmethod
+    def _write(path: str, record: dict):
+        with open(path, "w") as f:
+            json.dump(record, f)
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"attempts": 0}
+
+    def requeue_expired(self) -> int:
+        """
+        Move claims whose lease has expired back to pending (also claims whose
+        worker died while finishing them).
+        """
+        n = 0
+        now = time.time()
+        for name in os.listdir(self.path("claimed")):
+            if "__" not in name:
+                continue
+            path = self.path("claimed", name)
+            entry = _staged_entry(name) if name.startswith(".") else name
+            try:
+                if now - os.stat(path).st_mtime < self.lease_s:
+                    continue
+                os.rename(path, self.path("pending", entry))
+                n += 1
+            except FileNotFoundError:
+                # Finished or requeued by another worker meanwhile
+                continue
+        return n
+
+    def claim(self, worker: str) -> str | None:
+        """
+        Claim the next pending item (largest first).
+
+        Returns:
+            str | None: The claimed entry, or None when nothing is pending.
+        """
+        # A second pass re-lists pending/ when the cached listing was taken by other workers
+        for _ in range(2):
+            if not self._candidates:
+                self.requeue_expired()
+                self._candidates = self.entries("pending")
+            while self._candidates:
+                entry = self._candidates.pop(0)
+                try:
+                    # rename keeps the mtime: touch first so the new claim does not look expired
+                    os.utime(self.path("pending", entry))
+                    os.rename(self.path("pending", entry), self.path("claimed", entry))
+                except FileNotFoundError:
+                    # Another worker was faster
+                    continue
+                record = self._read(self.path("claimed", entry))
+                record.update(worker=worker, claimed=datetime.now().isoformat(timespec="seconds"))
+                self._write(self.path("claimed", entry), record)
+                return entry
+        return None
+
+    def renew(self, entry: str) -> bool:
+        """
+        Extend the lease of a claim; False if the claim was lost (requeued after expiring).
+        """
+        try:
+            os.utime(self.path("claimed", entry))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def finish(self, entry: str, ok: bool, error: str = "") -> str:
+        """
+        Move a claim to done, or back to pending / to failed after a failure.
+
+        Every outcome starts with a single rename out of claimed/, so a lease
+        that expires meanwhile either requeues the item first (the claim is
+        lost) or finds nothing left to requeue. A success is that one rename to
+        done/ (the file keeps its claim record). A failure is renamed to a
+        staging name only this worker knows, gets its attempt count there and
+        then moves on; nothing is written to a path another worker may move.
+
+        Returns:
+            str: The new state, or "lost" if the claim had been requeued meanwhile.
+        """
+        claimed = self.path("claimed", entry)
+        if ok:
+            try:
+                os.rename(claimed, self.path("done", entry))
+            except FileNotFoundError:
+                return "lost"
+            return "done"
+        staged = self.path("claimed", f".{os.getpid()}.{entry}")
+        try:
+            os.rename(claimed, staged)
+        except FileNotFoundError:
+            return "lost"
+        record = self._read(staged)
+        record["attempts"] = record.get("attempts", 0) + 1
+        record["error"] = error
+        record.update(finished=datetime.now().isoformat(timespec="seconds"))
+        self._write(staged, record)
+        state = "failed" if record["attempts"] >= self.max_attempts else "pending"
+        os.rename(staged, self.path(state, entry))
+        return state
+
+    def release(self, entry: str):
+        """
+        Give a claim back without counting an attempt (worker shutting down).
+        """
+        try:
+            os.rename(self.path("claimed", entry), self.path("pending", entry))
+        except FileNotFoundError:
+            pass
+
+    def requeue_failed(self) -> int:
+        n = 0
+        for entry in self.entries("failed"):
+            self._write(self.path("failed", entry), {"attempts": 0})
+            os.rename(self.path("failed", entry), self.path("pending", entry))
+            n += 1
+        return n
+
+    def status(self) -> dict:
+        """
+        Items per state, plus expired claims and the workers holding claims.
+        """
+        counts = {state: len(self.entries(state)) for state in QUEUE_STATES}
+        now = time.time()
+        expired, workers = 0, set()
+        for entry in self.entries("claimed"):
+            path = self.path("claimed", entry)
+            try:
+                expired += now - os.stat(path).st_mtime >= self.lease_s
+            except FileNotFoundError:
+                continue
+            workers.add(self._read(path).get("worker", "?"))
+        counts.update(expired=expired, workers=len(workers))
+        return counts
+
+
+def _staged_entry(name: str) -> str:
+    # '.<pid>.<entry>' -> '<entry>'
+    return name.split(".", 2)[2]
+
+
+def item_name(entry: str) -> str:
+    return entry.split("__", 1)[1]
+
+
+def _shebang_command(script: str) -> list:
+    # Run the script with its #! interpreter (e.g. "bash -l" for `module load`)
+    with open(script) as f:
+        first = f.readline()
+    return (shlex.split(first[2:]) if first.startswith("#!") else ["bash"]) + [script]
+
+
+def run_worker(root: str, worker: str | None = None, max_items: int | None = None,
+               lease_s: int = QUEUE_LEASE_S, max_attempts: int = QUEUE_MAX_ATTEMPTS) -> dict:
+    """
+    Claim and process items until the queue is drained.
+
+    Each item runs `<script> <queue dir> <in_dir> <out_dir>` with QUEUE_ITEM set
+    to its name (the *-par.sh scripts then skip their array-task lookup); its
+    output goes to logs/<name>.log. The lease is renewed while the item runs.
+    On SIGTERM (SLURM time limit, scancel) the running item is stopped and
+    given back to pending. The worker stops when nothing is pending and no
+    claim has expired.
+
+    Args:
+        root (str): Queue folder.
+        worker (str | None): Worker name (default: host:pid).
+        max_items (int | None): Stop after this many items.
+        lease_s (int): Lease length in seconds.
+        max_attempts (int): Failures before an item is moved to failed/.
+
+    Returns:
+        dict: Items done, failed (this attempt), lost and whether the worker was stopped.
+    """
+    queue = WorkQueue(root, lease_s, max_attempts)
+    config = queue.config
+    if "script" not in config:
+        raise ValueError(f"{root} has no queue.json with a script; enqueue items first")
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    command = _shebang_command(config["script"]) + [root, config.get("in_dir", ""), config.get("out_dir", "")]
+    env = dict(os.environ)
+    env.setdefault("SLURM_JOB_ID", "local")
+    env.setdefault("SLURM_SUBMIT_DIR", BASE_DIR)
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+    stats = {"done": 0, "failed": 0, "lost": 0, "stopped": False}
+    while not stopping and (max_items is None or stats["done"] + stats["failed"] < max_items):
+        entry = queue.claim(worker)
+        if entry is None:
+            break
+        name = item_name(entry)
+        with open(queue.path("logs", f"{name}.log"), "a") as log:
+            log.write(f"=== {worker} at {datetime.now().isoformat(timespec='seconds')} ===\n")
+            log.flush()
+            proc = subprocess.Popen(command, env={**env, "QUEUE_ITEM": name}, stdout=log,
+                                    stderr=subprocess.STDOUT, cwd=env["SLURM_SUBMIT_DIR"])
+            renewed = time.time()
+            while True:
+                # Short polls, so a SIGTERM is handled within SLURM's kill grace period
+                try:
+                    rc = proc.wait(timeout=5)
+                    break
+                except subprocess.TimeoutExpired:
+                    if stopping:
+                        proc.terminate()
+                        rc = proc.wait()
+                        break
+                    if time.time() - renewed >= lease_s / 4:
+                        queue.renew(entry)
+                        renewed = time.time()
+        if stopping:
+            queue.release(entry)
+            break
+        state = queue.finish(entry, rc == 0, f"exit code {rc}")
+        if state == "done":
+            stats["done"] += 1
+        elif state == "lost":
+            stats["lost"] += 1
+        else:
+            stats["failed"] += 1
+        print(f"{'✅' if rc == 0 else '❌'} {name}: {state}" + (f" (exit code {rc})" if rc else ""), flush=True)
+    stats["stopped"] = bool(stopping)
+    return stats
@@ -0,0 +1,95 @@
+import os
+import gzip
+import hashlib
+
+
+def open_text(path: str, mode: str = "rt"):
+    """
+    Open a plain or gzip-compressed text file depending on its extension.
+
+    Args:
+        path (str): File path.
+        mode (str): 'rt' or 'wt' (also 'at').
+
+    Returns:
+        file object
+    """
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode)
+    return open(path, mode.replace("t", ""))
+
+
+def iter_fasta(path: str):
+    """
+    Stream (header, sequence) pairs from a FASTA file without Bio.SeqIO overhead.
+
+    Args:
+        path (str): FASTA file (plain or .gz).
+
+    Yields:
+        tuple: (header without '>', sequence string).
+    """
+    header = None
+    parts = []
+    with open_text(path) as f:
+        for line in f:
+            if line.startswith(">"):
+                if header is not None:
+                    yield header, "".join(parts)
+                header = line[1:].rstrip("\r\n")
+                parts = []
+            else:
+                parts.append(line.strip())
+    if header is not None:
+        yield header, "".join(parts)
+
+
+def write_fasta_record(f, header: str, seq: str, width: int = 60):
+    """
+    Write one FASTA record wrapped at a fixed line width (as Bio.SeqIO does).
+    """
+    f.write(f">{header}\n")
+    for i in range(0, len(seq), width):
+        f.write(seq[i:i + width] + "\n")
+
+
+def normalize_protein(seq: str) -> str:
+    """
+    Normalize a protein sequence for identity checks: upper case, no stop '*'.
+    """
+    return seq.upper().replace("*", "")
+
+
+def sequence_md5(seq: str) -> str:
+    """
+    MD5 of a normalized protein sequence, upper-case hex as in InterProScan's TSV.
+    """
+    return hashlib.md5(normalize_protein(seq).encode()).hexdigest().upper()
+
+
+def jgi_portal_id(seq_id: str) -> str | None:
+    """
+    'Portal-ID' for a JGI 'jgi|Portal|ID|model' sequence id (None for other ids).
+    """
+    if seq_id.startswith("jgi|"):
+        parts = seq_id.split("|")
+        if len(parts) >= 3:
+            return f"{parts[1]}-{parts[2]}"
+    return None
+
+
+def portal_of(seq_id: str) -> str:
+    """
+    Portal part of a renamed 'Portal-ID' sequence id.
+    """
+    return seq_id.split("-", 1)[0]
+
+
+def fasta_stem(path: str) -> str:
+    """
+    File name without the FASTA (and .gz) extension.
+    """
+    name = os.path.basename(path)
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return name.rsplit(".", 1)[0]
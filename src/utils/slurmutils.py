@@ -0,0 +1,240 @@
+import os
+import json
+import math
+import subprocess
+from datetime import datetime
+
+from config import (
+    SLURM_RESOURCE_MODELS, SLURM_RESOURCE_MODELS_PATH, SLURM_TIME_MARGIN, SLURM_MEM_MARGIN, SLURM_MIN_TIME_S,
+    SLURM_MIN_MEM_MB, SLURM_MAX_TIME_S, SLURM_MAX_MEM_MB, SLURM_KILLED_MARGIN
+)
+from src.utils.sequtils import iter_fasta
+
+# Input kind of each stage: unaligned FASTA or alignment
+STAGE_INPUTS = {"msa": "fasta", "trim": "alignment", "iqtree": "alignment"}
+USAGE_COLUMNS = ["stage", "job_id", "task", "class", "input", "x", "cpus", "mem_mb", "time_s",
+                 "state", "elapsed_s", "cpu_s", "max_rss_mb"]
+
+
+def input_size(path: str, kind: str) -> dict:
+    """
+    Size of a task's input: sequences and residues of a FASTA, taxa and sites of an alignment.
+    """
+    n = residues = sites = 0
+    for _, seq in iter_fasta(path):
+        n += 1
+        sites = max(sites, len(seq))
+        if kind == "fasta":
+            residues += len(seq) - seq.count("-") - seq.count("*")
+    if kind == "fasta":
+        return {"n_seqs": n, "residues": residues}
+    return {"taxa": n, "sites": sites}
+
+
+def cost_feature(size: dict) -> float:
+    """
+    The x of the cost models: n_seqs * residues for FASTA, taxa * sites for alignments.
+    """
+    if "residues" in size:
+        return float(size["n_seqs"] * size["residues"])
+    return float(size["taxa"] * size["sites"])
+
+
+def load_models(path: str = SLURM_RESOURCE_MODELS_PATH) -> dict:
+    """
+    Cost models per stage: config.SLURM_RESOURCE_MODELS, with fitted coefficients
+    (and their margins) from `path` where available.
+    """
+    models = {stage: dict(model) for stage, model in SLURM_RESOURCE_MODELS.items()}
+    if os.path.exists(path):
+        with open(path) as f:
+            for stage, fitted in json.load(f).items():
+                models.setdefault(stage, {"cpus": [(None, 1)]}).update(fitted)
+    return models
+
+
+def _round_up(value: float, step: int) -> int:
+    return int(math.ceil(value / step) * step)
+
+
+def task_resources(stage: str, size: dict, models: dict) -> dict:
+    """
+    cpus, mem_mb and time_s for one task from its input size.
+    """
+    model = models[stage]
+    x = max(cost_feature(size), 1.0)
+    a, b = model["time"]
+    c, d = model["mem"]
+    time_s = a * x ** b * model.get("time_margin", SLURM_TIME_MARGIN)
+    mem_mb = c * x ** d * model.get("mem_margin", SLURM_MEM_MARGIN)
+    if model.get("cpus") is None:
+        # MSA: the threads mafft-adaptive.py will use for this family
+        from src.utils.msautils import choose_strategy
+        cpus = choose_strategy(size["n_seqs"], size["residues"] / max(size["n_seqs"], 1))["threads"]
+    else:
+        cpus = next(n for limit, n in model["cpus"] if limit is None or x <= limit)
+    return {
+        "x": x,
+        "cpus": int(cpus),
+        "mem_mb": int(min(max(mem_mb, SLURM_MIN_MEM_MB), SLURM_MAX_MEM_MB)),
+        "time_s": int(min(max(time_s, SLURM_MIN_TIME_S), SLURM_MAX_TIME_S)),
+    }
+
+
+def resource_classes(tasks: list, n_classes: int) -> list:
+    """
+    Group tasks into at most n_classes arrays of similar predicted time.
+
+    Tasks are sorted by predicted time and cut into groups of equal count; each
+    class requests the largest cpus / memory / time of its members (memory per
+    cpu rounded up to 256 MB, time to 5 minutes).
+
+    Args:
+        tasks (list): Dicts with 'input', 'cpus', 'mem_mb' and 'time_s' (from task_resources).
+        n_classes (int): Maximum number of classes.
+
+    Returns:
+        list: Dicts with 'cpus', 'mem_per_cpu_mb', 'time_s' and 'tasks', smallest class first.
+    """
+    ordered = sorted(tasks, key=lambda t: (t["time_s"], t["mem_mb"]))
+    n_classes = max(1, min(n_classes, len(ordered)))
+    size = math.ceil(len(ordered) / n_classes)
+    classes = []
+    for i in range(0, len(ordered), size):
+        members = ordered[i:i + size]
+        cpus = max(t["cpus"] for t in members)
+        mem_mb = max(t["mem_mb"] for t in members)
+        classes.append({
+            "cpus": cpus,
+            "mem_per_cpu_mb": _round_up(mem_mb / cpus, 256),
+            "time_s": min(_round_up(max(t["time_s"] for t in members), 300), SLURM_MAX_TIME_S),
+            "tasks": members,
+        })
+    return classes
+
+
+def slurm_time(seconds: int) -> str:
+    """
+    Seconds as a SLURM time limit (D-HH:MM:SS).
+    """
+    days, rest = divmod(int(seconds), 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{days}-{hours:02d}:{minutes:02d}:{secs:02d}" if days else f"{hours:02d}:{minutes:02d}:{secs:02d}"
+
+
+def parse_slurm_time(value: str) -> float | None:
+    """
+    sacct duration ([D-]HH:MM:SS, MM:SS.mmm) in seconds.
+    """
+    if not value or value in ("INVALID", "UNLIMITED", "Partition_Limit"):
+        return None
+    days, _, clock = value.rpartition("-")
+    parts = [float(p) for p in clock.split(":")]
+    while len(parts) < 3:
+        parts.insert(0, 0.0)
+    return (int(days) if days else 0) * 86400 + parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def parse_slurm_mem(value: str) -> float | None:
+    """
+    sacct memory (e.g. 123456K, 1.5G) in MB.
+    """
+    if not value:
+        return None
+    units = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024}
+    if value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value) / (1024 * 1024)
+
+
+def sacct_usage(job_ids: list, batch: int = 100) -> dict:
+    """
+    Actual usage of array tasks from sacct.
+
+    Returns:
+        dict: "<job>_<task>" -> state, elapsed_s, cpu_s and max_rss_mb (max over the job steps).
+    """
+    usage = {}
+    fields = "JobID,State,ElapsedRaw,TotalCPU,MaxRSS"
+    for i in range(0, len(job_ids), batch):
+        out = subprocess.run(
+            ["sacct", "-P", "-n", f"--format={fields}", "-j", ",".join(job_ids[i:i + batch])],
+            check=True, capture_output=True, text=True).stdout
+        for line in out.splitlines():
+            job, state, elapsed, cpu, rss = line.split("|")
+            task, _, step = job.partition(".")
+            if "[" in task:
+                # Pending elements are listed as 123_[5-10]
+                continue
+            rec = usage.setdefault(task, {"state": "", "elapsed_s": None, "cpu_s": None, "max_rss_mb": None})
+            if not step:
+                rec["state"] = state.split()[0]
+                rec["elapsed_s"] = float(elapsed) if elapsed else None
+                rec["cpu_s"] = parse_slurm_time(cpu)
+            rss_mb = parse_slurm_mem(rss)
+            if rss_mb is not None:
+                rec["max_rss_mb"] = max(rec["max_rss_mb"] or 0.0, rss_mb)
+    return usage
+
+
+def fit_models(rows: list, min_tasks: int = 10) -> dict:
+    """
+    Fit time and memory power laws per stage from completed and killed tasks.
+
+    log(time) and log(max RSS) are regressed on log(x); the margin is the 95th
+    percentile of the ratio actual / predicted, so 95% of past tasks would
+    have fit into their request. Tasks killed at a limit (TIMEOUT for time,
+    OUT_OF_MEMORY for memory) only give a lower bound, the limit they hit:
+    it enters the regression as an observation, and the margin is raised until
+    every killed task would get SLURM_KILLED_MARGIN times the limit that killed it.
+
+    Args:
+        rows (list): Joined plan/usage records (see USAGE_COLUMNS).
+        min_tasks (int): Completed or killed tasks needed to fit a stage.
+
+    Returns:
+        dict: stage -> time, mem (coefficients), time_margin, mem_margin, tasks, killed and fitted date.
+    """
+    import numpy as np
+
+    def number(value):
+        return float(value) if value not in (None, "") else None
+
+    # (usage column, requested column, state of a task killed at that limit)
+    targets = {"time": ("elapsed_s", "time_s", "TIMEOUT"), "mem": ("max_rss_mb", "mem_mb", "OUT_OF_MEMORY")}
+    fitted = {}
+    for stage in sorted({r["stage"] for r in rows}):
+        stage_rows = [r for r in rows if r["stage"] == stage and number(r["x"])]
+        used = [r for r in stage_rows if r["state"] in ("COMPLETED", "TIMEOUT", "OUT_OF_MEMORY")]
+        if len(used) < min_tasks:
+            continue
+        entry = {"tasks": len(used), "killed": sum(r["state"] != "COMPLETED" for r in used),
+                 "fitted": datetime.now().isoformat(timespec="seconds")}
+        for key, (column, requested, killed_state) in targets.items():
+            x, y, bound = [], [], []
+            for r in used:
+                value, limit = number(r[column]), number(r[requested])
+                if r["state"] == killed_state:
+                    # Killed at the limit: the task needed at least that much
+                    value = max(value or 0.0, limit or 0.0)
+                elif r["state"] != "COMPLETED":
+                    # Killed at the other limit: its usage here is cut short
+                    continue
+                if value:
+                    x.append(float(r["x"]))
+                    y.append(max(value, 1.0))
+                    bound.append(r["state"] == killed_state)
+            if len(x) < 2:
+                break
+            log_x, log_y, bound = np.log(x), np.log(y), np.array(bound)
+            slope, intercept = np.polyfit(log_x, log_y, 1)
+            residual = log_y - (intercept + slope * log_x)
+            margin = max(np.exp(np.percentile(residual, 95)), 1.0)
+            if bound.any():
+                margin = max(margin, SLURM_KILLED_MARGIN * np.exp(residual[bound].max()))
+            entry[key] = [float(np.exp(intercept)), float(slope)]
+            entry[f"{key}_margin"] = round(float(margin), 3)
+        else:
+            fitted[stage] = entry
+    return fitted
@@ -0,0 +1,145 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+from config import MAFFT_TIERS, MAFFT_FIXED_OPTIONS, TRIMAL_OPTIONS, IQTREE_OPTIONS
+from src.utils.sequtils import iter_fasta
+
+# Output of every family stage for an input <base>.fa, as written by its *-par.sh script
+STAGE_OUTPUTS = {"msa": "{base}_mafft.fa", "trim": "{base}_trim.fa", "iqtree": "{base}.treefile"}
+STAMP_SUFFIX = ".stamp"
+# Plan states that need the stage to run
+RERUN_STATES = ("new", "input changed", "options changed", "unstamped")
+
+
+def stage_options(stage: str) -> str:
+    """
+    Options of a family stage; part of its stamp key.
+    """
+    if stage == "msa":
+        # MSA_MODE as in msa-par.sh; the thread counts of the tiers do not change the alignment
+        if os.environ.get("MSA_MODE", "adaptive") == "adaptive":
+            return "adaptive " + json.dumps([list(tier[:4]) for tier in MAFFT_TIERS])
+        return "fixed " + MAFFT_FIXED_OPTIONS
+    return {"trim": TRIMAL_OPTIONS, "iqtree": IQTREE_OPTIONS}[stage]
+
+
+def membership_hash(path: str) -> str:
+    """
+    Hash of a family's sorted (id, sequence) pairs.
+
+    Gaps are removed and residues upper-cased, so an alignment hashes like the
+    FASTA it was made from, and the record order does not matter.
+    """
+    records = sorted(f"{header.split(None, 1)[0]}\t{seq.replace('-', '').replace('.', '').upper()}\n"
+                     for header, seq in iter_fasta(path))
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(record.encode())
+    return digest.hexdigest()
+
+
+def stage_key(stage: str, upstream: str) -> str:
+    return hashlib.sha256(f"{stage}\n{stage_options(stage)}\n{upstream}".encode()).hexdigest()
+
+
+def stamp_path(out_path: str) -> str:
+    """
+    Stamp of a stage output: <OG>_mafft.fa -> <OG>_mafft.fa.stamp.
+    """
+    return out_path + STAMP_SUFFIX
+
+
+def read_stamp(path: str) -> dict | None:
+    try:
+        with open(stamp_path(path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def upstream_key(in_path: str, previous: dict | None = None, rehash: bool = False) -> str:
+    """
+    What a stage output depends on: the stamp key of its input when the input is
+    itself a stage output (so option changes cascade downstream), else the
+    membership hash of the input. The upstream recorded in the output's previous
+    stamp is reused while the input's size and mtime are unchanged.
+    """
+    input_stamp = read_stamp(in_path)
+    if input_stamp and "key" in input_stamp:
+        return input_stamp["key"]
+    st = os.stat(in_path)
+    if (previous and not rehash and previous.get("input_size") == st.st_size
+            and previous.get("input_mtime") == st.st_mtime):
+        return previous["upstream"]
+    return membership_hash(in_path)
+
+
+def write_stamp(stage: str, in_path: str, out_path: str, upstream: str | None = None) -> dict:
+    """
+    Record that out_path was made from in_path with the current stage options.
+    """
+    upstream = upstream or upstream_key(in_path)
+    st = os.stat(in_path)
+    stamp = {
+        "stage": stage,
+        "key": stage_key(stage, upstream),
+        "upstream": upstream,
+        "options": stage_options(stage),
+        "input": os.path.basename(in_path),
+        "input_size": st.st_size,
+        "input_mtime": st.st_mtime,
+        "stamped": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp_path = stamp_path(out_path) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(stamp, f, indent=2)
+    os.replace(tmp_path, stamp_path(out_path))
+    return stamp
+
+
+def family_status(stage: str, in_path: str, out_path: str, adopt: bool = True, rehash: bool = False,
+                  write: bool = True) -> str:
+    """
+    Whether a family's stage output is up to date with its input.
+
+    Outputs without a stamp (made before stamps existed) are adopted when they
+    provably match: an alignment with exactly the family's members, or a
+    trimmed alignment / tree newer than its input.
+
+    Args:
+        stage (str): "msa", "trim" or "iqtree".
+        in_path (str): Stage input (family FASTA, alignment or trimmed alignment).
+        out_path (str): Stage output.
+        adopt (bool): Adopt matching unstamped outputs instead of reporting them as "unstamped".
+        rehash (bool): Hash the input even if its size and mtime are unchanged.
+        write (bool): Stamp adopted outputs and refresh the input size / mtime of current ones.
+
+    Returns:
+        str: "new", "current", "adopted", "input changed", "options changed" or "unstamped".
+    """
+    if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+        return "new"
+    stamp = read_stamp(out_path)
+    upstream = upstream_key(in_path, stamp, rehash)
+    if stamp is None:
+        if not adopt:
+            return "unstamped"
+        if stage == "msa":
+            matches = membership_hash(out_path) == upstream
+        else:
+            matches = os.path.getmtime(out_path) >= os.path.getmtime(in_path)
+        if not matches:
+            return "unstamped"
+        if write:
+            write_stamp(stage, in_path, out_path, upstream)
+        return "adopted"
+    if stamp.get("key") == stage_key(stage, upstream):
+        st = os.stat(in_path)
+        if write and (stamp.get("input_size"), stamp.get("input_mtime")) != (st.st_size, st.st_mtime):
+            write_stamp(stage, in_path, out_path, upstream)
+        return "current"
+    if stamp.get("upstream") != upstream:
+        return "input changed"
+    return "options changed"
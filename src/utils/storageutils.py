@@ -0,0 +1,253 @@
+import os
+import glob
+import bisect
+import struct
+import zlib
+
+from config import PROTEOME_COMPRESSION, BGZF_LEVEL
+from src.utils.sequtils import write_fasta_record
+
+# Uncompressed bytes per BGZF block (as bgzip), so every block fits the 64 KiB limit
+BGZF_BLOCK_SIZE = 0xff00
+# Empty block that terminates every BGZF file
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+FASTA_SUFFIXES = (".fasta", ".fasta.gz")
+
+
+def proteome_suffix() -> str:
+    """
+    File suffix for proteomes written by the pipeline (.fasta.gz with BGZF storage).
+    """
+    return ".fasta.gz" if PROTEOME_COMPRESSION == "bgzf" else ".fasta"
+
+
+def list_fasta(folder: str) -> list:
+    """
+    Sorted <name>.fasta and <name>.fasta.gz files in a folder (index files excluded).
+    """
+    return sorted(p for suffix in FASTA_SUFFIXES for p in glob.glob(os.path.join(folder, "*" + suffix)))
+
+
+def _bgzf_block(data: bytes, level: int) -> bytes:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    deflated = compressor.compress(data) + compressor.flush()
+    # gzip header with the BC extra field holding the block size - 1
+    header = struct.pack("<4BI2BH2BHH", 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, 66, 67, 2, len(deflated) + 25)
+    return header + deflated + struct.pack("<II", zlib.crc32(data), len(data))
+
+
+class BgzfFastaWriter:
+    """
+    Write a BGZF-compressed FASTA with samtools-compatible .fai and .gzi indexes.
+
+    BGZF is a series of independent gzip members, so the file still reads with
+    gzip/zcat (and sequtils.open_text), while samtools faidx, pysam or htslib
+    can fetch single proteins through the indexes. Output goes to a temporary
+    file that replaces the target on close, so a hardlinked copy of the old
+    file (e.g. in proteomes/final) is never modified in place.
+    """
+
+    def __init__(self, path: str, width: int = 60, level: int = BGZF_LEVEL):
+        self.path = path
+        self.width = width
+        self.level = level
+        self._tmp_path = path + ".tmp"
+        self._out = open(self._tmp_path, "wb")
+        self._buffer = bytearray()
+        self._uncompressed = 0        # bytes written so far (uncompressed coordinates)
+        self._block_start = 0         # uncompressed offset of the buffered block
+        self._compressed = 0          # bytes of compressed output so far
+        self._gzi = []                # (compressed, uncompressed) start of every block but the first
+        self._fai = []
+
+    def write(self, header: str, seq: str):
+        name = header.split(None, 1)[0]
+        self._append(f">{header}\n".encode())
+        if seq:
+            # samtools leaves empty sequences out of the .fai as well
+            line_bases = min(len(seq), self.width)
+            self._fai.append((name, len(seq), self._uncompressed, line_bases, line_bases + 1))
+        for i in range(0, len(seq), self.width):
+            self._append(seq[i:i + self.width].encode() + b"\n")
+
+    def _append(self, data: bytes):
+        self._buffer += data
+        self._uncompressed += len(data)
+        while len(self._buffer) >= BGZF_BLOCK_SIZE:
+            self._flush_block(BGZF_BLOCK_SIZE)
+
+    def _flush_block(self, size: int):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        block = _bgzf_block(data, self.level)
+        if self._compressed:
+            self._gzi.append((self._compressed, self._block_start))
+        self._out.write(block)
+        self._compressed += len(block)
+        self._block_start += size
+
+    def close(self):
+        if self._buffer:
+            self._flush_block(len(self._buffer))
+        self._out.write(BGZF_EOF)
+        self._out.close()
+        os.replace(self._tmp_path, self.path)
+        # Indexes are replaced the same way, never rewritten in place
+        with open(self.path + ".fai.tmp", "w") as f:
+            for row in self._fai:
+                f.write("\t".join(map(str, row)) + "\n")
+        os.replace(self.path + ".fai.tmp", self.path + ".fai")
+        with open(self.path + ".gzi.tmp", "wb") as f:
+            f.write(struct.pack("<Q", len(self._gzi)))
+            for compressed, uncompressed in self._gzi:
+                f.write(struct.pack("<QQ", compressed, uncompressed))
+        os.replace(self.path + ".gzi.tmp", self.path + ".gzi")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._out.close()
+            os.remove(self._tmp_path)
+
+
+class PlainFastaWriter:
+    """
+    Uncompressed counterpart of BgzfFastaWriter (same write(header, seq) interface).
+    """
+
+    def __init__(self, path: str, width: int = 60):
+        self.path = path
+        self.width = width
+        self._tmp_path = path + ".tmp"
+        self._out = open(self._tmp_path, "w")
+
+    def write(self, header: str, seq: str):
+        write_fasta_record(self._out, header, seq, self.width)
+
+    def close(self):
+        self._out.close()
+        os.replace(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._out.close()
+            os.remove(self._tmp_path)
+
+
+def fasta_writer(path: str, width: int = 60):
+    """
+    Writer for path: BGZF + indexes for .gz paths, plain FASTA otherwise.
+    """
+    if path.endswith(".gz"):
+        return BgzfFastaWriter(path, width)
+    return PlainFastaWriter(path, width)
+
+
+def seqrecord_title(record) -> str:
+    """
+    FASTA title line of a Bio.SeqRecord, as Bio.SeqIO writes it.
+    """
+    if record.description and record.description.split(None, 1)[0] == record.id:
+        return record.description
+    if record.description:
+        return f"{record.id} {record.description}"
+    return record.id
+
+
+def write_seqrecords(path: str, records) -> int:
+    """
+    Write Bio.SeqRecords to a plain or BGZF FASTA (chosen by the path's extension).
+
+    Returns:
+        int: Number of records written.
+    """
+    n = 0
+    with fasta_writer(path) as out:
+        for record in records:
+            out.write(seqrecord_title(record), str(record.seq))
+            n += 1
+    return n
+
+
+class IndexedFasta:
+    """
+    Random access to single sequences of a FASTA with a samtools .fai index:
+    BGZF files (with their .gzi, as written by BgzfFastaWriter) or plain files.
+
+    Only the index entries of `names` are kept when given, so many large
+    indexes can be opened one after another without holding them all.
+    """
+
+    def __init__(self, path: str, names=None):
+        self.path = path
+        self.index = {}
+        wanted = set(names) if names is not None else None
+        with open(path + ".fai") as f:
+            for line in f:
+                name, length, offset, line_bases, line_width = line.rstrip("\n").split("\t")[:5]
+                if wanted is None or name in wanted:
+                    self.index[name] = (int(length), int(offset), int(line_bases), int(line_width))
+        self.bgzf = path.endswith(".gz")
+        self._blocks = [(0, 0)]
+        if self.bgzf:
+            with open(path + ".gzi", "rb") as f:
+                data = f.read()
+            n = struct.unpack_from("<Q", data)[0]
+            self._blocks += [struct.unpack_from("<QQ", data, 8 + 16 * i) for i in range(n)]
+        self._starts = [uncompressed for _, uncompressed in self._blocks]
+        self._cache = (None, b"")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def _block(self, f, compressed: int) -> bytes:
+        if self._cache[0] == compressed:
+            return self._cache[1]
+        f.seek(compressed)
+        header = f.read(18)
+        size = struct.unpack_from("<H", header, 16)[0] + 1
+        data = zlib.decompress(f.read(size - 18)[:-8], -15)
+        self._cache = (compressed, data)
+        return data
+
+    def _read(self, f, start: int, size: int) -> bytes:
+        if not self.bgzf:
+            f.seek(start)
+            return f.read(size)
+        # Last block starting at or before `start`, then following blocks until `size` bytes are read
+        compressed, uncompressed = self._blocks[bisect.bisect_right(self._starts, start) - 1]
+        out = bytearray()
+        skip = start - uncompressed
+        while len(out) < size:
+            data = self._block(f, compressed)
+            if not data:
+                break
+            out += data[skip:]
+            skip = 0
+            f.seek(compressed + 16)
+            compressed += struct.unpack("<H", f.read(2))[0] + 1
+        return bytes(out[:size])
+
+    def fetch(self, names) -> dict:
+        """
+        Sequences of the given names (missing names are left out).
+        """
+        found = {}
+        with open(self.path, "rb") as f:
+            for name in names:
+                if name not in self.index:
+                    continue
+                length, offset, line_bases, line_width = self.index[name]
+                n_lines = (length + line_bases - 1) // line_bases
+                raw = self._read(f, offset, length + n_lines * (line_width - line_bases))
+                found[name] = raw.replace(b"\n", b"").replace(b"\r", b"")[:length].decode()
+        return found
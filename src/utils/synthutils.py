@@ -0,0 +1,217 @@
+import os
+import gzip
+import json
+import random
+import pandas as pd
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+LINEAGE = "fungi_odb10"
+
+
+def synthetic_portals(n: int) -> list:
+    """
+    Portal names shaped like MycoCosm ones (letters + digit, no '-').
+    """
+    return [f"Synth{i:05d}a1" for i in range(n)]
+
+
+def random_protein(rng: random.Random, min_len: int = 30, max_len: int = 1200) -> str:
+    # Log-normal-ish lengths: mostly a few hundred residues with a long tail
+    length = int(min(max(rng.lognormvariate(5.8, 0.7), min_len), max_len))
+    return "M" + "".join(rng.choices(AMINO_ACIDS, k=length - 1)) + "*"
+
+
+def _write_wrapped(f, header: str, seq: str, width: int = 60):
+    f.write(f">{header}\n")
+    for i in range(0, len(seq), width):
+        f.write(seq[i:i + width] + "\n")
+
+
+def write_mycocosm_jsons(json_dir: str, portals: list, files_per_portal: int, rng: random.Random,
+                         files_per_page: int = 50) -> int:
+    """
+    Write paginated all_files_<portal>_page_<n>.json listings as returned by the JGI API.
+
+    One proteome and one CDS file per portal look like the 'best' filtered models,
+    the rest are assorted other files.
+
+    Returns:
+        int: Number of JSON files written.
+    """
+    os.makedirs(json_dir, exist_ok=True)
+    written = 0
+    for p, portal in enumerate(portals):
+        files = []
+        for i in range(files_per_portal):
+            if i == 0:
+                name, ftype, label = f"{portal}_GeneCatalog_proteins_20240101.aa.fasta.gz", "protein", "proteins_filtered"
+            elif i == 1:
+                name, ftype, label = f"{portal}_GeneCatalog_CDS_20240101.fasta.gz", "cds", "cds_filtered"
+            else:
+                name, ftype, label = f"{portal}_misc_{i}.txt.gz", rng.choice(["text", "gff", "assembly"]), "other"
+            files.append({
+                "file_name": name,
+                "file_id": f"{p:05d}{i:04d}",
+                "_id": f"{rng.getrandbits(96):024x}",
+                "file_status": "RESTORED",
+                "md5sum": f"{rng.getrandbits(128):032x}",
+                "file_date": "2024-01-01T00:00:00",
+                "file_type": ftype,
+                "metadata": {
+                    "ncbi_taxon_id": 100000 + p,
+                    "jat_label": label,
+                    "ncbi_taxon": {
+                        "ncbi_taxon_class": f"Class{p % 7}",
+                        "ncbi_taxon_family": f"Family{p % 53}",
+                        "ncbi_taxon_order": f"Order{p % 19}",
+                        "ncbi_taxon_genus": f"Genus{p % 211}",
+                        "ncbi_taxon_species": f"Genus{p % 211} species{p}",
+                    },
+                    "portal": {"display_location": 'Filtered Models ("best")' if i < 2 else "Annotation"},
+                },
+            })
+        for page, start in enumerate(range(0, len(files), files_per_page), 1):
+            path = os.path.join(json_dir, f"all_files_{portal}_page_{page}.json")
+            with open(path, "w") as f:
+                json.dump({"organisms": [{"id": portal, "files": files[start:start + files_per_page]}]}, f, indent=2)
+            written += 1
+    return written
+
+
+def write_jgi_proteomes(compressed_dir: str, portals: list, proteins: int, rng: random.Random) -> pd.DataFrame:
+    """
+    Write gzipped proteomes with JGI headers (>jgi|<portal>|<protein id>|<model>).
+
+    Returns:
+        pd.DataFrame: portal and compressed_file columns, as in proteomes_all_list.csv.
+    """
+    os.makedirs(compressed_dir, exist_ok=True)
+    rows = []
+    for portal in portals:
+        name = f"{portal}_GeneCatalog_proteins_20240101.aa.fasta.gz"
+        # compresslevel 1 keeps generation fast; the benchmark reads, it does not write these
+        with gzip.open(os.path.join(compressed_dir, name), "wt", compresslevel=1) as f:
+            for i in range(proteins):
+                pid = 100000 + i
+                _write_wrapped(f, f"jgi|{portal}|{pid}|fgenesh1_kg.1_#_{i}_#_Locus{pid}", random_protein(rng))
+        rows.append({"portal": portal, "compressed_file": name})
+    return pd.DataFrame(rows)
+
+
+def write_renamed_proteomes(out_dir: str, portals: list, proteins: int, rng: random.Random) -> int:
+    """
+    Write proteomes as they look after renaming (<portal>.fasta, >portal-id headers).
+
+    Returns:
+        int: Number of sequences written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    for portal in portals:
+        with open(os.path.join(out_dir, f"{portal}.fasta"), "w") as f:
+            for i in range(proteins):
+                _write_wrapped(f, f"{portal}-{100000 + i}", random_protein(rng, min_len=10, max_len=12000))
+    return len(portals) * proteins
+
+
+def write_busco_results(res_dir: str, portals: list, n_markers: int, rng: random.Random) -> int:
+    """
+    Write one BUSCO output folder per portal (<portal>.fasta/) with a short
+    summary JSON and run_<lineage>/full_table.tsv.
+
+    Returns:
+        int: Number of portals written.
+    """
+    markers = [f"{1000 + i}at4751" for i in range(n_markers)]
+    statuses = ["Complete", "Duplicated", "Fragmented", "Missing"]
+    for portal in portals:
+        folder = os.path.join(res_dir, f"{portal}.fasta")
+        run_dir = os.path.join(folder, f"run_{LINEAGE}")
+        os.makedirs(run_dir, exist_ok=True)
+        counts = dict.fromkeys(statuses, 0)
+        with open(os.path.join(run_dir, "full_table.tsv"), "w") as f:
+            f.write("# BUSCO version is: 5.8.2\n# Busco id\tStatus\tSequence\tGene Start\tGene End\tStrand\tScore\tLength\n")
+            for m in markers:
+                status = rng.choices(statuses, weights=[90, 4, 3, 3])[0]
+                counts[status] += 1
+                copies = 2 if status == "Duplicated" else 1
+                for _ in range(copies):
+                    if status == "Missing":
+                        f.write(f"{m}\tMissing\n")
+                    else:
+                        f.write(f"{m}\t{status}\t{portal}-{rng.randint(100000, 199999)}\t1\t500\t+\t{rng.uniform(100, 900):.1f}\t500\n")
+        complete = counts["Complete"] + counts["Duplicated"]
+        pct = lambda n: round(100 * n / n_markers, 1)
+        summary = {
+            "parameters": {"in": f"{portal}.fasta", "main_out": folder, "mode": "proteins"},
+            "lineage_dataset": {"name": LINEAGE, "creation_date": "2024-01-08", "number_of_buscos": str(n_markers),
+                                "number_of_species": "549"},
+            "versions": {"busco": "5.8.2", "python": [3, 11, 7, "final", 0]},
+            "results": {
+                "one_line_summary": f"C:{pct(complete)}%[S:{pct(counts['Complete'])}%,D:{pct(counts['Duplicated'])}%],"
+                                    f"F:{pct(counts['Fragmented'])}%,M:{pct(counts['Missing'])}%,n:{n_markers}",
+                "Complete percentage": pct(complete),
+                "Single copy percentage": pct(counts["Complete"]),
+                "Multi copy percentage": pct(counts["Duplicated"]),
+                "Fragmented percentage": pct(counts["Fragmented"]),
+                "Missing percentage": pct(counts["Missing"]),
+                "Complete BUSCOs": complete,
+                "Single copy BUSCOs": counts["Complete"],
+                "Multi copy BUSCOs": counts["Duplicated"],
+                "Fragmented BUSCOs": counts["Fragmented"],
+                "Missing BUSCOs": counts["Missing"],
+                "n_markers": n_markers,
+                "domain": "eukaryota",
+            },
+        }
+        with open(os.path.join(folder, f"short_summary.specific.{LINEAGE}.{portal}.fasta.json"), "w") as f:
+            json.dump(summary, f, indent=4)
+    return len(portals)
+
+
+def write_iprscan_logs(log_dir: str, portals: list, pieces: int, rng: random.Random, failed_rate: float = 0.02) -> int:
+    """
+    Write cluster InterProScan submit logs (iprscan_<portal>.submit.log), some
+    finished, some still running.
+
+    Returns:
+        int: Number of log lines written.
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    lines = 0
+    for portal in portals:
+        done = pieces if rng.random() < 0.7 else rng.randint(0, pieces)
+        with open(os.path.join(log_dir, f"iprscan_{portal}.submit.log"), "w") as f:
+            f.write(f"Running InterProScan for {portal}\nThe job is split into {pieces} pieces\n")
+            lines += 2
+            for k in range(1, done + 1):
+                f.write(f"INFO: submitted subjob {k}\n")
+                f.write(f"subjob {k} {'FAILED' if rng.random() < failed_rate else 'OK'}\n")
+                lines += 2
+    return lines
+
+
+def _random_newick(rng: random.Random, leaves: list) -> str:
+    nodes = list(leaves)
+    while len(nodes) > 1:
+        a = nodes.pop(rng.randrange(len(nodes)))
+        b = nodes.pop(rng.randrange(len(nodes)))
+        support = f"{rng.uniform(0, 100):.1f}/{rng.randint(0, 100)}" if len(nodes) else ""
+        nodes.append(f"({a}:{rng.uniform(0.001, 0.5):.6f},{b}:{rng.uniform(0.001, 0.5):.6f}){support}")
+    return nodes[0] + ";"
+
+
+def write_gene_trees(tree_dir: str, portals: list, n_trees: int, rng: random.Random, occupancy: float = 0.9) -> int:
+    """
+    Write IQ-TREE style gene trees (<OG>_mafft_trim.treefile) with portal-protein
+    leaves and SH-aLRT/UFBoot support labels.
+
+    Returns:
+        int: Number of trees written.
+    """
+    os.makedirs(tree_dir, exist_ok=True)
+    for t in range(n_trees):
+        taxa = [p for p in portals if rng.random() < occupancy] or portals[:4]
+        leaves = [f"{p}-{rng.randint(100000, 199999)}" for p in taxa]
+        with open(os.path.join(tree_dir, f"OG{t:07d}_mafft_trim.treefile"), "w") as f:
+            f.write(_random_newick(rng, leaves) + "\n")
+    return n_trees
@@ -0,0 +1,291 @@
+import os
+import re
+import hashlib
+import logging
+import zipfile
+import posixpath
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+# Bump when the parsing/wrangling output changes, so old cache entries are ignored
+TABLE_CACHE_VERSION = 2
+# DataFrame.attrs key holding the column dtypes of the parsed table
+CACHE_DTYPES_ATTR = "parsed_dtypes"
+
+_NS = {
+    "m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_R_ID = "{%s}id" % _NS["r"]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_cached_table(cache_dir: str | None, key: str) -> pd.DataFrame | None:
+    """
+    Return the cached parsed table for a source hash, or None.
+    """
+    if not cache_dir:
+        return None
+    path = os.path.join(cache_dir, f"{key}.v{TABLE_CACHE_VERSION}.parquet")
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable table cache {path}: {e}")
+        return None
+    # Back to the dtypes of the fresh parse (object with None, or str/string with their own NA),
+    # so .isna() and .str behave the same whether or not the cache was warm
+    dtypes = df.attrs.pop(CACHE_DTYPES_ATTR, None)
+    if dtypes is None or set(dtypes) != set(df.columns):
+        logging.warning(f"Ignoring table cache {path} without the parsed dtypes")
+        return None
+    try:
+        for c, dtype in dtypes.items():
+            if str(df[c].dtype) == dtype:
+                continue
+            if dtype == "object":
+                df[c] = df[c].astype(object).where(df[c].notna(), None)
+            else:
+                df[c] = df[c].astype(dtype)
+    except (TypeError, ValueError) as e:
+        logging.warning(f"Ignoring table cache {path}: {e}")
+        return None
+    return df
+
+
+def save_cached_table(cache_dir: str | None, key: str, df: pd.DataFrame):
+    """
+    Store a parsed table as Parquet under its source hash (skipped without a Parquet engine).
+    """
+    if not cache_dir:
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.v{TABLE_CACHE_VERSION}.parquet")
+    tmp_path = path + ".tmp"
+    try:
+        # Numeric columns keep their type; mixed-type object columns are stored as strings, None stays null.
+        # The parsed dtypes go into the file's pandas metadata so load_cached_table can restore them.
+        dtypes = {c: str(df[c].dtype) for c in df.columns}
+        df = df.infer_objects()
+        df = df.astype({c: "string" for c in df.columns if df[c].dtype == object})
+        df.attrs = {CACHE_DTYPES_ATTR: dtypes}
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except (ImportError, ValueError) as e:
+        logging.warning(f"Could not cache parsed table ({e}); it will be parsed again next time.")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class _TableParser(HTMLParser):
+    """
+    Streaming extractor for the first <table>: header texts plus, per row, the
+    cell texts and the href of the first link in each cell.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.headers, self.rows = [], []
+        self._depth = 0            # nesting level of <table>; only the first table is read
+        self._done = False
+        self._cell = None          # 'th' / 'td' while inside a cell
+        self._text, self._href, self._seen_a = [], None, False
+        self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth += 1
+        elif self._depth != 1:
+            return
+        elif tag == "tr":
+            self._row = ([], [])
+        elif tag in ("td", "th"):
+            self._cell, self._text, self._href, self._seen_a = tag, [], None, False
+        elif tag == "a" and self._cell and not self._seen_a:
+            self._seen_a = True
+            self._href = dict(attrs).get("href") or None
+
+    def handle_endtag(self, tag):
+        if self._done:
+            return
+        if tag == "table":
+            self._depth -= 1
+            self._done = self._depth == 0
+        elif self._depth != 1:
+            return
+        elif tag in ("td", "th") and self._cell:
+            text = "".join(t.strip() for t in self._text)
+            if self._cell == "th":
+                self.headers.append(text)
+            elif self._row is not None:
+                self._row[0].append(text)
+                self._row[1].append(self._href)
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell and self._depth == 1:
+            self._text.append(data)
+
+
+def _extract_with_lxml(html: str):
+    import lxml.html
+
+    doc = lxml.html.fromstring(html)
+    # fromstring returns the element itself for a bare '<table>' fragment
+    table = doc if doc.tag == "table" else doc.find(".//table")
+    if table is None:
+        return None, None
+    headers = ["".join(t.strip() for t in th.itertext()) for th in table.iter("th")]
+    rows = []
+    for tr in list(table.iter("tr"))[1:]:
+        texts, links = [], []
+        for td in tr.iter("td"):
+            texts.append("".join(t.strip() for t in td.itertext()))
+            a = next(td.iter("a"), None)
+            links.append((a.get("href") or None) if a is not None else None)
+        rows.append((texts, links))
+    return headers, rows
+
+
+def extract_html_table(html: str):
+    """
+    Extract the first HTML table: header texts and (cell texts, cell hrefs) per row.
+
+    Uses lxml when installed and a streaming html.parser pass otherwise; both
+    match BeautifulSoup's get_text(strip=True) / find('a')['href'] per cell.
+
+    Returns:
+        tuple: (headers, rows), or (None, None) when there is no table.
+    """
+    try:
+        return _extract_with_lxml(html)
+    except ImportError:
+        parser = _TableParser()
+        parser.feed(html)
+        parser.close()
+        if not parser.headers and not parser.rows:
+            return None, None
+        # The header row has no <td> cells
+        return parser.headers, [r for r in parser.rows if r[0]]
+
+
+def html_table_to_frame(html: str, base_url: str) -> pd.DataFrame | None:
+    """
+    Parse the MycoCosm fungi table into the DataFrame used downstream
+    (table columns plus 'portal' and 'reference').
+    """
+    headers, rows = extract_html_table(html)
+    if headers is None:
+        return None
+    records = [
+        texts + [urljoin(base_url, h) if h else None for h in links]
+        for texts, links in rows
+    ]
+    df = pd.DataFrame(records, columns=headers + [f"{col}_link" for col in headers])
+    df['portal'] = df['Name_link'].str.replace('https://mycocosm.jgi.doe.gov/', '')
+    df['reference'] = df['Published_link']
+    return df.loc[:, ~df.columns.str.endswith('_link')]
+
+
+def _sheet_xml_paths(zf: zipfile.ZipFile) -> tuple:
+    # Resolve the active sheet's XML part and its relationships part
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    view = wb.find("m:bookViews/m:workbookView", _NS)
+    active = int(view.get("activeTab", 0)) if view is not None else 0
+    sheets = wb.findall("m:sheets/m:sheet", _NS)
+    rid = sheets[min(active, len(sheets) - 1)].get(_R_ID)
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    target = next(r.get("Target") for r in rels.findall("rel:Relationship", _NS) if r.get("Id") == rid)
+    sheet_path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    rels_path = posixpath.join(posixpath.dirname(sheet_path), "_rels", posixpath.basename(sheet_path) + ".rels")
+    return sheet_path, rels_path
+
+
+def _column_index(ref: str) -> tuple:
+    # 'AB12' -> (row 12, column index 27)
+    m = re.match(r"([A-Z]+)(\d+)", ref)
+    col = 0
+    for ch in m.group(1):
+        col = col * 26 + ord(ch) - 64
+    return int(m.group(2)), col - 1
+
+
+def read_xlsx_hyperlinks(path: str) -> dict:
+    """
+    Read the hyperlinks of the active sheet straight from the .xlsx package.
+
+    openpyxl's read-only mode does not expose hyperlinks, so they are taken from
+    the sheet's <hyperlinks> block and its relationships instead of loading the
+    whole workbook a second time.
+
+    Returns:
+        dict: (row, column index) -> target URL (rows 1-based, columns 0-based).
+    """
+    links = {}
+    with zipfile.ZipFile(path) as zf:
+        sheet_path, rels_path = _sheet_xml_paths(zf)
+        targets = {}
+        if rels_path in zf.namelist():
+            for r in ET.fromstring(zf.read(rels_path)).findall("rel:Relationship", _NS):
+                targets[r.get("Id")] = r.get("Target")
+        with zf.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == "{%s}hyperlink" % _NS["m"]:
+                    target = targets.get(elem.get(_R_ID))
+                    if target:
+                        # A ref can be a range (A2:A3); every cell in it links to the target
+                        first, _, last = elem.get("ref").partition(":")
+                        r0, c0 = _column_index(first)
+                        r1, c1 = _column_index(last or first)
+                        for row in range(r0, r1 + 1):
+                            for col in range(c0, c1 + 1):
+                                links[(row, col)] = target
+                elif elem.tag == "{%s}row" % _NS["m"]:
+                    # Cell values are read by openpyxl; drop them as we go
+                    elem.clear()
+    return links
+
+
+def xlsx_table_to_frame(path: str) -> pd.DataFrame:
+    """
+    Load a manually downloaded MycoCosm Excel export in one read-only pass,
+    taking 'portal' and 'reference' from the Name / Published hyperlinks.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(next(rows, ()))]
+        # Keep sheet row numbers (1-based, header = 1) to match hyperlinks; skip blank rows like read_excel
+        numbered = [(n, r) for n, r in enumerate(rows, 2) if any(v is not None for v in r)]
+    finally:
+        wb.close()
+    df = pd.DataFrame([r for _, r in numbered], columns=header)
+    links = read_xlsx_hyperlinks(path)
+
+    def column_links(name):
+        idx = header.index(name)
+        return [links.get((n, idx)) for n, _ in numbered]
+
+    if "Name" in header:
+        df['portal'] = pd.Series(column_links("Name"), dtype=object).str.replace(
+            'https://mycocosm.jgi.doe.gov/', '', regex=False)
+    else:
+        df['portal'] = df['Name'].astype(str).str.replace('https://mycocosm.jgi.doe.gov/', '', regex=False)
+    if "Published" in header:
+        df['reference'] = column_links("Published")
+    return df.loc[:, ~df.columns.str.endswith('_link')]
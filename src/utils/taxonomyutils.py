@@ -0,0 +1,415 @@
+import io
+import os
+import json
+import logging
+import tarfile
+import hashlib
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+# Lineage fields of the MycoCosm metadata (ncbi_taxon_<rank>)
+LINEAGE_RANKS = ("class", "order", "family", "genus", "species")
+FUNGI_TAXID = 4751
+MERGED_RANK = "merged"
+# Name classes of names.dmp that can resolve a portal's species/genus
+NAME_CLASSES = ("scientific name", "synonym", "equivalent name")
+# Deeper than any NCBI lineage; guards against cycles in a broken dump
+MAX_DEPTH = 128
+TAXONOMY_INDEX_VERSION = 1
+
+
+def name_key(name: str) -> int:
+    """
+    64-bit key of a taxon name (case and whitespace insensitive).
+    """
+    normalized = " ".join(str(name).lower().split())
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "little")
+
+
+def _dmp_rows(taxdump: str, member: str, optional: bool = False):
+    """
+    Yield the fields of a .dmp file from an extracted taxdump folder or taxdump.tar.gz.
+    """
+    with contextlib.ExitStack() as stack:
+        if os.path.isdir(taxdump):
+            path = os.path.join(taxdump, member)
+            if optional and not os.path.exists(path):
+                return
+            f = stack.enter_context(open(path, encoding="utf-8"))
+        else:
+            tar = stack.enter_context(tarfile.open(taxdump, "r:gz"))
+            # Match on the basename so repacked archives ("./nodes.dmp") work too
+            info = next((m for m in tar if os.path.basename(m.name) == member), None)
+            if info is None:
+                if optional:
+                    return
+                raise FileNotFoundError(f"{member} not found in {taxdump}")
+            f = stack.enter_context(io.TextIOWrapper(tar.extractfile(info), encoding="utf-8"))
+        for line in f:
+            # Fields are separated by "\t|\t" and lines end with "\t|"
+            yield line.rstrip("\n").removesuffix("\t|").split("\t|\t")
+
+
+def _descends_from(parent: np.ndarray, ancestor: int) -> np.ndarray:
+    # Boolean mask over all taxids: ancestor is on the node's lineage
+    cur = np.arange(len(parent), dtype=parent.dtype)
+    mask = cur == ancestor
+    for _ in range(MAX_DEPTH):
+        cur = parent[cur]
+        mask |= cur == ancestor
+        if not (cur > 1).any():
+            break
+    return mask
+
+
+def build_taxonomy_index(taxdump: str, index_dir: str) -> dict:
+    """
+    Build the offline taxonomy index from an NCBI taxdump.
+
+    The index is a set of .npy arrays that are memory-mapped when loaded:
+    parent.npy / rank.npy (indexed by taxid; merged taxids point at their new
+    id), names.bin + name_offsets.npy (scientific name per taxid) and
+    name_keys.npy / name_taxids.npy (sorted name keys -> taxid). A name used by
+    several taxa resolves to the fungal one, or to -1 when it stays ambiguous.
+
+    Args:
+        taxdump (str): Extracted taxdump folder or taxdump.tar.gz.
+        index_dir (str): Output folder.
+
+    Returns:
+        dict: The index metadata (also written to meta.json).
+    """
+    taxids, parents, rank_names = [], [], []
+    for row in _dmp_rows(taxdump, "nodes.dmp"):
+        taxids.append(int(row[0]))
+        parents.append(int(row[1]))
+        rank_names.append(row[2])
+    merged = [(int(row[0]), int(row[1])) for row in _dmp_rows(taxdump, "merged.dmp", optional=True)]
+
+    ranks = ["", MERGED_RANK] + sorted(set(rank_names))
+    if len(ranks) > np.iinfo(np.int8).max:
+        raise ValueError(f"Too many ranks in {taxdump}: {len(ranks)}")
+    codes = {r: i for i, r in enumerate(ranks)}
+    size = max(taxids + [old for old, _ in merged]) + 1
+    parent = np.zeros(size, dtype=np.int32)
+    rank = np.zeros(size, dtype=np.int8)
+    parent[taxids] = parents
+    rank[taxids] = [codes[r] for r in rank_names]
+    for old, new in merged:
+        parent[old] = new
+        rank[old] = codes[MERGED_RANK]
+    fungal = _descends_from(parent, FUNGI_TAXID)
+
+    scientific = {}
+    keys, key_taxids, priority = [], [], []
+    for row in _dmp_rows(taxdump, "names.dmp"):
+        if row[3] not in NAME_CLASSES:
+            continue
+        taxid, name = int(row[0]), row[1]
+        is_scientific = row[3] == "scientific name"
+        if is_scientific:
+            scientific[taxid] = name
+        keys.append(name_key(name))
+        key_taxids.append(taxid)
+        # Scientific names beat synonyms; fungal taxa beat homonyms elsewhere
+        priority.append(2 * is_scientific + int(fungal[taxid]))
+    keys = np.array(keys, dtype=np.uint64)
+    key_taxids = np.array(key_taxids, dtype=np.int32)
+    priority = np.array(priority, dtype=np.int8)
+
+    # One entry per (name, taxid), keeping its best priority
+    order = np.lexsort((-priority, key_taxids, keys))
+    keys, key_taxids, priority = keys[order], key_taxids[order], priority[order]
+    first = np.r_[True, (keys[1:] != keys[:-1]) | (key_taxids[1:] != key_taxids[:-1])]
+    keys, key_taxids, priority = keys[first], key_taxids[first], priority[first]
+    # Then the best taxid per name; a tie between different taxa is ambiguous
+    order = np.lexsort((-priority, keys))
+    keys, key_taxids, priority = keys[order], key_taxids[order], priority[order]
+    heads = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    runner_up = np.minimum(heads + 1, len(keys) - 1)
+    tied = (runner_up != heads) & (keys[runner_up] == keys[heads]) & (priority[runner_up] == priority[heads])
+    name_taxids = np.where(tied, -1, key_taxids[heads]).astype(np.int32)
+
+    encoded = [scientific.get(t, "").encode() for t in range(size)]
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "parent.npy"), parent)
+    np.save(os.path.join(index_dir, "rank.npy"), rank)
+    np.save(os.path.join(index_dir, "name_offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "name_keys.npy"), keys[heads])
+    np.save(os.path.join(index_dir, "name_taxids.npy"), name_taxids)
+    with open(os.path.join(index_dir, "names.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    meta = {
+        "version": TAXONOMY_INDEX_VERSION,
+        "source": os.path.abspath(taxdump),
+        "built": datetime.now().isoformat(timespec="seconds"),
+        "ranks": ranks,
+        "nodes": len(taxids),
+        "merged": len(merged),
+        "names": int(len(heads)),
+        "ambiguous_names": int(tied.sum()),
+    }
+    with open(os.path.join(index_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class TaxonomyIndex:
+    """
+    Memory-mapped NCBI taxonomy built by build_taxonomy_index.
+
+    All lookups take and return arrays, so thousands of portals are resolved
+    with a few numpy passes instead of one tree walk per portal.
+    """
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != TAXONOMY_INDEX_VERSION:
+            raise ValueError(f"Taxonomy index {index_dir} is version {self.meta.get('version')}, "
+                             f"expected {TAXONOMY_INDEX_VERSION}; rebuild it")
+
+        def load(name):
+            return np.load(os.path.join(index_dir, name), mmap_mode="r")
+
+        self.parent = load("parent.npy")
+        self.rank = load("rank.npy")
+        self.name_offsets = load("name_offsets.npy")
+        self.name_keys = load("name_keys.npy")
+        self.name_taxids = load("name_taxids.npy")
+        names_path = os.path.join(index_dir, "names.bin")
+        self.names_blob = (np.memmap(names_path, dtype=np.uint8, mode="r")
+                           if os.path.getsize(names_path) else np.zeros(0, dtype=np.uint8))
+        self.rank_codes = {r: i for i, r in enumerate(self.meta["ranks"])}
+
+    def canonical(self, taxids) -> np.ndarray:
+        """
+        Current taxid for each input (merged ids followed), 0 for unknown or deleted ones.
+        """
+        ids = np.asarray(taxids, dtype=np.int64)
+        ids = np.where((ids > 0) & (ids < len(self.parent)), ids, 0)
+        merged = self.rank[ids] == self.rank_codes[MERGED_RANK]
+        ids[merged] = self.parent[ids[merged]]
+        ids[self.parent[ids] == 0] = 0
+        return ids
+
+    def lookup(self, names) -> np.ndarray:
+        """
+        Taxid for each name: 0 when unknown, -1 when the name is ambiguous.
+        """
+        keys = np.array([name_key(n) if isinstance(n, str) and n.strip() else 0 for n in names], dtype=np.uint64)
+        if not len(self.name_keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.name_keys, keys), len(self.name_keys) - 1)
+        found = (self.name_keys[pos] == keys) & (keys != 0)
+        return np.where(found, self.name_taxids[pos], 0).astype(np.int64)
+
+    def ancestors(self, taxids, ranks=LINEAGE_RANKS) -> dict:
+        """
+        Taxid of the ancestor at each rank (the node itself included), 0 if the lineage has none.
+
+        Returns:
+            dict: rank -> int array aligned with taxids.
+        """
+        cur = self.canonical(taxids)
+        out = {r: np.zeros(len(cur), dtype=np.int64) for r in ranks}
+        codes = {r: self.rank_codes.get(r, -1) for r in ranks}
+        for _ in range(MAX_DEPTH):
+            node_rank = self.rank[cur]
+            for r in ranks:
+                hit = (node_rank == codes[r]) & (out[r] == 0) & (cur > 0)
+                out[r][hit] = cur[hit]
+            cur = self.parent[cur]
+            if not (cur > 1).any():
+                break
+        return out
+
+    def is_fungal(self, taxids) -> np.ndarray:
+        """
+        True where the taxid (merged ids followed) is Fungi or descends from it.
+        """
+        cur = self.canonical(taxids)
+        out = cur == FUNGI_TAXID
+        for _ in range(MAX_DEPTH):
+            cur = self.parent[cur]
+            out |= cur == FUNGI_TAXID
+            if not (cur > 1).any():
+                break
+        return out
+
+    def names(self, taxids) -> list:
+        """
+        Scientific name for each taxid ("" for 0 or unknown ids).
+        """
+        ids = np.asarray(taxids, dtype=np.int64)
+        unique, inverse = np.unique(ids, return_inverse=True)
+        decoded = []
+        for t in unique:
+            if t <= 0 or t >= len(self.parent):
+                decoded.append("")
+            else:
+                start, end = self.name_offsets[t], self.name_offsets[t + 1]
+                decoded.append(self.names_blob[start:end].tobytes().decode())
+        return [decoded[i] for i in inverse.ravel()]
+
+    def lineages(self, taxids, ranks=LINEAGE_RANKS) -> dict:
+        """
+        Scientific names of the ancestors at each rank.
+
+        Returns:
+            dict: rank -> list of names aligned with taxids ("" where missing).
+        """
+        return {r: self.names(ids) for r, ids in self.ancestors(taxids, ranks).items()}
+
+
+def load_taxonomy_index(index_dir: str) -> TaxonomyIndex | None:
+    """
+    Open the taxonomy index, or return None (with a warning) when it has not been built.
+    """
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        logging.warning(f"No taxonomy index in {index_dir}; lineages are left for manual curation "
+                        f"(build one with src/build-taxonomy-index.py)")
+        return None
+    return TaxonomyIndex(index_dir)
+
+
+def _column_taxids(df) -> np.ndarray:
+    import pandas as pd
+
+    return pd.to_numeric(df["ncbi_taxon_id"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+
+
+def _blank(series):
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+
+def _usable_taxids(taxonomy: TaxonomyIndex, taxids: np.ndarray) -> np.ndarray:
+    # A taxid only resolves a portal when it is fungal and has an ancestor at one of the lineage ranks
+    has_rank = np.zeros(len(taxids), dtype=bool)
+    for ids in taxonomy.ancestors(taxids).values():
+        has_rank |= ids > 0
+    return (taxids > 0) & has_rank & taxonomy.is_fungal(taxids)
+
+
+def fill_lineages(phylogeny_data, taxonomy: TaxonomyIndex):
+    """
+    Fill missing NCBI lineage fields from the offline taxonomy index.
+
+    An existing ncbi_taxon_id is only trusted when it descends from Fungi and
+    has an ancestor at one of the lineage ranks (ids like 1 or a non-fungal
+    taxon are not). Other rows get a taxid from their species name (also tried
+    as a binomial, without strain suffixes) or genus name, under the same
+    check. Empty ncbi_taxon_class/order/family/genus/species fields are then
+    filled from that taxid's lineage; values already present are kept.
+
+    Args:
+        phylogeny_data (pd.DataFrame): Phylogeny rows as from build_phylogeny_data.
+        taxonomy (TaxonomyIndex): Loaded taxonomy index.
+
+    Returns:
+        pd.DataFrame: Copy with filled fields and a 'lineage_source' column
+            (ncbi_taxon_id, the name column used, or "" when unresolved).
+    """
+    df = phylogeny_data.copy()
+    resolved = taxonomy.canonical(_column_taxids(df))
+    resolved[~_usable_taxids(taxonomy, resolved)] = 0
+    source = np.where(resolved > 0, "ncbi_taxon_id", "").astype(object)
+
+    attempts = []
+    if "ncbi_taxon_species" in df:
+        species = df["ncbi_taxon_species"].fillna("").astype(str)
+        attempts += [("ncbi_taxon_species", species),
+                     ("ncbi_taxon_species", species.str.split().str[:2].str.join(" "))]
+    if "ncbi_taxon_genus" in df:
+        attempts.append(("ncbi_taxon_genus", df["ncbi_taxon_genus"].fillna("").astype(str)))
+    for col, names in attempts:
+        todo = resolved <= 0
+        if not todo.any():
+            break
+        found = taxonomy.canonical(np.maximum(taxonomy.lookup(names.where(todo, "")), 0))
+        hit = todo & _usable_taxids(taxonomy, found)
+        resolved[hit] = found[hit]
+        source[hit] = col
+
+    from_name = (source != "") & (source != "ncbi_taxon_id")
+    if from_name.any():
+        df["ncbi_taxon_id"] = df["ncbi_taxon_id"].astype(object)
+        df.loc[from_name, "ncbi_taxon_id"] = resolved[from_name]
+    for rank, names in taxonomy.lineages(resolved).items():
+        col = f"ncbi_taxon_{rank}"
+        names = np.array(names, dtype=object)
+        if col not in df:
+            df[col] = ""
+        fill = _blank(df[col]).to_numpy() & (names != "")
+        if fill.any():
+            df[col] = df[col].astype(object)
+            df.loc[fill, col] = names[fill]
+    df["lineage_source"] = source
+    return df
+
+
+def resolve_incomplete_phylogeny(complete, incomplete, taxonomy: TaxonomyIndex):
+    """
+    Fill lineages of the complete and incomplete phylogeny rows and move the
+    incomplete rows that got a fungal taxid and a filled lineage over to the
+    complete ones.
+
+    Returns:
+        tuple:
+            pd.DataFrame: Complete rows (filled).
+            pd.DataFrame: Rows that are still unresolved.
+    """
+    import pandas as pd
+
+    complete = fill_lineages(complete, taxonomy)
+    incomplete = fill_lineages(incomplete, taxonomy)
+    lineage_filled = np.zeros(len(incomplete), dtype=bool)
+    for rank in LINEAGE_RANKS:
+        lineage_filled |= ~_blank(incomplete[f"ncbi_taxon_{rank}"]).to_numpy()
+    resolved = (incomplete["lineage_source"] != "").to_numpy() & lineage_filled
+    logging.info(f"Resolved {int(resolved.sum())}/{len(incomplete)} incomplete lineages from the taxonomy index")
+    complete = pd.concat([complete, incomplete[resolved]]).drop_duplicates()
+    return complete, incomplete[~resolved]
+
+
+def _species_binomial(name: str) -> str:
+    return " ".join(name.split()[:2])
+
+
+def lineage_conflicts(phylogeny_data, taxonomy: TaxonomyIndex) -> np.ndarray:
+    """
+    Flag rows whose lineage is inconsistent.
+
+    A row conflicts when one of its stored ncbi_taxon_<rank> values disagrees
+    with the NCBI lineage of its taxid (species compared as binomials, empty
+    values ignored), or when rows of its organism name different taxa at the
+    same rank (a genus-level and a species-level row of one species agree).
+
+    Returns:
+        np.ndarray: Boolean mask aligned with the rows.
+    """
+    import pandas as pd
+
+    n = len(phylogeny_data)
+    if not n:
+        return np.zeros(0, dtype=bool)
+    ncbi = taxonomy.lineages(taxonomy.canonical(_column_taxids(phylogeny_data)))
+    conflict = np.zeros(n, dtype=bool)
+    for rank in LINEAGE_RANKS:
+        col = f"ncbi_taxon_{rank}"
+        stored = (phylogeny_data[col].fillna("").astype(str).str.strip().str.lower().tolist()
+                  if col in phylogeny_data else [""] * n)
+        expected = [name.lower() for name in ncbi[rank]]
+        if rank == "species":
+            stored = [_species_binomial(s) for s in stored]
+            expected = [_species_binomial(s) for s in expected]
+        conflict |= np.array([bool(s and e and s != e) for s, e in zip(stored, expected)])
+        effective = pd.Series([e or s or None for s, e in zip(stored, expected)], index=phylogeny_data.index)
+        per_organism = effective.groupby(phylogeny_data["organism"]).transform("nunique")
+        conflict |= (per_organism > 1).to_numpy()
+    return conflict
@@ -0,0 +1,466 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Newick tokens: structural characters or a run of label/length characters
+NEWICK_TOKEN_RE = re.compile(r"\s*([(),;]|[^(),;]+)")
+
+
+class TreeNode:
+    """
+    Minimal Newick node. Much lighter than Bio.Phylo clades, which matters when
+    thousands of gene trees are parsed in one go.
+    """
+    __slots__ = ("name", "length", "children")
+
+    def __init__(self, name="", length=None):
+        self.name = name
+        self.length = length
+        self.children = []
+
+    def is_leaf(self):
+        return not self.children
+
+
+def _split_label(token):
+    """
+    Split a raw Newick label token such as 'Aspni1-1234:0.05' into name and length.
+    """
+    token = token.strip()
+    if ":" in token:
+        name, length = token.rsplit(":", 1)
+        try:
+            return name.strip().strip("'"), float(length)
+        except ValueError:
+            return token.strip("'"), None
+    return token.strip("'"), None
+
+
+def parse_newick(text):
+    """
+    Parse a single Newick string into a tree of TreeNode objects.
+
+    Commas are attached to the innermost open node, so unrooted trees with a
+    basal trifurcation such as IQ-TREE's '(A,B,(C,D));' give a root with three
+    children. A top level without enclosing parentheses ('A,B,(C,D);') is
+    read the same way.
+
+    Args:
+        text (str): Newick string (one tree, terminated by ';').
+
+    Returns:
+        TreeNode: The root node.
+
+    Raises:
+        ValueError: On unbalanced parentheses.
+    """
+    # The implicit top node holds the root, or the top-level siblings of a tree without outer parentheses
+    top = TreeNode()
+    current = TreeNode()
+    top.children.append(current)
+    stack = [top]
+    expect_label = True
+    for m in NEWICK_TOKEN_RE.finditer(text):
+        tok = m.group(1)
+        if tok == "(":
+            child = TreeNode()
+            current.children.append(child)
+            stack.append(current)
+            current = child
+            expect_label = True
+        elif tok == ",":
+            current = TreeNode()
+            stack[-1].children.append(current)
+            expect_label = True
+        elif tok == ")":
+            if len(stack) == 1:
+                raise ValueError("Unbalanced parentheses in Newick string.")
+            current = stack.pop()
+            expect_label = True
+        elif tok == ";":
+            break
+        elif expect_label:
+            current.name, current.length = _split_label(tok)
+            expect_label = False
+    if len(stack) > 1:
+        raise ValueError("Unbalanced parentheses in Newick string.")
+    root = top.children[0] if len(top.children) == 1 else top
+    # Drop a redundant outer pair of parentheses, e.g. '((A,B,C));'
+    if len(root.children) == 1 and not root.name:
+        root = root.children[0]
+    return root
+
+
+def read_newick(path):
+    """
+    Read the first tree of a Newick file.
+
+    Args:
+        path (str | Path): Path to the tree file.
+
+    Returns:
+        TreeNode: The root node.
+    """
+    with open(path, "r") as f:
+        return parse_newick(f.read())
+
+
+def write_newick(root):
+    """
+    Serialize a TreeNode tree back to a Newick string.
+
+    Args:
+        root (TreeNode): Root of the tree.
+
+    Returns:
+        str: Newick string terminated by ';'.
+    """
+    def fmt(node):
+        label = node.name or ""
+        if node.length is not None:
+            label += f":{node.length:g}"
+        return label
+
+    out = []
+    # Iterative post-order so deep caterpillar trees do not hit the recursion limit
+    stack = [(root, 0)]
+    while stack:
+        node, i = stack.pop()
+        if node.is_leaf():
+            out.append(fmt(node))
+            continue
+        if i == 0:
+            out.append("(")
+        if i < len(node.children):
+            if i > 0:
+                out.append(",")
+            stack.append((node, i + 1))
+            stack.append((node.children[i], 0))
+        else:
+            out.append(")" + fmt(node))
+    return "".join(out) + ";"
+
+
+def iter_postorder(root):
+    """
+    Iterate over nodes so that every child is yielded before its parent.
+
+    Args:
+        root (TreeNode): Root of the tree.
+
+    Yields:
+        TreeNode: Nodes in post-order.
+    """
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if visited or node.is_leaf():
+            yield node
+        else:
+            stack.append((node, True))
+            stack.extend((c, False) for c in reversed(node.children))
+
+
+def parse_support(label):
+    """
+    Parse an IQ-TREE internal node label into SH-aLRT and UFBoot values.
+
+    IQ-TREE writes 'SH-aLRT/UFBoot' when both -alrt and -B are used, and a single
+    number when only one of them is.
+
+    Args:
+        label (str): Internal node label.
+
+    Returns:
+        tuple: (sh_alrt, ufboot) as floats, NaN when absent.
+    """
+    if not label:
+        return np.nan, np.nan
+    parts = label.split("/")
+    try:
+        if len(parts) >= 2:
+            return float(parts[0]), float(parts[1])
+        return np.nan, float(parts[0])
+    except ValueError:
+        return np.nan, np.nan
+
+
+def leaf_taxon(name):
+    """
+    Map a leaf name like 'Portal-ID' to its taxon (the portal), as done for ASTRAL.
+    """
+    return name.split("-", 1)[0]
+
+
+def collapse_low_support(root, min_support):
+    """
+    Collapse internal branches whose UFBoot support is below a threshold.
+
+    The children of a collapsed node are attached to its parent, producing a
+    polytomy, which is how ASTRAL expects unreliable branches to be encoded.
+
+    Args:
+        root (TreeNode): Root of the tree (modified in place).
+        min_support (float): Minimum UFBoot to keep a branch.
+
+    Returns:
+        int: Number of collapsed branches.
+    """
+    collapsed = 0
+    for node in iter_postorder(root):
+        if node.is_leaf():
+            continue
+        new_children = []
+        for child in node.children:
+            if not child.is_leaf():
+                _, ufboot = parse_support(child.name)
+                if not np.isnan(ufboot) and ufboot < min_support:
+                    new_children.extend(child.children)
+                    collapsed += 1
+                    continue
+            new_children.append(child)
+        node.children = new_children
+    return collapsed
+
+
+def build_taxon_index(roots):
+    """
+    Build a global taxon -> column index over the leaves of all trees.
+
+    Args:
+        roots (iterable): TreeNode roots.
+
+    Returns:
+        dict: Mapping taxon name -> integer index (sorted by name).
+    """
+    taxa = set()
+    for root in roots:
+        taxa.update(leaf_taxon(n.name) for n in iter_postorder(root) if n.is_leaf())
+    return {t: i for i, t in enumerate(sorted(taxa))}
+
+
+def _int_to_words(value, n_words):
+    return np.frombuffer(value.to_bytes(n_words * 8, "little"), dtype="<u8")
+
+
+def tree_bipartitions(root, taxon_index, n_words):
+    """
+    Convert a tree into canonical bitset bipartitions over a global taxon index.
+
+    Each non-trivial bipartition is stored as the side that does not contain the
+    lowest-indexed taxon of the tree, packed into n_words uint64 words.
+
+    Args:
+        root (TreeNode): Root of the tree.
+        taxon_index (dict): Mapping taxon name -> bit index.
+        n_words (int): Number of uint64 words per bitset.
+
+    Returns:
+        dict: 'bits' (k x n_words uint64), 'sh_alrt' and 'ufboot' (k floats),
+              'taxa' (n_words uint64 mask), 'n_leaves' and 'n_taxa' (ints).
+    """
+    masks = {}
+    full = 0
+    n_leaves = 0
+    splits = []
+    for node in iter_postorder(root):
+        if node.is_leaf():
+            m = 1 << taxon_index[leaf_taxon(node.name)]
+            n_leaves += 1
+            full |= m
+        else:
+            m = 0
+            for c in node.children:
+                m |= masks.pop(id(c))
+            if node is not root:
+                splits.append((m, node.name))
+        masks[id(node)] = m
+
+    n_taxa = full.bit_count()
+    lowest = full & -full
+    seen = {}
+    for m, label in splits:
+        if m & lowest:
+            m = full ^ m
+        size = m.bit_count()
+        if size < 2 or n_taxa - size < 2 or m in seen:
+            continue
+        seen[m] = parse_support(label)
+
+    bits = np.zeros((len(seen), n_words), dtype=np.uint64)
+    for i, m in enumerate(seen):
+        bits[i] = _int_to_words(m, n_words)
+    support = np.array(list(seen.values()), dtype=float).reshape(-1, 2)
+    return {
+        "bits": bits,
+        "sh_alrt": support[:, 0],
+        "ufboot": support[:, 1],
+        "taxa": _int_to_words(full, n_words),
+        "n_leaves": n_leaves,
+        "n_taxa": n_taxa,
+    }
+
+
+def _popcount(bits):
+    """
+    Row-wise popcount of a (k x n_words) uint64 array.
+    """
+    as_bytes = bits.view(np.uint8).reshape(bits.shape[0], -1)
+    return np.unpackbits(as_bytes, axis=1).sum(axis=1)
+
+
+def restrict_bipartitions(bits, taxa_masks):
+    """
+    Restrict reference bipartitions to each tree's taxon set and canonicalize them.
+
+    Args:
+        bits (np.ndarray): m x n_words reference bipartitions (e.g. species tree).
+        taxa_masks (np.ndarray): t x n_words taxon masks of the gene trees.
+
+    Returns:
+        tuple:
+            np.ndarray: t x m x n_words restricted, canonical bipartitions.
+            np.ndarray: t x m boolean, True where the restricted split is non-trivial.
+    """
+    restricted = bits[None, :, :] & taxa_masks[:, None, :]
+    # Lowest set bit of each taxon mask, as a one-hot word vector
+    lowest = np.zeros_like(taxa_masks)
+    for t in range(taxa_masks.shape[0]):
+        nz = np.flatnonzero(taxa_masks[t])
+        if nz.size:
+            w = nz[0]
+            v = taxa_masks[t, w]
+            lowest[t, w] = v & (~v + np.uint64(1))
+    has_lowest = (restricted & lowest[:, None, :]).any(axis=2)
+    restricted = np.where(has_lowest[:, :, None], taxa_masks[:, None, :] ^ restricted, restricted)
+
+    t, m, w = restricted.shape
+    sizes = _popcount(restricted.reshape(t * m, w)).reshape(t, m)
+    n_taxa = _popcount(taxa_masks)[:, None]
+    informative = (sizes >= 2) & (n_taxa - sizes >= 2)
+    return restricted, informative
+
+
+def summarize_gene_trees(gene_trees, species_tree=None, chunk_size=500):
+    """
+    Compute support, occupancy, Robinson-Foulds distance and concordance for many
+    gene trees using bitset bipartitions.
+
+    Args:
+        gene_trees (dict): Mapping tree name -> TreeNode root.
+        species_tree (TreeNode | None): Reference species tree with taxon leaves.
+        chunk_size (int): Number of gene trees compared to the species tree per batch.
+
+    Returns:
+        tuple:
+            pd.DataFrame: One row per gene tree.
+            pd.DataFrame: One row per species-tree branch with concordance counts
+                          (empty if no species tree was given).
+    """
+    roots = list(gene_trees.values())
+    taxon_index = build_taxon_index(roots + ([species_tree] if species_tree is not None else []))
+    n_total = len(taxon_index)
+    n_words = max(1, (n_total + 63) // 64)
+
+    names = list(gene_trees)
+    parsed = [tree_bipartitions(r, taxon_index, n_words) for r in roots]
+    n_bips = np.array([len(p["bits"]) for p in parsed], dtype=np.int64)
+    tree_ids = np.repeat(np.arange(len(parsed)), n_bips)
+    all_bits = np.concatenate([p["bits"] for p in parsed]) if len(parsed) else np.zeros((0, n_words), np.uint64)
+    all_sh = np.concatenate([p["sh_alrt"] for p in parsed]) if len(parsed) else np.zeros(0)
+    all_ufb = np.concatenate([p["ufboot"] for p in parsed]) if len(parsed) else np.zeros(0)
+    taxa_masks = np.stack([p["taxa"] for p in parsed]) if len(parsed) else np.zeros((0, n_words), np.uint64)
+    n_leaves = np.array([p["n_leaves"] for p in parsed], dtype=np.int64)
+    n_taxa = np.array([p["n_taxa"] for p in parsed], dtype=np.int64)
+
+    def mean_by_tree(values):
+        ok = ~np.isnan(values)
+        sums = np.bincount(tree_ids[ok], weights=values[ok], minlength=len(parsed))
+        counts = np.bincount(tree_ids[ok], minlength=len(parsed))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+
+    summary = pd.DataFrame({
+        "tree": names,
+        "n_leaves": n_leaves,
+        "n_taxa": n_taxa,
+        "single_copy": n_leaves == n_taxa,
+        "occupancy": n_taxa / n_total if n_total else np.nan,
+        "n_bipartitions": n_bips,
+        "mean_sh_alrt": mean_by_tree(all_sh),
+        "mean_ufboot": mean_by_tree(all_ufb),
+    })
+
+    if species_tree is None:
+        return summary, pd.DataFrame()
+
+    sp = tree_bipartitions(species_tree, taxon_index, n_words)
+    sp_bits = sp["bits"]
+    m = len(sp_bits)
+    rf = np.zeros(len(parsed), dtype=np.int64)
+    shared = np.zeros(len(parsed), dtype=np.int64)
+    concordant = np.zeros(m, dtype=np.int64)
+    decisive = np.zeros(m, dtype=np.int64)
+    # Multi-copy trees have no well-defined taxon bipartitions, so they are skipped
+    eligible = (n_leaves == n_taxa)
+
+    offsets = np.concatenate([[0], np.cumsum(n_bips)])
+    for start in range(0, len(parsed), chunk_size):
+        stop = min(start + chunk_size, len(parsed))
+        restricted, informative = restrict_bipartitions(sp_bits, taxa_masks[start:stop])
+        t = stop - start
+
+        sp_rows = restricted.reshape(t * m, n_words)
+        sp_tree = np.repeat(np.arange(start, stop), m)
+        sp_keep = informative.reshape(-1)
+
+        g_rows = all_bits[offsets[start]:offsets[stop]]
+        g_tree = tree_ids[offsets[start]:offsets[stop]]
+
+        keys = np.concatenate([
+            np.column_stack([sp_tree[sp_keep].astype(np.uint64), sp_rows[sp_keep]]),
+            np.column_stack([g_tree.astype(np.uint64), g_rows]),
+        ])
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        n_sp = int(sp_keep.sum())
+        in_gene = np.zeros(inverse.max() + 1 if inverse.size else 0, dtype=bool)
+        in_gene[inverse[n_sp:]] = True
+
+        sp_inv = inverse[:n_sp]
+        sp_match = in_gene[sp_inv]
+        # Restricted species bipartitions can coincide; count each split once per tree
+        uniq_sp, first = np.unique(sp_inv, return_index=True)
+        u_tree = sp_tree[sp_keep][first]
+        u_match = in_gene[uniq_sp]
+        n_sp_unique = np.bincount(u_tree - start, minlength=t)
+        n_shared = np.bincount(u_tree[u_match] - start, minlength=t)
+
+        rf[start:stop] = (n_sp_unique - n_shared) + (n_bips[start:stop] - n_shared)
+        shared[start:stop] = n_shared
+
+        branch = np.tile(np.arange(m), t)[sp_keep]
+        ok = eligible[sp_tree[sp_keep]]
+        decisive += np.bincount(branch[ok], minlength=m)
+        concordant += np.bincount(branch[ok & sp_match], minlength=m)
+
+    max_rf = 2 * np.maximum(n_taxa - 3, 0)
+    summary["shared_bipartitions"] = np.where(eligible, shared, -1)
+    summary["rf_distance"] = np.where(eligible, rf, -1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary["rf_normalized"] = np.where(eligible & (max_rf > 0), rf / np.maximum(max_rf, 1), np.nan)
+
+    inv_index = np.array(sorted(taxon_index, key=taxon_index.get))
+    branch_rows = []
+    for i in range(m):
+        members = np.flatnonzero(np.unpackbits(sp_bits[i].view(np.uint8), bitorder="little")[:n_total])
+        branch_rows.append({
+            "branch": i,
+            "clade_size": len(members),
+            "clade": ";".join(inv_index[members]),
+            "species_support": sp["ufboot"][i],
+            "decisive_trees": decisive[i],
+            "concordant_trees": concordant[i],
+            "concordance": concordant[i] / decisive[i] if decisive[i] else np.nan,
+        })
+    return summary, pd.DataFrame(branch_rows)
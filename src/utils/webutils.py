@@ -1,65 +1,54 @@
 import os
 import json
-import requests
 import time
 import pandas as pd
-import openpyxl
 import logging
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
 
 from config import JGI_API_BASE_URL, FILES_PER_PAGE, REQUEST_DELAY
-from src.credentials import HEADERS, COOKIES
+from src.utils.tableutils import (
+    content_hash, load_cached_table, save_cached_table, html_table_to_frame, xlsx_table_to_frame
+)
+from src.utils.profileutils import timed
 
+# requests, openpyxl and the credentials are imported inside the functions
+# that go to the network or read Excel, so parsing local JSON stays cheap to import.
 
-def download_mycocosm_fungi_table(url: str, local_xlsx: str) -> pd.DataFrame:
+
+def download_mycocosm_fungi_table(url: str, local_xlsx: str, cache_dir: str | None = None) -> pd.DataFrame:
     """
     Downloads the HTML table from the given MycoCosm URL and returns it as a DataFrame.
     If the download fails, attempts to load and wrangle a local Excel file.
     If both fail, instructs the user to manually download the table.
 
+    Parsed tables are cached as Parquet in cache_dir, keyed by the SHA-256 of the
+    downloaded page (or Excel file), so an unchanged source is never parsed twice.
+
     Args:
         url (str): The URL of the web page containing the table.
         local_xlsx (str): Path to a local Excel file to use as a fallback.
+        cache_dir (str | None): Folder for the parsed-table cache (None disables it).
 
     Returns:
         pd.DataFrame: The table data as a pandas DataFrame, or None if unavailable.
     """
     try:
+        import requests
+        from src.credentials import HEADERS, COOKIES
+
         response = requests.get(url, cookies=COOKIES, headers=HEADERS)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        table = soup.find('table')
-        if not table:
+        key = content_hash(response.content)
+        df = load_cached_table(cache_dir, key)
+        if df is not None:
+            logging.info(f"MycoCosm table unchanged since last parse; using cache ({key[:12]})")
+            return df
+
+        df = html_table_to_frame(response.text, url)
+        if df is None:
             logging.error("No table found at the provided URL.")
             return None
-
-        headers = [th.get_text(strip=True) for th in table.find_all('th')]
-        rows = []
-        for tr in table.find_all('tr')[1:]:
-            cells = tr.find_all('td')
-            row_data = []
-            row_links = []
-            for cell in cells:
-                cell_text = cell.get_text(strip=True)
-                row_data.append(cell_text)
-                link_tag = cell.find('a')
-                if link_tag and link_tag.get('href'):
-                    full_url = urljoin(url, link_tag['href'])
-                    row_links.append(full_url)
-                else:
-                    row_links.append(None)
-            combined_row = row_data + row_links
-            rows.append(combined_row)
-
-        link_headers = [f"{col}_link" for col in headers]
-        final_headers = headers + link_headers
-
-        df = pd.DataFrame(rows, columns=final_headers)
-        df['portal'] = df['Name_link'].str.replace('https://mycocosm.jgi.doe.gov/', '')
-        df['reference'] = df['Published_link']
-        df = df.loc[:, ~df.columns.str.endswith('_link')]
+        save_cached_table(cache_dir, key, df)
 
         logging.info(f"Successfully downloaded table from {url}")
         return df
@@ -69,55 +58,12 @@ def download_mycocosm_fungi_table(url: str, local_xlsx: str) -> pd.DataFrame:
         # Try to load local Excel file
         if os.path.exists(local_xlsx):
             try:
-                # Load with pandas for values
-                df = pd.read_excel(local_xlsx)
-                # Load with openpyxl for hyperlinks
-                wb = openpyxl.load_workbook(local_xlsx, data_only=True)
-                ws = wb.active
-                # Find the column indices for "Name" and "Published"
-                header_row = next(ws.iter_rows(min_row=1, max_row=1))
-                name_col_idx = None
-                published_col_idx = None
-                for idx, cell in enumerate(header_row):
-                    if cell.value == "Name":
-                        name_col_idx = idx
-                    if cell.value == "Published":
-                        published_col_idx = idx
-                # Extract Name_link and Published_link
-                name_links = []
-                published_links = []
-                for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-                    # Name link
-                    if name_col_idx is not None:
-                        cell = row[name_col_idx]
-                        if cell.hyperlink:
-                            name_links.append(cell.hyperlink.target)
-                        else:
-                            name_links.append(None)
-                    else:
-                        name_links.append(None)
-                    # Published link
-                    if published_col_idx is not None:
-                        cell = row[published_col_idx]
-                        if cell.hyperlink:
-                            published_links.append(cell.hyperlink.target)
-                        else:
-                            published_links.append(None)
-                    else:
-                        published_links.append(None)
-                if name_col_idx is not None:
-                    df['Name_link'] = name_links
-                    df['portal'] = df['Name_link'].str.replace('https://mycocosm.jgi.doe.gov/', '', regex=False)
-                else:
-                    df['portal'] = df['Name'].astype(str).str.replace('https://mycocosm.jgi.doe.gov/', '', regex=False)
-                if published_col_idx is not None:
-                    df['Published_link'] = published_links
-                    df['reference'] = df['Published_link']
-                elif 'Published' in df.columns:
-                    df['reference'] = df['Published']
-                
-                df = df.loc[:, ~df.columns.str.endswith('_link')]
-                
+                with open(local_xlsx, "rb") as f:
+                    key = content_hash(f.read())
+                df = load_cached_table(cache_dir, key)
+                if df is None:
+                    df = xlsx_table_to_frame(local_xlsx)
+                    save_cached_table(cache_dir, key, df)
                 logging.info(f"Loaded and wrangled local Excel file: {local_xlsx}")
                 return df
             except Exception as e2:
@@ -139,6 +85,8 @@ def fetch_portal_json(organism_id: str, header: dict, out_dir: str) -> bool:
     Args:
         organism_id (str): The ID of the organism to fetch files for.
     """
+    import requests
+
     logging.info(f"Fetching all files for {organism_id} from JGI...")
     params = {
         "organism": organism_id,
@@ -212,6 +160,7 @@ def batch_fetch_json(organism_ids: list, headers: dict, out_dir: str):
     with ThreadPoolExecutor(max_workers=5) as executor:
         executor.map(fetch_if_needed, organism_ids)
 
+@timed("datadump.parse_portal_jsons")
 def parse_portal_jsons(organism_ids: list, input_dir: str) -> pd.DataFrame:
     """
     Parses the JSON files obtained from mycocosm and returns them as a DataFrame.
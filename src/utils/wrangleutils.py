@@ -1,9 +1,12 @@
+from __future__ import annotations
+
 import os
 import sys
 import shutil
 import gzip
-import pandas as pd
-from Bio import SeqIO
+
+# pandas and Biopython are imported inside the functions that use them, so
+# scripts that only need validate_directories & co. start quickly.
 
 def validate_directories(dirs):
     """
@@ -37,6 +40,9 @@ def extract_files(proteome_data, compressed_dir, extracted_dir):
     """
     Extract compressed proteome files (.gz or .zip) to a target directory.
 
+    With BGZF proteome storage (config.PROTEOME_COMPRESSION), .gz proteomes are
+    stored as indexed BGZF under their original name instead of uncompressed.
+
     Args:
         proteome_data (pd.DataFrame): DataFrame containing file metadata.
         compressed_dir (str): Directory containing compressed files.
@@ -45,6 +51,11 @@ def extract_files(proteome_data, compressed_dir, extracted_dir):
     Returns:
         list: Paths to the extracted files (empty string if extraction failed).
     """
+    import pandas as pd
+    from src.utils.sequtils import iter_fasta
+    from src.utils.storageutils import fasta_writer, proteome_suffix
+
+    bgzf = proteome_suffix().endswith(".gz")
     extracted_files_column = []
     for _, row in proteome_data.iterrows():
         compressed_name = row["compressed_file"]
@@ -53,7 +64,18 @@ def extract_files(proteome_data, compressed_dir, extracted_dir):
             extracted_files_column.append(extracted_path)
             continue
         compressed_path = os.path.join(compressed_dir, compressed_name)
-        if compressed_name.endswith(".gz"):
+        if compressed_name.endswith(".gz") and bgzf:
+            # Recompress as indexed BGZF instead of storing the proteome uncompressed
+            output_path = os.path.join(extracted_dir, compressed_name)
+            try:
+                with fasta_writer(output_path) as out:
+                    for header, seq in iter_fasta(compressed_path):
+                        out.write(header, seq)
+                print(f"✅ Extracted {compressed_name} to {output_path}")
+                extracted_path = output_path
+            except Exception as e:
+                print(f"❌ Failed to extract {compressed_name}: {e}")
+        elif compressed_name.endswith(".gz"):
             output_name = compressed_name[:-3]
             output_path = os.path.join(extracted_dir, output_name)
             try:
@@ -79,6 +101,9 @@ def rename_fasta_headers(proteome_data, renamed_dir):
     """
     Rename FASTA sequence headers for extracted proteome files and log the changes.
 
+    Inputs may be plain or gzip/BGZF-compressed; outputs are <portal>.fasta or,
+    with BGZF proteome storage, indexed <portal>.fasta.gz.
+
     Args:
         proteome_data (pd.DataFrame): DataFrame containing file metadata and extracted file paths.
         renamed_dir (str): Directory to save renamed FASTA files.
@@ -88,6 +113,11 @@ def rename_fasta_headers(proteome_data, renamed_dir):
             list: Paths to renamed FASTA files (empty string if renaming failed).
             list: Log data for each file (dicts with file info and renaming summary).
     """
+    from Bio import SeqIO
+    from src.utils.sequtils import open_text
+    from src.utils.storageutils import proteome_suffix, write_seqrecords
+
+    suffix = proteome_suffix()
     renamed_file_column = []
     log_data = []
     for _, row in proteome_data.iterrows():
@@ -103,11 +133,12 @@ def rename_fasta_headers(proteome_data, renamed_dir):
             })
             continue
         portal_name = row.get("portal", "").strip()
-        output_file_name = f"{portal_name}.fasta" if portal_name else os.path.basename(input_path)
+        output_file_name = f"{portal_name}{suffix}" if portal_name else os.path.basename(input_path)
         output_path = os.path.join(renamed_dir, output_file_name)
         renamed_file_column.append(output_path)
         try:
-            records = list(SeqIO.parse(input_path, "fasta"))
+            with open_text(input_path) as fin:
+                records = list(SeqIO.parse(fin, "fasta"))
             total_seqs = len(records)
             renamed_count = 0
             first_original_id = records[0].id if records else ""
@@ -125,8 +156,7 @@ def rename_fasta_headers(proteome_data, renamed_dir):
                             first_renamed_id = new_id
                 elif i == 0:
                     first_renamed_id = original_id
-            with open(output_path, "w") as fout:
-                SeqIO.write(records, fout, "fasta")
+            write_seqrecords(output_path, records)
             print(f"✅ Renamed {renamed_count}/{total_seqs} headers in: {output_path}")
             log_data.append({
                 "file": os.path.basename(input_path),
@@ -185,12 +215,20 @@ def split_phylogeny_data(phylogeny_data, missing_organisms):
     ].drop_duplicates()
     return missing, complete, incomplete
 
-def find_duplicates(phylogeny_data_complete):
+def find_duplicates(phylogeny_data_complete, taxonomy=None):
     """
     Identifies organisms with duplicate entries in the complete phylogeny data.
 
+    With a taxonomy index, every row gets a 'lineage_conflict' flag (see
+    taxonomyutils.lineage_conflicts), and duplicated organisms whose rows agree
+    on their NCBI lineage are reduced to one row and returned as singles, so
+    only real conflicts are left for manual curation. The kept row is chosen
+    deterministically: the one with the most filled ncbi_* fields, then a new
+    proteome over an old one, then the lowest ncbi_taxon_id.
+
     Args:
         phylogeny_data_complete (pd.DataFrame): DataFrame with complete phylogeny information.
+        taxonomy (TaxonomyIndex, optional): Offline NCBI taxonomy to check lineages against.
 
     Returns:
         tuple:
@@ -199,11 +237,35 @@ def find_duplicates(phylogeny_data_complete):
     """
     counts = phylogeny_data_complete.groupby("organism").size().reset_index(name="count")
     double_organisms = counts[counts["count"] > 1]["organism"]
+    if taxonomy is not None and "ncbi_taxon_id" in phylogeny_data_complete.columns:
+        from src.utils.taxonomyutils import lineage_conflicts
+
+        flagged = phylogeny_data_complete.assign(
+            lineage_conflict=lineage_conflicts(phylogeny_data_complete, taxonomy)
+        )
+        conflicted = flagged.groupby("organism")["lineage_conflict"].transform("any")
+        is_double = flagged["organism"].isin(double_organisms) & conflicted
+        double_phylogeny = flagged[is_double]
+        singles = flagged[~is_double]
+        ncbi_cols = [c for c in singles.columns if c.startswith("ncbi")]
+        filled = singles[ncbi_cols].notna() & (singles[ncbi_cols].astype(str).apply(lambda c: c.str.strip()) != "")
+        order = singles.assign(_filled=filled.sum(axis=1),
+                               _new=(singles["new_proteome"].astype(str).str.lower() == "true") if "new_proteome" in singles
+                               else False,
+                               _taxid=singles["ncbi_taxon_id"].astype(str))
+        order = order.sort_values(["organism", "_filled", "_new", "_taxid"], ascending=[True, False, False, True],
+                                  kind="stable")
+        single_phylogeny = singles.loc[order.drop_duplicates("organism").index].sort_index()
+        print(f"⚠️ {double_phylogeny['organism'].nunique()} organisms with conflicting lineages, "
+              f"{int(single_phylogeny['lineage_conflict'].sum())} single entries disagree with NCBI")
+        return double_phylogeny, single_phylogeny
     double_phylogeny = phylogeny_data_complete[phylogeny_data_complete["organism"].isin(double_organisms)]
     single_phylogeny = phylogeny_data_complete[~phylogeny_data_complete["organism"].isin(double_organisms)]
     return double_phylogeny, single_phylogeny
 
 def check_organism_counts(single_phylogeny, double_phylogeny, missing, incomplete, all_organisms):
+    import pandas as pd
+
     all_organisms_series = pd.concat([
         single_phylogeny["organism"],
         double_phylogeny["organism"],
@@ -229,6 +291,7 @@ def find_new_proteomes(
         pd.DataFrame: The input DataFrame with a new 'new_proteome' boolean column.
     """
     import warnings
+    import pandas as pd
 
     if not os.path.exists(portals_table_path):
         df['new_proteome'] = True
@@ -276,4 +339,109 @@ def case_get(d, *keys, default=None):
         for dk in d:
             if str(dk).lower() == k_low:
                 return d[dk]
-    return default
\ No newline at end of file
+    return default
+
+def find_single_copy_orthogroups(gene_count_path, output_path, threshold=0.75):
+    """
+    Find orthogroups where at least a fraction of genomes have exactly one gene.
+
+    Args:
+        gene_count_path (str): Path to OrthoFinder's Orthogroups.GeneCount.tsv.
+        output_path (str): Where to write the selected orthogroups (TSV).
+        threshold (float): Fraction of genomes required to have a single gene.
+
+    Returns:
+        list: Names of the selected orthogroups.
+    """
+    import pandas as pd
+
+    counts = pd.read_csv(gene_count_path, sep="\t")
+    species_cols = [c for c in counts.columns if c not in ("Orthogroup", "Total")]
+    single_fraction = (counts[species_cols] == 1).sum(axis=1) / len(species_cols)
+    selected = counts.loc[single_fraction >= threshold, ["Orthogroup"]].copy()
+    selected["single_copy_fraction"] = single_fraction[single_fraction >= threshold]
+    selected.to_csv(output_path, sep="\t", index=False)
+    print(f"✅ {len(selected)} orthogroups with single copies in >= {threshold:.0%} of genomes -> {output_path}")
+    return selected["Orthogroup"].tolist()
+
+def copy_orthogroup_fastas(orthogroup_names, source_dir, target_dir):
+    """
+    Copy the FASTA files of the selected orthogroups to a target directory.
+
+    Args:
+        orthogroup_names (list): Orthogroup names (e.g. OG0000001).
+        source_dir (str): OrthoFinder Orthogroup_Sequences directory.
+        target_dir (str): Destination directory.
+
+    Returns:
+        list: Orthogroups whose FASTA file was not found.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    missing = []
+    for og in orthogroup_names:
+        src = os.path.join(source_dir, f"{og}.fa")
+        if os.path.isfile(src):
+            shutil.copy2(src, os.path.join(target_dir, f"{og}.fa"))
+        else:
+            missing.append(og)
+    if missing:
+        print(f"⚠️ {len(missing)} orthogroup FASTAs not found in {source_dir}")
+    print(f"📁 Copied {len(orthogroup_names) - len(missing)} orthogroup FASTAs to {target_dir}")
+    return missing
+
+def find_latest_orthofinder_results(orthofinder_dir):
+    """
+    Find the most recent OrthoFinder Results_* directory (also inside -b reruns).
+
+    Args:
+        orthofinder_dir (str): OrthoFinder output root (e.g. proteomes/clean/OrthoFinder).
+
+    Returns:
+        str | None: Path to the newest Results_* directory, or None.
+    """
+    candidates = []
+    for root, dirs, _ in os.walk(orthofinder_dir):
+        for d in dirs:
+            if d.startswith("Results_"):
+                path = os.path.join(root, d)
+                if os.path.isdir(os.path.join(path, "Orthogroups")):
+                    candidates.append(path)
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+def stream_rename_fasta(input_path, output_path):
+    """
+    Rename JGI headers (jgi|Portal|ID|model -> Portal-ID) while streaming a FASTA,
+    as rename_fasta_headers does for proteomes, without holding the file in memory.
+
+    Args:
+        input_path (str): Plain or gzip FASTA.
+        output_path (str): Renamed FASTA (indexed BGZF for .gz paths).
+
+    Returns:
+        dict: file, total_sequences, renamed_sequences, first_id_before and first_id_after.
+    """
+    from src.utils.sequtils import iter_fasta, jgi_portal_id
+    from src.utils.storageutils import fasta_writer
+
+    total = renamed = 0
+    first_before = first_after = ""
+    with fasta_writer(output_path) as out:
+        for header, seq in iter_fasta(input_path):
+            seq_id = header.split(None, 1)[0]
+            new_id = jgi_portal_id(seq_id)
+            if new_id:
+                header = new_id
+                renamed += 1
+            if total == 0:
+                first_before, first_after = seq_id, header.split(None, 1)[0]
+            out.write(header, seq)
+            total += 1
+    return {
+        "file": os.path.basename(input_path),
+        "total_sequences": total,
+        "renamed_sequences": renamed,
+        "first_id_before": first_before,
+        "first_id_after": first_after
+    }
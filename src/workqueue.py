@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Shared-filesystem work queue drained by a fixed pool of long-lived workers.
+
+Instead of one array element per family (capped by the array size limit),
+the pending families are queued once and every worker keeps claiming the
+next one (largest first) until the queue is empty, so one submission drains
+any number of families and fast workers take over the work of slow ones.
+Claims are leases: items of dead or killed workers go back to pending.
+Each item runs the stage's *-par.sh with QUEUE_ITEM set to the family.
+
+enqueue  queue the names of a set file (a batch-*.sh list) for an item script
+work     run workers here (-n local processes) until the queue is drained
+submit   submit a pool of SLURM workers (src/queue-worker.sh) with the item
+         script's #SBATCH resources
+status   items pending / claimed / done / failed, expired claims
+requeue  put failed items (and expired claims) back to pending
+
+Usage:
+  python src/workqueue.py enqueue local_data/queues/msa unaligned_files.txt --script src/msa-par.sh \\
+      --in-dir local_data/speciestree/seq_files --out-dir local_data/speciestree/seq_alignments
+  python src/workqueue.py submit local_data/queues/msa --workers 50
+  python src/workqueue.py work local_data/queues/msa -n 4
+  python src/workqueue.py status local_data/queues/msa
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Add project root to sys.path only here
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import QUEUE_LEASE_S, QUEUE_MAX_ATTEMPTS, QUEUE_WORKERS, QUEUE_WORKER_TIME
+from src.utils.queueutils import WorkQueue, run_worker
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# #SBATCH options of the item script a worker pool inherits
+WORKER_SBATCH_OPTIONS = ("account", "partition", "cpus-per-task", "mem-per-cpu", "mem")
+
+
+def cmd_enqueue(args):
+    with open(args.set_file) as f:
+        names = [line.strip() for line in f if line.strip()]
+    items = []
+    for name in names:
+        path = os.path.join(args.in_dir, name)
+        items.append((name, os.path.getsize(path) if os.path.exists(path) else 0))
+    queue = WorkQueue(args.queue)
+    counts = queue.enqueue(items, script=os.path.abspath(args.script), in_dir=os.path.abspath(args.in_dir),
+                           out_dir=os.path.abspath(args.out_dir))
+    print(f"✅ {counts['added']} items added, {counts['requeued']} requeued, {counts['skipped']} already queued "
+          f"-> {args.queue}")
+
+
+def _worker(params: tuple) -> dict:
+    queue, max_items, lease, max_attempts = params
+    return run_worker(queue, max_items=max_items, lease_s=lease, max_attempts=max_attempts)
+
+
+def cmd_work(args):
+    params = (args.queue, args.max_items, args.lease, args.max_attempts)
+    if args.workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=args.workers) as ex:
+            results = list(ex.map(_worker, [params] * args.workers))
+    else:
+        results = [_worker(params)]
+    done = sum(r["done"] for r in results)
+    failed = sum(r["failed"] for r in results)
+    print(f"{'⚠️' if failed else '✅'} {done} items done, {failed} failed attempts"
+          + (" (stopped)" if any(r["stopped"] for r in results) else ""))
+    cmd_status(args)
+
+
+def sbatch_options(script: str) -> dict:
+    """
+    Resource options from the #SBATCH header of a script.
+    """
+    options = {}
+    with open(script) as f:
+        for line in f:
+            match = re.match(r"#SBATCH\s+--([\w-]+)=(\S+)", line)
+            if match and match.group(1) in WORKER_SBATCH_OPTIONS:
+                options[match.group(1)] = match.group(2)
+    return options
+
+
+def cmd_submit(args):
+    queue = WorkQueue(args.queue)
+    config = queue.config
+    if "script" not in config:
+        sys.exit(f"❌ {args.queue} has no queue.json; enqueue items first")
+    pending = queue.status()["pending"]
+    if not pending:
+        print(f"✅ Nothing pending in {args.queue}")
+        return
+    workers = min(args.workers, pending)
+    options = sbatch_options(config["script"])
+    name = os.path.basename(os.path.normpath(args.queue))
+    cmd = ["sbatch", "--parsable", f"--array=1-{workers}", f"--job-name={name}_queue", f"--time={args.time}",
+           *[f"--{k}={v}" for k, v in options.items()], os.path.join(SRC_DIR, "queue-worker.sh"),
+           os.path.abspath(args.queue)]
+    if args.dry_run:
+        print(" ".join(cmd))
+        return
+    job_id = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip().split(";")[0]
+    print(f"✅ Submitted {workers} workers for {pending} pending items: job {job_id}")
+
+
+def cmd_status(args):
+    status = WorkQueue(args.queue, args.lease).status()
+    print(f"📋 {args.queue}: {status['pending']} pending, {status['claimed']} claimed by {status['workers']} "
+          f"workers ({status['expired']} expired), {status['done']} done, {status['failed']} failed")
+
+
+def cmd_requeue(args):
+    queue = WorkQueue(args.queue, args.lease)
+    expired = queue.requeue_expired()
+    failed = queue.requeue_failed() if args.failed else 0
+    print(f"✅ Requeued {expired} expired claims and {failed} failed items")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shared-filesystem work queue")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("enqueue", help="Queue the names of a set file")
+    p.add_argument("queue", help="Queue folder")
+    p.add_argument("set_file", help="Item names (input file names), one per line")
+    p.add_argument("--script", required=True, help="Item script taking <queue> <in dir> <out dir> and QUEUE_ITEM")
+    p.add_argument("--in-dir", required=True)
+    p.add_argument("--out-dir", required=True)
+    p.set_defaults(func=cmd_enqueue)
+
+    p = sub.add_parser("work", help="Run workers until the queue is drained")
+    p.add_argument("queue")
+    p.add_argument("-n", "--workers", type=int, default=1, help="Local worker processes (default: 1)")
+    p.add_argument("--max-items", type=int, default=None, help="Items per worker before it stops")
+    p.add_argument("--max-attempts", type=int, default=QUEUE_MAX_ATTEMPTS,
+                   help=f"Failures before an item is moved to failed/ (default: {QUEUE_MAX_ATTEMPTS})")
+    p.set_defaults(func=cmd_work)
+
+    p = sub.add_parser("submit", help="Submit a pool of SLURM workers")
+    p.add_argument("queue")
+    p.add_argument("--workers", type=int, default=QUEUE_WORKERS, help=f"Pool size (default: {QUEUE_WORKERS})")
+    p.add_argument("--time", default=QUEUE_WORKER_TIME, help=f"Worker time limit (default: {QUEUE_WORKER_TIME})")
+    p.add_argument("--dry-run", action="store_true", help="Print the sbatch command only")
+    p.set_defaults(func=cmd_submit)
+
+    p = sub.add_parser("status", help="Items per state")
+    p.add_argument("queue")
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("requeue", help="Put expired claims (and failed items) back to pending")
+    p.add_argument("queue")
+    p.add_argument("--failed", action="store_true", help="Also requeue failed items")
+    p.set_defaults(func=cmd_requeue)
+
+    for p in sub.choices.values():
+        p.add_argument("--lease", type=int, default=QUEUE_LEASE_S,
+                       help=f"Claim lease in seconds (default: {QUEUE_LEASE_S})")
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
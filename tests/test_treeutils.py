@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from src.utils.treeutils import parse_newick, write_newick, build_taxon_index, tree_bipartitions
+
+
+def test_unrooted_trifurcation():
+    # IQ-TREE .treefile: the root has three children
+    root = parse_newick("(A:0.1,B:0.2,(C:0.3,D:0.4)95/100:0.5);\n")
+    assert [c.name for c in root.children] == ["A", "B", "95/100"]
+    assert [c.name for c in root.children[2].children] == ["C", "D"]
+    assert write_newick(parse_newick("(A,B,(C,D));")) == "(A,B,(C,D));"
+
+
+def test_trifurcation_bipartitions():
+    root = parse_newick("(A,B,(C,D)95/100);")
+    index = build_taxon_index([root])
+    bips = tree_bipartitions(root, index, 1)
+    assert bips["n_taxa"] == 4
+    assert bips["bits"].tolist() == [[(1 << index["C"]) | (1 << index["D"])]]
+    assert bips["ufboot"].tolist() == [100.0]
+
+
+def test_top_level_without_parentheses():
+    assert write_newick(parse_newick("A,B,(C,D);")) == "(A,B,(C,D));"
+
+
+def test_redundant_outer_parentheses():
+    assert write_newick(parse_newick("((A,B,C));")) == "(A,B,C);"
+
+
+@pytest.mark.parametrize("text", ["(A,B));", "((A,B);"])
+def test_unbalanced(text):
+    with pytest.raises(ValueError):
+        parse_newick(text)